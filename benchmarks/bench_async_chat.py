@@ -0,0 +1,92 @@
+"""
+Load benchmark: concurrent /api/chat throughput, blocking vs async pipeline.
+
+The "blocking" run replays the original handler logic (sync Database calls and
+the sync OpenAI client inside an async function) so every request serializes
+on the event loop. The "async" run drives the real /api/chat endpoint.
+
+Usage: python benchmarks/bench_async_chat.py [concurrency] [llm_latency_seconds]
+"""
+
+import asyncio
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from fake_openai import FakeOpenAIServer
+
+CONCURRENCY = int(sys.argv[1]) if len(sys.argv) > 1 else 16
+LATENCY = float(sys.argv[2]) if len(sys.argv) > 2 else 0.2
+ROUNDS = 2
+
+server = FakeOpenAIServer(latency=LATENCY)
+os.environ["OPENAI_API_KEY"] = "sk-fake"
+os.environ["OPENAI_BASE_URL"] = server.start()
+os.environ["DATABASE_PATH"] = os.path.join(tempfile.mkdtemp(), "bench.db")
+
+import httpx  # noqa: E402
+from src import main  # noqa: E402
+
+
+def create_sessions(n):
+    sessions = []
+    for i in range(n):
+        user = main.db.create_user(f"bench_{time.time_ns()}_{i}", "x")
+        main.db.create_user_profile(user["user_id"], main.profile_service._get_empty_profile())
+        sessions.append(main.db.get_user_sessions(user["user_id"])[0]["id"])
+    return sessions
+
+
+async def blocking_chat(session_id, message):
+    """Original handler shape: blocking calls straight on the event loop."""
+    db, profile_service, llm_service = main.db, main.profile_service, main.llm_service
+    user_id = db.get_user_id_from_session(session_id)
+    db.add_message(session_id, "user", message)
+    history = db.get_session_messages(session_id)
+    profile = db.get_user_profile(user_id)
+    if len(history) >= 2:
+        recent_conv = [{"role": m["role"], "content": m["content"]} for m in history[-10:]]
+        profile = profile_service.extract_profile_from_conversation(recent_conv, profile)
+        db.update_user_profile(user_id, profile)
+    system_prompt = profile_service.generate_system_prompt(profile, profile.get("emotional_state"))
+    formatted = [{"role": m["role"], "content": m["content"]} for m in history]
+    response = llm_service.chat_with_custom_system(formatted, system_prompt)
+    db.add_message(session_id, "assistant", response["content"])
+
+
+async def run_blocking(sessions):
+    for r in range(ROUNDS):
+        await asyncio.gather(*(blocking_chat(s, f"Hola, mensaje {r}") for s in sessions))
+
+
+async def run_async(sessions):
+    transport = httpx.ASGITransport(app=main.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=60) as client:
+        for r in range(ROUNDS):
+            responses = await asyncio.gather(*(
+                client.post("/api/chat", data={"session_id": s, "message": f"Hola, mensaje {r}"})
+                for s in sessions
+            ))
+            assert all(resp.status_code == 200 for resp in responses), responses[0].text
+
+
+def measure(label, runner):
+    sessions = create_sessions(CONCURRENCY)
+    start = time.perf_counter()
+    asyncio.run(runner(sessions))
+    elapsed = time.perf_counter() - start
+    total = CONCURRENCY * ROUNDS
+    print(f"   {label:<10} {total} requests in {elapsed:6.2f}s → {total / elapsed:7.2f} req/s")
+    return elapsed
+
+
+print(f"🏁 /api/chat load benchmark (concurrency={CONCURRENCY}, LLM latency={LATENCY}s)\n")
+blocking = measure("blocking", run_blocking)
+non_blocking = measure("async", run_async)
+print(f"\n   Speedup: {blocking / non_blocking:.1f}x")
+server.stop()
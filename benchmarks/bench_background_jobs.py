@@ -0,0 +1,95 @@
+"""
+Latency breakdown: inline profile/emotional analysis vs background jobs.
+
+"inline" replays the previous handler order (prepare turn, extract profile,
+every 7th turn analyze emotions, then reply). "background" drives the real
+/api/chat endpoint, which replies first and queues the analysis jobs.
+The user think-time between turns is simulated by waiting for the queue.
+
+Usage: python benchmarks/bench_background_jobs.py [turns] [llm_latency_seconds]
+"""
+
+import asyncio
+import os
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from fake_openai import FakeOpenAIServer
+
+TURNS = int(sys.argv[1]) if len(sys.argv) > 1 else 21
+LATENCY = float(sys.argv[2]) if len(sys.argv) > 2 else 0.2
+
+server = FakeOpenAIServer(latency=LATENCY)
+os.environ["OPENAI_API_KEY"] = "sk-fake"
+os.environ["OPENAI_BASE_URL"] = server.start()
+os.environ["DATABASE_PATH"] = os.path.join(tempfile.mkdtemp(), "bench.db")
+
+import httpx  # noqa: E402
+from src import main  # noqa: E402
+
+
+def new_session():
+    user = main.db.create_user(f"bench_{time.time_ns()}", "x")
+    main.db.create_user_profile(user["user_id"], main.profile_service._get_empty_profile())
+    return main.db.get_user_sessions(user["user_id"])[0]["id"]
+
+
+async def inline_turn(session_id, message, stages):
+    t0 = time.perf_counter()
+    turn = await main.prepare_turn(session_id, message)
+    payload = {"user_id": turn["user_id"], "session_id": session_id}
+    t1 = time.perf_counter()
+    if turn["history_length"] >= 2:
+        await main.run_profile_extraction(payload)
+    if turn["count"] % 7 == 0 and turn["history_length"] >= 10:
+        await main.run_emotional_analysis(payload)
+    # The old handler built the prompt from the freshly extracted profile
+    profile = await main.profile_store.get(turn["user_id"])
+    system_prompt = main.profile_service.generate_system_prompt(profile, profile.get("emotional_state"))
+    t2 = time.perf_counter()
+    response = await main.llm_service.achat_with_custom_system(turn["history"], system_prompt)
+    await main.adb.add_message(session_id, "assistant", response["content"])
+    t3 = time.perf_counter()
+    stages["prepare"].append(t1 - t0)
+    stages["analysis"].append(t2 - t1)
+    stages["reply"].append(t3 - t2)
+    return t3 - t0
+
+
+async def run():
+    async with main.lifespan(main.app):
+        transport = httpx.ASGITransport(app=main.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=60) as client:
+            inline_stages = {"prepare": [], "analysis": [], "reply": []}
+            session_id = new_session()
+            inline = [await inline_turn(session_id, f"Hola {i}", inline_stages) for i in range(TURNS)]
+
+            session_id = new_session()
+            background = []
+            for i in range(TURNS):
+                start = time.perf_counter()
+                response = await client.post("/api/chat", data={"session_id": session_id, "message": f"Hola {i}"})
+                response.raise_for_status()
+                background.append(time.perf_counter() - start)
+                await main.job_queue.join()
+    return inline, inline_stages, background
+
+
+def ms(values):
+    return statistics.median(values) * 1000
+
+
+inline, stages, background = asyncio.run(run())
+print(f"\n📊 Chat latency breakdown ({TURNS} turns, stub LLM latency {LATENCY}s)\n")
+print(f"   inline      p50 {ms(inline):7.1f} ms   max {max(inline) * 1000:7.1f} ms")
+for name, values in stages.items():
+    print(f"      {name:<9} p50 {ms(values):7.1f} ms")
+print(f"   background  p50 {ms(background):7.1f} ms   max {max(background) * 1000:7.1f} ms")
+print(f"\n   p50 reduction: {(1 - ms(background) / ms(inline)) * 100:.0f}%")
+server.stop()
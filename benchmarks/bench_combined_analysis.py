@@ -0,0 +1,94 @@
+"""
+Analysis calls and tokens: separate prompts vs one combined structured call.
+
+Replays the background analysis of a conversation against the fake OpenAI
+server. "separate" runs the free-text profile extraction every turn plus the
+free-text emotional analysis every 7th turn; "combined" runs one
+function-calling conversation analysis per turn, asking for the emotional
+state too on the 7th turns. The fake model wraps free-text JSON in prose
+now and then, which json.loads rejects; tool call arguments are always
+well-formed.
+
+Usage: python benchmarks/bench_combined_analysis.py [turns]
+"""
+
+import asyncio
+import os
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from fake_openai import FakeOpenAIServer, default_responder
+
+TURNS = int(sys.argv[1]) if len(sys.argv) > 1 else 70
+PROSE_EVERY = 6  # every Nth free-text answer comes wrapped in prose
+
+CONVERSATION = []
+for i in range(40):
+    CONVERSATION.append({"role": "user", "content": f"Mensaje {i}: hoy he estado cocinando con mi hermana y hablando del trabajo"})
+    CONVERSATION.append({"role": "assistant", "content": "¡Qué bien! ¿Y qué cocinasteis? Cuéntame más sobre tu trabajo."})
+
+free_text_answers = 0
+
+
+def responder(payload):
+    global free_text_answers
+    content = default_responder(payload)
+    if not payload.get("tools") and content.startswith("{"):
+        free_text_answers += 1
+        if free_text_answers % PROSE_EVERY == 0:
+            return f"Aquí tienes el análisis:\n{content}\nEspero que sea útil."
+    return content
+
+
+async def run(mode, server, profile_service, llm_service):
+    failures = 0
+    calls = {True: 0, False: 0}
+    tokens = {True: 0, False: 0}
+    for turn in range(1, TURNS + 1):
+        emotional_check = turn % 7 == 0
+        window = CONVERSATION[:min(2 * turn, len(CONVERSATION))]
+        requests, chars = server.requests, server.prompt_chars
+
+        if mode == "separate":
+            before = {"age_range": None}
+            profile = await profile_service.aextract_profile_from_conversation(window[-10:], before)
+            failures += profile is before
+            if emotional_check:
+                failures += await llm_service.aanalyze_emotional_state(window[-15:]) is None
+        else:
+            conv = window[-15:] if emotional_check else window[-10:]
+            failures += await profile_service.aanalyze_conversation(conv, profile=True, emotion=emotional_check) is None
+
+        calls[emotional_check] += server.requests - requests
+        tokens[emotional_check] += (server.prompt_chars - chars) // 4
+    return calls, tokens, failures
+
+
+async def compare(server, profile_service, llm_service):
+    checks = TURNS // 7
+    print(f"🔬 Background analysis over {TURNS} turns ({checks} emotional-check turns)\n")
+    print(f"   {'mode':<10}{'calls':>7}{'check-turn calls':>18}{'tokens/turn':>13}"
+          f"{'tokens/check turn':>19}{'parse failures':>16}")
+    for mode in ["separate", "combined"]:
+        calls, tokens, failures = await run(mode, server, profile_service, llm_service)
+        print(f"   {mode:<10}{calls[True] + calls[False]:>7}{calls[True]:>18}"
+              f"{tokens[False] // (TURNS - checks):>13}{tokens[True] // checks:>19}{failures:>16}")
+
+
+def main():
+    server = FakeOpenAIServer(latency=0.0, responder=responder)
+    os.environ["OPENAI_BASE_URL"] = server.start()
+    os.environ.setdefault("OPENAI_API_KEY", "sk-bench")
+
+    from src.llm_service import LLMService
+    from src.profile_service import ProfileService
+
+    llm_service = LLMService()
+    asyncio.run(compare(server, ProfileService(llm_service), llm_service))
+    server.stop()
+
+
+main()
@@ -0,0 +1,87 @@
+"""
+Prompt-token savings of the context builder on a replayed long conversation.
+
+Replays a long session through /api/chat against the fake OpenAI server and
+compares the tokens actually sent for each reply with what sending the whole
+history plus system prompt would have cost. Summarization calls are counted
+as overhead.
+
+Usage: python benchmarks/bench_context_budget.py [turns]
+"""
+
+import asyncio
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from fake_openai import FakeOpenAIServer, default_responder
+
+TURNS = int(sys.argv[1]) if len(sys.argv) > 1 else 150
+USER_TEXT = "Hoy he estado pensando en el proyecto de jardinería que empecé con mis vecinos " * 4
+REPLY_TEXT = "Me parece un plan estupendo, cuéntame más sobre cómo os organizáis en el huerto " * 5
+SUMMARY_TEXT = "El usuario habla de su huerto comunitario con sus vecinos y de cómo se organizan. " * 6
+
+reply_prompts = []
+summary_prompts = []
+
+
+def responder(payload):
+    chars = sum(len(m["content"]) for m in payload["messages"])
+    if payload["messages"][0]["role"] == "system":
+        reply_prompts.append(chars)
+        return REPLY_TEXT
+    if "RESUMEN ANTERIOR" in payload["messages"][-1]["content"]:
+        summary_prompts.append(chars)
+        return SUMMARY_TEXT
+    return default_responder(payload)
+
+
+server = FakeOpenAIServer(latency=0.0, responder=responder)
+os.environ["OPENAI_API_KEY"] = "sk-fake"
+os.environ["OPENAI_BASE_URL"] = server.start()
+os.environ["DATABASE_PATH"] = os.path.join(tempfile.mkdtemp(), "bench.db")
+
+import httpx  # noqa: E402
+from src import main  # noqa: E402
+
+
+async def replay():
+    user = main.db.create_user(f"bench_{time.time_ns()}", "x")
+    main.db.create_user_profile(user["user_id"], main.profile_service._get_empty_profile())
+    session_id = main.db.get_user_sessions(user["user_id"])[0]["id"]
+    full_history_tokens = []
+
+    async with main.lifespan(main.app):
+        transport = httpx.ASGITransport(app=main.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=60) as client:
+            for i in range(TURNS):
+                response = await client.post("/api/chat", data={"session_id": session_id, "message": USER_TEXT})
+                response.raise_for_status()
+                await main.job_queue.join()
+
+                # What the old handler would have sent: full history + system prompt
+                history = main.db.get_session_messages(session_id)[:-1]
+                profile = await main.profile_store.get(user["user_id"])
+                system_prompt = main.profile_service.generate_system_prompt(profile, profile.get("emotional_state"))
+                full_history_tokens.append(
+                    main.llm_service.estimate_tokens(system_prompt)
+                    + sum(main.llm_service.estimate_tokens(m["content"]) for m in history)
+                )
+    return full_history_tokens
+
+
+full = asyncio.run(replay())
+budgeted = [chars // 4 for chars in reply_prompts]
+overhead = sum(summary_prompts) // 4
+print(f"\n🧮 Prompt tokens over a {TURNS}-turn conversation (CONTEXT_TOKEN_BUDGET="
+      f"{main.context_builder.token_budget})\n")
+print(f"   full history    total {sum(full):>10,}   last turn {full[-1]:>7,}")
+print(f"   context builder total {sum(budgeted):>10,}   last turn {budgeted[-1]:>7,}")
+print(f"   summarization   total {overhead:>10,}   ({len(summary_prompts)} calls)")
+print(f"\n   Net savings: {(1 - (sum(budgeted) + overhead) / sum(full)) * 100:.0f}%")
+server.stop()
@@ -0,0 +1,80 @@
+"""
+Micro-benchmark: Database ops/sec with and without pooled WAL connections.
+
+"baseline" reproduces the original setup (new connection per call, rollback
+journal, synchronous=FULL). "pooled" uses the defaults: one long-lived
+connection per thread, WAL, synchronous=NORMAL, larger cache and mmap.
+
+Usage: python benchmarks/bench_db_pool.py [seconds_per_case]
+"""
+
+import os
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from src.database import Database
+
+DURATION = float(sys.argv[1]) if len(sys.argv) > 1 else 1.0
+WRITERS = [1, 8, 32]
+
+CONFIGS = {
+    "baseline": {"SQLITE_POOL": "0", "SQLITE_JOURNAL_MODE": "DELETE", "SQLITE_SYNCHRONOUS": "FULL",
+                 "SQLITE_CACHE_SIZE": "-2000", "SQLITE_MMAP_SIZE": "0"},
+    "pooled": {"SQLITE_POOL": "1", "SQLITE_JOURNAL_MODE": "WAL", "SQLITE_SYNCHRONOUS": "NORMAL",
+               "SQLITE_CACHE_SIZE": "-20000", "SQLITE_MMAP_SIZE": str(256 * 1024 * 1024)},
+}
+
+
+def make_db(config):
+    os.environ.update(config)
+    db = Database(os.path.join(tempfile.mkdtemp(), "bench.db"))
+    user = db.create_user("bench", "x")
+    session_ids = [db.create_session(user["user_id"], f"s{i}") for i in range(32)]
+    for session_id in session_ids:
+        for j in range(50):
+            db.add_message(session_id, "user" if j % 2 == 0 else "assistant", "Mensaje de prueba " * 10)
+    return db, session_ids
+
+
+def run_case(db, session_ids, threads, op):
+    counts = [0] * threads
+    deadline = time.perf_counter() + DURATION
+
+    def worker(i):
+        session_id = session_ids[i % len(session_ids)]
+        while time.perf_counter() < deadline:
+            if op == "add_message":
+                db.add_message(session_id, "user", "Hola, ¿qué tal?")
+            else:
+                db.get_session_messages(session_id)
+            counts[i] += 1
+
+    pool = [threading.Thread(target=worker, args=(i,)) for i in range(threads)]
+    for t in pool:
+        t.start()
+    for t in pool:
+        t.join()
+    return sum(counts) / DURATION
+
+
+print(f"🗄️  Database micro-benchmark ({DURATION}s per case)\n")
+print(f"   {'operation':<22}{'threads':>8}{'baseline':>14}{'pooled':>14}{'speedup':>10}")
+results = {}
+for name, config in CONFIGS.items():
+    db, session_ids = make_db(config)
+    # Reads first so both configs read the same seeded data
+    for op in ["get_session_messages", "add_message"]:
+        for threads in WRITERS:
+            results[(name, op, threads)] = run_case(db, session_ids, threads, op)
+    db.close()
+
+for op in ["add_message", "get_session_messages"]:
+    for threads in WRITERS:
+        base = results[("baseline", op, threads)]
+        pooled = results[("pooled", op, threads)]
+        print(f"   {op:<22}{threads:>8}{base:>12.0f}/s{pooled:>12.0f}/s{pooled / base:>9.1f}x")
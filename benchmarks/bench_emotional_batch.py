@@ -0,0 +1,113 @@
+"""
+Batch emotional analysis vs the inline check every 7 messages.
+
+Seeds a database with users that each sent a burst of messages, then:
+- counts the emotional analysis calls the inline cadence would make for
+  that traffic against one batch run (one call per due user)
+- times a batch run against a fake provider at several concurrencies
+- checks that a second run finds nobody due (last_emotional_check updated)
+- round-trips the OpenAI batch file format: export the requests, answer them
+  the way the provider's batch output does, import the results
+
+Usage: python benchmarks/bench_emotional_batch.py [users] [messages_per_user] [llm_latency_seconds]
+"""
+
+import asyncio
+import json
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from fake_openai import ANALYSIS_JSON, FakeOpenAIServer
+
+USERS = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+MESSAGES = int(sys.argv[2]) if len(sys.argv) > 2 else 30
+LATENCY = float(sys.argv[3]) if len(sys.argv) > 3 else 0.05
+
+server = FakeOpenAIServer(latency=LATENCY)
+os.environ["OPENAI_BASE_URL"] = server.start()
+
+from src.database import Database, AsyncDatabase  # noqa: E402
+from src.emotional_batch import EmotionalBatch  # noqa: E402
+from src.llm_service import LLMService  # noqa: E402
+from src.profile_service import ProfileService  # noqa: E402
+
+
+def seed(db):
+    empty = ProfileService.__new__(ProfileService)._get_empty_profile()
+    for i in range(USERS):
+        user_id = db.create_user(f"user{i}", "secret")["user_id"]
+        db.create_user_profile(user_id, empty)
+        session_id = db.create_session(user_id, "Charla")
+        for j in range(MESSAGES):
+            db.add_message(session_id, "user", f"Hoy me siento un poco cansado, mensaje {j}")
+            db.add_message(session_id, "assistant", "Vaya, ¿quieres contarme qué ha pasado?")
+
+
+def inline_calls():
+    """Checks made by the old cadence: every 7th user message once history >= 10."""
+    return USERS * sum(1 for count in range(1, MESSAGES + 1) if count % 7 == 0 and count * 2 - 1 >= 10)
+
+
+def reset_checks(db):
+    conn = db.get_connection()
+    conn.execute("UPDATE user_profiles SET last_emotional_check = NULL, emotional_state_json = NULL")
+    conn.commit()
+    db.release_connection(conn)
+
+
+async def main():
+    db = Database(os.path.join(tempfile.mkdtemp(), "bench.db"))
+    adb = AsyncDatabase(db)
+    seed(db)
+    llm_service = LLMService(api_key="sk-fake")
+
+    print(f"🧠 Emotional analysis for {USERS} users x {MESSAGES} messages "
+          f"({LATENCY * 1000:.0f} ms LLM latency)\n")
+    print(f"   inline cadence (every 7 messages){inline_calls():>10} calls")
+    print(f"   batch run (once per due user)    {len(await EmotionalBatch(adb, llm_service).due_users()):>10} calls\n")
+
+    for concurrency in [1, 4, 16]:
+        reset_checks(db)
+        batch = EmotionalBatch(adb, llm_service, concurrency=concurrency, batch_size=USERS)
+        before = server.requests
+        start = time.perf_counter()
+        stats = await batch.run()
+        elapsed = time.perf_counter() - start
+        assert stats["updated"] == USERS, stats
+        print(f"   concurrency {concurrency:<3}{stats['updated']:>6} users {elapsed:>7.2f}s "
+              f"{stats['updated'] / elapsed:>8.1f} users/s  ({server.requests - before} API calls)")
+
+    again = await batch.run()
+    assert again["due"] == 0, again
+    print("\n   ✓ second run finds nobody due")
+
+    # OpenAI batch file round trip
+    reset_checks(db)
+    folder = tempfile.mkdtemp()
+    requests_path, results_path = os.path.join(folder, "requests.jsonl"), os.path.join(folder, "results.jsonl")
+    exported = await batch.export(requests_path)
+    with open(requests_path, encoding="utf-8") as f, open(results_path, "w", encoding="utf-8") as out:
+        for line in f:
+            request = json.loads(line)
+            out.write(json.dumps({"custom_id": request["custom_id"], "response": {"status_code": 200, "body": {
+                "id": "batch-1", "object": "chat.completion", "created": 0, "model": request["body"]["model"],
+                "choices": [{"index": 0, "finish_reason": "stop",
+                             "message": {"role": "assistant", "content": ANALYSIS_JSON}}]
+            }}}) + "\n")
+    imported = await batch.import_results(results_path)
+    assert exported == USERS and imported["updated"] == USERS, (exported, imported)
+    assert (await batch.run())["due"] == 0
+    print(f"   ✓ batch file round trip: {exported} requests exported, {imported['updated']} results imported")
+
+    await llm_service.aclose()
+    adb.shutdown()
+    server.stop()
+
+
+asyncio.run(main())
@@ -0,0 +1,122 @@
+"""
+Profile extraction calls saved by the informative-message pre-filter.
+
+Replays a sample corpus of Spanish chat turns (assistant reply + user answer,
+hand-labelled as carrying profile information or not) through
+main.schedule_analysis and counts queued profile extractions per 100
+turns for several PROFILE_UPDATE_FREQUENCY values. Also reports how many
+labelled-informative messages the filter rejects.
+
+Usage: python benchmarks/bench_extraction_prefilter.py
+"""
+
+import asyncio
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+os.environ.setdefault("OPENAI_API_KEY", "sk-bench")
+os.environ["DATABASE_PATH"] = os.path.join(tempfile.mkdtemp(), "bench.db")
+
+from src import main
+
+# (previous assistant reply, user message, carries profile info)
+CORPUS = [
+    ("¡Hola! ¿Cómo te llamas?", "Me llamo Lucía", True),
+    ("Encantada, Lucía. ¿Qué tal tu día?", "bien", False),
+    ("Me alegro. ¿Qué has hecho hoy?", "Fui al cole y luego a natación", True),
+    ("¡Qué divertido! La natación es genial.", "jajaja sí", False),
+    ("¿Cuántos años tienes?", "10", True),
+    ("Genial, estás en quinto entonces.", "ok", False),
+    ("¿Cuál es tu asignatura favorita?", "Matemáticas", True),
+    ("A mí también me gustan los números.", "vale", False),
+    ("¿Tienes mascotas?", "no", False),
+    ("Bueno, quizá algún día.", "jeje", False),
+    ("Cuéntame algo que te guste.", "Me encanta Minecraft", True),
+    ("¡Minecraft mola mucho! Construir es muy creativo.", "xd", False),
+    ("¿Juegas con amigos?", "sí claro", False),
+    ("Eso está muy bien.", "gracias", False),
+    ("¿Qué tal el fin de semana?", "Estuve en casa de mi abuela en Sevilla", True),
+    ("¡Sevilla es preciosa!", "ya", False),
+    ("¿Qué hicisteis?", "nada", False),
+    ("Bueno, a veces descansar también está bien.", "vale vale", False),
+    ("Buenos días, ¿qué tal todo?", "Hoy estoy muy cansada, trabajo de noche en el hospital", True),
+    ("Vaya, debe de ser duro. ¿Eres enfermera?", "sí", False),
+    ("Es una profesión admirable.", "gracias", False),
+    ("¿Llevas mucho tiempo en el hospital?", "unos 15 años", True),
+    ("¡Mucha experiencia!", "jaja ya", False),
+    ("¿Tienes hijos?", "dos, de 8 y 12 años", True),
+    ("Qué bonita edad.", "sí", False),
+    ("¿Qué os gusta hacer en familia?", "Ir al campo los domingos", True),
+    ("Eso suena genial.", "ok", False),
+    ("¿Qué tal has dormido?", "mal", True),
+    ("Lo siento. ¿Quieres hablar de algo?", "no, gracias", False),
+    ("De acuerdo, aquí estoy.", "👍", False),
+    ("¿Cómo va la semana?", "Estresado con el máster, tengo exámenes", True),
+    ("Ánimo con los exámenes.", "gracias", False),
+    ("¿Qué estudias?", "Ingeniería de datos en la Politécnica", True),
+    ("Muy interesante.", "bueno", False),
+    ("¿Te gusta?", "sí, bastante", True),
+    ("Me alegro mucho.", "jajaja", False),
+    ("¿Qué planes tienes para el verano?", "Quiero viajar a Japón con mi novia", True),
+    ("¡Qué planazo!", "sí jaja", False),
+    ("¿Has estado antes?", "no", False),
+    ("Te va a encantar.", "eso espero", False),
+    ("Hola de nuevo. ¿Qué tal?", "pues aquí", False),
+    ("¿Ha pasado algo?", "Me han despedido del trabajo", True),
+    ("Lo siento mucho. ¿Cómo te sientes?", "fatal", True),
+    ("Es normal sentirse así.", "ya", False),
+    ("¿Quieres contarme qué pasó?", "Recortes en la empresa, éramos 30", True),
+    ("Eso no tiene nada que ver contigo.", "supongo", False),
+    ("¿Tienes a alguien cerca?", "mi hermana vive conmigo", True),
+    ("Me alegro de que no estés solo.", "ok", False),
+    ("Si quieres, podemos buscar ideas.", "vale", False),
+    ("Aquí estaré cuando quieras.", "adiós", False),
+]
+TURNS = 100
+FREQUENCIES = [1, 3]
+
+
+async def replay(frequency):
+    queued = []
+
+    async def count_enqueue(job_type, payload):
+        if job_type == "conversation_analysis" and payload["profile"]:
+            queued.append(payload)
+        return len(queued)
+
+    main.job_queue.enqueue = count_enqueue
+    main.PROFILE_UPDATE_FREQUENCY = frequency
+    main.last_profile_extraction.clear()
+    main.pending_profile_info.clear()
+
+    for count in range(1, TURNS + 1):
+        reply, message, _ = CORPUS[(count - 1) % len(CORPUS)]
+        turn = {
+            "user_id": 1, "count": count, "history_length": 2, "summarize_up_to": None, "risk_level": "none",
+            "history": [{"role": "assistant", "content": reply}, {"role": "user", "content": message}]
+        }
+        await main.schedule_analysis(1, turn)
+    return len(queued)
+
+
+def main_bench():
+    informative = sum(1 for _, _, label in CORPUS if label)
+    missed = [m for r, m, label in CORPUS if label and not main.profile_service.is_informative_message(m, r)]
+    false_pos = [m for r, m, label in CORPUS if not label and main.profile_service.is_informative_message(m, r)]
+
+    print(f"🧪 Profile extraction calls per {TURNS} turns ({len(CORPUS)}-turn corpus, "
+          f"{informative} informative)\n")
+    print(f"   {'every turn (before)':<28}{TURNS:>5}")
+    for frequency in FREQUENCIES:
+        calls = asyncio.run(replay(frequency))
+        print(f"   {f'pre-filter, frequency {frequency}':<28}{calls:>5}   saved {TURNS - calls}")
+
+    print(f"\n   informative messages rejected: {len(missed)} {missed}")
+    print(f"   small talk let through:        {len(false_pos)} {false_pos}")
+
+
+main_bench()
@@ -0,0 +1,73 @@
+"""
+Benchmark: per-turn history loading cost vs session length.
+
+"full" is the previous behaviour (load and format the whole session every
+turn); "windowed" loads the last HISTORY_WINDOW messages through the index
+and trims them to the token budget. Also reports the history prompt size.
+
+Usage: python benchmarks/bench_history_window.py
+"""
+
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from src.database import Database
+from src.llm_service import LLMService
+
+SIZES = [10, 1_000, 10_000]
+TURNS = 50
+WINDOW = 50
+BUDGET = 3000
+
+db = Database(os.path.join(tempfile.mkdtemp(), "bench.db"))
+llm = LLMService(api_key="sk-fake")
+user = db.create_user("bench", "x")
+content = "Esto es un mensaje de longitud media para el benchmark de historial. " * 3
+
+
+def seed_session(n):
+    session_id = db.create_session(user["user_id"], f"s{n}")
+    conn = db.get_connection()
+    conn.executemany(
+        "INSERT INTO messages (session_id, role, content) VALUES (?, ?, ?)",
+        [(session_id, "user" if i % 2 == 0 else "assistant", content) for i in range(n)]
+    )
+    conn.commit()
+    db.release_connection(conn)
+    return session_id
+
+
+def full_turn(session_id):
+    history = db.get_session_messages(session_id)
+    return [{"role": m["role"], "content": m["content"]} for m in history]
+
+
+def windowed_turn(session_id):
+    history = db.get_recent_messages(session_id, WINDOW)
+    formatted = [{"role": m["role"], "content": m["content"]} for m in history]
+    return llm.window_history(formatted, BUDGET)
+
+
+def measure(turn, session_id):
+    start = time.perf_counter()
+    for _ in range(TURNS):
+        messages = turn(session_id)
+    elapsed = (time.perf_counter() - start) / TURNS * 1000
+    tokens = sum(llm.estimate_tokens(m["content"]) for m in messages)
+    return elapsed, tokens
+
+
+print(f"📜 History loading per turn (window={WINDOW} messages, budget={BUDGET} tokens)\n")
+print(f"   {'messages':>9}  {'full':>22}  {'windowed':>22}")
+for n in SIZES:
+    session_id = seed_session(n)
+    full_ms, full_tokens = measure(full_turn, session_id)
+    win_ms, win_tokens = measure(windowed_turn, session_id)
+    print(f"   {n:>9,}  {full_ms:>8.2f} ms {full_tokens:>8,} tok  {win_ms:>8.2f} ms {win_tokens:>8,} tok")
+
+db.close()
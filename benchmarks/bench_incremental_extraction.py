@@ -0,0 +1,82 @@
+"""
+Prompt tokens per turn: windowed vs incremental profile extraction.
+
+Replays a 200-message session (100 turns) and runs a profile extraction
+after every turn against the fake OpenAI server. "window" re-sends the last
+10 messages every time (the previous behaviour); "incremental" is the
+conversation_analysis job, which sends only messages after the user's
+watermark plus the compact current profile.
+
+Usage: python benchmarks/bench_incremental_extraction.py [messages]
+"""
+
+import asyncio
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from fake_openai import FakeOpenAIServer, default_responder
+
+MESSAGES = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+RULE = "━━━━━━━━━━━━━━━━━━━━━━━━━━━"
+USER_TEXT = "hoy he estado en el huerto con mi vecina Carmen, plantamos tomates y lechugas y luego merendamos juntas"
+REPLY_TEXT = ("¡Qué bien suena eso! Me encanta que compartáis el huerto, seguro que con Carmen todo es más "
+              "divertido. Los tomates necesitan bastante sol y riego constante, y las lechugas agradecen algo "
+              "de sombra en verano. ¿Cuánto tiempo lleváis cuidando el huerto juntas? ¿Y qué es lo que más te "
+              "gusta de pasar esas tardes allí?")
+
+conversation_chars = []
+
+
+def responder(payload):
+    prompt = payload["messages"][-1]["content"]
+    if payload.get("tools") and RULE in prompt:
+        conversation_chars.append(len(prompt.split(RULE)[1]))
+    return default_responder(payload)
+
+
+async def replay(main):
+    user_id = main.db.create_user("bench", "x")["user_id"]
+    main.db.create_user_profile(user_id, main.profile_service._get_empty_profile())
+    window_session = main.db.create_session(user_id, "window")
+    incremental_session = main.db.create_session(user_id, "incremental")
+
+    results = {}
+    for mode, session_id in [("window", window_session), ("incremental", incremental_session)]:
+        conversation_chars.clear()
+        server.prompt_chars = 0
+        for turn in range(MESSAGES // 2):
+            main.db.add_message(session_id, "user", f"Turno {turn}: {USER_TEXT}")
+            main.db.add_message(session_id, "assistant", REPLY_TEXT)
+            if mode == "window":
+                history = main.db.get_recent_messages(session_id, 10)
+                conv = [{"role": m["role"], "content": m["content"]} for m in history]
+                await main.profile_service.aanalyze_conversation(conv, profile=True, emotion=False)
+            else:
+                await main.run_conversation_analysis({"user_id": user_id, "session_id": session_id,
+                                                      "profile": True, "emotion": False})
+        turns = MESSAGES // 2
+        results[mode] = (server.prompt_chars // 4 // turns, sum(conversation_chars) // 4 // turns)
+    return results
+
+
+os.environ.setdefault("OPENAI_API_KEY", "sk-bench")
+os.environ["DATABASE_PATH"] = os.path.join(tempfile.mkdtemp(), "bench.db")
+server = FakeOpenAIServer(latency=0.0, responder=responder)
+os.environ["OPENAI_BASE_URL"] = server.start()
+
+from src import main  # noqa: E402
+
+results = asyncio.run(replay(main))
+server.stop()
+
+print(f"\n✂️  Profile extraction prompt tokens per turn ({MESSAGES}-message session)\n")
+print(f"   {'mode':<13}{'total':>8}{'conversation part':>20}")
+for mode, (total, conv) in results.items():
+    print(f"   {mode:<13}{total:>8}{conv:>20}")
+(before, before_conv), (after, after_conv) = results["window"], results["incremental"]
+print(f"\n   reduction: {1 - after / before:.0%} total, {1 - after_conv / before_conv:.0%} of the conversation part")
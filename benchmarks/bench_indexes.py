@@ -0,0 +1,94 @@
+"""
+Benchmark: session/message lookups as the messages table grows.
+
+Seeds the database in steps up to a million messages (spread over many
+users and sessions) and times get_session_messages and get_user_sessions
+with the migration indexes in place and with them dropped.
+
+Usage: python benchmarks/bench_indexes.py [total_messages]
+"""
+
+import os
+import random
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from src.database import Database, MIGRATIONS
+
+TOTAL = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+STEPS = [TOTAL // 100, TOTAL // 10, TOTAL]
+USERS = 1000
+SESSIONS_PER_USER = 5
+QUERIES = 200
+
+db = Database(os.path.join(tempfile.mkdtemp(), "bench.db"))
+conn = db.get_connection()
+conn.executemany(
+    "INSERT INTO users (id, username, password_hash) VALUES (?, ?, 'x')",
+    [(u, f"user{u}") for u in range(1, USERS + 1)]
+)
+conn.executemany(
+    "INSERT INTO sessions (user_id, session_name) VALUES (?, 'bench')",
+    [(u,) for u in range(1, USERS + 1) for _ in range(SESSIONS_PER_USER)]
+)
+conn.commit()
+session_count = USERS * SESSIONS_PER_USER
+
+
+def seed(n):
+    batch = []
+    for _ in range(n):
+        batch.append((random.randint(1, session_count), "user", "Hola, esto es un mensaje de prueba"))
+        if len(batch) == 50_000:
+            conn.executemany("INSERT INTO messages (session_id, role, content) VALUES (?, ?, ?)", batch)
+            batch = []
+    if batch:
+        conn.executemany("INSERT INTO messages (session_id, role, content) VALUES (?, ?, ?)", batch)
+    conn.commit()
+
+
+def time_queries():
+    rng = random.Random(42)
+    start = time.perf_counter()
+    for _ in range(QUERIES):
+        db.get_session_messages(rng.randint(1, session_count))
+    messages_ms = (time.perf_counter() - start) / QUERIES * 1000
+
+    start = time.perf_counter()
+    for _ in range(QUERIES):
+        db.get_user_sessions(rng.randint(1, USERS))
+    sessions_ms = (time.perf_counter() - start) / QUERIES * 1000
+    return messages_ms, sessions_ms
+
+
+def drop_indexes():
+    for statement in MIGRATIONS[0][2]:
+        name = statement.split("EXISTS ")[1].split(" ON")[0]
+        conn.execute(f"DROP INDEX IF EXISTS {name}")
+
+
+def create_indexes():
+    for statement in MIGRATIONS[0][2]:
+        conn.execute(statement)
+
+
+print(f"📈 Index benchmark ({USERS} users, {session_count} sessions, avg of {QUERIES} queries)\n")
+print(f"   {'messages':>10}  {'get_session_messages':>30}  {'get_user_sessions':>30}")
+print(f"   {'':>10}  {'indexed':>14}{'full scan':>16}  {'indexed':>14}{'full scan':>16}")
+seeded = 0
+for step in STEPS:
+    seed(step - seeded)
+    seeded = step
+    indexed = time_queries()
+    drop_indexes()
+    scan = time_queries()
+    create_indexes()
+    print(f"   {step:>10,}  {indexed[0]:>11.3f} ms{scan[0]:>13.3f} ms  {indexed[1]:>11.3f} ms{scan[1]:>13.3f} ms")
+
+print("\n   Indexed get_session_messages grows only with the rows each session returns;")
+print("   full scans grow with the whole table.")
+db.close()
@@ -0,0 +1,116 @@
+"""
+Response cache for deterministic analysis calls.
+
+Replays conversation windows through the analysis calls (combined analysis,
+profile extraction, emotional analysis, summary) twice, as happens on job
+retries and reloads, and checks that the second pass makes zero API calls.
+Also checks that malformed answers are not cached, that entries expire after
+the TTL and that the table stays within max_entries.
+
+Usage: python benchmarks/bench_llm_cache.py [windows] [llm_latency_seconds]
+"""
+
+import asyncio
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from fake_openai import FakeOpenAIServer, default_responder
+from src.database import Database, AsyncDatabase
+from src.llm_cache import LLMResponseCache
+from src.llm_service import LLMService
+from src.profile_service import ProfileService
+
+WINDOWS = int(sys.argv[1]) if len(sys.argv) > 1 else 20
+LATENCY = float(sys.argv[2]) if len(sys.argv) > 2 else 0.05
+
+
+def window(i):
+    return [
+        {"role": "user", "content": f"Hola, me llamo Usuario{i} y tengo {20 + i} años"},
+        {"role": "assistant", "content": "¡Encantado! ¿A qué te dedicas?"},
+        {"role": "user", "content": f"Trabajo de profesor y me encanta la cocina {i}"},
+    ]
+
+
+async def analyze(llm_service, profile_service, i):
+    conversation = window(i)
+    await profile_service.aanalyze_conversation(conversation)
+    await profile_service.aextract_profile_from_conversation(conversation)
+    await llm_service.aanalyze_emotional_state(conversation)
+    await llm_service.asummarize_conversation(None, conversation)
+
+
+async def main():
+    broken = {"next": False}
+
+    def responder(payload):
+        if broken["next"]:
+            broken["next"] = False
+            return "esto no es JSON"
+        return default_responder(payload)
+
+    server = FakeOpenAIServer(latency=LATENCY, responder=responder)
+    os.environ["OPENAI_BASE_URL"] = server.start()
+    db = Database(os.path.join(tempfile.mkdtemp(), "bench.db"))
+    adb = AsyncDatabase(db)
+    cache = LLMResponseCache(adb, ttl=3600, max_entries=10000)
+    llm_service = LLMService(api_key="sk-fake", response_cache=cache)
+    profile_service = ProfileService(llm_service)
+
+    print(f"🗃️  LLM response cache ({WINDOWS} windows x 4 analysis calls, "
+          f"{LATENCY * 1000:.0f} ms LLM latency)\n")
+
+    for label in ["first pass", "replay"]:
+        before = server.requests
+        start = time.perf_counter()
+        for i in range(WINDOWS):
+            await analyze(llm_service, profile_service, i)
+        elapsed = time.perf_counter() - start
+        print(f"   {label:<12}{server.requests - before:>5} API calls {elapsed:>8.2f}s")
+    replay_calls = server.requests - before
+    assert replay_calls == 0, f"replayed windows made {replay_calls} API calls"
+
+    stats = cache.stats()
+    print(f"\n   hit rate {stats['hit_rate']:.0%} ({stats['hits']} hits, {stats['misses']} misses)")
+
+    # A malformed answer is not cached: the retry goes back to the API
+    conversation = window(WINDOWS + 1)
+    broken["next"] = True
+    before = server.requests
+    failed = await llm_service.aanalyze_emotional_state(conversation)
+    retried = await llm_service.aanalyze_emotional_state(conversation)
+    assert failed is None and retried is not None and server.requests - before == 2
+    print("   ✓ malformed response not cached (retry called the API)")
+
+    # Expired entries are not served
+    cache.ttl = 0.2
+    conversation = window(WINDOWS + 2)
+    await llm_service.aanalyze_emotional_state(conversation)
+    await asyncio.sleep(0.3)
+    before = server.requests
+    await llm_service.aanalyze_emotional_state(conversation)
+    assert server.requests - before == 1
+    print("   ✓ entries expire after the TTL")
+
+    # Size-based eviction keeps the least recently used entries out
+    cache.ttl, cache.max_entries = 3600, 10
+    for i in range(WINDOWS + 3, WINDOWS + 8):
+        await llm_service.aanalyze_emotional_state(window(i))
+    conn = db.get_connection()
+    rows = conn.execute("SELECT COUNT(*) FROM llm_cache").fetchone()[0]
+    db.release_connection(conn)
+    assert rows <= 10, rows
+    print(f"   ✓ table capped at max_entries ({rows} rows, {cache.evictions} evicted)")
+
+    await llm_service.aclose()
+    adb.shutdown()
+    server.stop()
+
+
+asyncio.run(main())
@@ -0,0 +1,129 @@
+"""
+Simulation: reply latency under mixed load, with and without the scheduler.
+
+A fake provider with finite capacity (max_concurrency requests processed at
+once, the rest queue) receives, over a few seconds:
+- regular users sending a message every second
+- one chatty user sending many messages per second
+- profile extraction / emotional analysis calls after replies (as the
+  background jobs do)
+- a burst of proactive question calls
+
+"unscheduled" sends every call immediately (old behaviour: the provider's
+queue is FIFO across everything). "scheduled" goes through LLMScheduler
+with max_concurrency equal to the provider capacity, so replies are sent
+first and users are served round-robin. A last run adds an RPM limit and
+reports the peak rate of completed requests.
+
+Usage: python benchmarks/bench_llm_scheduler.py [seconds] [provider_capacity] [latency_seconds]
+"""
+
+import asyncio
+import os
+import random
+import sys
+import time
+from collections import deque
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from fake_openai import FakeOpenAIServer
+
+DURATION = float(sys.argv[1]) if len(sys.argv) > 1 else 5.0
+CAPACITY = int(sys.argv[2]) if len(sys.argv) > 2 else 8
+LATENCY = float(sys.argv[3]) if len(sys.argv) > 3 else 0.1
+
+REGULAR_USERS = 10
+CHATTY_RATE = 40      # messages/s from the chatty user
+PROACTIVE_BURST = 100
+
+server = FakeOpenAIServer(latency=LATENCY, max_concurrency=CAPACITY)
+os.environ["OPENAI_BASE_URL"] = server.start()
+
+from src.llm_scheduler import LLMScheduler  # noqa: E402
+from src.llm_service import LLMService  # noqa: E402
+
+
+def percentile(values, fraction):
+    values = sorted(values)
+    return values[min(int(len(values) * fraction), len(values) - 1)] * 1000 if values else 0.0
+
+
+async def simulate(scheduler):
+    llm = LLMService(api_key="sk-fake", scheduler=scheduler)
+    rng = random.Random(42)
+    latencies = {"regular": [], "chatty": [], "profile": [], "emotion": [], "proactive": []}
+    tasks = []
+    done_at = deque()
+
+    async def call(kind, priority, user_id):
+        start = time.perf_counter()
+        await llm.acreate_completion(
+            priority=priority, user_id=user_id,
+            messages=[{"role": "user", "content": f"mensaje de {user_id}"}], max_tokens=50
+        )
+        done_at.append(time.perf_counter())
+        latencies[kind].append(time.perf_counter() - start)
+
+    async def turn(kind, user_id):
+        await call(kind, "reply", user_id)
+        # Background analysis after the reply, as schedule_analysis queues it
+        if rng.random() < 0.5:
+            tasks.append(asyncio.create_task(call("profile", "profile", user_id)))
+        if rng.random() < 0.3:
+            tasks.append(asyncio.create_task(call("emotion", "emotion", user_id)))
+
+    async def user(kind, user_id, interval):
+        await asyncio.sleep(rng.random() * interval)
+        end = time.perf_counter() + DURATION
+        while time.perf_counter() < end:
+            tasks.append(asyncio.create_task(turn(kind, user_id)))
+            await asyncio.sleep(interval)
+
+    async def proactive_burst():
+        await asyncio.sleep(DURATION / 4)
+        for i in range(PROACTIVE_BURST):
+            tasks.append(asyncio.create_task(call("proactive", "proactive", 1000 + i)))
+
+    await asyncio.gather(
+        *(user("regular", i, 1.0) for i in range(REGULAR_USERS)),
+        user("chatty", 999, 1 / CHATTY_RATE),
+        proactive_burst()
+    )
+    while tasks:
+        pending, tasks[:] = list(tasks), []
+        await asyncio.gather(*pending)
+    await llm.aclose()
+
+    # Peak responses received in any 1 s window
+    times = sorted(done_at)
+    peak, left = 0, 0
+    for right, t in enumerate(times):
+        while t - times[left] > 1.0:
+            left += 1
+        peak = max(peak, right - left + 1)
+    return latencies, peak
+
+
+def report(name, latencies, peak):
+    print(f"\n   {name} (peak {peak} req/s)")
+    for kind, values in latencies.items():
+        print(f"   {kind:<12}{len(values):>6} calls   p50 {percentile(values, 0.5):>7.0f} ms"
+              f"   p99 {percentile(values, 0.99):>7.0f} ms")
+
+
+async def main():
+    print(f"⚖️  LLM scheduler simulation ({DURATION:.0f}s, provider capacity {CAPACITY} x "
+          f"{LATENCY * 1000:.0f} ms = {CAPACITY / LATENCY:.0f} req/s, "
+          f"{REGULAR_USERS} regular users + 1 chatty user at {CHATTY_RATE} msg/s)")
+
+    report("unscheduled", *await simulate(LLMScheduler(max_concurrency=1_000_000)))
+    report("scheduled", *await simulate(LLMScheduler(max_concurrency=CAPACITY)))
+    rpm = CAPACITY / LATENCY * 60 / 4
+    report(f"scheduled, LLM_RPM={rpm:.0f}", *await simulate(LLMScheduler(max_concurrency=CAPACITY, rpm=rpm)))
+    server.stop()
+
+
+asyncio.run(main())
@@ -0,0 +1,117 @@
+"""
+Throughput of the LLM transport against a fake provider that fails.
+
+Each scenario sends concurrent completions through LLMTransport with the
+fake server injecting errors, with and without retries / circuit breaker:
+- healthy provider
+- 20% of requests answered 503, 10% answered 429
+- provider down (every request 503): how long callers wait and how many
+  requests still reach the provider
+- recovery: the provider comes back after the breaker cooldown
+
+Backoff delays and cooldown are scaled down so the run takes seconds.
+
+Usage: python benchmarks/bench_llm_transport.py [requests] [concurrency] [latency_seconds]
+"""
+
+import asyncio
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from fake_openai import FakeOpenAIServer
+from src.llm_transport import LLMTransport, TransportConfig
+
+REQUESTS = int(sys.argv[1]) if len(sys.argv) > 1 else 300
+CONCURRENCY = int(sys.argv[2]) if len(sys.argv) > 2 else 32
+LATENCY = float(sys.argv[3]) if len(sys.argv) > 3 else 0.05
+
+NO_RETRIES = dict(max_retries=0, breaker_threshold=0)
+RETRIES = dict(max_retries=3, retry_base_delay=0.05, retry_max_delay=0.5, breaker_threshold=0)
+BREAKER = dict(RETRIES, breaker_threshold=5, breaker_cooldown=1.0)
+
+
+async def run(server, settings, requests=REQUESTS):
+    transport = LLMTransport("sk-fake", base_url=server.base_url, config=TransportConfig(**settings))
+    semaphore = asyncio.Semaphore(CONCURRENCY)
+    latencies, failures = [], 0
+
+    async def one(i):
+        nonlocal failures
+        async with semaphore:
+            start = time.perf_counter()
+            try:
+                await transport.acreate_completion(
+                    model="fake-model", messages=[{"role": "user", "content": f"hola {i}"}], max_tokens=20
+                )
+            except Exception:
+                failures += 1
+            latencies.append(time.perf_counter() - start)
+
+    sent = server.requests
+    start = time.perf_counter()
+    await asyncio.gather(*(one(i) for i in range(requests)))
+    elapsed = time.perf_counter() - start
+    await transport.aclose()
+
+    latencies.sort()
+    return {
+        "ok": (requests - failures) / requests,
+        "throughput": (requests - failures) / elapsed,
+        "p50": latencies[len(latencies) // 2] * 1000,
+        "p99": latencies[int(len(latencies) * 0.99) - 1] * 1000,
+        "upstream": server.requests - sent,
+        "stats": transport.stats()
+    }
+
+
+def report(name, result):
+    print(f"   {name:<34}{result['ok']:>7.0%}{result['throughput']:>9.0f}/s"
+          f"{result['p50']:>9.0f}{result['p99']:>9.0f}{result['upstream']:>10}")
+
+
+async def main():
+    print(f"🔁 LLM transport under failure ({REQUESTS} requests, concurrency {CONCURRENCY}, "
+          f"{LATENCY * 1000:.0f} ms provider latency)\n")
+    print(f"   {'scenario':<34}{'ok':>7}{'goodput':>11}{'p50 ms':>9}{'p99 ms':>9}{'upstream':>10}")
+
+    server = FakeOpenAIServer(latency=LATENCY)
+    server.start()
+    report("healthy", await run(server, BREAKER))
+
+    server.error_rate = 0.2
+    report("20% 503, no retries", await run(server, NO_RETRIES))
+    report("20% 503, retries", await run(server, RETRIES))
+    report("20% 503, retries + breaker", await run(server, BREAKER))
+
+    server.error_status = 429
+    server.error_rate = 0.1
+    report("10% 429, no retries", await run(server, NO_RETRIES))
+    report("10% 429, retries + breaker", await run(server, BREAKER))
+
+    server.error_status = 503
+    server.error_rate = 0.0
+    server.down = True
+    report("provider down, retries", await run(server, RETRIES))
+    report("provider down, retries + breaker", await run(server, BREAKER))
+
+    # Down long enough to open the breaker, then back before the cooldown ends
+    transport = LLMTransport("sk-fake", base_url=server.base_url, config=TransportConfig(**BREAKER))
+    for _ in range(5):
+        try:
+            await transport.acreate_completion(model="fake-model", messages=[{"role": "user", "content": "x"}])
+        except Exception:
+            pass
+    server.down = False
+    opened = transport.breaker.state
+    await asyncio.sleep(BREAKER["breaker_cooldown"])
+    await transport.acreate_completion(model="fake-model", messages=[{"role": "user", "content": "x"}])
+    print(f"\n   recovery: breaker {opened} while down -> {transport.breaker.state} after the cooldown probe")
+    await transport.aclose()
+    server.stop()
+
+
+asyncio.run(main())
@@ -0,0 +1,98 @@
+"""
+_merge_profiles cost with 10, 100 and 1,000 accumulated facts.
+
+Compares the previous quadratic implementation (kept here as a reference)
+with ProfileService._merge_profiles, merging a fresh extraction of 5 facts
+and 3 interests into profiles of growing size.
+
+Usage: python benchmarks/bench_merge_profiles.py
+"""
+
+import random
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from src.profile_service import ProfileService
+
+SIZES = [10, 100, 1000]
+WORDS = ("perro gato Madrid Barcelona hermana hijos diabetes yoga bicicleta piano huerto "
+         "trabajo casa abuela montaña playa coche teletrabajo universidad música").split()
+
+
+def legacy_merge(existing, new):
+    """_merge_profiles before the linear rewrite (facts part only)."""
+    merged = existing.copy()
+    for key in ["interests", "important_facts", "sensitive_topics", "personality_traits", "needs"]:
+        if key in new and new[key]:
+            merged[key] = list(set(merged.get(key, [])) | set(new[key]))
+
+    interests = [i.lower() for i in merged.get("interests", [])]
+    cleaned_facts = []
+    for fact in merged.get("important_facts", []):
+        fact_lower = fact.lower()
+        should_skip = False
+        for interest in interests:
+            if interest in fact_lower or fact_lower in interest:
+                should_skip = True
+                break
+            if any(pattern.format(interest) in fact_lower for pattern in [
+                "le gusta {}", "le encanta {}", "{} es su pasión", "disfruta {}",
+                "le apasiona {}", "practica {}", "{}"
+            ]):
+                should_skip = True
+                break
+        if not should_skip:
+            cleaned_facts.append(fact)
+
+    final_facts = []
+    for fact in cleaned_facts:
+        is_duplicate = False
+        for existing_fact in final_facts:
+            fact_words = set(fact.lower().split())
+            existing_words = set(existing_fact.lower().split())
+            overlap = len(fact_words & existing_words)
+            if overlap >= 2 and overlap >= len(fact_words) * 0.5:
+                is_duplicate = True
+                break
+        if not is_duplicate:
+            final_facts.append(fact)
+    merged["important_facts"] = final_facts
+    return merged
+
+
+def make_fact(rng, i):
+    return f"Hecho{i} {rng.choice(WORDS)} {rng.choice(WORDS)} dato{i}"
+
+
+def profile_with(service, rng, facts):
+    profile = service._get_empty_profile()
+    profile["interests"] = [f"Afición{i}" for i in range(15)]
+    profile["important_facts"] = [make_fact(rng, i) for i in range(facts)]
+    return profile
+
+
+def timed(fn, existing, new, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        result = fn(existing, new)
+    return (time.perf_counter() - start) / repeat * 1000, result
+
+
+service = ProfileService(None)
+rng = random.Random(7)
+new = service._get_empty_profile()
+new["interests"] = ["Yoga", "Piano", "Huerto"]
+new["important_facts"] = [make_fact(rng, 10_000 + i) for i in range(5)]
+
+print("🔀 _merge_profiles time per merge\n")
+print(f"   {'facts':>6}{'before ms':>12}{'after ms':>11}{'facts kept after':>19}")
+for size in SIZES:
+    existing = profile_with(service, rng, size)
+    repeat = max(1, 2000 // size)
+    before_ms, _ = timed(legacy_merge, existing, new, repeat)
+    after_ms, merged = timed(service._merge_profiles, existing, new, repeat)
+    print(f"   {size:>6}{before_ms:>12.3f}{after_ms:>11.3f}{len(merged['important_facts']):>19}")
+print("\n   After: important_facts capped at 50 (oldest evicted first).")
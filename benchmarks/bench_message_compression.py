@@ -0,0 +1,187 @@
+"""
+Compressed message storage on a synthetic corpus of Spanish chat messages.
+
+1. Compression ratio and speed per message for the stored bodies above the
+   size threshold: zlib without a dictionary, with the built-in preset
+   dictionary, with a dictionary trained from other messages of the corpus
+   (and zstd when the zstandard package is installed)
+2. A database of 1M messages (100 per session) stored as plain text, then
+   compacted with `compact_messages` + VACUUM (what
+   `python -m src.message_codec compact --vacuum` does): file size, and
+   read throughput of random 50-message pages before and after
+3. Every compacted message reads back identical to the original
+
+Usage: python benchmarks/bench_message_compression.py [messages] [dictionary_samples]
+"""
+
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from src.database import Database
+from src.message_codec import MessageCodec, train_dictionary, zstandard
+
+MESSAGES = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+SAMPLES = int(sys.argv[2]) if len(sys.argv) > 2 else 20_000
+PER_SESSION = 100
+PAGE = 50
+READ_SECONDS = 3.0
+
+TOPICS = ["el instituto", "tus amigos", "el fútbol", "Minecraft", "la música", "tu familia", "los exámenes",
+          "el trabajo", "tu perro", "la cocina", "las series", "dormir mejor", "el baloncesto", "tu hermana"]
+NAMES = ["Lucía", "Mateo", "Sofía", "Hugo", "Martina", "Leo", "Valeria", "Daniel", "Carmen", "Pablo"]
+USER = [
+    "hola", "jajaja", "vale", "sí", "no sé", "gracias!!", "bueno...", "ok",
+    "hoy he tenido un día raro en {topic}", "me llamo {name}", "¿qué opinas de {topic}?",
+    "estoy un poco cansado de {topic}, la verdad", "me encanta {topic} jaja",
+    "mi madre dice que paso demasiado tiempo con {topic}", "no sé qué hacer con {topic}, me agobia bastante",
+    "ayer estuve con {name} hablando de {topic} y al final discutimos por una tontería",
+]
+ASSISTANT = [
+    "¡Hola, {name}! ¿Qué tal estás hoy?", "Me alegra mucho que me lo cuentes.",
+    "Entiendo cómo te sientes, es completamente normal sentirse así con {topic}.",
+    "¿Quieres contarme un poco más sobre {topic}?", "¿Qué es lo que más te gusta de {topic}?",
+    "A veces ayuda ponerlo en palabras y buscar juntos alguna idea.",
+    "Por ejemplo, podrías intentar dedicar un rato cada día a {topic} sin presión.",
+    "Otra opción es hablarlo con alguien de confianza, como {name} o alguien de tu familia.",
+    "Lo más importante es que te cuides y descanses bien.",
+    "Recuerda que no estás solo y que pedir ayuda es un signo de fortaleza.",
+    "Si te apetece, podemos hacer una lista de cosas pequeñas que te hagan sentir mejor esta semana.",
+    "¿Has probado a organizarte el tiempo por bloques? A mucha gente le funciona para {topic}.",
+    "Eso suena a que has tenido {n} días bastante intensos, ¿cómo has dormido?",
+    "Aquí tienes algunas ideas que pueden ayudarte: 1) respirar hondo unos minutos, "
+    "2) salir a caminar, 3) escribir lo que sientes.",
+    "¡Qué bien! Me encanta que hayas encontrado algo que te motiva.",
+    "¿Hay algo más en lo que te pueda ayudar con {topic}?",
+]
+
+
+def message(rng, i):
+    fill = {"topic": rng.choice(TOPICS), "name": rng.choice(NAMES), "n": rng.randint(2, 9)}
+    if i % 2 == 0:
+        return "user", rng.choice(USER).format(**fill)
+    sentences = rng.sample(ASSISTANT, rng.randint(1, 6))
+    return "assistant", " ".join(s.format(**fill) for s in sentences)
+
+
+def corpus(rng, count):
+    return [message(rng, i) for i in range(count)]
+
+
+def ratios(name, codec, bodies):
+    start = time.perf_counter()
+    encoded = [codec.encode(text) for text in bodies]
+    encode_us = (time.perf_counter() - start) / len(bodies) * 1e6
+    start = time.perf_counter()
+    for value, encoding in encoded:
+        codec.decode(value, encoding)
+    decode_us = (time.perf_counter() - start) / len(bodies) * 1e6
+    before = sum(len(text.encode("utf-8")) for text in bodies)
+    after = sum(len(value) if encoding else len(value.encode("utf-8")) for value, encoding in encoded)
+    print(f"   {name:<28}{before / after:>8.2f}x{encode_us:>11.1f}{decode_us:>11.1f}")
+
+
+def no_dictionary(codec):
+    """zlib with an empty preset dictionary."""
+    codec.dictionaries[0] = (None, b"\0")
+    return codec
+
+
+def build(path, rng):
+    db = Database(path)
+    conn = db.get_connection()
+    conn.executemany("INSERT INTO users (username, password_hash) VALUES (?, 'x')",
+                     [(f"user{i}",) for i in range(MESSAGES // PER_SESSION // 10 + 1)])
+    conn.executemany("INSERT INTO sessions (user_id, session_name) VALUES (?, 'Charla')",
+                     [(i // 10 + 1,) for i in range(MESSAGES // PER_SESSION)])
+    for start in range(0, MESSAGES, 50_000):
+        conn.executemany(
+            "INSERT INTO messages (session_id, role, content) VALUES (?, ?, ?)",
+            [(i // PER_SESSION + 1, *message(rng, i)) for i in range(start, min(start + 50_000, MESSAGES))]
+        )
+        conn.commit()
+    db.release_connection(conn)
+    return db
+
+
+def read_throughput(db, sessions):
+    rng = random.Random(1)
+    rows = pages = 0
+    start = time.perf_counter()
+    while time.perf_counter() - start < READ_SECONDS:
+        page = db.get_session_messages_page(rng.randint(1, sessions), limit=PAGE)
+        rows += len(page["messages"])
+        pages += 1
+    elapsed = time.perf_counter() - start
+    return pages / elapsed, rows / elapsed
+
+
+def main():
+    rng = random.Random(42)
+    threshold = MessageCodec(algorithm="zlib").min_bytes
+    train_set = [text for _, text in corpus(rng, SAMPLES) if len(text.encode("utf-8")) >= threshold]
+    test_set = [text for _, text in corpus(rng, SAMPLES) if len(text.encode("utf-8")) >= threshold]
+    trained = train_dictionary(train_set, "zlib")
+
+    print(f"🗜️  Message compression, {len(test_set)} bodies >= {threshold} bytes "
+          f"(avg {sum(len(t.encode()) for t in test_set) / len(test_set):.0f} bytes)\n")
+    print(f"   {'codec':<28}{'ratio':>9}{'enc µs':>11}{'dec µs':>11}")
+    ratios("zlib, no dictionary", no_dictionary(MessageCodec(algorithm="zlib")), test_set)
+    ratios("zlib, built-in dictionary", MessageCodec(algorithm="zlib"), test_set)
+    codec = MessageCodec(algorithm="zlib")
+    codec.add_dictionary(1, "zlib", trained)
+    ratios(f"zlib, trained ({len(trained) // 1024} KiB)", codec, test_set)
+    if zstandard is not None:
+        codec = MessageCodec(algorithm="zstd")
+        codec.add_dictionary(1, "zstd", train_dictionary(train_set, "zstd"))
+        ratios("zstd, trained", codec, test_set)
+    else:
+        print("   (zstd: zstandard not installed)")
+
+    workdir = tempfile.mkdtemp()
+    plain_path = os.path.join(workdir, "plain.db")
+    start = time.perf_counter()
+    plain = build(plain_path, rng)
+    sessions = MESSAGES // PER_SESSION
+    print(f"\n📦 {MESSAGES:,} messages in {sessions:,} sessions (built in {time.perf_counter() - start:.0f}s)\n")
+
+    shutil.copy(plain_path, os.path.join(workdir, "compact.db"))
+    os.environ["MESSAGE_COMPRESSION"] = "zlib"
+    compact = Database(os.path.join(workdir, "compact.db"))
+    compact.save_message_dictionary("zlib", trained)
+    start = time.perf_counter()
+    after_id = compressed = 0
+    while True:
+        batch = compact.compact_messages(after_id, 5000)
+        if batch["scanned"] == 0:
+            break
+        after_id, compressed = batch["last_id"], compressed + batch["compressed"]
+    compact_seconds = time.perf_counter() - start
+    compact.vacuum()
+
+    print(f"   {'storage':<12}{'file MB':>10}{'pages/s':>10}{'rows/s':>11}")
+    for name, db in [("plain", plain), ("compressed", compact)]:
+        size = db.get_message_storage_stats()["file_bytes"]
+        pages, rows = read_throughput(db, sessions)
+        print(f"   {name:<12}{size / 1e6:>10.1f}{pages:>10,.0f}{rows:>11,.0f}")
+    stats = compact.get_message_storage_stats()
+    print(f"\n   compaction: {compressed:,} bodies compressed in {compact_seconds:.0f}s; "
+          f"{stats['encodings']}")
+
+    check = random.Random(7)
+    for session_id in [check.randint(1, sessions) for _ in range(200)]:
+        assert compact.get_session_messages(session_id) == plain.get_session_messages(session_id)
+    print("   ✓ 200 random sessions read back identical to the plain database")
+
+    plain.close()
+    compact.close()
+    shutil.rmtree(workdir)
+
+
+main()
@@ -0,0 +1,134 @@
+"""
+NewsService against a stub NewsAPI: caching, coalescing, stale-while-revalidate.
+
+Many users ask for news about a few shared interests at once:
+- "uncached" is the previous behaviour: one blocking request per call
+- "cold cache" runs the same lookups concurrently through the async
+  service; concurrent lookups of one topic share a single upstream request
+- "warm cache" repeats them and must not reach the upstream at all
+
+Then checks stale-while-revalidate (an expired entry is served at cache
+speed and refreshed in the background), that stale entries are served while
+NewsAPI is down, and that the cache survives a restart (it is backed by
+SQLite, with an in-memory LRU in front).
+
+Usage: python benchmarks/bench_news_cache.py [users] [topics] [news_latency_seconds]
+"""
+
+import asyncio
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from fake_newsapi import FakeNewsAPIServer
+from src.database import Database, AsyncDatabase
+from src.news_service import NewsService
+
+USERS = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+TOPICS = int(sys.argv[2]) if len(sys.argv) > 2 else 10
+LATENCY = float(sys.argv[3]) if len(sys.argv) > 3 else 0.1
+
+INTERESTS = ["fútbol", "Minecraft", "cocina", "Pokémon", "música", "series", "ciencia",
+             "baloncesto", "viajes", "tecnología", "anime", "libros"]
+
+
+def user_topic(i):
+    return INTERESTS[i % TOPICS % len(INTERESTS)]
+
+
+def percentile(values, fraction):
+    values = sorted(values)
+    return values[min(int(len(values) * fraction), len(values) - 1)] * 1000
+
+
+async def lookups(news_service):
+    latencies = []
+
+    async def one(i):
+        start = time.perf_counter()
+        articles = await news_service.asearch_news(user_topic(i), days_back=3)
+        latencies.append(time.perf_counter() - start)
+        assert articles, f"no news for {user_topic(i)}"
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one(i) for i in range(USERS)))
+    return time.perf_counter() - start, latencies
+
+
+def report(name, elapsed, latencies, upstream):
+    print(f"   {name:<14}{elapsed:>8.2f}s{percentile(latencies, 0.5):>10.1f}{percentile(latencies, 0.99):>10.1f}"
+          f"{upstream:>10}")
+
+
+async def main():
+    server = FakeNewsAPIServer(latency=LATENCY)
+    server.start()
+    db = Database(os.path.join(tempfile.mkdtemp(), "bench.db"))
+    adb = AsyncDatabase(db)
+
+    print(f"📰 News lookups for {USERS} users sharing {TOPICS} interests "
+          f"({LATENCY * 1000:.0f} ms NewsAPI latency)\n")
+    print(f"   {'scenario':<14}{'total':>9}{'p50 ms':>10}{'p99 ms':>10}{'upstream':>10}")
+
+    # Previous behaviour: a fresh blocking request per call, one after another
+    uncached = NewsService(api_key="fake", base_url=server.base_url)
+    uncached.memory_size = 0
+    sent, latencies = server.requests, []
+    start = time.perf_counter()
+    for i in range(USERS):
+        t = time.perf_counter()
+        uncached.search_news(user_topic(i), days_back=3)
+        latencies.append(time.perf_counter() - t)
+    report("uncached", time.perf_counter() - start, latencies, server.requests - sent)
+    await uncached.aclose()
+
+    news_service = NewsService(api_key="fake", adb=adb, base_url=server.base_url, ttl=3600, stale_ttl=86400)
+    for name in ["cold cache", "warm cache"]:
+        sent = server.requests
+        elapsed, latencies = await lookups(news_service)
+        report(name, elapsed, latencies, server.requests - sent)
+        if name == "cold cache":
+            assert server.requests - sent == TOPICS, "concurrent lookups were not coalesced"
+        else:
+            assert server.requests == sent, "warm cache reached the upstream"
+    stats = news_service.stats()
+    print(f"\n   ✓ {stats['coalesced']} lookups coalesced into {TOPICS} upstream requests, "
+          f"hit rate {stats['hit_rate']:.0%}")
+
+    # Stale-while-revalidate: expired entries answer at cache speed, refresh in the background
+    news_service.ttl = 0.0
+    sent = server.requests
+    start = time.perf_counter()
+    await news_service.asearch_news(user_topic(0), days_back=3)
+    stale_ms = (time.perf_counter() - start) * 1000
+    await asyncio.sleep(LATENCY * 3)
+    assert server.requests - sent == 1 and news_service.stale_hits == 1
+    print(f"   ✓ stale entry served in {stale_ms:.1f} ms, refreshed in the background (1 upstream request)")
+
+    # NewsAPI down: stale entries keep being served
+    server.down = True
+    articles = await news_service.asearch_news(user_topic(1), days_back=3)
+    await asyncio.sleep(LATENCY * 3)
+    assert articles and news_service.fetch_errors == 1
+    print("   ✓ stale entry served while NewsAPI is down")
+    server.down = False
+    await news_service.aclose()
+
+    # Restart: a new service instance (empty memory) reads the persisted cache
+    restarted = NewsService(api_key="fake", adb=adb, base_url=server.base_url, ttl=3600)
+    sent = server.requests
+    await restarted.asearch_news(user_topic(2), days_back=3)
+    assert server.requests == sent and restarted.hits == 1
+    print("   ✓ cache persisted across a restart (SQLite)")
+    await restarted.aclose()
+
+    adb.shutdown()
+    server.stop()
+
+
+asyncio.run(main())
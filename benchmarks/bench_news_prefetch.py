@@ -0,0 +1,162 @@
+"""
+Proactive greetings: on demand vs prefetched by NewsPrefetcher.
+
+Seeds users with interests drawn from a skewed (Zipf-like) popularity
+distribution, all idle for two days, then:
+- "on demand" is the previous behaviour: every returning user's session
+  listing searches news for their first interest and asks the LLM for a
+  greeting before answering
+- one prefetch run ranks the interests, refreshes the top topics and
+  precomputes every greeting; the prefetch hit rate is the share of users
+  whose greeting used an already prefetched topic
+- a second run within the TTLs must not refresh or regenerate anything
+- "precomputed" repeats the listings, which now only read the greeting and
+  must not reach NewsAPI or the LLM
+
+Usage: python benchmarks/bench_news_prefetch.py [users] [top_topics] [news_latency] [llm_latency]
+"""
+
+import asyncio
+import os
+import random
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from fake_newsapi import FakeNewsAPIServer
+from fake_openai import FakeOpenAIServer
+
+USERS = int(sys.argv[1]) if len(sys.argv) > 1 else 300
+TOP_TOPICS = int(sys.argv[2]) if len(sys.argv) > 2 else 10
+NEWS_LATENCY = float(sys.argv[3]) if len(sys.argv) > 3 else 0.1
+LLM_LATENCY = float(sys.argv[4]) if len(sys.argv) > 4 else 0.05
+
+llm_server = FakeOpenAIServer(latency=LLM_LATENCY)
+os.environ["OPENAI_BASE_URL"] = llm_server.start()
+
+from src.database import Database, AsyncDatabase  # noqa: E402
+from src.llm_service import LLMService  # noqa: E402
+from src.news_prefetcher import NewsPrefetcher  # noqa: E402
+from src.news_service import NewsService  # noqa: E402
+from src.profile_service import ProfileService  # noqa: E402
+
+TOPICS = ["fútbol", "Minecraft", "cocina", "Pokémon", "música", "series", "ciencia", "baloncesto",
+          "viajes", "tecnología", "anime", "libros", "tenis", "fotografía", "ajedrez", "astronomía",
+          "moda", "coches", "dinosaurios", "Fortnite", "pintura", "baile", "cine", "historia",
+          "robótica", "natación", "mascotas", "teatro", "cómics", "senderismo"]
+
+
+def seed(db):
+    rng = random.Random(7)
+    weights = [1 / (rank + 1) for rank in range(len(TOPICS))]
+    empty = ProfileService.__new__(ProfileService)._get_empty_profile()
+    for i in range(USERS):
+        user_id = db.create_user(f"user{i}", "secret")["user_id"]
+        interests = []
+        while len(interests) < rng.randint(1, 3):
+            topic = rng.choices(TOPICS, weights)[0]
+            if topic not in interests:
+                interests.append(topic)
+        db.create_user_profile(user_id, {**empty, "interests": interests})
+    conn = db.get_connection()
+    conn.execute("UPDATE sessions SET updated_at = datetime('now', '-2 days')")
+    conn.commit()
+    db.release_connection(conn)
+
+
+def percentile(values, fraction):
+    values = sorted(values)
+    return values[min(int(len(values) * fraction), len(values) - 1)] * 1000
+
+
+async def listings(listing):
+    latencies, greetings = [], 0
+
+    async def one(user_id):
+        nonlocal greetings
+        start = time.perf_counter()
+        greeting = await listing(user_id)
+        latencies.append(time.perf_counter() - start)
+        greetings += greeting is not None
+
+    await asyncio.gather(*(one(user_id) for user_id in range(1, USERS + 1)))
+    return latencies, greetings
+
+
+def report(name, latencies, greetings, news_calls, llm_calls):
+    print(f"   {name:<14}{percentile(latencies, 0.5):>9.1f}{percentile(latencies, 0.99):>9.1f}"
+          f"{greetings:>11}{news_calls:>7}{llm_calls:>6}")
+
+
+async def main():
+    news_server = FakeNewsAPIServer(latency=NEWS_LATENCY)
+    news_server.start()
+    db = Database(os.path.join(tempfile.mkdtemp(), "bench.db"))
+    adb = AsyncDatabase(db)
+    seed(db)
+    llm_service = LLMService(api_key="sk-fake")
+
+    print(f"📰 Proactive greetings for {USERS} returning users, {len(TOPICS)} interests, "
+          f"top {TOP_TOPICS} prefetched\n   ({NEWS_LATENCY * 1000:.0f} ms NewsAPI, "
+          f"{LLM_LATENCY * 1000:.0f} ms LLM latency)\n")
+    print(f"   {'listing':<14}{'p50 ms':>9}{'p99 ms':>9}{'greetings':>11}{'news':>7}{'llm':>6}")
+
+    # Previous behaviour: news search + LLM call inside the request
+    on_demand_news = NewsService(api_key="fake", base_url=news_server.base_url)
+
+    async def on_demand(user_id):
+        await adb.get_user_sessions(user_id)
+        profile = await adb.get_user_profile(user_id)
+        news = await on_demand_news.asearch_news(profile["interests"][0], "es", 3, 3)
+        return await llm_service.agenerate_proactive_question(profile["interests"], news, profile, user_id)
+
+    news_sent, llm_sent = news_server.requests, llm_server.requests
+    latencies, greetings = await listings(on_demand)
+    report("on demand", latencies, greetings, news_server.requests - news_sent, llm_server.requests - llm_sent)
+    await on_demand_news.aclose()
+
+    news_service = NewsService(api_key="fake", adb=adb, base_url=news_server.base_url)
+    prefetcher = NewsPrefetcher(adb, news_service, llm_service, run_interval=1800,
+                                max_topics=TOP_TOPICS, concurrency=8, rpm=0)
+    news_sent, llm_sent = news_server.requests, llm_server.requests
+    start = time.perf_counter()
+    stats = await prefetcher.run()
+    prefetch_seconds = time.perf_counter() - start
+    prefetch_news, prefetch_llm = news_server.requests - news_sent, llm_server.requests - llm_sent
+
+    news_sent, llm_sent = news_server.requests, llm_server.requests
+    second = await prefetcher.run()
+    assert second["generated"] == 0 and news_server.requests == news_sent and llm_server.requests == llm_sent
+
+    async def precomputed(user_id):
+        sessions = await adb.get_user_sessions(user_id)
+        if sessions and prefetcher.is_idle(sessions[0]["updated_at"]):
+            return await prefetcher.take_greeting(user_id)
+        return None
+
+    latencies, greetings = await listings(precomputed)
+    report("precomputed", latencies, greetings, news_server.requests - news_sent, llm_server.requests - llm_sent)
+    assert news_server.requests == news_sent and llm_server.requests == llm_sent, "listing reached upstream"
+    assert greetings == USERS, f"only {greetings}/{USERS} greetings ready"
+
+    summary = prefetcher.stats()
+    print(f"\n   prefetch run: {prefetch_seconds:.2f}s, {stats['refreshed']}/{stats['topics']} topics "
+          f"refreshed, {stats['generated']} greetings, {prefetch_news} news + {prefetch_llm} LLM calls")
+    print("   top topics: " + ", ".join(f"{t['query']} ({t['users']})" for t in summary["topics"][:5]))
+    print(f"   ✓ prefetch hit rate {summary['prefetch_hit_rate']:.0%} "
+          f"({summary['prefetch_misses']} users looked up a topic outside the top {TOP_TOPICS}), "
+          f"greeting hit rate {summary['greeting_hit_rate']:.0%}")
+    print("   ✓ second run within the TTLs: nothing refreshed or regenerated")
+
+    await news_service.aclose()
+    await llm_service.aclose()
+    adb.shutdown()
+    news_server.stop()
+    llm_server.stop()
+
+
+asyncio.run(main())
@@ -0,0 +1,158 @@
+"""
+Cursor pagination of /api/messages and /api/sessions.
+
+Seeds one user with a long session (10k messages by default) and many
+sessions, then drives the real endpoints:
+- "full" is the previous behaviour: the whole list read and encoded as one
+  response (measured in process, so without HTTP overhead)
+- "first page" is what opening the session now transfers (PAGE_SIZE items)
+- "deep page" asks for a page just before the oldest messages; keyset
+  pagination reads it through the index, so it costs the same as the first
+  (OFFSET pagination, shown for reference, has to skip every earlier row)
+
+Finally walks every page with next_before_id and checks that each message
+and session is returned exactly once, in order.
+
+Usage: python benchmarks/bench_pagination.py [messages] [sessions] [page_size]
+"""
+
+import asyncio
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+MESSAGES = int(sys.argv[1]) if len(sys.argv) > 1 else 10_000
+SESSIONS = int(sys.argv[2]) if len(sys.argv) > 2 else 1_000
+PAGE_SIZE = int(sys.argv[3]) if len(sys.argv) > 3 else 50
+REPEATS = 20
+
+os.environ["OPENAI_API_KEY"] = "sk-fake"
+os.environ["DATABASE_PATH"] = os.path.join(tempfile.mkdtemp(), "bench.db")
+os.environ["PAGE_SIZE"] = str(PAGE_SIZE)
+
+import httpx  # noqa: E402
+from src import main  # noqa: E402
+
+USER_TEXT = "Hoy he estado pensando en lo que hablamos ayer sobre el instituto y mis amigos"
+ASSISTANT_TEXT = ("¡Qué bien que lo hayas pensado! Cuéntame un poco más: ¿qué es lo que más te "
+                  "preocupa de esa situación? A veces ayuda ponerlo en palabras, y podemos buscar "
+                  "juntos alguna idea para que la semana que viene sea más tranquila. ")
+
+
+def seed():
+    db = main.db
+    user_id = db.create_user("scroller", "secret")["user_id"]
+    session_id = db.get_user_sessions(user_id)[0]["id"]
+    conn = db.get_connection()
+    conn.executemany(
+        "INSERT INTO messages (session_id, role, content) VALUES (?, ?, ?)",
+        [(session_id, "user" if i % 2 == 0 else "assistant",
+          f"{USER_TEXT} ({i})" if i % 2 == 0 else f"{ASSISTANT_TEXT * 2}({i})")
+         for i in range(MESSAGES)]
+    )
+    conn.executemany(
+        "INSERT INTO sessions (user_id, session_name, updated_at) VALUES (?, ?, datetime('now', ?))",
+        [(user_id, f"Conversación {i}", f"-{i % 500} minutes") for i in range(SESSIONS - 1)]
+    )
+    conn.commit()
+    db.release_connection(conn)
+    return user_id, session_id
+
+
+async def timed(client, url):
+    latencies = []
+    for _ in range(REPEATS):
+        start = time.perf_counter()
+        response = await client.get(url)
+        latencies.append(time.perf_counter() - start)
+        assert response.status_code == 200, response.text
+    return sorted(latencies)[len(latencies) // 2] * 1000, len(response.content), response.json()
+
+
+def full_listing(call, key):
+    """Previous behaviour: the whole list read and JSON-encoded (in process, no HTTP)."""
+    latencies = []
+    for _ in range(REPEATS):
+        start = time.perf_counter()
+        payload = httpx.Response(200, json={key: call()}).content
+        latencies.append(time.perf_counter() - start)
+    return sorted(latencies)[len(latencies) // 2] * 1000, len(payload)
+
+
+def sql_page(session_id, before_id=None, offset=None):
+    """The SQL of one page alone: keyset (id < before_id) or LIMIT/OFFSET."""
+    conn = main.db.get_connection()
+    if offset is None:
+        sql, params = ("SELECT id, role, content, created_at FROM messages WHERE session_id = ? AND id < ? "
+                       "ORDER BY id DESC LIMIT ?", (session_id, before_id, PAGE_SIZE))
+    else:
+        sql, params = ("SELECT id, role, content, created_at FROM messages WHERE session_id = ? "
+                       "ORDER BY id DESC LIMIT ? OFFSET ?", (session_id, PAGE_SIZE, offset))
+    start = time.perf_counter()
+    for _ in range(REPEATS):
+        conn.execute(sql, params).fetchall()
+    main.db.release_connection(conn)
+    return (time.perf_counter() - start) / REPEATS * 1000
+
+
+def report(name, ms, size):
+    print(f"   {name:<26}{ms:>9.2f}{size / 1024:>12.1f}")
+
+
+async def walk(client, url, key):
+    """Follow next_before_id through every page."""
+    items, cursor = [], None
+    while True:
+        response = await client.get(url + (f"?before_id={cursor}" if cursor else ""))
+        page = response.json()
+        items.append(page[key])
+        cursor = page["next_before_id"]
+        if cursor is None:
+            return items
+
+
+async def bench():
+    user_id, session_id = seed()
+    transport = httpx.ASGITransport(app=main.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        print(f"📜 /api/messages: one session with {MESSAGES} messages, {PAGE_SIZE} per page\n")
+        print(f"   {'request':<26}{'p50 ms':>9}{'payload KB':>12}")
+
+        full = main.db.get_session_messages(session_id)
+        report("full (previous)", *full_listing(lambda: main.db.get_session_messages(session_id), "messages"))
+        ms, size, first = await timed(client, f"/api/messages/{session_id}")
+        report("first page", ms, size)
+        oldest = full[PAGE_SIZE + 1]["id"]
+        ms, size, deep = await timed(client, f"/api/messages/{session_id}?before_id={oldest}")
+        report("deep page", ms, size)
+        print(f"\n   deep page SQL only: keyset {sql_page(session_id, before_id=oldest):.2f} ms, "
+              f"OFFSET {sql_page(session_id, offset=MESSAGES - PAGE_SIZE * 2):.2f} ms")
+        assert len(first["messages"]) == PAGE_SIZE and first["has_more"]
+        assert first["messages"][-1]["id"] == full[-1]["id"]
+
+        pages = await walk(client, f"/api/messages/{session_id}", "messages")
+        ids = [m["id"] for page in reversed(pages) for m in page]
+        assert ids == [m["id"] for m in full], "pages skipped or repeated messages"
+        print(f"\n   ✓ {len(pages)} pages cover all {len(ids)} messages once, in order")
+
+        print(f"\n🗂️  /api/sessions: {SESSIONS} sessions\n")
+        print(f"   {'request':<26}{'p50 ms':>9}{'payload KB':>12}")
+        all_sessions = main.db.get_user_sessions(user_id)
+        report("full (previous)", *full_listing(lambda: main.db.get_user_sessions(user_id), "sessions"))
+        ms, size, first = await timed(client, f"/api/sessions/{user_id}")
+        report("first page", ms, size)
+        ms, size, _ = await timed(client, f"/api/sessions/{user_id}?before_id={all_sessions[-PAGE_SIZE - 1]['id']}")
+        report("deep page", ms, size)
+
+        pages = await walk(client, f"/api/sessions/{user_id}", "sessions")
+        ids = [s["id"] for page in pages for s in page]
+        assert len(ids) == len(set(ids)) == SESSIONS, "pages skipped or repeated sessions"
+        print(f"\n   ✓ {len(pages)} pages cover all {SESSIONS} sessions once, most recent first")
+
+
+asyncio.run(bench())
+main.adb.shutdown()
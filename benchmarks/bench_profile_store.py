@@ -0,0 +1,98 @@
+"""
+Benchmark: profile reads/writes per chat turn with and without ProfileStore.
+
+Each simulated turn touches the profile the way the app does: prepare_turn
+reads it, the extraction job reads and rewrites it, and the UI then polls
+/api/profile and /api/system-prompt. "direct" goes to SQLite every time;
+"cached" goes through the ProfileStore with write-behind flushes.
+
+Usage: python benchmarks/bench_profile_store.py [users] [turns_per_user]
+"""
+
+import asyncio
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from src.database import Database, AsyncDatabase
+from src.profile_service import ProfileService
+from src.profile_store import ProfileStore
+
+USERS = int(sys.argv[1]) if len(sys.argv) > 1 else 50
+TURNS = int(sys.argv[2]) if len(sys.argv) > 2 else 20
+WRITE_METHODS = ["update_user_profile", "update_emotional_state", "save_profiles_batch"]
+READ_METHODS = ["get_user_profile"]
+
+
+def counting_db():
+    db = Database(os.path.join(tempfile.mkdtemp(), "bench.db"))
+    counts = {"reads": 0, "writes": 0}
+    for name in READ_METHODS + WRITE_METHODS:
+        method = getattr(db, name)
+        kind = "reads" if name in READ_METHODS else "writes"
+
+        def wrapper(*args, _method=method, _kind=kind, **kwargs):
+            counts[_kind] += 1
+            return _method(*args, **kwargs)
+
+        setattr(db, name, wrapper)
+
+    empty = ProfileService(None)._get_empty_profile()
+    user_ids = []
+    for i in range(USERS):
+        user_id = db.create_user(f"user{i}", "x")["user_id"]
+        db.create_user_profile(user_id, {**empty, "interests": ["Cocina"], "important_facts": ["Vive en Madrid"] * 5})
+        user_ids.append(user_id)
+    return db, counts, user_ids
+
+
+async def direct_turn(adb, user_id):
+    profile = await adb.get_user_profile(user_id)          # prepare_turn
+    profile = await adb.get_user_profile(user_id)          # extraction job
+    profile["needs"] = profile.get("needs", []) + ["charlar"]
+    await adb.update_user_profile(user_id, profile)
+    await adb.get_user_profile(user_id)                    # /api/profile
+    await adb.get_user_profile(user_id)                    # /api/system-prompt
+
+
+async def cached_turn(store, user_id):
+    profile = await store.get(user_id)
+    profile = await store.get(user_id)
+    profile["needs"] = profile.get("needs", []) + ["charlar"]
+    await store.update(user_id, profile)
+    await store.get(user_id)
+    await store.get(user_id)
+
+
+async def run(mode):
+    db, counts, user_ids = counting_db()
+    adb = AsyncDatabase(db)
+    store = ProfileStore(adb, flush_interval=0.5)
+    await store.start()
+
+    start = time.perf_counter()
+    for _ in range(TURNS):
+        for user_id in user_ids:
+            if mode == "direct":
+                await direct_turn(adb, user_id)
+            else:
+                await cached_turn(store, user_id)
+        await asyncio.sleep(0.05)  # think time between rounds lets flushes happen
+    await store.stop()
+    elapsed = time.perf_counter() - start - TURNS * 0.05
+
+    adb.shutdown()
+    return counts, elapsed / (USERS * TURNS) * 1000
+
+
+print(f"👤 Profile access per chat turn ({USERS} users x {TURNS} turns)\n")
+print(f"   {'mode':<8}{'reads/turn':>12}{'writes/turn':>13}{'ms/turn':>10}")
+for mode in ["direct", "cached"]:
+    counts, ms = asyncio.run(run(mode))
+    turns = USERS * TURNS
+    print(f"   {mode:<8}{counts['reads'] / turns:>12.2f}{counts['writes'] / turns:>13.3f}{ms:>10.3f}")
+print("\n   Cached writes are batched: one transaction per flush covers every dirty profile.")
@@ -0,0 +1,70 @@
+"""
+Microbenchmark of system prompt generation across age groups.
+
+"stored" profiles carry age_years/age_group written at extraction time;
+"legacy" profiles (saved before those fields existed) are classified on the
+fly from age_range. Also times the cached get_system_prompt path and
+measures how much of the prompt is a prefix shared by users of the same age
+group (what provider-side prompt caching can reuse).
+
+Usage: python benchmarks/bench_prompt_generation.py [iterations]
+"""
+
+import os
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from src.profile_service import ProfileService
+
+ITERATIONS = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+AGES = ["~9 años (niño)", "~12 años", "~10-17 años (preadolescente/adolescente)", "~16 años",
+        "~19 años", "~28 años (adulto)", "~45 años (adulto)", "~80 años (senior)", None]
+
+service = ProfileService(None)
+stored, legacy = [], []
+for i, age in enumerate(AGES):
+    profile = service._get_empty_profile()
+    profile.update(age_range=age, gender="femenino", interests=["Minecraft", "Cocina"],
+                   important_facts=["Tiene un perro"], profile_version=1)
+    legacy.append(dict(profile))
+    stored.append(service._normalize_demographics(dict(profile)))
+
+
+def timed(fn):
+    start = time.perf_counter()
+    for i in range(ITERATIONS):
+        fn(i)
+    return (time.perf_counter() - start) / ITERATIONS * 1_000_000
+
+
+print(f"🧩 System prompt generation ({ITERATIONS} prompts, {len(AGES)} age profiles)\n")
+results = [
+    ("generate, stored age_group", timed(lambda i: service.generate_system_prompt(stored[i % len(AGES)]))),
+    ("generate, legacy profile", timed(lambda i: service.generate_system_prompt(legacy[i % len(AGES)]))),
+    ("get_system_prompt (cached)", timed(lambda i: service.get_system_prompt(i % len(AGES), stored[i % len(AGES)]))),
+]
+for name, us in results:
+    print(f"   {name:<30}{us:>9.1f} µs/prompt")
+
+
+# Shared prefix: same age, different name/interests/facts/emotional state
+USERS = [("Lucía", ["Minecraft"], "Tiene un perro", None),
+         ("Marcos", ["Fútbol", "Trap"], "Vive en Sevilla", None),
+         ("Ana", ["Cocina"], "Tiene dos hijos", {"support_needed": "high", "detected_concerns": ["soledad"]})]
+print("\n   shared prefix across users of the same age")
+for age in ["~12 años", "~16 años", "~45 años (adulto)"]:
+    prompts = []
+    for name, interests, fact, emotional_state in USERS:
+        profile = service._get_empty_profile()
+        profile.update(name=name, age_range=age, interests=interests, important_facts=[fact])
+        prompts.append(service.generate_system_prompt(service._normalize_demographics(profile), emotional_state))
+    prefix = len(os.path.commonprefix(prompts))
+    average = sum(len(prompt) for prompt in prompts) / len(prompts)
+    print(f"   {age:<20}{prefix:>6} of {average:>6.0f} chars ({prefix / average:.0%})")
+
+print("\n   age_range            -> age_years, age_group")
+for profile in stored:
+    print(f"   {str(profile['age_range']):<42}{str(profile['age_years']):>5}  {profile['age_group']}")
@@ -0,0 +1,154 @@
+"""
+Accuracy and throughput of the local risk pre-screen.
+
+Runs a hand-labelled corpus of Spanish chat messages (high risk, moderate,
+or none, including idioms like "me muero de risa" and negations) through
+RiskScreen and checks that every high-risk message is escalated and that no
+harmless message is. Then measures messages/second on a mixed stream,
+against the crisis regex it replaces (15 phrases) and against the whole
+lexicon compiled as one regex alternation.
+
+Usage: python benchmarks/bench_risk_screen.py [messages]
+"""
+
+import re
+import sys
+import time
+from collections import Counter
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from src.profile_service import _normalize_text
+from src.risk_screen import RISK_LEXICON, SAFE_PHRASES, RiskScreen
+
+MESSAGES = int(sys.argv[1]) if len(sys.argv) > 1 else 200_000
+
+# (message, expected level)
+CORPUS = [
+    ("Ya no puedo más, quiero morirme", "high"),
+    ("He pensado en suicidarme varias veces esta semana", "high"),
+    ("a veces pienso en el suicidio", "high"),
+    ("No quiero vivir así", "high"),
+    ("me quiero morir, de verdad", "high"),
+    ("Tengo ganas de morirme", "high"),
+    ("Estaría mejor muerta", "high"),
+    ("Ojalá no despertar mañana", "high"),
+    ("He escrito una carta de despedida", "high"),
+    ("Creo que estarían mejor sin mí", "high"),
+    ("quiero acabar con todo", "high"),
+    ("voy a tomarme todas las pastillas", "high"),
+    ("Estoy harto de vivir", "high"),
+    ("Me hago cortes en los brazos", "high"),
+    ("A veces me corto las muñecas", "high"),
+    ("Quiero hacerme daño", "high"),
+    ("sigo con las autolesiones", "high"),
+    ("Mi padre me pega cuando bebe", "high"),
+    ("mi padre me pega con el cinturón", "high"),
+    ("mi madre me pega mucho", "high"),
+    ("quiero acabar con todo esto de una vez", "high"),
+    ("Mi tío abusó de mí", "high"),
+    ("Tengo miedo de volver a casa", "high"),
+    ("Mi novio me maltrata", "high"),
+    ("QUIERO MORIR!!!", "high"),
+    ("no kiero vivir... no quiero vivir", "high"),
+    ("No puedo más, nadie me quiere y odio mi vida", "high"),
+    ("No aguanto más, nada tiene sentido", "moderate"),
+    ("Soy una carga para todos", "moderate"),
+    ("No sirvo para nada", "moderate"),
+    ("Me hacen bullying en el cole", "moderate"),
+    ("En clase se burlan de mí", "moderate"),
+    ("Estoy deprimida y me siento sola", "moderate"),
+    ("Lloro todos los días y no puedo dormir", "moderate"),
+    ("Odio mi vida", "moderate"),
+    ("Todos me odian", "moderate"),
+    ("No le importo a nadie", "moderate"),
+    ("Me muero de risa jajaja", "none"),
+    ("Me quiero morir de vergüenza, le he dicho mamá a la profe", "none"),
+    ("Me voy a matar a estudiar para el examen", "none"),
+    ("No quiero morir, solo estoy cansado", "none"),
+    ("Esa camiseta me pega mucho", "none"),
+    ("Se me pega la canción todo el rato", "none"),
+    ("No puedo más de risa", "none"),
+    ("Escuadrón Suicida es buena peli", "none"),
+    ("Hoy me corto el pelo", "none"),
+    ("Me he cortado el dedo cocinando", "none"),
+    ("Quiero acabar con todo el trabajo antes del viernes", "none"),
+    ("El examen me mata", "none"),
+    ("Estoy muerto de cansancio", "none"),
+    ("Me encanta el fútbol", "none"),
+    ("Hola, ¿qué tal?", "none"),
+    ("Hoy he ido al parque con mi perro", "none"),
+    ("Tengo 10 años y me gusta Minecraft", "none"),
+    ("Bro literal estoy aburrido", "none"),
+    ("Estoy un poco cansada del trabajo", "none"),
+    ("Me siento bien hoy", "none"),
+    ("Mi abuela vive en Sevilla", "none"),
+    ("¿Me recomiendas una serie?", "none"),
+    ("Trabajo de enfermera en el turno de noche", "none"),
+    ("Vaya día más largo", "none"),
+    ("La película me hizo llorar", "none"),
+    ("Mi hermano me molesta", "none"),
+]
+
+# The single regex used before the lexicon
+CRISIS_PATTERN = re.compile(
+    r"\b(?:suicid\w*|matarme|quitarme la vida|acabar con mi vida|acabar con todo|"
+    r"no quiero (?:vivir|seguir viviendo|estar aqui)|quiero morir\w*|"
+    r"me quiero morir|ganas de morir\w*|mejor muert[oa]|hacerme daño|"
+    r"autolesion\w*|cortarme (?:las venas|los brazos|las muñecas)|desaparecer para siempre)\b"
+)
+
+
+# Same phrases as the automaton, as one alternation (longest first)
+LEXICON_PATTERN = re.compile("|".join(
+    re.escape(phrase[:-1]) + r"\w*" if phrase.endswith("*") else re.escape(phrase) + r"\b"
+    for phrase in sorted([p for _, phrases in RISK_LEXICON.values() for p in phrases] + list(SAFE_PHRASES),
+                         key=len, reverse=True)
+))
+
+
+def throughput(name, stream, screen):
+    start = time.perf_counter()
+    for message in stream:
+        screen(message)
+    elapsed = time.perf_counter() - start
+    print(f"   {name:<28}{len(stream) / elapsed:>12,.0f} msg/s {elapsed / len(stream) * 1e6:>8.1f} µs/msg")
+
+
+def main():
+    screen = RiskScreen()
+    confusion = Counter()
+    mistakes = []
+    for message, expected in CORPUS:
+        level = screen.screen(message).level
+        confusion[expected, level] += 1
+        if level != expected:
+            mistakes.append((message, expected, level))
+
+    print(f"🛟 Risk pre-screen ({len(CORPUS)} labelled messages)\n")
+    print(f"   {'expected':<12}{'high':>8}{'moderate':>10}{'none':>8}")
+    for expected in ["high", "moderate", "none"]:
+        print(f"   {expected:<12}" + "".join(f"{confusion[expected, level]:>{w}}"
+                                         for level, w in [("high", 8), ("moderate", 10), ("none", 8)]))
+    for message, expected, level in mistakes:
+        print(f"   ✗ {message!r}: expected {expected}, got {level}")
+
+    missed_high = sum(confusion["high", level] for level in ["moderate", "none"])
+    false_high = confusion["none", "high"]
+    assert missed_high == 0, f"{missed_high} high-risk messages not escalated"
+    assert false_high == 0, f"{false_high} harmless messages escalated"
+    print("\n   ✓ every high-risk message escalated, no harmless message escalated")
+
+    stream = [message for message, _ in CORPUS] * (MESSAGES // len(CORPUS) + 1)
+    stream = stream[:MESSAGES]
+    average = sum(len(message) for message in stream) / len(stream)
+    print(f"\n   throughput on {MESSAGES} messages ({average:.0f} chars on average)")
+
+    throughput("crisis regex (15 phrases)", stream, lambda m: CRISIS_PATTERN.search(_normalize_text(m)))
+    throughput(f"lexicon regex ({LEXICON_PATTERN.pattern.count('|') + 1} phrases)", stream,
+               lambda m: LEXICON_PATTERN.findall(_normalize_text(m)))
+    throughput("risk screen (Aho-Corasick)", stream, screen.screen)
+
+
+main()
@@ -0,0 +1,157 @@
+"""
+/api/sessions latency with and without precomputed proactive greetings.
+
+Seeds users with interests, all idle for two days (so each listing should
+carry a greeting), against stub NewsAPI and LLM servers:
+- "on demand" replays the previous handler: list sessions, read the
+  profile, search news for the first interest and ask the LLM for a greeting
+  before answering
+- "precomputed" drives the real endpoint after one offline prefetch run,
+  which stores the greetings in proactive_greetings; the listing is a
+  primary-key read and must not reach NewsAPI or the LLM
+- a second listing gets no greeting (it was marked consumed)
+
+Then regenerates some of the consumed greetings (those users are still
+idle) with a request-per-minute cap and checks that it is respected.
+
+Usage: python benchmarks/bench_sessions_greeting.py [users] [concurrency] [news_latency] [llm_latency]
+"""
+
+import asyncio
+import os
+import random
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from fake_newsapi import FakeNewsAPIServer
+from fake_openai import FakeOpenAIServer
+
+USERS = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+CONCURRENCY = int(sys.argv[2]) if len(sys.argv) > 2 else 10
+NEWS_LATENCY = float(sys.argv[3]) if len(sys.argv) > 3 else 0.1
+LLM_LATENCY = float(sys.argv[4]) if len(sys.argv) > 4 else 0.3
+RATE_LIMITED = 20
+RPM = 1200
+
+llm_server = FakeOpenAIServer(latency=LLM_LATENCY)
+news_server = FakeNewsAPIServer(latency=NEWS_LATENCY)
+os.environ["OPENAI_API_KEY"] = "sk-fake"
+os.environ["OPENAI_BASE_URL"] = llm_server.start()
+os.environ["NEWS_API_KEY"] = "fake"
+os.environ["NEWS_API_BASE_URL"] = news_server.start()
+os.environ["DATABASE_PATH"] = os.path.join(tempfile.mkdtemp(), "bench.db")
+os.environ["PROACTIVE_GREETING_RPM"] = "0"
+
+import httpx  # noqa: E402
+from src import main  # noqa: E402
+from src.news_prefetcher import NewsPrefetcher  # noqa: E402
+from src.news_service import NewsService  # noqa: E402
+
+TOPICS = ["fútbol", "Minecraft", "cocina", "Pokémon", "música", "series", "ciencia", "baloncesto",
+          "viajes", "tecnología", "anime", "libros", "tenis", "ajedrez", "astronomía", "dinosaurios"]
+
+
+def seed():
+    rng = random.Random(3)
+    users = []
+    for i in range(USERS):
+        user_id = main.db.create_user(f"user{i}", "secret")["user_id"]
+        interests = rng.sample(TOPICS, rng.randint(1, 3))
+        main.db.create_user_profile(user_id, {**main.profile_service._get_empty_profile(),
+                                              "interests": interests})
+        users.append(user_id)
+    conn = main.db.get_connection()
+    conn.execute("UPDATE sessions SET updated_at = datetime('now', '-2 days')")
+    conn.commit()
+    main.db.release_connection(conn)
+    return users
+
+
+def percentile(values, fraction):
+    values = sorted(values)
+    return values[min(int(len(values) * fraction), len(values) - 1)] * 1000
+
+
+async def listings(name, users, listing):
+    semaphore = asyncio.Semaphore(CONCURRENCY)
+    latencies, greetings = [], 0
+
+    async def one(user_id):
+        nonlocal greetings
+        async with semaphore:
+            start = time.perf_counter()
+            greeting = await listing(user_id)
+            latencies.append(time.perf_counter() - start)
+        greetings += greeting is not None
+
+    news_sent, llm_sent = news_server.requests, llm_server.requests
+    await asyncio.gather(*(one(user_id) for user_id in users))
+    print(f"   {name:<16}{percentile(latencies, 0.5):>9.1f}{percentile(latencies, 0.99):>9.1f}"
+          f"{greetings:>11}{news_server.requests - news_sent:>7}{llm_server.requests - llm_sent:>6}")
+    return greetings, news_server.requests - news_sent + llm_server.requests - llm_sent
+
+
+async def bench():
+    users = seed()
+    print(f"👋 /api/sessions for {USERS} returning users ({CONCURRENCY} at a time, "
+          f"{NEWS_LATENCY * 1000:.0f} ms NewsAPI, {LLM_LATENCY * 1000:.0f} ms LLM)\n")
+    print(f"   {'listing':<16}{'p50 ms':>9}{'p99 ms':>9}{'greetings':>11}{'news':>7}{'llm':>6}")
+
+    # Previous handler: news search + LLM call before answering
+    on_demand_news = NewsService(api_key="fake", adb=main.adb, base_url=news_server.base_url)
+
+    async def on_demand(user_id):
+        sessions = await main.adb.get_user_sessions(user_id)
+        if not (sessions and main.news_prefetcher.is_idle(sessions[0]["updated_at"])):
+            return None
+        profile = await main.adb.get_user_profile(user_id)
+        news = await on_demand_news.asearch_news(profile["interests"][0], "es", 3, 3)
+        return await main.llm_service.agenerate_proactive_question(profile["interests"], news,
+                                                                   profile, user_id)
+
+    await listings("on demand", users, on_demand)
+    await on_demand_news.aclose()
+
+    start = time.perf_counter()
+    stats = await main.news_prefetcher.run()
+    offline = f"{stats['generated']} greetings, {stats['refreshed']} topics refreshed " \
+              f"in {time.perf_counter() - start:.2f}s"
+
+    transport = httpx.ASGITransport(app=main.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        async def endpoint(user_id):
+            response = await client.get(f"/api/sessions/{user_id}")
+            assert response.status_code == 200, response.text
+            return response.json()["proactive_greeting"]
+
+        greetings, upstream = await listings("precomputed", users, endpoint)
+        assert greetings == USERS, f"only {greetings}/{USERS} greetings ready"
+        assert upstream == 0, "listing reached NewsAPI or the LLM"
+        greetings, upstream = await listings("again (consumed)", users, endpoint)
+        assert greetings == 0 and upstream == 0
+    print(f"\n   offline run before the precomputed listings: {offline}")
+
+    # Offline job under a request-per-minute cap
+    limited = NewsPrefetcher(main.adb, main.news_service, main.llm_service, rpm=RPM, concurrency=8,
+                             max_greetings=RATE_LIMITED)
+    start = time.perf_counter()
+    stats = await limited.run()
+    elapsed = time.perf_counter() - start
+    assert stats["generated"] == RATE_LIMITED, stats
+    assert elapsed >= (RATE_LIMITED - 1) * 60 / RPM, f"{RATE_LIMITED} calls in {elapsed:.2f}s exceed {RPM} rpm"
+    print(f"   ✓ {RATE_LIMITED} greetings at {RPM} rpm took {elapsed:.2f}s "
+          f"(>= {(RATE_LIMITED - 1) * 60 / RPM:.2f}s)")
+
+    await main.news_service.aclose()
+    await main.llm_service.aclose()
+
+
+asyncio.run(bench())
+main.adb.shutdown()
+news_server.stop()
+llm_server.stop()
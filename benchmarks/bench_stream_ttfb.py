@@ -0,0 +1,82 @@
+"""
+Time-to-first-byte benchmark: /api/chat vs /api/chat/stream.
+
+Runs the app under uvicorn against the local fake OpenAI server, which waits
+`latency` before the first token and `token_latency` between tokens.
+
+Usage: python benchmarks/bench_stream_ttfb.py [first_token_latency] [token_latency]
+"""
+
+import os
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from fake_openai import FakeOpenAIServer, default_responder
+
+FIRST_TOKEN = float(sys.argv[1]) if len(sys.argv) > 1 else 0.2
+PER_TOKEN = float(sys.argv[2]) if len(sys.argv) > 2 else 0.02
+RUNS = 5
+LONG_REPLY = " ".join(["palabra"] * 80)
+
+
+def responder(payload):
+    reply = default_responder(payload)
+    return reply if reply.startswith("{") else LONG_REPLY
+
+
+server = FakeOpenAIServer(latency=FIRST_TOKEN, token_latency=PER_TOKEN, responder=responder)
+os.environ["OPENAI_API_KEY"] = "sk-fake"
+os.environ["OPENAI_BASE_URL"] = server.start()
+os.environ["DATABASE_PATH"] = os.path.join(tempfile.mkdtemp(), "bench.db")
+
+import httpx  # noqa: E402
+import uvicorn  # noqa: E402
+from src import main  # noqa: E402
+
+config = uvicorn.Config(main.app, host="127.0.0.1", port=8765, log_level="warning")
+app_server = uvicorn.Server(config)
+threading.Thread(target=app_server.run, daemon=True).start()
+while not app_server.started:
+    time.sleep(0.05)
+
+user = main.db.create_user(f"bench_{time.time_ns()}", "x")
+main.db.create_user_profile(user["user_id"], main.profile_service._get_empty_profile())
+session_id = main.db.get_user_sessions(user["user_id"])[0]["id"]
+client = httpx.Client(base_url="http://127.0.0.1:8765", timeout=60)
+
+
+def blocking_turn(i):
+    start = time.perf_counter()
+    response = client.post("/api/chat", data={"session_id": session_id, "message": f"Hola {i}"})
+    response.raise_for_status()
+    elapsed = time.perf_counter() - start
+    return elapsed, elapsed
+
+
+def streaming_turn(i):
+    start = time.perf_counter()
+    first = None
+    with client.stream("POST", "/api/chat/stream",
+                       data={"session_id": session_id, "message": f"Hola {i}"}) as response:
+        for line in response.iter_lines():
+            if first is None and line.startswith("data:"):
+                first = time.perf_counter() - start
+    return first, time.perf_counter() - start
+
+
+print(f"⏱️  TTFB benchmark (first token {FIRST_TOKEN}s, {PER_TOKEN}s/token, 80 tokens)\n")
+for label, turn in [("/api/chat", blocking_turn), ("/api/chat/stream", streaming_turn)]:
+    results = [turn(i) for i in range(RUNS)]
+    ttfb = sum(r[0] for r in results) / RUNS
+    total = sum(r[1] for r in results) / RUNS
+    print(f"   {label:<18} TTFB {ttfb * 1000:7.1f} ms   total {total * 1000:7.1f} ms")
+
+print("\n   (TTFB still includes the inline profile extraction round-trip)")
+app_server.should_exit = True
+server.stop()
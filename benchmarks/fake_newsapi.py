@@ -0,0 +1,90 @@
+"""
+Local fake NewsAPI server for benchmarks.
+
+Implements GET /v2/everything with configurable latency, returning a few
+articles about the requested query. Counts requests per query so tests can
+check how many upstream calls a scenario made; ``down = True`` answers 503.
+"""
+
+import json
+import threading
+import time
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+
+class FakeNewsAPIServer:
+    """Threaded HTTP server emulating NewsAPI's /everything endpoint."""
+
+    def __init__(self, latency: float = 0.2):
+        self.latency = latency
+        self.down = False
+        self.requests = 0
+        self.queries = Counter()
+        self._lock = threading.Lock()
+        self._httpd = None
+        self._thread = None
+
+    @property
+    def base_url(self) -> str:
+        host, port = self._httpd.server_address
+        return f"http://{host}:{port}/v2"
+
+    def start(self) -> str:
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, format, *args):
+                pass
+
+            def do_GET(self):
+                params = {k: v[0] for k, v in parse_qs(urlparse(self.path).query).items()}
+                with server._lock:
+                    server.requests += 1
+                    server.queries[params.get("q", "")] += 1
+                time.sleep(server.latency)
+                if server.down:
+                    self._send(503, {"status": "error", "code": "unexpectedError"})
+                else:
+                    self._send(200, server.articles(params))
+
+            def _send(self, status, payload):
+                body = json.dumps(payload).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+        class Server(ThreadingHTTPServer):
+            request_queue_size = 128
+
+        self._httpd = Server(("127.0.0.1", 0), Handler)
+        self._httpd.daemon_threads = True
+        self._thread = threading.Thread(target=self._httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self.base_url
+
+    def stop(self):
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+    def articles(self, params):
+        query = params.get("q", "")
+        size = int(params.get("pageSize", 10))
+        return {
+            "status": "ok",
+            "totalResults": size,
+            "articles": [{
+                "source": {"id": None, "name": "Diario Falso"},
+                "author": "Redacción",
+                "title": f"Noticia {i + 1} sobre {query}",
+                "description": f"Lo último sobre {query} (petición {self.requests}).",
+                "url": f"https://example.com/{query}/{i}",
+                "publishedAt": "2025-01-01T10:00:00Z",
+                "content": "..."
+            } for i in range(size)]
+        }
@@ -0,0 +1,223 @@
+"""
+Local fake OpenAI server for benchmarks.
+
+Implements just enough of POST /v1/chat/completions for the openai SDK to
+talk to it, with configurable latency so throughput can be measured without
+hitting the real API. Streaming requests (``stream: true``) are answered
+word by word as chat.completion.chunk SSE frames.
+
+Errors can be injected: a fraction of requests (``error_rate``) or all of
+them (``down = True``) are answered with ``error_status`` after the latency.
+``max_concurrency`` limits how many requests are processed at once (the
+rest queue), to model a provider with finite capacity.
+"""
+
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+PROFILE_FIELDS = {
+    "name": None,
+    "age_range": "~30 años (adulto)",
+    "gender": "ambiguo",
+    "profession": None,
+    "education": None,
+    "interests": ["Cocina"],
+    "important_facts": [],
+    "sensitive_topics": [],
+    "personality_traits": [],
+    "needs": [],
+    "tone_preference": "amigable y natural"
+}
+
+EMOTION_FIELDS = {
+    "depression_probability": 0.0,
+    "anxiety_level": "none",
+    "loneliness_level": "none",
+    "support_needed": "none",
+    "recommended_mode": "normal",
+    "detected_concerns": [],
+    "positive_indicators": [],
+    "confidence": 0.5,
+    "professional_help_suggested": False,
+    "notes": ""
+}
+
+# Valid JSON for both the profile extraction and the emotional analysis prompts
+ANALYSIS_JSON = json.dumps({**PROFILE_FIELDS, **EMOTION_FIELDS}, ensure_ascii=False)
+
+
+def tool_arguments(payload):
+    """Arguments for the forced analysis tool call, with the requested parts."""
+    properties = payload["tools"][0]["function"]["parameters"]["properties"]
+    parts = {"profile": PROFILE_FIELDS, "emotional_state": EMOTION_FIELDS}
+    return json.dumps({name: parts[name] for name in properties}, ensure_ascii=False)
+
+
+def default_responder(payload):
+    """Return analysis JSON for analysis prompts and a plain reply otherwise."""
+    if payload.get("tools"):
+        return tool_arguments(payload)
+    last = payload["messages"][-1]["content"]
+    if "JSON" in last:
+        return ANALYSIS_JSON
+    return "¡Claro! Esta es una respuesta de prueba del servidor falso."
+
+
+class FakeOpenAIServer:
+    """Threaded HTTP server emulating the chat completions endpoint."""
+
+    def __init__(self, latency: float = 0.2, responder=default_responder,
+                 token_latency: float = 0.0, error_rate: float = 0.0,
+                 error_status: int = 503, seed: int = 0, max_concurrency: int = 0):
+        self.latency = latency
+        self.token_latency = token_latency
+        self.responder = responder
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.down = False
+        self._capacity = threading.Semaphore(max_concurrency) if max_concurrency else None
+        self.requests = 0
+        self.errors = 0
+        self.prompt_chars = 0
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._httpd = None
+        self._thread = None
+
+    @property
+    def base_url(self) -> str:
+        host, port = self._httpd.server_address
+        return f"http://{host}:{port}/v1"
+
+    def start(self) -> str:
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, format, *args):
+                pass
+
+            def do_POST(self):
+                length = int(self.headers.get("Content-Length", 0))
+                payload = json.loads(self.rfile.read(length))
+                server._record(payload)
+                if server._capacity:
+                    server._capacity.acquire()
+                try:
+                    time.sleep(server.latency)
+                    if server._should_fail():
+                        server._reply_error(self)
+                    else:
+                        server._reply(self, payload)
+                finally:
+                    if server._capacity:
+                        server._capacity.release()
+
+        class Server(ThreadingHTTPServer):
+            request_queue_size = 128  # default 5 drops SYNs under concurrent connects
+
+        self._httpd = Server(("127.0.0.1", 0), Handler)
+        self._httpd.daemon_threads = True
+        self._thread = threading.Thread(target=self._httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self.base_url
+
+    def stop(self):
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+    def _record(self, payload):
+        with self._lock:
+            self.requests += 1
+            self.prompt_chars += sum(len(m["content"]) for m in payload["messages"])
+            self.prompt_chars += len(json.dumps(payload.get("tools", [])))  # schemas count too
+
+    def _should_fail(self) -> bool:
+        with self._lock:
+            fail = self.down or self._random.random() < self.error_rate
+            if fail:
+                self.errors += 1
+            return fail
+
+    def _reply_error(self, handler):
+        body = json.dumps({"error": {
+            "message": f"Injected error {self.error_status}",
+            "type": "server_error" if self.error_status >= 500 else "rate_limit_error",
+            "code": None
+        }}).encode()
+        handler.send_response(self.error_status)
+        handler.send_header("Content-Type", "application/json")
+        handler.send_header("Content-Length", str(len(body)))
+        handler.end_headers()
+        handler.wfile.write(body)
+
+    def _reply(self, handler, payload):
+        content = self.responder(payload)
+        if payload.get("stream"):
+            return self._reply_stream(handler, payload, content)
+        # Non-streaming clients wait for the whole generation
+        time.sleep(self.token_latency * len(content.split()))
+        prompt_tokens = (sum(len(m["content"]) for m in payload["messages"])
+                         + len(json.dumps(payload.get("tools", [])))) // 4
+        completion_tokens = len(content) // 4
+        message = {"role": "assistant", "content": content}
+        finish_reason = "stop"
+        if payload.get("tools"):
+            # Forced function call: the responder's text is the arguments
+            tool = payload["tools"][0]["function"]["name"]
+            message = {"role": "assistant", "content": None, "tool_calls": [{
+                "id": "call_fake", "type": "function",
+                "function": {"name": tool, "arguments": content}
+            }]}
+            finish_reason = "tool_calls"
+        body = json.dumps({
+            "id": "chatcmpl-fake",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": payload.get("model", "fake-model"),
+            "choices": [{
+                "index": 0,
+                "message": message,
+                "finish_reason": finish_reason
+            }],
+            "usage": {
+                "prompt_tokens": prompt_tokens,
+                "completion_tokens": completion_tokens,
+                "total_tokens": prompt_tokens + completion_tokens
+            }
+        }).encode()
+        handler.send_response(200)
+        handler.send_header("Content-Type", "application/json")
+        handler.send_header("Content-Length", str(len(body)))
+        handler.end_headers()
+        handler.wfile.write(body)
+
+    def _reply_stream(self, handler, payload, content):
+        handler.send_response(200)
+        handler.send_header("Content-Type", "text/event-stream")
+        handler.send_header("Connection", "close")
+        handler.end_headers()
+        handler.close_connection = True
+
+        for i, word in enumerate(content.split(" ")):
+            if i:
+                time.sleep(self.token_latency)
+            chunk = {
+                "id": "chatcmpl-fake",
+                "object": "chat.completion.chunk",
+                "created": int(time.time()),
+                "model": payload.get("model", "fake-model"),
+                "choices": [{
+                    "index": 0,
+                    "delta": {"content": word if i == 0 else " " + word},
+                    "finish_reason": None
+                }]
+            }
+            handler.wfile.write(f"data: {json.dumps(chunk)}\n\n".encode())
+            handler.wfile.flush()
+        handler.wfile.write(b"data: [DONE]\n\n")
+        handler.wfile.flush()
@@ -0,0 +1,128 @@
+"""
+Context builder for chat completions.
+
+Fits the adaptive system prompt, the session's rolling summary and the most
+recent turns into a fixed token budget, and decides when older turns should
+be folded into the summary.
+"""
+
+import os
+from typing import Any, Dict, List, Optional
+
+
+class ContextBuilder:
+    """Builds a token-bounded prompt from system prompt + summary + recent turns."""
+
+    def __init__(self, adb, llm_service, token_budget: Optional[int] = None,
+                 reply_tokens: int = 500, min_history_tokens: int = 500,
+                 summary_min_messages: Optional[int] = None):
+        """
+        Args:
+            adb: AsyncDatabase holding messages and session summaries.
+            llm_service: LLMService used for token counting and summarization.
+            token_budget: Total prompt budget (CONTEXT_TOKEN_BUDGET, default 8000).
+            reply_tokens: Tokens reserved for the model's answer.
+            min_history_tokens: History budget kept even if the system prompt is huge.
+            summary_min_messages: Unsummarized dropped messages needed before
+                a summary update is requested (SUMMARY_MIN_MESSAGES, default 10).
+        """
+        self.adb = adb
+        self.llm_service = llm_service
+        self.token_budget = token_budget or int(os.getenv("CONTEXT_TOKEN_BUDGET", "8000"))
+        self.reply_tokens = reply_tokens
+        self.min_history_tokens = min_history_tokens
+        self.summary_min_messages = summary_min_messages or int(os.getenv("SUMMARY_MIN_MESSAGES", "10"))
+        # Latest requested summary boundary per session, read by update_summary
+        self._summary_requests: Dict[int, int] = {}
+
+    async def build(self, session_id: int, system_prompt: str,
+                    history: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """
+        Build the prompt for one turn.
+
+        Args:
+            session_id: Session being answered
+            system_prompt: Adaptive system prompt for the user
+            history: Recent message rows (with ids), oldest first, ending with
+                the current user message
+
+        Returns:
+            Dict with 'system_prompt' (including the summary), 'messages'
+            (role/content turns that fit), 'prompt_tokens' (estimate) and
+            'summarize_up_to' (message id to summarize up to, or None)
+        """
+        summary = await self.adb.get_session_summary(session_id)
+        watermark = summary["summarized_up_to"] if summary else 0
+
+        full_system_prompt = system_prompt
+        if summary:
+            full_system_prompt += (
+                "\n\nRESUMEN DE LA CONVERSACIÓN ANTERIOR (mensajes que ya no ves):\n"
+                f"{summary['summary']}"
+            )
+
+        system_tokens = self.llm_service.estimate_tokens(full_system_prompt)
+        history_budget = max(self.token_budget - system_tokens - self.reply_tokens,
+                             self.min_history_tokens)
+
+        kept = self.llm_service.window_history(history, history_budget)
+
+        # Turns before the window (trimmed here or never loaded) that the
+        # summary doesn't cover yet
+        summarize_up_to = None
+        if kept and kept[0]["id"] - 1 > watermark:
+            last_dropped_id = kept[0]["id"] - 1
+            pending = await self.adb.count_messages_between(session_id, watermark, last_dropped_id)
+            if pending >= self.summary_min_messages:
+                summarize_up_to = last_dropped_id
+                self._summary_requests[session_id] = max(
+                    self._summary_requests.get(session_id, 0), last_dropped_id
+                )
+
+        messages = [{"role": m["role"], "content": m["content"]} for m in kept]
+        prompt_tokens = system_tokens + sum(
+            self.llm_service.estimate_tokens(m["content"]) + 4 for m in messages
+        )
+
+        return {
+            "system_prompt": full_system_prompt,
+            "messages": messages,
+            "prompt_tokens": prompt_tokens,
+            "summarize_up_to": summarize_up_to
+        }
+
+    async def update_summary(self, session_id: int, up_to_id: Optional[int] = None,
+                             user_id: Optional[int] = None) -> bool:
+        """
+        Fold messages up to `up_to_id` into the session's rolling summary.
+
+        The boundary is the latest one requested by build() for the session
+        (or `up_to_id` if that is further), so one job per session covers
+        every turn since it was queued. Requests are kept in memory: after a
+        restart the job does nothing and the next turn requests it again.
+
+        Returns True if the summary was updated.
+        """
+        up_to_id = max(up_to_id or 0, self._summary_requests.get(session_id, 0))
+        summary = await self.adb.get_session_summary(session_id)
+        watermark = summary["summarized_up_to"] if summary else 0
+        if up_to_id <= watermark:
+            self._summary_requests.pop(session_id, None)
+            return False
+
+        messages = await self.adb.get_messages_between(session_id, watermark, up_to_id)
+        if not messages:
+            return False
+
+        conversation = [{"role": m["role"], "content": m["content"]} for m in messages]
+        new_summary = await self.llm_service.asummarize_conversation(
+            summary["summary"] if summary else None, conversation, user_id=user_id
+        )
+        if not new_summary:
+            return False
+
+        # get_messages_between is capped; only advance as far as we summarized
+        await self.adb.save_session_summary(session_id, new_summary, messages[-1]["id"])
+        if self._summary_requests.get(session_id, 0) <= messages[-1]["id"]:
+            self._summary_requests.pop(session_id, None)
+        return True
@@ -0,0 +1,208 @@
+"""
+Structured result of the combined profile + emotional analysis call.
+
+The analysis is requested through function calling, so the model returns
+arguments that follow ANALYSIS_FUNCTION's JSON schema instead of free text.
+The arguments are still validated here before anything is written to a
+profile.
+"""
+
+import json
+from dataclasses import dataclass, field, asdict
+from typing import Any, Dict, List, Optional
+
+ANALYSIS_FUNCTION_NAME = "save_conversation_analysis"
+
+LEVELS = ["none", "low", "moderate", "high", "severe"]
+SUPPORT_LEVELS = ["none", "low", "moderate", "high", "urgent"]
+MODES = ["normal", "friendly", "empathetic", "supportive", "crisis"]
+
+PROFILE_SCALAR_FIELDS = ["name", "age_range", "gender", "profession", "education"]
+PROFILE_LIST_FIELDS = ["interests", "important_facts", "sensitive_topics", "personality_traits", "needs"]
+PROFILE_NESTED_FIELDS = {
+    "political_stance": ["spectrum", "intensity", "approach"],
+    "religion": ["faith", "intensity", "approach"]
+}
+
+_NULLABLE_STRING = {"type": ["string", "null"]}
+_STRING_LIST = {"type": "array", "items": {"type": "string"}}
+
+PROFILE_SCHEMA = {
+    "type": "object",
+    "description": "Información PERMANENTE sobre el usuario (null si no se sabe)",
+    "properties": {
+        **{name: _NULLABLE_STRING for name in PROFILE_SCALAR_FIELDS},
+        **{name: _STRING_LIST for name in PROFILE_LIST_FIELDS},
+        **{
+            name: {
+                "type": "object",
+                "properties": {key: _NULLABLE_STRING for key in keys},
+                "required": keys
+            }
+            for name, keys in PROFILE_NESTED_FIELDS.items()
+        },
+        "tone_preference": _NULLABLE_STRING
+    },
+    "required": PROFILE_SCALAR_FIELDS + PROFILE_LIST_FIELDS + list(PROFILE_NESTED_FIELDS) + ["tone_preference"]
+}
+
+EMOTIONAL_STATE_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "depression_probability": {"type": "number", "minimum": 0, "maximum": 1},
+        "anxiety_level": {"type": "string", "enum": LEVELS},
+        "loneliness_level": {"type": "string", "enum": LEVELS},
+        "support_needed": {"type": "string", "enum": SUPPORT_LEVELS},
+        "recommended_mode": {"type": "string", "enum": MODES},
+        "detected_concerns": _STRING_LIST,
+        "positive_indicators": _STRING_LIST,
+        "confidence": {"type": "number", "minimum": 0, "maximum": 1},
+        "professional_help_suggested": {"type": "boolean"},
+        "notes": {"type": "string"}
+    },
+    "required": [
+        "depression_probability", "anxiety_level", "loneliness_level", "support_needed",
+        "recommended_mode", "detected_concerns", "positive_indicators", "confidence",
+        "professional_help_suggested", "notes"
+    ]
+}
+
+
+def analysis_tool(profile: bool = True, emotion: bool = True) -> Dict[str, Any]:
+    """Tool definition asking for the requested parts of the analysis."""
+    properties = {}
+    if profile:
+        properties["profile"] = PROFILE_SCHEMA
+    if emotion:
+        properties["emotional_state"] = EMOTIONAL_STATE_SCHEMA
+
+    return {
+        "type": "function",
+        "function": {
+            "name": ANALYSIS_FUNCTION_NAME,
+            "description": "Guarda el análisis de la conversación",
+            "parameters": {
+                "type": "object",
+                "properties": properties,
+                "required": list(properties)
+            }
+        }
+    }
+
+
+def _string_or_none(value: Any, name: str) -> Optional[str]:
+    if value is None or value == "null" or value == "":
+        return None
+    if not isinstance(value, str):
+        raise ValueError(f"{name} must be a string or null")
+    return value
+
+
+def _string_list(value: Any, name: str) -> List[str]:
+    if value is None:
+        return []
+    if not isinstance(value, list) or not all(isinstance(v, str) for v in value):
+        raise ValueError(f"{name} must be a list of strings")
+    return [v for v in value if v.strip()]
+
+
+def _probability(value: Any, name: str) -> float:
+    if isinstance(value, bool) or not isinstance(value, (int, float)):
+        raise ValueError(f"{name} must be a number")
+    return min(max(float(value), 0.0), 1.0)
+
+
+def _choice(value: Any, name: str, choices: List[str]) -> str:
+    if value not in choices:
+        raise ValueError(f"{name} must be one of {choices}, got {value!r}")
+    return value
+
+
+def validate_profile(data: Any) -> Dict[str, Any]:
+    """Validate extracted profile fields and normalize "null" strings to None."""
+    if not isinstance(data, dict):
+        raise ValueError("profile must be an object")
+
+    profile = {name: _string_or_none(data.get(name), name) for name in PROFILE_SCALAR_FIELDS}
+    for name in PROFILE_LIST_FIELDS:
+        profile[name] = _string_list(data.get(name), name)
+    for name, keys in PROFILE_NESTED_FIELDS.items():
+        nested = data.get(name) or {}
+        if not isinstance(nested, dict):
+            raise ValueError(f"{name} must be an object")
+        profile[name] = {key: _string_or_none(nested.get(key), f"{name}.{key}") for key in keys}
+    profile["tone_preference"] = _string_or_none(data.get("tone_preference"), "tone_preference")
+
+    return profile
+
+
+@dataclass
+class EmotionalState:
+    """Validated emotional analysis (same keys the emotional-only prompt returns)."""
+
+    depression_probability: float = 0.0
+    anxiety_level: str = "none"
+    loneliness_level: str = "none"
+    support_needed: str = "none"
+    recommended_mode: str = "normal"
+    detected_concerns: List[str] = field(default_factory=list)
+    positive_indicators: List[str] = field(default_factory=list)
+    confidence: float = 0.0
+    professional_help_suggested: bool = False
+    notes: str = ""
+
+    @classmethod
+    def from_dict(cls, data: Any) -> "EmotionalState":
+        """Build from tool arguments. Raises ValueError on invalid values."""
+        if not isinstance(data, dict):
+            raise ValueError("emotional_state must be an object")
+
+        missing = [name for name in EMOTIONAL_STATE_SCHEMA["required"] if name not in data]
+        if missing:
+            raise ValueError(f"emotional_state is missing {missing}")
+
+        return cls(
+            depression_probability=_probability(data["depression_probability"], "depression_probability"),
+            anxiety_level=_choice(data["anxiety_level"], "anxiety_level", LEVELS),
+            loneliness_level=_choice(data["loneliness_level"], "loneliness_level", LEVELS),
+            support_needed=_choice(data["support_needed"], "support_needed", SUPPORT_LEVELS),
+            recommended_mode=_choice(data["recommended_mode"], "recommended_mode", MODES),
+            detected_concerns=_string_list(data["detected_concerns"], "detected_concerns"),
+            positive_indicators=_string_list(data["positive_indicators"], "positive_indicators"),
+            confidence=_probability(data["confidence"], "confidence"),
+            professional_help_suggested=bool(data["professional_help_suggested"]),
+            notes=data["notes"] if isinstance(data["notes"], str) else ""
+        )
+
+    def to_dict(self) -> Dict[str, Any]:
+        return asdict(self)
+
+
+@dataclass
+class AnalysisResult:
+    """Outcome of one analysis call; parts that were not requested are None."""
+
+    profile: Optional[Dict[str, Any]] = None
+    emotional_state: Optional[EmotionalState] = None
+
+    @classmethod
+    def from_arguments(cls, arguments: str, profile: bool = True,
+                       emotion: bool = True) -> "AnalysisResult":
+        """
+        Parse and validate the tool call arguments.
+
+        Raises ValueError if the JSON is malformed or a requested part is
+        missing or invalid.
+        """
+        data = json.loads(arguments)
+        if not isinstance(data, dict):
+            raise ValueError("analysis arguments must be an object")
+        if profile and "profile" not in data:
+            raise ValueError("analysis is missing profile")
+        if emotion and "emotional_state" not in data:
+            raise ValueError("analysis is missing emotional_state")
+
+        return cls(
+            profile=validate_profile(data["profile"]) if profile else None,
+            emotional_state=EmotionalState.from_dict(data["emotional_state"]) if emotion else None
+        )
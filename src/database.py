@@ -3,24 +3,179 @@ Database module for managing SQLite database operations.
 Handles users, sessions, messages, and user profiles.
 """
 
+import os
 import sqlite3
 import hashlib
 import json
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
+from functools import partial
 from typing import Optional, Dict, List, Any
 
+try:
+    from .message_codec import BUILTIN_DICTIONARY, MessageCodec
+except ImportError:  # imported as a top-level module (src/ on sys.path, as test_app.py does)
+    from message_codec import BUILTIN_DICTIONARY, MessageCodec
+
+# Ordered schema migrations: (version, description, statements).
+# Applied once each at startup and recorded in the schema_version table.
+# Never edit a released step; append a new one instead.
+MIGRATIONS = [
+    (1, "Indexes for per-session message and per-user session lookups", [
+        "CREATE INDEX IF NOT EXISTS idx_messages_session_id ON messages (session_id, id)",
+        "CREATE INDEX IF NOT EXISTS idx_sessions_user_updated ON sessions (user_id, updated_at)",
+        "CREATE INDEX IF NOT EXISTS idx_jobs_status ON jobs (status, id)",
+    ]),
+    (2, "Rolling conversation summaries per session", [
+        """CREATE TABLE IF NOT EXISTS session_summaries (
+               session_id INTEGER PRIMARY KEY,
+               summary TEXT NOT NULL,
+               summarized_up_to INTEGER NOT NULL,
+               updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+               FOREIGN KEY (session_id) REFERENCES sessions (id)
+           )""",
+    ]),
+    (3, "Profile version counter for prompt cache invalidation", [
+        "ALTER TABLE user_profiles ADD COLUMN profile_version INTEGER NOT NULL DEFAULT 0",
+    ]),
+    (4, "Per-user watermark of messages already used for profile extraction", [
+        "ALTER TABLE user_profiles ADD COLUMN last_analyzed_message_id INTEGER NOT NULL DEFAULT 0",
+    ]),
+    (5, "Content-addressed cache of deterministic LLM responses", [
+        """CREATE TABLE IF NOT EXISTS llm_cache (
+               cache_key TEXT PRIMARY KEY,
+               model TEXT NOT NULL,
+               response_json TEXT NOT NULL,
+               expires_at REAL NOT NULL,
+               last_used_at REAL NOT NULL,
+               hits INTEGER NOT NULL DEFAULT 0
+           )""",
+        "CREATE INDEX IF NOT EXISTS idx_llm_cache_last_used ON llm_cache (last_used_at)",
+    ]),
+    (6, "Cache of NewsAPI search results", [
+        """CREATE TABLE IF NOT EXISTS news_cache (
+               cache_key TEXT PRIMARY KEY,
+               query TEXT NOT NULL,
+               language TEXT NOT NULL,
+               days_back INTEGER NOT NULL,
+               articles_json TEXT NOT NULL,
+               fetched_at REAL NOT NULL
+           )""",
+        "CREATE INDEX IF NOT EXISTS idx_news_cache_fetched ON news_cache (fetched_at)",
+    ]),
+    (7, "Precomputed proactive greetings per user", [
+        """CREATE TABLE IF NOT EXISTS proactive_greetings (
+               user_id INTEGER PRIMARY KEY,
+               greeting TEXT NOT NULL,
+               topic TEXT,
+               generated_at REAL NOT NULL,
+               expires_at REAL NOT NULL,
+               consumed INTEGER NOT NULL DEFAULT 0,
+               FOREIGN KEY (user_id) REFERENCES users (id)
+           )""",
+        "CREATE INDEX IF NOT EXISTS idx_proactive_greetings_expires ON proactive_greetings (expires_at)",
+    ]),
+    (8, "Compressed message bodies and their preset dictionaries", [
+        "ALTER TABLE messages ADD COLUMN encoding TEXT",
+        """CREATE TABLE IF NOT EXISTS message_dictionaries (
+               id INTEGER PRIMARY KEY AUTOINCREMENT,
+               algorithm TEXT NOT NULL,
+               data BLOB NOT NULL,
+               created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+           )""",
+        # Stored rows are decoded with this copy of the built-in dictionary, not the constant
+        "INSERT OR IGNORE INTO message_dictionaries (id, algorithm, data) "
+        f"VALUES (0, 'any', X'{BUILTIN_DICTIONARY.encode().hex()}')",
+    ]),
+]
+
+# Profile keys stored in their own user_profiles columns rather than in profile_json
+PROFILE_COLUMN_KEYS = ("profile_version", "last_analyzed_message_id", "emotional_state")
+
 
 class Database:
-    def __init__(self, db_path: str = "chat_agent.db"):
+    def __init__(self, db_path: str = "chat_agent.db", pooled: Optional[bool] = None):
+        """
+        Args:
+            db_path: Path to the SQLite database file.
+            pooled: Keep one long-lived connection per thread instead of opening
+                one per call. Defaults to SQLITE_POOL (enabled unless "0").
+        """
         self.db_path = db_path
+        self.pooled = pooled if pooled is not None else os.getenv("SQLITE_POOL", "1") != "0"
+        self.journal_mode = os.getenv("SQLITE_JOURNAL_MODE", "WAL")
+        self.synchronous = os.getenv("SQLITE_SYNCHRONOUS", "NORMAL")
+        self.cache_size = int(os.getenv("SQLITE_CACHE_SIZE", "-20000"))  # negative = KiB
+        self.mmap_size = int(os.getenv("SQLITE_MMAP_SIZE", str(256 * 1024 * 1024)))
+        self.busy_timeout = int(os.getenv("SQLITE_BUSY_TIMEOUT", "5000"))  # ms
+        self.cached_statements = int(os.getenv("SQLITE_CACHED_STATEMENTS", "256"))
+
+        self._local = threading.local()
+        self._connections: List[sqlite3.Connection] = []
+        self._pool_lock = threading.Lock()
+        # Message body compression (MESSAGE_COMPRESSION, off by default)
+        self.codec = MessageCodec(loader=self.get_message_dictionary)
+
         self.init_database()
+        self.load_message_dictionaries()
+
+    def _open_connection(self) -> sqlite3.Connection:
+        """Open a new connection with the configured pragmas."""
+        conn = sqlite3.connect(
+            self.db_path,
+            timeout=self.busy_timeout / 1000,
+            cached_statements=self.cached_statements,
+            check_same_thread=not self.pooled
+        )
+        conn.row_factory = sqlite3.Row
+        conn.execute(f"PRAGMA journal_mode = {self.journal_mode}")
+        conn.execute(f"PRAGMA synchronous = {self.synchronous}")
+        conn.execute(f"PRAGMA cache_size = {self.cache_size}")
+        conn.execute(f"PRAGMA mmap_size = {self.mmap_size}")
+        conn.execute(f"PRAGMA busy_timeout = {self.busy_timeout}")
+        return conn
 
     def get_connection(self):
-        """Create a database connection."""
-        conn = sqlite3.connect(self.db_path)
-        conn.row_factory = sqlite3.Row
+        """
+        Get a database connection.
+
+        With pooling enabled each thread reuses its own connection, which also
+        keeps sqlite3's prepared statement cache warm between calls.
+        """
+        if not self.pooled:
+            return self._open_connection()
+
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = self._open_connection()
+            self._local.conn = conn
+            with self._pool_lock:
+                self._connections.append(conn)
+        elif conn.in_transaction:
+            # A previous call failed before committing
+            conn.rollback()
         return conn
 
+    def release_connection(self, conn: sqlite3.Connection):
+        """Give back a connection obtained from get_connection."""
+        if not self.pooled:
+            conn.close()
+            return
+
+        # Never leave half-done work on a reused connection
+        if conn.in_transaction:
+            conn.rollback()
+
+    def close(self):
+        """Close every pooled connection."""
+        with self._pool_lock:
+            for conn in self._connections:
+                conn.close()
+            self._connections = []
+        self._local = threading.local()
+
     def init_database(self):
         """Initialize database tables."""
         conn = self.get_connection()
@@ -72,8 +227,74 @@ class Database:
             )
         """)
 
+        # Background jobs table (pending work survives restarts)
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS jobs (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                job_type TEXT NOT NULL,
+                payload_json TEXT NOT NULL,
+                status TEXT NOT NULL DEFAULT 'pending',
+                attempts INTEGER NOT NULL DEFAULT 0,
+                error TEXT,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+        """)
+
+        # Schema version bookkeeping for migrations
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS schema_version (
+                version INTEGER PRIMARY KEY,
+                description TEXT NOT NULL,
+                applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+        """)
+
         conn.commit()
-        conn.close()
+        self.release_connection(conn)
+
+        self.apply_migrations()
+
+    def get_schema_version(self) -> int:
+        """Get the highest applied migration version (0 if none)."""
+        conn = self.get_connection()
+        cursor = conn.cursor()
+
+        cursor.execute("SELECT MAX(version) AS version FROM schema_version")
+
+        row = cursor.fetchone()
+        self.release_connection(conn)
+
+        return row["version"] or 0
+
+    def apply_migrations(self) -> List[int]:
+        """Apply pending migrations in order, each in its own transaction."""
+        applied = []
+
+        for version, description, statements in MIGRATIONS:
+            conn = self.get_connection()
+            cursor = conn.cursor()
+
+            # IMMEDIATE takes the write lock so concurrent starts don't race
+            cursor.execute("BEGIN IMMEDIATE")
+            cursor.execute("SELECT 1 FROM schema_version WHERE version = ?", (version,))
+            if cursor.fetchone():
+                self.release_connection(conn)
+                continue
+
+            for statement in statements:
+                cursor.execute(statement)
+            cursor.execute(
+                "INSERT INTO schema_version (version, description) VALUES (?, ?)",
+                (version, description)
+            )
+            conn.commit()
+            self.release_connection(conn)
+
+            print(f"🗄️  Applied migration {version}: {description}")
+            applied.append(version)
+
+        return applied
 
     def hash_password(self, password: str) -> str:
         """Hash a password using SHA-256."""
@@ -101,10 +322,10 @@ class Database:
             )
             conn.commit()
 
-            conn.close()
+            self.release_connection(conn)
             return {"success": True, "user_id": user_id, "username": username}
         except sqlite3.IntegrityError:
-            conn.close()
+            self.release_connection(conn)
             return {"success": False, "error": "Username already exists"}
 
     def authenticate_user(self, username: str, password: str) -> Dict[str, Any]:
@@ -120,7 +341,7 @@ class Database:
         )
 
         user = cursor.fetchone()
-        conn.close()
+        self.release_connection(conn)
 
         if user:
             return {"success": True, "user_id": user["id"], "username": user["username"]}
@@ -138,7 +359,7 @@ class Database:
         )
         conn.commit()
         session_id = cursor.lastrowid
-        conn.close()
+        self.release_connection(conn)
 
         return session_id
 
@@ -156,10 +377,62 @@ class Database:
         )
 
         sessions = [dict(row) for row in cursor.fetchall()]
-        conn.close()
+        self.release_connection(conn)
 
         return sessions
 
+    def get_user_sessions_page(self, user_id: int, before_id: Optional[int] = None,
+                               limit: int = 50) -> Dict[str, Any]:
+        """
+        One page of a user's sessions, most recently updated first.
+
+        Keyset pagination on (updated_at, id) through the
+        (user_id, updated_at) index: the page starts after the session
+        `before_id` (the last one of the previous page; None = first page).
+        Returns {"sessions", "has_more", "next_before_id"}, or None if
+        before_id is not one of the user's sessions.
+        """
+        conn = self.get_connection()
+        cursor = conn.cursor()
+
+        if before_id is not None:
+            cursor.execute("SELECT updated_at FROM sessions WHERE id = ? AND user_id = ?",
+                           (before_id, user_id))
+            start = cursor.fetchone()
+            if start is None:
+                self.release_connection(conn)
+                return None
+
+        if before_id is None:
+            cursor.execute(
+                """SELECT id, session_name, created_at, updated_at
+                   FROM sessions
+                   WHERE user_id = ?
+                   ORDER BY updated_at DESC, id DESC
+                   LIMIT ?""",
+                (user_id, limit + 1)
+            )
+        else:
+            cursor.execute(
+                """SELECT id, session_name, created_at, updated_at
+                   FROM sessions
+                   WHERE user_id = ? AND (updated_at, id) < (?, ?)
+                   ORDER BY updated_at DESC, id DESC
+                   LIMIT ?""",
+                (user_id, start["updated_at"], before_id, limit + 1)
+            )
+
+        rows = [dict(row) for row in cursor.fetchall()]
+        self.release_connection(conn)
+
+        has_more = len(rows) > limit
+        sessions = rows[:limit]
+        return {
+            "sessions": sessions,
+            "has_more": has_more,
+            "next_before_id": sessions[-1]["id"] if has_more else None
+        }
+
     def get_user_id_from_session(self, session_id: int) -> Optional[int]:
         """Get user_id from session_id."""
         conn = self.get_connection()
@@ -171,7 +444,7 @@ class Database:
         )
 
         row = cursor.fetchone()
-        conn.close()
+        self.release_connection(conn)
 
         return row["user_id"] if row else None
 
@@ -180,20 +453,20 @@ class Database:
         conn = self.get_connection()
         cursor = conn.cursor()
 
+        content, encoding = self.codec.encode(content)
         cursor.execute(
-            "INSERT INTO messages (session_id, role, content) VALUES (?, ?, ?)",
-            (session_id, role, content)
+            "INSERT INTO messages (session_id, role, content, encoding) VALUES (?, ?, ?, ?)",
+            (session_id, role, content, encoding)
         )
-        conn.commit()
         message_id = cursor.lastrowid
 
-        # Update session's updated_at timestamp
+        # Update session's updated_at timestamp (same transaction)
         cursor.execute(
             "UPDATE sessions SET updated_at = CURRENT_TIMESTAMP WHERE id = ?",
             (session_id,)
         )
         conn.commit()
-        conn.close()
+        self.release_connection(conn)
 
         return message_id
 
@@ -202,21 +475,495 @@ class Database:
         conn = self.get_connection()
         cursor = conn.cursor()
 
-        query = """SELECT id, role, content, created_at
+        query = """SELECT id, role, content, encoding, created_at
                    FROM messages
                    WHERE session_id = ?
-                   ORDER BY created_at ASC"""
+                   ORDER BY id ASC"""
 
+        params = (session_id,)
         if limit:
-            query += f" LIMIT {limit}"
+            query += " LIMIT ?"
+            params += (limit,)
+
+        cursor.execute(query, params)
+
+        messages = self._decode_messages(cursor.fetchall())
+        self.release_connection(conn)
+
+        return messages
+
+    def _decode_messages(self, rows: List[sqlite3.Row]) -> List[Dict[str, Any]]:
+        """Message rows as dicts with their content decompressed."""
+        messages = []
+        for row in rows:
+            message = dict(row)
+            encoding = message.pop("encoding")
+            if encoding is not None:
+                message["content"] = self.codec.decode(message["content"], encoding)
+            messages.append(message)
+        return messages
+
+    def get_session_messages_page(self, session_id: int, before_id: Optional[int] = None,
+                                  limit: int = 50) -> Dict[str, Any]:
+        """
+        One page of a session's messages, oldest first, for scrolling back.
+
+        Keyset pagination: the page holds the `limit` messages just before
+        `before_id` (the newest ones when None), read backwards through the
+        (session_id, id) index, so any page costs the same however deep it is.
+        Returns {"messages", "has_more", "next_before_id"}.
+        """
+        conn = self.get_connection()
+        cursor = conn.cursor()
+
+        if before_id is None:
+            cursor.execute(
+                """SELECT id, role, content, encoding, created_at
+                   FROM messages
+                   WHERE session_id = ?
+                   ORDER BY id DESC
+                   LIMIT ?""",
+                (session_id, limit + 1)
+            )
+        else:
+            cursor.execute(
+                """SELECT id, role, content, encoding, created_at
+                   FROM messages
+                   WHERE session_id = ? AND id < ?
+                   ORDER BY id DESC
+                   LIMIT ?""",
+                (session_id, before_id, limit + 1)
+            )
+
+        rows = self._decode_messages(cursor.fetchall())
+        self.release_connection(conn)
+
+        has_more = len(rows) > limit
+        messages = rows[:limit][::-1]
+        return {
+            "messages": messages,
+            "has_more": has_more,
+            "next_before_id": messages[0]["id"] if has_more else None
+        }
 
-        cursor.execute(query, (session_id,))
+    def get_recent_messages(self, session_id: int, limit: int) -> List[Dict[str, Any]]:
+        """
+        Get the last `limit` messages of a session, oldest first.
 
-        messages = [dict(row) for row in cursor.fetchall()]
-        conn.close()
+        Reads only the tail of the conversation through the
+        (session_id, id) index, so cost does not grow with session length.
+        """
+        conn = self.get_connection()
+        cursor = conn.cursor()
 
+        cursor.execute(
+            """SELECT id, role, content, encoding, created_at
+               FROM messages
+               WHERE session_id = ?
+               ORDER BY id DESC
+               LIMIT ?""",
+            (session_id, limit)
+        )
+
+        messages = self._decode_messages(cursor.fetchall())
+        self.release_connection(conn)
+
+        messages.reverse()
         return messages
 
+    def get_messages_between(self, session_id: int, after_id: int, up_to_id: int,
+                             limit: int = 200) -> List[Dict[str, Any]]:
+        """Get messages with after_id < id <= up_to_id, oldest first."""
+        conn = self.get_connection()
+        cursor = conn.cursor()
+
+        cursor.execute(
+            """SELECT id, role, content, encoding, created_at
+               FROM messages
+               WHERE session_id = ? AND id > ? AND id <= ?
+               ORDER BY id ASC
+               LIMIT ?""",
+            (session_id, after_id, up_to_id, limit)
+        )
+
+        messages = self._decode_messages(cursor.fetchall())
+        self.release_connection(conn)
+
+        return messages
+
+    def get_user_messages_after(self, user_id: int, after_id: int, limit: int = 30,
+                                oldest: bool = False) -> List[Dict[str, Any]]:
+        """
+        Get a user's messages (any session) with id > after_id, oldest first.
+
+        At most `limit` messages are returned: the newest such messages, or
+        the oldest ones with oldest=True (to page forward from after_id).
+        """
+        conn = self.get_connection()
+        cursor = conn.cursor()
+
+        order = "ASC" if oldest else "DESC"
+        cursor.execute(
+            f"""SELECT m.id, m.role, m.content, m.encoding, m.created_at
+                FROM messages m
+                JOIN sessions s ON s.id = m.session_id
+                WHERE s.user_id = ? AND m.id > ?
+                ORDER BY m.id {order}
+                LIMIT ?""",
+            (user_id, after_id, limit)
+        )
+
+        messages = self._decode_messages(cursor.fetchall())
+        self.release_connection(conn)
+
+        if not oldest:
+            messages.reverse()
+        return messages
+
+    def count_messages_between(self, session_id: int, after_id: int, up_to_id: int) -> int:
+        """Count messages with after_id < id <= up_to_id."""
+        conn = self.get_connection()
+        cursor = conn.cursor()
+
+        cursor.execute(
+            """SELECT COUNT(*) AS total
+               FROM messages
+               WHERE session_id = ? AND id > ? AND id <= ?""",
+            (session_id, after_id, up_to_id)
+        )
+
+        row = cursor.fetchone()
+        self.release_connection(conn)
+
+        return row["total"]
+
+    def load_message_dictionaries(self):
+        """Register the stored compression dictionaries with the message codec."""
+        conn = self.get_connection()
+        cursor = conn.cursor()
+
+        cursor.execute("SELECT id, algorithm, data FROM message_dictionaries ORDER BY id")
+        for row in cursor.fetchall():
+            self.codec.add_dictionary(row["id"], row["algorithm"], row["data"])
+        self.release_connection(conn)
+
+    def get_message_dictionary(self, dictionary_id: int) -> Optional[tuple]:
+        """(algorithm, data) of a stored compression dictionary, or None."""
+        conn = self.get_connection()
+        cursor = conn.cursor()
+
+        cursor.execute("SELECT algorithm, data FROM message_dictionaries WHERE id = ?", (dictionary_id,))
+        row = cursor.fetchone()
+        self.release_connection(conn)
+
+        return (row["algorithm"], row["data"]) if row else None
+
+    def save_message_dictionary(self, algorithm: str, data: bytes) -> int:
+        """Store a trained dictionary; new messages are compressed with it from now on."""
+        conn = self.get_connection()
+        cursor = conn.cursor()
+
+        cursor.execute(
+            "INSERT INTO message_dictionaries (algorithm, data) VALUES (?, ?)",
+            (algorithm, data)
+        )
+        dictionary_id = cursor.lastrowid
+        conn.commit()
+        self.release_connection(conn)
+
+        self.codec.add_dictionary(dictionary_id, algorithm, data)
+        return dictionary_id
+
+    def sample_message_contents(self, min_bytes: int, limit: int) -> List[str]:
+        """Random message bodies of at least min_bytes (to train a dictionary)."""
+        conn = self.get_connection()
+        cursor = conn.cursor()
+
+        cursor.execute(
+            """SELECT id, role, content, encoding, created_at
+               FROM messages
+               WHERE encoding IS NOT NULL OR length(CAST(content AS BLOB)) >= ?
+               ORDER BY RANDOM()
+               LIMIT ?""",
+            (min_bytes, limit)
+        )
+
+        messages = self._decode_messages(cursor.fetchall())
+        self.release_connection(conn)
+
+        return [m["content"] for m in messages]
+
+    def compact_messages(self, after_id: int, limit: int = 1000,
+                         recompress: bool = False) -> Dict[str, int]:
+        """
+        Compress the stored bodies of the `limit` messages after after_id
+        with the current codec settings, in one transaction.
+
+        With recompress, bodies compressed with another dictionary are
+        re-encoded too. Returns last_id (to continue from), scanned,
+        compressed, bytes_before and bytes_after (of the rewritten rows).
+        """
+        conn = self.get_connection()
+        cursor = conn.cursor()
+
+        cursor.execute(
+            "SELECT id, content, encoding FROM messages WHERE id > ? ORDER BY id LIMIT ?",
+            (after_id, limit)
+        )
+        rows = cursor.fetchall()
+        current = f"{self.codec.algorithm}:{self.codec.dictionary_id}"
+
+        updates, bytes_before, bytes_after = [], 0, 0
+        for row in rows:
+            if row["encoding"] is not None and (not recompress or row["encoding"] == current):
+                continue
+            text = self.codec.decode(row["content"], row["encoding"])
+            content, encoding = self.codec.encode(text)
+            if encoding == row["encoding"]:
+                continue
+            bytes_before += len(row["content"]) if row["encoding"] else len(text.encode("utf-8"))
+            bytes_after += len(content) if encoding else len(text.encode("utf-8"))
+            updates.append((content, encoding, row["id"]))
+
+        cursor.executemany("UPDATE messages SET content = ?, encoding = ? WHERE id = ?", updates)
+        conn.commit()
+        self.release_connection(conn)
+
+        return {
+            "last_id": rows[-1]["id"] if rows else after_id,
+            "scanned": len(rows),
+            "compressed": len(updates),
+            "bytes_before": bytes_before,
+            "bytes_after": bytes_after
+        }
+
+    def get_message_storage_stats(self) -> Dict[str, Any]:
+        """Messages and stored body bytes per encoding, plus the database file size."""
+        conn = self.get_connection()
+        cursor = conn.cursor()
+
+        cursor.execute(
+            """SELECT COALESCE(encoding, 'plain') AS encoding, COUNT(*) AS messages,
+                      SUM(length(CAST(content AS BLOB))) AS bytes
+               FROM messages
+               GROUP BY encoding"""
+        )
+        encodings = {row["encoding"]: {"messages": row["messages"], "bytes": row["bytes"]}
+                     for row in cursor.fetchall()}
+        page_size = cursor.execute("PRAGMA page_size").fetchone()[0]
+        page_count = cursor.execute("PRAGMA page_count").fetchone()[0]
+        free_pages = cursor.execute("PRAGMA freelist_count").fetchone()[0]
+        self.release_connection(conn)
+
+        return {
+            "encodings": encodings,
+            "file_bytes": page_size * page_count,
+            "free_bytes": page_size * free_pages
+        }
+
+    def vacuum(self):
+        """Rebuild the database file, returning the space freed by compaction."""
+        conn = self.get_connection()
+        conn.execute("VACUUM")
+        self.release_connection(conn)
+
+    def get_session_summary(self, session_id: int) -> Optional[Dict[str, Any]]:
+        """Get the rolling summary of a session and the last message id it covers."""
+        conn = self.get_connection()
+        cursor = conn.cursor()
+
+        cursor.execute(
+            "SELECT summary, summarized_up_to FROM session_summaries WHERE session_id = ?",
+            (session_id,)
+        )
+
+        row = cursor.fetchone()
+        self.release_connection(conn)
+
+        return dict(row) if row else None
+
+    def save_session_summary(self, session_id: int, summary: str, summarized_up_to: int) -> bool:
+        """Create or replace the rolling summary of a session."""
+        conn = self.get_connection()
+        cursor = conn.cursor()
+
+        cursor.execute(
+            """INSERT INTO session_summaries (session_id, summary, summarized_up_to)
+               VALUES (?, ?, ?)
+               ON CONFLICT(session_id) DO UPDATE SET
+                   summary = excluded.summary,
+                   summarized_up_to = excluded.summarized_up_to,
+                   updated_at = CURRENT_TIMESTAMP""",
+            (session_id, summary, summarized_up_to)
+        )
+
+        conn.commit()
+        rows_affected = cursor.rowcount
+        self.release_connection(conn)
+
+        return rows_affected > 0
+
+    def get_llm_cache(self, cache_key: str, now: float) -> Optional[str]:
+        """Get an unexpired cached LLM response (JSON) and record the hit."""
+        conn = self.get_connection()
+        cursor = conn.cursor()
+
+        cursor.execute(
+            "SELECT response_json FROM llm_cache WHERE cache_key = ? AND expires_at > ?",
+            (cache_key, now)
+        )
+        row = cursor.fetchone()
+
+        if row:
+            cursor.execute(
+                "UPDATE llm_cache SET hits = hits + 1, last_used_at = ? WHERE cache_key = ?",
+                (now, cache_key)
+            )
+            conn.commit()
+
+        self.release_connection(conn)
+        return row["response_json"] if row else None
+
+    def save_llm_cache(self, cache_key: str, model: str, response_json: str,
+                       now: float, ttl: float, max_entries: int) -> int:
+        """
+        Store an LLM response, then drop expired entries and the least
+        recently used ones beyond max_entries. Returns entries evicted.
+        """
+        conn = self.get_connection()
+        cursor = conn.cursor()
+
+        cursor.execute(
+            """INSERT INTO llm_cache (cache_key, model, response_json, expires_at, last_used_at)
+               VALUES (?, ?, ?, ?, ?)
+               ON CONFLICT(cache_key) DO UPDATE SET
+                   response_json = excluded.response_json,
+                   expires_at = excluded.expires_at,
+                   last_used_at = excluded.last_used_at""",
+            (cache_key, model, response_json, now + ttl, now)
+        )
+
+        cursor.execute("DELETE FROM llm_cache WHERE expires_at <= ?", (now,))
+        evicted = cursor.rowcount
+
+        cursor.execute("SELECT COUNT(*) FROM llm_cache")
+        excess = cursor.fetchone()[0] - max_entries
+        if excess > 0:
+            cursor.execute(
+                """DELETE FROM llm_cache WHERE cache_key IN (
+                       SELECT cache_key FROM llm_cache ORDER BY last_used_at LIMIT ?
+                   )""",
+                (excess,)
+            )
+            evicted += cursor.rowcount
+
+        conn.commit()
+        self.release_connection(conn)
+
+        return evicted
+
+    def delete_llm_cache(self, cache_key: str) -> bool:
+        """Drop one cached LLM response."""
+        conn = self.get_connection()
+        cursor = conn.cursor()
+
+        cursor.execute("DELETE FROM llm_cache WHERE cache_key = ?", (cache_key,))
+
+        conn.commit()
+        rows_affected = cursor.rowcount
+        self.release_connection(conn)
+
+        return rows_affected > 0
+
+    def get_news_cache(self, cache_key: str) -> Optional[Dict[str, Any]]:
+        """Get cached news articles and when they were fetched (any age)."""
+        conn = self.get_connection()
+        cursor = conn.cursor()
+
+        cursor.execute(
+            "SELECT articles_json, fetched_at FROM news_cache WHERE cache_key = ?",
+            (cache_key,)
+        )
+        row = cursor.fetchone()
+        self.release_connection(conn)
+
+        if not row:
+            return None
+        return {"articles": json.loads(row["articles_json"]), "fetched_at": row["fetched_at"]}
+
+    def save_news_cache(self, cache_key: str, query: str, language: str, days_back: int,
+                        articles: List[Dict[str, Any]], fetched_at: float, max_age: float) -> int:
+        """Store news articles and drop entries older than max_age. Returns entries dropped."""
+        conn = self.get_connection()
+        cursor = conn.cursor()
+
+        cursor.execute(
+            """INSERT INTO news_cache (cache_key, query, language, days_back, articles_json, fetched_at)
+               VALUES (?, ?, ?, ?, ?, ?)
+               ON CONFLICT(cache_key) DO UPDATE SET
+                   articles_json = excluded.articles_json,
+                   fetched_at = excluded.fetched_at""",
+            (cache_key, query, language, days_back, json.dumps(articles, ensure_ascii=False), fetched_at)
+        )
+        cursor.execute("DELETE FROM news_cache WHERE fetched_at < ?", (fetched_at - max_age,))
+        dropped = cursor.rowcount
+
+        conn.commit()
+        self.release_connection(conn)
+
+        return dropped
+
+    def take_proactive_greeting(self, user_id: int, now: float) -> Optional[str]:
+        """
+        Return the user's valid, unconsumed greeting and mark it consumed.
+
+        A primary-key read; the update only happens when there is a greeting.
+        """
+        conn = self.get_connection()
+        cursor = conn.cursor()
+
+        cursor.execute(
+            """SELECT greeting FROM proactive_greetings
+               WHERE user_id = ? AND consumed = 0 AND expires_at > ?""",
+            (user_id, now)
+        )
+        row = cursor.fetchone()
+        if row:
+            cursor.execute("UPDATE proactive_greetings SET consumed = 1 WHERE user_id = ?", (user_id,))
+            conn.commit()
+        self.release_connection(conn)
+
+        return row["greeting"] if row else None
+
+    def save_proactive_greetings(self, greetings: List[tuple], now: float) -> int:
+        """
+        Store (user_id, greeting, topic, expires_at) rows in one transaction,
+        replacing each user's previous greeting, and drop expired ones.
+
+        Returns the number of expired greetings dropped.
+        """
+        conn = self.get_connection()
+        cursor = conn.cursor()
+
+        cursor.executemany(
+            """INSERT INTO proactive_greetings (user_id, greeting, topic, generated_at, expires_at, consumed)
+               VALUES (?, ?, ?, ?, ?, 0)
+               ON CONFLICT(user_id) DO UPDATE SET
+                   greeting = excluded.greeting,
+                   topic = excluded.topic,
+                   generated_at = excluded.generated_at,
+                   expires_at = excluded.expires_at,
+                   consumed = 0""",
+            [(user_id, greeting, topic, now, expires_at) for user_id, greeting, topic, expires_at in greetings]
+        )
+        cursor.execute("DELETE FROM proactive_greetings WHERE expires_at <= ?", (now,))
+        dropped = cursor.rowcount
+
+        conn.commit()
+        self.release_connection(conn)
+
+        return dropped
+
     def delete_session(self, session_id: int, user_id: int) -> bool:
         """Delete a session and all its messages."""
         conn = self.get_connection()
@@ -229,17 +976,18 @@ class Database:
         )
 
         if not cursor.fetchone():
-            conn.close()
+            self.release_connection(conn)
             return False
 
-        # Delete messages first
+        # Delete messages and summary first
         cursor.execute("DELETE FROM messages WHERE session_id = ?", (session_id,))
+        cursor.execute("DELETE FROM session_summaries WHERE session_id = ?", (session_id,))
 
         # Delete session
         cursor.execute("DELETE FROM sessions WHERE id = ?", (session_id,))
 
         conn.commit()
-        conn.close()
+        self.release_connection(conn)
 
         return True
 
@@ -249,12 +997,14 @@ class Database:
         cursor = conn.cursor()
 
         cursor.execute(
-            "SELECT profile_json, emotional_state_json, last_updated FROM user_profiles WHERE user_id = ?",
+            """SELECT profile_json, emotional_state_json, last_updated, profile_version,
+                      last_analyzed_message_id
+               FROM user_profiles WHERE user_id = ?""",
             (user_id,)
         )
 
         row = cursor.fetchone()
-        conn.close()
+        self.release_connection(conn)
 
         if not row:
             return None
@@ -263,6 +1013,8 @@ class Database:
         if row["emotional_state_json"]:
             profile["emotional_state"] = json.loads(row["emotional_state_json"])
         profile["last_updated"] = row["last_updated"]
+        profile["profile_version"] = row["profile_version"]
+        profile["last_analyzed_message_id"] = row["last_analyzed_message_id"]
 
         return profile
 
@@ -277,44 +1029,306 @@ class Database:
                 (user_id, json.dumps(profile_data))
             )
             conn.commit()
-            conn.close()
+            self.release_connection(conn)
             return True
         except sqlite3.IntegrityError:
-            conn.close()
+            self.release_connection(conn)
             return False
 
     def update_user_profile(self, user_id: int, profile_data: Dict[str, Any]) -> bool:
-        """Update user profile."""
+        """Update user profile and bump its version."""
         conn = self.get_connection()
         cursor = conn.cursor()
 
+        # Version and watermark live in their own columns, not in the JSON
+        watermark = profile_data.get("last_analyzed_message_id", 0)
+        profile_data = {k: v for k, v in profile_data.items() if k not in PROFILE_COLUMN_KEYS}
+
         cursor.execute(
             """UPDATE user_profiles
-               SET profile_json = ?, last_updated = CURRENT_TIMESTAMP
+               SET profile_json = ?, last_updated = CURRENT_TIMESTAMP,
+                   profile_version = profile_version + 1,
+                   last_analyzed_message_id = MAX(last_analyzed_message_id, ?)
                WHERE user_id = ?""",
-            (json.dumps(profile_data), user_id)
+            (json.dumps(profile_data), watermark, user_id)
         )
 
         conn.commit()
         rows_affected = cursor.rowcount
-        conn.close()
+        self.release_connection(conn)
 
         return rows_affected > 0
 
     def update_emotional_state(self, user_id: int, emotional_state: Dict[str, Any]) -> bool:
-        """Update user's emotional state analysis."""
+        """Update user's emotional state analysis and bump the profile version."""
         conn = self.get_connection()
         cursor = conn.cursor()
 
         cursor.execute(
             """UPDATE user_profiles
-               SET emotional_state_json = ?, last_emotional_check = CURRENT_TIMESTAMP
+               SET emotional_state_json = ?, last_emotional_check = CURRENT_TIMESTAMP,
+                   profile_version = profile_version + 1
                WHERE user_id = ?""",
             (json.dumps(emotional_state), user_id)
         )
 
         conn.commit()
         rows_affected = cursor.rowcount
-        conn.close()
+        self.release_connection(conn)
 
         return rows_affected > 0
+
+    def mark_emotional_check(self, user_id: int) -> bool:
+        """Record a check that produced no emotional state (not enough to analyze)."""
+        conn = self.get_connection()
+        cursor = conn.cursor()
+
+        cursor.execute(
+            "UPDATE user_profiles SET last_emotional_check = CURRENT_TIMESTAMP WHERE user_id = ?",
+            (user_id,)
+        )
+
+        conn.commit()
+        rows_affected = cursor.rowcount
+        self.release_connection(conn)
+
+        return rows_affected > 0
+
+    def get_users_due_for_emotional_check(self, min_interval: float, min_new_messages: int = 3,
+                                          limit: int = 500) -> List[Dict[str, Any]]:
+        """
+        Users whose emotional state should be refreshed by the batch job.
+
+        A user is due when never checked, or when the last check is older than
+        `min_interval` seconds and they wrote at least `min_new_messages`
+        messages since then. Never-checked users come first, then the oldest
+        checks.
+        """
+        conn = self.get_connection()
+        cursor = conn.cursor()
+
+        cursor.execute(
+            """SELECT p.user_id, p.last_emotional_check, COUNT(m.id) AS new_messages
+               FROM user_profiles p
+               JOIN sessions s ON s.user_id = p.user_id
+               JOIN messages m ON m.session_id = s.id
+               WHERE m.role = 'user'
+                 AND (p.last_emotional_check IS NULL
+                      OR (p.last_emotional_check < datetime('now', ?)
+                          AND m.created_at > p.last_emotional_check))
+               GROUP BY p.user_id
+               HAVING COUNT(m.id) >= ?
+               ORDER BY p.last_emotional_check IS NOT NULL, p.last_emotional_check
+               LIMIT ?""",
+            (f"-{int(min_interval)} seconds", min_new_messages, limit)
+        )
+
+        users = [dict(row) for row in cursor.fetchall()]
+        self.release_connection(conn)
+
+        return users
+
+    def get_profiles_with_activity(self, now: float) -> List[Dict[str, Any]]:
+        """
+        Every stored profile with the seconds since the user's last activity.
+
+        Used by the news prefetcher to rank interests and pick the users who
+        get a proactive greeting. idle_seconds is None for users without
+        sessions; has_greeting tells whether an unconsumed greeting is still
+        valid at `now` (epoch seconds).
+        """
+        conn = self.get_connection()
+        cursor = conn.cursor()
+
+        cursor.execute(
+            """SELECT p.user_id, p.profile_json,
+                      CAST(strftime('%s', 'now') - strftime('%s', MAX(s.updated_at)) AS INTEGER)
+                          AS idle_seconds,
+                      g.consumed = 0 AND g.expires_at > ? AS has_greeting
+               FROM user_profiles p
+               LEFT JOIN sessions s ON s.user_id = p.user_id
+               LEFT JOIN proactive_greetings g ON g.user_id = p.user_id
+               GROUP BY p.user_id""",
+            (now,)
+        )
+
+        profiles = [
+            {"user_id": row["user_id"], "profile": json.loads(row["profile_json"]),
+             "idle_seconds": row["idle_seconds"], "has_greeting": bool(row["has_greeting"])}
+            for row in cursor.fetchall()
+        ]
+        self.release_connection(conn)
+
+        return profiles
+
+    def save_profiles_batch(self, profiles: List[tuple], emotional_states: List[tuple]) -> int:
+        """
+        Write several cached profiles in a single transaction.
+
+        Args:
+            profiles: (user_id, profile) pairs whose profile_json changed
+            emotional_states: (user_id, profile) pairs whose emotional_state changed
+
+        Versions and extraction watermarks only move forward: each row gets
+        max(stored + 1, cached) and max(stored, cached) respectively.
+
+        Returns:
+            Number of rows updated
+        """
+        conn = self.get_connection()
+        cursor = conn.cursor()
+
+        written = 0
+        if profiles:
+            cursor.executemany(
+                """UPDATE user_profiles
+                   SET profile_json = ?, last_updated = CURRENT_TIMESTAMP,
+                       profile_version = MAX(profile_version + 1, ?),
+                       last_analyzed_message_id = MAX(last_analyzed_message_id, ?)
+                   WHERE user_id = ?""",
+                [
+                    (json.dumps({k: v for k, v in profile.items() if k not in PROFILE_COLUMN_KEYS}),
+                     profile.get("profile_version", 0),
+                     profile.get("last_analyzed_message_id", 0), user_id)
+                    for user_id, profile in profiles
+                ]
+            )
+            written += cursor.rowcount
+
+        if emotional_states:
+            cursor.executemany(
+                """UPDATE user_profiles
+                   SET emotional_state_json = ?, last_emotional_check = CURRENT_TIMESTAMP,
+                       profile_version = MAX(profile_version + 1, ?)
+                   WHERE user_id = ?""",
+                [
+                    (json.dumps(profile.get("emotional_state")),
+                     profile.get("profile_version", 0), user_id)
+                    for user_id, profile in emotional_states
+                ]
+            )
+            written += cursor.rowcount
+
+        conn.commit()
+        self.release_connection(conn)
+
+        return written
+
+    def add_job(self, job_type: str, payload: Dict[str, Any]) -> Optional[int]:
+        """
+        Persist a pending background job.
+
+        Returns None if an identical job is already pending, so repeated
+        triggers for the same work coalesce into one job.
+        """
+        conn = self.get_connection()
+        cursor = conn.cursor()
+
+        payload_json = json.dumps(payload, sort_keys=True)
+
+        cursor.execute(
+            """SELECT id FROM jobs
+               WHERE job_type = ? AND payload_json = ? AND status = 'pending'""",
+            (job_type, payload_json)
+        )
+        if cursor.fetchone():
+            self.release_connection(conn)
+            return None
+
+        cursor.execute(
+            "INSERT INTO jobs (job_type, payload_json) VALUES (?, ?)",
+            (job_type, payload_json)
+        )
+        conn.commit()
+        job_id = cursor.lastrowid
+        self.release_connection(conn)
+
+        return job_id
+
+    def get_unfinished_jobs(self) -> List[Dict[str, Any]]:
+        """Get pending and interrupted jobs, oldest first, resetting them to pending."""
+        conn = self.get_connection()
+        cursor = conn.cursor()
+
+        cursor.execute("UPDATE jobs SET status = 'pending' WHERE status = 'running'")
+        conn.commit()
+
+        cursor.execute(
+            """SELECT id, job_type, payload_json, attempts
+               FROM jobs
+               WHERE status = 'pending'
+               ORDER BY id ASC"""
+        )
+
+        jobs = []
+        for row in cursor.fetchall():
+            job = dict(row)
+            job["payload"] = json.loads(job.pop("payload_json"))
+            jobs.append(job)
+        self.release_connection(conn)
+
+        return jobs
+
+    def update_job_status(self, job_id: int, status: str, error: Optional[str] = None) -> bool:
+        """Mark a job as running, pending (retry) or failed."""
+        conn = self.get_connection()
+        cursor = conn.cursor()
+
+        cursor.execute(
+            """UPDATE jobs
+               SET status = ?, error = ?, updated_at = CURRENT_TIMESTAMP,
+                   attempts = attempts + (CASE WHEN ? = 'running' THEN 1 ELSE 0 END)
+               WHERE id = ?""",
+            (status, error, status, job_id)
+        )
+
+        conn.commit()
+        rows_affected = cursor.rowcount
+        self.release_connection(conn)
+
+        return rows_affected > 0
+
+    def delete_job(self, job_id: int) -> bool:
+        """Remove a finished job."""
+        conn = self.get_connection()
+        cursor = conn.cursor()
+
+        cursor.execute("DELETE FROM jobs WHERE id = ?", (job_id,))
+
+        conn.commit()
+        rows_affected = cursor.rowcount
+        self.release_connection(conn)
+
+        return rows_affected > 0
+
+
+class AsyncDatabase:
+    """
+    Async facade over Database.
+
+    Every public Database method is exposed as a coroutine that runs the
+    blocking sqlite3 call on a bounded thread pool, so request handlers never
+    block the event loop while waiting on disk.
+    """
+
+    def __init__(self, db: Database, max_workers: Optional[int] = None):
+        self.db = db
+        max_workers = max_workers or int(os.getenv("DB_MAX_WORKERS", "8"))
+        self._executor = ThreadPoolExecutor(max_workers=max_workers,
+                                            thread_name_prefix="db")
+
+    def __getattr__(self, name: str):
+        method = getattr(self.db, name)
+        if not callable(method):
+            return method
+
+        async def run_in_pool(*args, **kwargs):
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self._executor, partial(method, *args, **kwargs))
+
+        return run_in_pool
+
+    def shutdown(self):
+        """Stop the worker threads once pending calls have finished."""
+        self._executor.shutdown(wait=True)
+        self.db.close()
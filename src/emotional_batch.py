@@ -0,0 +1,247 @@
+"""
+Batch emotional analysis.
+
+The emotional state is a slow-moving, non-urgent signal, so instead of an
+inline check every few messages it is refreshed in batches: users whose
+last_emotional_check is older than EMOTIONAL_CHECK_INTERVAL and who wrote
+enough messages since then are analyzed with bounded parallelism (at the
+scheduler's "emotion" priority) and the results are written back.
+
+Runs periodically inside the app (EMOTIONAL_BATCH_INTERVAL) or from the
+command line / cron, optionally through the provider's batch API:
+
+    python -m src.emotional_batch run
+    python -m src.emotional_batch export requests.jsonl
+    python -m src.emotional_batch import results.jsonl
+
+Messages the risk screen flags are still checked right away (see main.prepare_turn).
+"""
+
+import argparse
+import asyncio
+import json
+import os
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from openai.types.chat import ChatCompletion
+
+try:
+    from .conversation_analysis import EmotionalState
+    from .llm_service import completion_json
+except ImportError:  # imported as a top-level module (src/ on sys.path, as main_new.py does)
+    from conversation_analysis import EmotionalState
+    from llm_service import completion_json
+
+SaveEmotionalState = Callable[[int, Dict[str, Any]], Awaitable[Any]]
+
+# Messages of recent conversation sent with each analysis
+ANALYSIS_WINDOW = 15
+
+_CUSTOM_ID_PREFIX = "user-"
+
+
+class EmotionalBatch:
+    """Finds users due for an emotional check and refreshes them in bulk."""
+
+    def __init__(self, adb, llm_service, save: Optional[SaveEmotionalState] = None,
+                 check_interval: Optional[float] = None, concurrency: Optional[int] = None,
+                 batch_size: Optional[int] = None, run_interval: Optional[float] = None,
+                 min_new_messages: int = 3):
+        """
+        Args:
+            adb: AsyncDatabase with the profiles and messages.
+            llm_service: LLMService used for the analyses.
+            save: Coroutine storing a result (default adb.update_emotional_state;
+                the app passes its ProfileStore so cached profiles stay current).
+            check_interval: Minimum seconds between checks of a user
+                (EMOTIONAL_CHECK_INTERVAL, default 3600).
+            concurrency: Analyses in flight (EMOTIONAL_BATCH_CONCURRENCY, default 4).
+            batch_size: Users per run (EMOTIONAL_BATCH_SIZE, default 500).
+            run_interval: Seconds between runs of the in-process loop
+                (EMOTIONAL_BATCH_INTERVAL, default 900; 0 = no loop).
+            min_new_messages: User messages since the last check needed to re-check.
+        """
+        self.adb = adb
+        self.llm_service = llm_service
+        self.save = save or adb.update_emotional_state
+        self.check_interval = check_interval if check_interval is not None else float(
+            os.getenv("EMOTIONAL_CHECK_INTERVAL", "3600"))
+        self.concurrency = concurrency or int(os.getenv("EMOTIONAL_BATCH_CONCURRENCY", "4"))
+        self.batch_size = batch_size or int(os.getenv("EMOTIONAL_BATCH_SIZE", "500"))
+        self.run_interval = run_interval if run_interval is not None else float(
+            os.getenv("EMOTIONAL_BATCH_INTERVAL", "900"))
+        self.min_new_messages = min_new_messages
+        self._task = None
+        self.runs = 0
+        self.updated = 0
+        self.skipped = 0
+        self.failed = 0
+
+    async def start(self):
+        """Start the periodic run loop (no-op when run_interval is 0)."""
+        if self.run_interval > 0:
+            self._task = asyncio.create_task(self._run_loop())
+
+    async def stop(self):
+        """Stop the run loop; analyses in progress are abandoned and retried next run."""
+        if self._task:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    async def due_users(self) -> List[int]:
+        """Ids of the users due for a check, most overdue first."""
+        due = await self.adb.get_users_due_for_emotional_check(
+            self.check_interval, self.min_new_messages, self.batch_size
+        )
+        return [row["user_id"] for row in due]
+
+    async def run(self) -> Dict[str, int]:
+        """Analyze every due user (bounded parallelism) and store the results."""
+        user_ids = await self.due_users()
+        semaphore = asyncio.Semaphore(self.concurrency)
+
+        async def check(user_id: int) -> bool:
+            async with semaphore:
+                return await self._check_user(user_id)
+
+        results = await asyncio.gather(*(check(user_id) for user_id in user_ids))
+        updated = results.count(True)
+        skipped = results.count(None)
+        failed = len(results) - updated - skipped
+        self.runs += 1
+        self.updated += updated
+        self.skipped += skipped
+        self.failed += failed
+        return {"due": len(user_ids), "updated": updated, "skipped": skipped, "failed": failed}
+
+    async def export(self, path: str) -> int:
+        """
+        Write the analysis requests of all due users as an OpenAI batch input file.
+
+        Returns the number of requests written. Feed the provider's output
+        file back with import_results.
+        """
+        count = 0
+        with open(path, "w", encoding="utf-8") as f:
+            for user_id in await self.due_users():
+                conversation = await self._recent_conversation(user_id)
+                if len(conversation) < 3:
+                    continue
+                f.write(json.dumps({
+                    "custom_id": f"{_CUSTOM_ID_PREFIX}{user_id}",
+                    "method": "POST",
+                    "url": "/v1/chat/completions",
+                    "body": {"model": self.llm_service.model,
+                             **self.llm_service.emotional_analysis_request(conversation)}
+                }, ensure_ascii=False) + "\n")
+                count += 1
+        return count
+
+    async def import_results(self, path: str) -> Dict[str, int]:
+        """Store the results of an OpenAI batch output file written for export."""
+        updated = failed = 0
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                try:
+                    result = json.loads(line)
+                    user_id = int(result["custom_id"][len(_CUSTOM_ID_PREFIX):])
+                    response = result["response"]
+                    if response.get("status_code") != 200:
+                        raise ValueError(f"status {response.get('status_code')}")
+                    completion = ChatCompletion.model_validate(response["body"])
+                    emotional_state = EmotionalState.from_dict(completion_json(completion))
+                except (KeyError, TypeError, ValueError) as e:
+                    print(f"Skipping batch result: {str(e)}")
+                    failed += 1
+                    continue
+
+                await self.save(user_id, emotional_state.to_dict())
+                updated += 1
+
+        self.updated += updated
+        self.failed += failed
+        return {"updated": updated, "failed": failed}
+
+    def stats(self) -> Dict[str, Any]:
+        """Run and result counters."""
+        return {
+            "runs": self.runs,
+            "updated": self.updated,
+            "skipped": self.skipped,
+            "failed": self.failed,
+            "check_interval": self.check_interval,
+            "run_interval": self.run_interval
+        }
+
+    async def _recent_conversation(self, user_id: int) -> List[Dict[str, str]]:
+        history = await self.adb.get_user_messages_after(user_id, 0, ANALYSIS_WINDOW)
+        return [{"role": m["role"], "content": m["content"]} for m in history]
+
+    async def _check_user(self, user_id: int) -> Optional[bool]:
+        """True if updated, None if there was too little to analyze, False on failure."""
+        conversation = await self._recent_conversation(user_id)
+        result = await self.llm_service.aanalyze_emotional_state(conversation, user_id)
+        if isinstance(result, dict) and result.get("insufficient_data"):
+            # Fewer than 3 messages (no LLM call) or the model found nothing to go
+            # on. Stamp the check so the user waits for new messages instead of
+            # being picked up again on every run
+            await self.adb.mark_emotional_check(user_id)
+            return None
+        try:
+            emotional_state = EmotionalState.from_dict(result)
+        except ValueError:
+            # Failed analysis: the user stays due for the next run
+            return False
+
+        await self.save(user_id, emotional_state.to_dict())
+        return True
+
+    async def _run_loop(self):
+        while True:
+            await asyncio.sleep(self.run_interval)
+            try:
+                stats = await self.run()
+                if stats["due"]:
+                    print(f"🧠 Emotional batch: {stats['updated']}/{stats['due']} users updated")
+            except Exception as e:
+                print(f"Error in emotional batch: {str(e)}")
+
+
+async def _main(argv: Optional[List[str]] = None):
+    from dotenv import load_dotenv
+
+    from .database import AsyncDatabase, Database
+    from .llm_cache import LLMResponseCache
+    from .llm_service import LLMService
+
+    parser = argparse.ArgumentParser(description="Batch emotional analysis of users due for a check.")
+    commands = parser.add_subparsers(dest="command", required=True)
+    commands.add_parser("run", help="analyze due users now and store the results")
+    export = commands.add_parser("export", help="write an OpenAI batch input file for due users")
+    export.add_argument("path")
+    results = commands.add_parser("import", help="store the results of an OpenAI batch output file")
+    results.add_argument("path")
+    args = parser.parse_args(argv)
+
+    load_dotenv()
+    adb = AsyncDatabase(Database(os.getenv("DATABASE_PATH", "chat_agent.db")))
+    llm_service = LLMService(response_cache=LLMResponseCache(adb))
+    batch = EmotionalBatch(adb, llm_service)
+
+    try:
+        if args.command == "run":
+            print(await batch.run())
+        elif args.command == "export":
+            print(f"{await batch.export(args.path)} requests written to {args.path}")
+        else:
+            print(await batch.import_results(args.path))
+    finally:
+        await llm_service.aclose()
+        adb.shutdown()
+
+
+if __name__ == "__main__":
+    asyncio.run(_main())
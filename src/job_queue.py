@@ -0,0 +1,135 @@
+"""
+Background job queue for work that should not delay the user's reply.
+
+Jobs are persisted in the SQLite `jobs` table before being queued, so pending
+profile updates survive a restart, and are executed by a small pool of
+asyncio workers inside the FastAPI process. A failed job (for example a
+write that still found the database locked after busy_timeout) is retried
+after an exponential backoff with jitter, up to JOB_MAX_ATTEMPTS.
+"""
+
+import asyncio
+import os
+import random
+import weakref
+from typing import Any, Awaitable, Callable, Dict, Optional, Set
+
+JobHandler = Callable[[Dict[str, Any]], Awaitable[None]]
+
+
+class JobQueue:
+    """In-process worker pool fed from the persistent jobs table."""
+
+    def __init__(self, adb, workers: Optional[int] = None, max_attempts: Optional[int] = None,
+                 retry_base_delay: Optional[float] = None, retry_max_delay: Optional[float] = None):
+        """
+        Args:
+            adb: AsyncDatabase used to persist job state.
+            workers: Number of concurrent workers (JOB_WORKERS, default 2).
+            max_attempts: Attempts before a job is marked failed (JOB_MAX_ATTEMPTS, default 3).
+            retry_base_delay: Backoff before the first retry, doubled for each
+                later one (JOB_RETRY_BASE_DELAY, default 1 second).
+            retry_max_delay: Cap on the backoff (JOB_RETRY_MAX_DELAY, default 60 seconds).
+        """
+        self.adb = adb
+        self.workers = workers or int(os.getenv("JOB_WORKERS", "2"))
+        self.max_attempts = max_attempts or int(os.getenv("JOB_MAX_ATTEMPTS", "3"))
+        self.retry_base_delay = retry_base_delay if retry_base_delay is not None else float(
+            os.getenv("JOB_RETRY_BASE_DELAY", "1"))
+        self.retry_max_delay = retry_max_delay if retry_max_delay is not None else float(
+            os.getenv("JOB_RETRY_MAX_DELAY", "60"))
+        self.handlers: Dict[str, JobHandler] = {}
+        self._queue: Optional[asyncio.Queue] = None
+        self._tasks = []
+        # Failed jobs waiting for their backoff before being queued again
+        self._retries: Set[asyncio.Task] = set()
+        # Jobs touching the same user run one at a time to avoid lost updates.
+        # Weak values: a user's lock is dropped once no job holds or awaits it.
+        self._user_locks: "weakref.WeakValueDictionary[Any, asyncio.Lock]" = weakref.WeakValueDictionary()
+
+    def register(self, job_type: str, handler: JobHandler):
+        """Register the coroutine that executes jobs of a given type."""
+        self.handlers[job_type] = handler
+
+    async def start(self):
+        """Requeue unfinished jobs from the database and start the workers."""
+        self._queue = asyncio.Queue()
+        for job in await self.adb.get_unfinished_jobs():
+            self._queue.put_nowait(job)
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+
+    async def stop(self):
+        """Cancel the workers and pending retries. Unfinished jobs stay pending in the database."""
+        tasks = self._tasks + list(self._retries)
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self._tasks = []
+        self._retries.clear()
+
+    async def enqueue(self, job_type: str, payload: Dict[str, Any]) -> Optional[int]:
+        """Persist and queue a job. Returns None if an identical job is already pending."""
+        job_id = await self.adb.add_job(job_type, payload)
+        if job_id is not None and self._queue is not None:
+            self._queue.put_nowait({"id": job_id, "job_type": job_type, "payload": payload, "attempts": 0})
+        return job_id
+
+    async def join(self):
+        """Wait until every queued job has been processed, retries included."""
+        if self._queue is None:
+            return
+        while True:
+            await self._queue.join()
+            if not self._retries:
+                return
+            await asyncio.gather(*list(self._retries), return_exceptions=True)
+
+    def retry_delay(self, attempts: int) -> float:
+        """Full jitter: uniform in [0, base * 2^(attempts - 1)], capped at retry_max_delay."""
+        ceiling = min(self.retry_max_delay, self.retry_base_delay * 2 ** (attempts - 1))
+        return random.uniform(0, ceiling)
+
+    def user_lock(self, user_id: Any) -> asyncio.Lock:
+        """Lock serializing the jobs of one user."""
+        lock = self._user_locks.get(user_id)
+        if lock is None:
+            lock = self._user_locks[user_id] = asyncio.Lock()
+        return lock
+
+    async def _worker(self):
+        while True:
+            job = await self._queue.get()
+            try:
+                await self._run(job)
+            finally:
+                self._queue.task_done()
+
+    async def _run(self, job: Dict[str, Any]):
+        handler = self.handlers.get(job["job_type"])
+        if handler is None:
+            await self.adb.update_job_status(job["id"], "failed", f"No handler for {job['job_type']}")
+            return
+
+        await self.adb.update_job_status(job["id"], "running")
+        attempts = job.get("attempts", 0) + 1
+
+        try:
+            async with self.user_lock(job["payload"].get("user_id")):
+                await handler(job["payload"])
+        except Exception as e:
+            print(f"Error running job {job['id']} ({job['job_type']}): {str(e)}")
+            if attempts < self.max_attempts:
+                await self.adb.update_job_status(job["id"], "pending", str(e))
+                retry = asyncio.create_task(self._requeue({**job, "attempts": attempts},
+                                                          self.retry_delay(attempts)))
+                self._retries.add(retry)
+                retry.add_done_callback(self._retries.discard)
+            else:
+                await self.adb.update_job_status(job["id"], "failed", str(e))
+            return
+
+        await self.adb.delete_job(job["id"])
+
+    async def _requeue(self, job: Dict[str, Any], delay: float):
+        await asyncio.sleep(delay)
+        self._queue.put_nowait(job)
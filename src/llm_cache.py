@@ -0,0 +1,109 @@
+"""
+Content-addressed cache of deterministic LLM responses.
+
+Analysis calls (profile extraction, emotional analysis, summaries) run at
+low temperature on a fixed prompt, and the same conversation window is
+often sent again (job retries, reloads, overlapping windows). Responses are
+stored in the llm_cache table under the sha256 of the full request (model,
+messages, tools and sampling parameters). Entries expire after a TTL and the
+least recently used ones are evicted beyond a maximum count.
+"""
+
+import hashlib
+import json
+import os
+import time
+from typing import Any, Dict, Optional
+
+from openai.types.chat import ChatCompletion
+
+
+class LLMResponseCache:
+    """SQLite-backed cache of chat completions keyed by request hash."""
+
+    def __init__(self, adb, ttl: Optional[float] = None, max_entries: Optional[int] = None):
+        """
+        Args:
+            adb: AsyncDatabase (its .db is used by the sync methods)
+            ttl: Seconds a response stays valid (LLM_CACHE_TTL, default 86400; 0 disables)
+            max_entries: Responses kept (LLM_CACHE_MAX_ENTRIES, default 10000)
+        """
+        self.adb = adb
+        self.db = adb.db
+        self.ttl = ttl if ttl is not None else float(os.getenv("LLM_CACHE_TTL", "86400"))
+        self.max_entries = max_entries or int(os.getenv("LLM_CACHE_MAX_ENTRIES", "10000"))
+        self.hits = 0
+        self.misses = 0
+        self.writes = 0
+        self.evictions = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.ttl > 0
+
+    def key(self, params: Dict[str, Any]) -> str:
+        """sha256 of the request parameters (model, messages, tools, sampling)."""
+        content = json.dumps(params, sort_keys=True, ensure_ascii=False, default=str)
+        return hashlib.sha256(content.encode()).hexdigest()
+
+    def get(self, key: str) -> Optional[ChatCompletion]:
+        try:
+            cached = self.db.get_llm_cache(key, time.time())
+        except Exception as e:
+            print(f"Error reading LLM cache: {str(e)}")
+            cached = None
+        return self._decode(cached)
+
+    async def aget(self, key: str) -> Optional[ChatCompletion]:
+        try:
+            cached = await self.adb.get_llm_cache(key, time.time())
+        except Exception as e:
+            print(f"Error reading LLM cache: {str(e)}")
+            cached = None
+        return self._decode(cached)
+
+    def put(self, key: str, response: ChatCompletion):
+        try:
+            self.evictions += self.db.save_llm_cache(
+                key, response.model, response.model_dump_json(), time.time(), self.ttl, self.max_entries
+            )
+            self.writes += 1
+        except Exception as e:
+            print(f"Error writing LLM cache: {str(e)}")
+
+    async def aput(self, key: str, response: ChatCompletion):
+        try:
+            self.evictions += await self.adb.save_llm_cache(
+                key, response.model, response.model_dump_json(), time.time(), self.ttl, self.max_entries
+            )
+            self.writes += 1
+        except Exception as e:
+            print(f"Error writing LLM cache: {str(e)}")
+
+    def discard(self, key: str):
+        """Drop an entry whose response turned out unusable."""
+        self.db.delete_llm_cache(key)
+
+    async def adiscard(self, key: str):
+        await self.adb.delete_llm_cache(key)
+
+    def stats(self) -> Dict[str, Any]:
+        """Hit/miss and write counters."""
+        lookups = self.hits + self.misses
+        return {
+            "enabled": self.enabled,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "writes": self.writes,
+            "evictions": self.evictions,
+            "max_entries": self.max_entries,
+            "ttl": self.ttl
+        }
+
+    def _decode(self, cached: Optional[str]) -> Optional[ChatCompletion]:
+        if cached is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return ChatCompletion.model_validate_json(cached)
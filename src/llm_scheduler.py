@@ -0,0 +1,208 @@
+"""
+Outbound LLM call scheduler.
+
+Every async completion waits here for a slot before it is sent:
+- at most LLM_MAX_CONCURRENCY calls in flight
+- token buckets for requests/min (LLM_RPM) and tokens/min (LLM_TPM), so
+  bursts stay under the provider's rate limits instead of turning into 429s
+- strict priority classes: user-facing replies first, then profile
+  extraction (and summaries), emotional analysis, proactive questions
+- within a class, users are served round-robin, so one chatty user cannot
+  starve the others
+
+Token reservations use an estimate (prompt + max_tokens) and are corrected
+with the actual usage once the response arrives.
+"""
+
+import asyncio
+import os
+import time
+from collections import OrderedDict, deque
+from contextlib import asynccontextmanager
+from typing import Any, Deque, Dict, List, Optional
+
+# Highest priority first
+PRIORITIES = ("reply", "profile", "emotion", "proactive")
+
+_WAIT_SAMPLES = 1000
+
+
+class TokenBucket:
+    """
+    Refills `per_minute` units per minute (0 = unlimited).
+
+    Bursts are capped at one second's worth: providers enforce per-minute
+    limits over shorter windows, so a full minute's burst would still 429.
+    """
+
+    def __init__(self, per_minute: float):
+        self.rate = per_minute / 60.0
+        self.capacity = max(self.rate, 1.0) if per_minute > 0 else 0.0
+        self.level = self.capacity
+        self.updated = time.monotonic()
+
+    def _refill(self, now: float):
+        self.level = min(self.capacity, self.level + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, amount: float, now: float) -> float:
+        """Seconds until `amount` can be taken (requests larger than the bucket wait for a full one)."""
+        if self.capacity <= 0:
+            return 0.0
+        self._refill(now)
+        needed = min(amount, self.capacity)
+        return 0.0 if self.level >= needed else (needed - self.level) / self.rate
+
+    def take(self, amount: float):
+        if self.capacity > 0:
+            self.level -= amount
+
+    def adjust(self, delta: float):
+        """Charge (positive) or refund (negative) the difference with an earlier take."""
+        if self.capacity > 0:
+            self.level = min(self.capacity, self.level - delta)
+
+
+class SlotGrant:
+    """Handed to the caller while it holds a slot; set tokens_used to the actual usage."""
+
+    def __init__(self, tokens: int):
+        self.tokens = tokens
+        self.tokens_used: Optional[int] = None
+
+
+class _Waiter:
+    __slots__ = ("future", "tokens", "enqueued_at")
+
+    def __init__(self, future: asyncio.Future, tokens: int):
+        self.future = future
+        self.tokens = tokens
+        self.enqueued_at = time.monotonic()
+
+
+class LLMScheduler:
+    """Concurrency, rate limit, priority and per-user fairness for LLM calls."""
+
+    def __init__(self, max_concurrency: Optional[int] = None, rpm: Optional[float] = None,
+                 tpm: Optional[float] = None):
+        """
+        Args:
+            max_concurrency: Calls in flight (LLM_MAX_CONCURRENCY, default 16)
+            rpm: Requests per minute (LLM_RPM, default 0 = unlimited)
+            tpm: Tokens per minute (LLM_TPM, default 0 = unlimited)
+        """
+        self.max_concurrency = max_concurrency or int(os.getenv("LLM_MAX_CONCURRENCY", "16"))
+        self.rpm = TokenBucket(rpm if rpm is not None else float(os.getenv("LLM_RPM", "0")))
+        self.tpm = TokenBucket(tpm if tpm is not None else float(os.getenv("LLM_TPM", "0")))
+        # One queue per priority class: user_id -> pending waiters, in round-robin order
+        self._queues: List["OrderedDict[Any, Deque[_Waiter]]"] = [OrderedDict() for _ in PRIORITIES]
+        self._in_flight = 0
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self._dispatched = {priority: 0 for priority in PRIORITIES}
+        self._waits = {priority: deque(maxlen=_WAIT_SAMPLES) for priority in PRIORITIES}
+
+    @asynccontextmanager
+    async def slot(self, priority: str, user_id: Any = None, tokens: int = 0):
+        """
+        Wait for a slot to send one call.
+
+        Args:
+            priority: One of PRIORITIES
+            user_id: Caller for per-user fairness (None shares one lane)
+            tokens: Estimated tokens of the call (prompt + max_tokens)
+        """
+        level = PRIORITIES.index(priority)
+        waiter = _Waiter(asyncio.get_running_loop().create_future(), tokens)
+        self._queues[level].setdefault(user_id, deque()).append(waiter)
+        self._dispatch()
+
+        try:
+            await waiter.future
+        except asyncio.CancelledError:
+            if waiter.future.done() and not waiter.future.cancelled():
+                self._release(tokens, None)  # granted just before the cancel
+            else:
+                self._remove(level, user_id, waiter)
+            raise
+
+        self._dispatched[priority] += 1
+        self._waits[priority].append(time.monotonic() - waiter.enqueued_at)
+
+        grant = SlotGrant(tokens)
+        try:
+            yield grant
+        finally:
+            self._release(tokens, grant.tokens_used)
+
+    def stats(self) -> Dict[str, Any]:
+        """Queue lengths, calls in flight and queueing delay per priority."""
+        classes = {}
+        for level, priority in enumerate(PRIORITIES):
+            waits = sorted(self._waits[priority])
+            classes[priority] = {
+                "queued": sum(len(q) for q in self._queues[level].values()),
+                "dispatched": self._dispatched[priority],
+                "wait_p50_ms": waits[len(waits) // 2] * 1000 if waits else 0.0,
+                "wait_p99_ms": waits[int(len(waits) * 0.99)] * 1000 if waits else 0.0
+            }
+        return {
+            "in_flight": self._in_flight,
+            "max_concurrency": self.max_concurrency,
+            "priorities": classes
+        }
+
+    def _release(self, tokens: int, tokens_used: Optional[int]):
+        self._in_flight -= 1
+        if tokens_used is not None:
+            self.tpm.adjust(tokens_used - tokens)
+        self._dispatch()
+
+    def _remove(self, level: int, user_id: Any, waiter: _Waiter):
+        lane = self._queues[level].get(user_id)
+        if lane and waiter in lane:
+            lane.remove(waiter)
+            if not lane:
+                del self._queues[level][user_id]
+
+    def _next(self):
+        """Highest priority class with waiters, and the user whose turn it is."""
+        for queue in self._queues:
+            if queue:
+                user_id = next(iter(queue))
+                return queue, user_id
+        return None, None
+
+    def _dispatch(self):
+        while self._in_flight < self.max_concurrency:
+            queue, user_id = self._next()
+            if queue is None:
+                return
+
+            lane = queue[user_id]
+            waiter = lane[0]
+            now = time.monotonic()
+            wait = max(self.rpm.wait_time(1, now), self.tpm.wait_time(waiter.tokens, now))
+            if wait > 0:
+                self._wake_in(wait)
+                return
+
+            lane.popleft()
+            # Round-robin: this user goes to the back of its class
+            if lane:
+                queue.move_to_end(user_id)
+            else:
+                del queue[user_id]
+
+            self.rpm.take(1)
+            self.tpm.take(waiter.tokens)
+            self._in_flight += 1
+            waiter.future.set_result(None)
+
+    def _wake_in(self, delay: float):
+        if self._timer is not None:
+            return
+        self._timer = asyncio.get_running_loop().call_later(delay, self._on_timer)
+
+    def _on_timer(self):
+        self._timer = None
+        self._dispatch()
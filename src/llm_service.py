@@ -5,25 +5,87 @@ Handles chat completions, emotional analysis, and profile extraction.
 
 import os
 import json
-from typing import List, Dict, Any, Optional
-from openai import OpenAI
+from typing import List, Dict, Any, Optional, AsyncIterator, Callable
+
+try:
+    from .llm_cache import LLMResponseCache
+    from .llm_scheduler import LLMScheduler
+    from .llm_transport import CircuitOpenError, LLMTransport, is_unavailable
+except ImportError:  # imported as a top-level module (src/ on sys.path, as main_new.py does)
+    from llm_cache import LLMResponseCache
+    from llm_scheduler import LLMScheduler
+    from llm_transport import CircuitOpenError, LLMTransport, is_unavailable
+
+try:
+    import tiktoken
+except ImportError:  # optional: fall back to a character-based estimate
+    tiktoken = None
+
+
+# Analysis rules shared by the emotional-only and the combined analysis prompts
+EMOTIONAL_ANALYSIS_GUIDELINES = """IMPORTANTE:
+- Basa tu análisis en EVIDENCIA observable en el texto
+- Sé objetivo y profesional
+- No exageres ni minimices señales
+- Si la información es insuficiente, indica baja confianza
+"""
+
+EMOTIONAL_EVALUATION_CRITERIA = """EVALÚA:
+1. Probabilidad de depresión (0.0-1.0)
+   - Busca: desesperanza, anhedonia, fatiga, ideación suicida
+
+2. Nivel de ansiedad (none/low/moderate/high/severe)
+   - Busca: preocupación excesiva, nerviosismo, pánico
+
+3. Nivel de soledad (none/low/moderate/high/severe)
+   - Busca: aislamiento, falta de conexión, vacío emocional
+
+4. Necesidad de apoyo (none/low/moderate/high/urgent)
+   - Considera gravedad y urgencia de la situación
+
+5. Modo recomendado:
+   - normal: conversación estándar
+   - friendly: amigable y cálido
+   - empathetic: empático y comprensivo
+   - supportive: apoyo emocional activo
+   - crisis: situación de riesgo, intervención necesaria
+"""
+
+
+def completion_text(response) -> str:
+    """Text of a completion, stripped."""
+    return response.choices[0].message.content.strip()
+
+
+def completion_json(response) -> Any:
+    """Parse the text of a completion as JSON (raises ValueError if invalid)."""
+    return json.loads(response.choices[0].message.content)
 
 
 class LLMService:
-    def __init__(self, api_key: str = None, model: str = "gpt-3.5-turbo"):
+    def __init__(self, api_key: str = None, model: str = "gpt-3.5-turbo",
+                 response_cache: Optional[LLMResponseCache] = None,
+                 scheduler: Optional[LLMScheduler] = None):
         """
         Initialize the LLM service.
 
         Args:
             api_key: OpenAI API key. If None, will try to get from environment.
             model: The OpenAI model to use.
+            response_cache: Cache for deterministic (analysis) calls, if any.
+            scheduler: Limiter/priority queue for async calls (default from env).
         """
         self.api_key = api_key or os.getenv("OPENAI_API_KEY")
         if not self.api_key:
             raise ValueError("OpenAI API key not provided and not found in environment")
 
-        self.client = OpenAI(api_key=self.api_key)
+        self.transport = LLMTransport(self.api_key)
+        self.client = self.transport.client
+        self.async_client = self.transport.async_client
+        self.response_cache = response_cache
+        self.scheduler = scheduler or LLMScheduler()
         self.model = model
+        self._encoding = self._load_encoding(model)
         self.system_prompt = """Eres un asistente conversacional inteligente y amigable.
 Tienes acceso al historial completo de la conversación con cada usuario, lo que te permite:
 - Recordar información mencionada anteriormente
@@ -55,8 +117,7 @@ Sé natural, útil y demuestra que recuerdas la conversación."""
             })
 
         try:
-            response = self.client.chat.completions.create(
-                model=self.model,
+            response = self.create_completion(
                 messages=chat_messages,
                 max_tokens=max_tokens,
                 temperature=0.7
@@ -112,37 +173,229 @@ Sé natural, útil y demuestra que recuerdas la conversación."""
         Returns:
             Dict with response content and metadata
         """
-        chat_messages = [{"role": "system", "content": system_prompt}]
-
-        for msg in messages:
-            chat_messages.append({
-                "role": msg["role"],
-                "content": msg["content"]
-            })
+        chat_messages = self._build_chat_messages(messages, system_prompt)
 
         try:
-            response = self.client.chat.completions.create(
-                model=self.model,
+            response = self.create_completion(
                 messages=chat_messages,
                 max_tokens=max_tokens,
                 temperature=0.7
             )
+            return self._format_completion(response)
 
-            return {
-                "content": response.choices[0].message.content,
-                "usage": {
-                    "prompt_tokens": response.usage.prompt_tokens,
-                    "completion_tokens": response.usage.completion_tokens,
-                    "total_tokens": response.usage.total_tokens
-                },
-                "model": response.model
-            }
+        except Exception as e:
+            return self._error_response(e)
+
+    async def achat_with_custom_system(self, messages: List[Dict[str, str]],
+                                      system_prompt: str, max_tokens: int = 500,
+                                      user_id: Optional[int] = None) -> Dict[str, Any]:
+        """
+        Async variant of chat_with_custom_system backed by AsyncOpenAI.
+
+        Does not block the event loop while the completion is generated.
+        Scheduled with "reply" priority.
+        """
+        chat_messages = self._build_chat_messages(messages, system_prompt)
+
+        try:
+            response = await self.acreate_completion(
+                priority="reply",
+                user_id=user_id,
+                messages=chat_messages,
+                max_tokens=max_tokens,
+                temperature=0.7
+            )
+            return self._format_completion(response)
 
         except Exception as e:
-            return {
-                "content": f"Error: {str(e)}",
-                "error": True
-            }
+            return self._error_response(e)
+
+    async def astream_chat_with_custom_system(self, messages: List[Dict[str, str]],
+                                             system_prompt: str,
+                                             max_tokens: int = 500,
+                                             user_id: Optional[int] = None) -> AsyncIterator[str]:
+        """
+        Stream a chat completion with custom system prompt.
+
+        Args:
+            messages: List of message dicts
+            system_prompt: Custom system prompt to use
+            max_tokens: Maximum tokens in response
+            user_id: Caller, for per-user fair scheduling
+
+        Yields:
+            Text fragments as the model produces them. API errors are raised
+            so the caller can report them on the open stream.
+        """
+        chat_messages = self._build_chat_messages(messages, system_prompt)
+        params = {"messages": chat_messages, "max_tokens": max_tokens, "temperature": 0.7}
+
+        # The slot is held until the stream ends, not just until it opens
+        async with self.scheduler.slot("reply", user_id, self._estimate_request_tokens(params)):
+            stream = await self.transport.acreate_completion(model=self.model, stream=True, **params)
+
+            async for chunk in stream:
+                if chunk.choices and chunk.choices[0].delta.content:
+                    yield chunk.choices[0].delta.content
+
+    def create_completion(self, **kwargs) -> Any:
+        """Chat completion with this service's model through the retrying transport."""
+        return self.transport.create_completion(model=self.model, **kwargs)
+
+    async def acreate_completion(self, priority: str = "reply", user_id: Optional[int] = None,
+                                 **kwargs) -> Any:
+        """
+        Async variant of create_completion, sent when the scheduler grants a slot.
+
+        Args:
+            priority: Scheduler class (see llm_scheduler.PRIORITIES)
+            user_id: Caller, for per-user fair queuing
+        """
+        async with self.scheduler.slot(priority, user_id, self._estimate_request_tokens(kwargs)) as grant:
+            response = await self.transport.acreate_completion(model=self.model, **kwargs)
+            if getattr(response, "usage", None):
+                grant.tokens_used = response.usage.total_tokens
+            return response
+
+    def cached_completion(self, parse: Callable[[Any], Any], **kwargs) -> Any:
+        """
+        create_completion for deterministic calls, answered from the response
+        cache when the identical request was made before.
+
+        Returns parse(response). Only responses that parse are cached, so a
+        malformed answer is not replayed when the call is retried.
+        """
+        cache = self.response_cache
+        if cache is None or not cache.enabled:
+            return parse(self.create_completion(**kwargs))
+
+        key = cache.key({"model": self.model, **kwargs})
+        cached = cache.get(key)
+        if cached is not None:
+            try:
+                return parse(cached)
+            except Exception:
+                cache.discard(key)
+
+        response = self.create_completion(**kwargs)
+        result = parse(response)
+        cache.put(key, response)
+        return result
+
+    async def acached_completion(self, parse: Callable[[Any], Any], priority: str = "profile",
+                                 user_id: Optional[int] = None, **kwargs) -> Any:
+        """Async variant of cached_completion; cache hits skip the scheduler."""
+        cache = self.response_cache
+        if cache is None or not cache.enabled:
+            return parse(await self.acreate_completion(priority, user_id, **kwargs))
+
+        key = cache.key({"model": self.model, **kwargs})
+        cached = await cache.aget(key)
+        if cached is not None:
+            try:
+                return parse(cached)
+            except Exception:
+                await cache.adiscard(key)
+
+        response = await self.acreate_completion(priority, user_id, **kwargs)
+        result = parse(response)
+        await cache.aput(key, response)
+        return result
+
+    async def aclose(self):
+        """Close the HTTP connection pools."""
+        await self.transport.aclose()
+
+    def _estimate_request_tokens(self, params: Dict[str, Any]) -> int:
+        """Prompt (messages + tool schemas) plus max_tokens, for rate limiting."""
+        tokens = sum(self.estimate_tokens(m.get("content") or "") + 4 for m in params.get("messages", []))
+        if params.get("tools"):
+            tokens += self.estimate_tokens(json.dumps(params["tools"]))
+        return tokens + params.get("max_tokens", 0)
+
+    def _error_response(self, error: Exception) -> Dict[str, Any]:
+        """Error dict for a failed completion; provider outages map to HTTP 503."""
+        response = {
+            "content": f"Error: {str(error)}",
+            "error": True,
+            "status_code": 503 if is_unavailable(error) else 500
+        }
+        if isinstance(error, CircuitOpenError):
+            response["retry_after"] = error.retry_after
+        return response
+
+    def _load_encoding(self, model: str):
+        """Get the tiktoken encoding for the model, or None if unavailable."""
+        if tiktoken is None:
+            return None
+        try:
+            return tiktoken.encoding_for_model(model)
+        except Exception:
+            try:
+                return tiktoken.get_encoding("cl100k_base")
+            except Exception:
+                return None
+
+    def estimate_tokens(self, text: str) -> int:
+        """
+        Count tokens in a text.
+
+        Exact with tiktoken installed, otherwise a rough estimate
+        (~4 characters per token for Spanish/English).
+        """
+        if self._encoding is not None:
+            return len(self._encoding.encode(text))
+        return len(text) // 4 + 1
+
+    def window_history(self, messages: List[Dict[str, str]],
+                       max_tokens: int) -> List[Dict[str, str]]:
+        """
+        Keep the most recent messages that fit in a token budget.
+
+        Args:
+            messages: Conversation messages, oldest first
+            max_tokens: Budget for the history part of the prompt
+
+        Returns:
+            Suffix of messages whose estimated size fits the budget. The last
+            message (the current user turn) is always kept.
+        """
+        window = []
+        used = 0
+        for msg in reversed(messages):
+            cost = self.estimate_tokens(msg["content"]) + 4  # per-message overhead
+            if window and used + cost > max_tokens:
+                break
+            window.append(msg)
+            used += cost
+
+        window.reverse()
+        return window
+
+    def _build_chat_messages(self, messages: List[Dict[str, str]],
+                             system_prompt: str) -> List[Dict[str, str]]:
+        """Prepend the system prompt to the conversation messages."""
+        chat_messages = [{"role": "system", "content": system_prompt}]
+
+        for msg in messages:
+            chat_messages.append({
+                "role": msg["role"],
+                "content": msg["content"]
+            })
+
+        return chat_messages
+
+    def _format_completion(self, response) -> Dict[str, Any]:
+        """Convert an OpenAI completion into the service's response dict."""
+        return {
+            "content": response.choices[0].message.content,
+            "usage": {
+                "prompt_tokens": response.usage.prompt_tokens,
+                "completion_tokens": response.usage.completion_tokens,
+                "total_tokens": response.usage.total_tokens
+            },
+            "model": response.model
+        }
 
     def analyze_emotional_state(self, conversation: List[Dict[str, str]]) -> Optional[Dict[str, Any]]:
         """
@@ -157,45 +410,69 @@ Sé natural, útil y demuestra que recuerdas la conversación."""
         if len(conversation) < 3:
             return {"insufficient_data": True}
 
+        analysis_prompt = self._build_emotional_analysis_prompt(conversation)
+
+        try:
+            return self.cached_completion(
+                completion_json,
+                messages=[{"role": "user", "content": analysis_prompt}],
+                max_tokens=400,
+                temperature=0.3  # Lower temperature for more consistent analysis
+            )
+
+        except Exception as e:
+            print(f"Error in emotional analysis: {str(e)}")
+            return None
+
+    async def aanalyze_emotional_state(self, conversation: List[Dict[str, str]],
+                                       user_id: Optional[int] = None,
+                                       priority: str = "emotion") -> Optional[Dict[str, Any]]:
+        """
+        Async variant of analyze_emotional_state.
+
+        Scheduled with "emotion" priority unless told otherwise (the inline
+        crisis check runs with "reply" priority, the reply waits for it).
+        """
+        if len(conversation) < 3:
+            return {"insufficient_data": True}
+
+        try:
+            return await self.acached_completion(
+                completion_json,
+                priority=priority,
+                user_id=user_id,
+                **self.emotional_analysis_request(conversation)
+            )
+
+        except Exception as e:
+            print(f"Error in emotional analysis: {str(e)}")
+            return None
+
+    def emotional_analysis_request(self, conversation: List[Dict[str, str]]) -> Dict[str, Any]:
+        """Completion parameters (without model) of an emotional analysis call."""
+        return {
+            "messages": [{"role": "user", "content": self._build_emotional_analysis_prompt(conversation)}],
+            "max_tokens": 400,
+            "temperature": 0.3
+        }
+
+    def _build_emotional_analysis_prompt(self, conversation: List[Dict[str, str]]) -> str:
+        """Build the psychologist prompt for a conversation window."""
         # Format conversation for analysis
         conv_text = "\n".join([
             f"{'Usuario' if msg['role'] == 'user' else 'Asistente'}: {msg['content']}"
             for msg in conversation
         ])
 
-        analysis_prompt = f"""Actúa como un PSICÓLOGO CLÍNICO EXPERTO analizando esta conversación.
-
-IMPORTANTE:
-- Basa tu análisis en EVIDENCIA observable en el texto
-- Sé objetivo y profesional
-- No exageres ni minimices señales
-- Si la información es insuficiente, indica baja confianza
+        return f"""Actúa como un PSICÓLOGO CLÍNICO EXPERTO analizando esta conversación.
 
+{EMOTIONAL_ANALYSIS_GUIDELINES}
 CONVERSACIÓN A ANALIZAR:
 ━━━━━━━━━━━━━━━━━━━━━━━━━━━
 {conv_text}
 ━━━━━━━━━━━━━━━━━━━━━━━━━━━
 
-EVALÚA:
-1. Probabilidad de depresión (0.0-1.0)
-   - Busca: desesperanza, anhedonia, fatiga, ideación suicida
-
-2. Nivel de ansiedad (none/low/moderate/high/severe)
-   - Busca: preocupación excesiva, nerviosismo, pánico
-
-3. Nivel de soledad (none/low/moderate/high/severe)
-   - Busca: aislamiento, falta de conexión, vacío emocional
-
-4. Necesidad de apoyo (none/low/moderate/high/urgent)
-   - Considera gravedad y urgencia de la situación
-
-5. Modo recomendado:
-   - normal: conversación estándar
-   - friendly: amigable y cálido
-   - empathetic: empático y comprensivo
-   - supportive: apoyo emocional activo
-   - crisis: situación de riesgo, intervención necesaria
-
+{EMOTIONAL_EVALUATION_CRITERIA}
 Responde SOLO con este JSON (sin texto adicional):
 {{
   "depression_probability": 0.0,
@@ -210,19 +487,58 @@ Responde SOLO con este JSON (sin texto adicional):
   "notes": ""
 }}"""
 
+    async def asummarize_conversation(self, previous_summary: Optional[str],
+                                      conversation: List[Dict[str, str]],
+                                      user_id: Optional[int] = None) -> Optional[str]:
+        """
+        Fold older conversation turns into a rolling summary.
+
+        Scheduled with the same priority as profile extraction: both only
+        shape future prompts.
+
+        Args:
+            previous_summary: Summary of everything before `conversation`, if any
+            conversation: Turns that are leaving the prompt window
+            user_id: Owner of the conversation, for fair scheduling
+
+        Returns:
+            Updated summary text or None if error
+        """
+        conv_text = "\n".join([
+            f"{'Usuario' if msg['role'] == 'user' else 'Asistente'}: {msg['content']}"
+            for msg in conversation
+        ])
+
+        prompt = f"""Mantienes un RESUMEN de una conversación larga entre un usuario y su asistente.
+
+RESUMEN ANTERIOR:
+{previous_summary or "(sin resumen todavía)"}
+
+NUEVOS MENSAJES A INCORPORAR:
+━━━━━━━━━━━━━━━━━━━━━━━━━━━
+{conv_text}
+━━━━━━━━━━━━━━━━━━━━━━━━━━━
+
+INSTRUCCIONES:
+- Integra los nuevos mensajes en el resumen anterior
+- Conserva temas tratados, decisiones, preguntas pendientes y detalles que el usuario espera que recuerdes
+- No repitas datos de perfil obvios (edad, nombre) salvo que sean relevantes para el hilo
+- Máximo 200 palabras, en español, en tercera persona
+
+Responde SOLO con el resumen actualizado:"""
+
         try:
-            response = self.client.chat.completions.create(
-                model=self.model,
-                messages=[{"role": "user", "content": analysis_prompt}],
-                max_tokens=400,
-                temperature=0.3  # Lower temperature for more consistent analysis
+            return await self.acached_completion(
+                completion_text,
+                priority="profile",
+                user_id=user_id,
+                messages=[{"role": "user", "content": prompt}],
+                max_tokens=350,
+                temperature=0.3
             )
 
-            analysis = json.loads(response.choices[0].message.content)
-            return analysis
-
         except Exception as e:
-            print(f"Error in emotional analysis: {str(e)}")
+            print(f"Error summarizing conversation: {str(e)}")
             return None
 
     def generate_proactive_question(self, user_interests: List[str],
@@ -242,15 +558,57 @@ Responde SOLO con este JSON (sin texto adicional):
         if not news_articles or not user_interests:
             return None
 
+        try:
+            prompt = self._build_proactive_question_prompt(user_interests, news_articles, user_profile)
+            response = self.create_completion(
+                messages=[{"role": "user", "content": prompt}],
+                max_tokens=100,
+                temperature=0.8
+            )
+
+            return response.choices[0].message.content.strip()
+
+        except Exception as e:
+            print(f"Error generating proactive question: {str(e)}")
+            return None
+
+    async def agenerate_proactive_question(self, user_interests: List[str],
+                                           news_articles: List[Dict[str, Any]],
+                                           user_profile: Dict[str, Any],
+                                           user_id: Optional[int] = None) -> Optional[str]:
+        """Async variant of generate_proactive_question ("proactive" scheduler priority)."""
+        if not news_articles or not user_interests:
+            return None
+
+        try:
+            prompt = self._build_proactive_question_prompt(user_interests, news_articles, user_profile)
+            response = await self.acreate_completion(
+                priority="proactive",
+                user_id=user_id,
+                messages=[{"role": "user", "content": prompt}],
+                max_tokens=100,
+                temperature=0.8
+            )
+
+            return completion_text(response)
+
+        except Exception as e:
+            print(f"Error generating proactive question: {str(e)}")
+            return None
+
+    def _build_proactive_question_prompt(self, user_interests: List[str],
+                                         news_articles: List[Dict[str, Any]],
+                                         user_profile: Dict[str, Any]) -> str:
+        """Prompt asking for a news-based conversation starter."""
         age_info = user_profile.get("age_range", "adulto")
         tone = user_profile.get("tone_preference", "amigable")
 
         news_text = "\n".join([
-            f"- {article['title']}\n  {article['description'][:150]}..."
+            f"- {article['title']}\n  {(article.get('description') or '')[:150]}..."
             for article in news_articles[:2]
         ])
 
-        prompt = f"""Basándote en estas noticias recientes sobre {user_interests[0]}:
+        return f"""Basándote en estas noticias recientes sobre {user_interests[0]}:
 
 {news_text}
 
@@ -271,17 +629,3 @@ INSTRUCCIONES:
 Ejemplo: "¡Ey! ¿Viste que sacaron la nueva Nintendo Switch 2? ¿Te gustaría tenerla? 😊"
 
 Genera SOLO la pregunta (sin explicaciones):"""
-
-        try:
-            response = self.client.chat.completions.create(
-                model=self.model,
-                messages=[{"role": "user", "content": prompt}],
-                max_tokens=100,
-                temperature=0.8
-            )
-
-            return response.choices[0].message.content.strip()
-
-        except Exception as e:
-            print(f"Error generating proactive question: {str(e)}")
-            return None
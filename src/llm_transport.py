@@ -0,0 +1,283 @@
+"""
+Transport layer for the OpenAI clients.
+
+Both clients (sync and async) share one configuration:
+- an httpx connection pool with bounded connections and keep-alive
+- per-call connect/read timeouts
+- retries with exponential backoff and full jitter on 429, 5xx, timeouts
+  and connection errors (the SDK's own retries are disabled)
+- a circuit breaker that fails fast while the provider keeps failing
+  (rate limits are retried but don't count as failures)
+
+Settings come from LLM_* environment variables (see .env.example).
+"""
+
+import asyncio
+import os
+import random
+import threading
+import time
+from dataclasses import dataclass
+from typing import Any, Dict, Optional
+
+import httpx
+from openai import (
+    APIConnectionError, APIStatusError, AsyncOpenAI, DefaultAsyncHttpxClient,
+    DefaultHttpxClient, OpenAI, RateLimitError
+)
+
+
+class CircuitOpenError(Exception):
+    """Raised without calling the provider while the circuit breaker is open."""
+
+    def __init__(self, retry_after: float):
+        super().__init__(f"LLM provider unavailable, retry in {retry_after:.0f}s")
+        self.retry_after = retry_after
+
+
+def is_retryable(error: Exception) -> bool:
+    """Rate limits, server errors, timeouts and connection errors are retried."""
+    if isinstance(error, APIConnectionError):  # includes APITimeoutError
+        return True
+    if isinstance(error, APIStatusError):
+        return error.status_code == 429 or error.status_code >= 500
+    return False
+
+
+def is_unavailable(error: Exception) -> bool:
+    """True if the error means the provider is down or overloaded (HTTP 503)."""
+    return isinstance(error, CircuitOpenError) or is_retryable(error)
+
+
+@dataclass
+class TransportConfig:
+    """Pool, timeout, retry and circuit breaker settings."""
+
+    max_connections: int = 100
+    max_keepalive_connections: int = 20
+    keepalive_expiry: float = 30.0
+    connect_timeout: float = 5.0
+    timeout: float = 60.0
+    max_retries: int = 3
+    retry_base_delay: float = 0.5
+    retry_max_delay: float = 8.0
+    breaker_threshold: int = 5
+    breaker_cooldown: float = 30.0
+
+    @classmethod
+    def from_env(cls) -> "TransportConfig":
+        return cls(
+            max_connections=int(os.getenv("LLM_MAX_CONNECTIONS", "100")),
+            max_keepalive_connections=int(os.getenv("LLM_MAX_KEEPALIVE", "20")),
+            keepalive_expiry=float(os.getenv("LLM_KEEPALIVE_EXPIRY", "30")),
+            connect_timeout=float(os.getenv("LLM_CONNECT_TIMEOUT", "5")),
+            timeout=float(os.getenv("LLM_TIMEOUT", "60")),
+            max_retries=int(os.getenv("LLM_MAX_RETRIES", "3")),
+            retry_base_delay=float(os.getenv("LLM_RETRY_BASE_DELAY", "0.5")),
+            retry_max_delay=float(os.getenv("LLM_RETRY_MAX_DELAY", "8")),
+            breaker_threshold=int(os.getenv("LLM_BREAKER_THRESHOLD", "5")),
+            breaker_cooldown=float(os.getenv("LLM_BREAKER_COOLDOWN", "30"))
+        )
+
+
+class CircuitBreaker:
+    """
+    Consecutive-failure circuit breaker.
+
+    closed: calls go through. After `threshold` consecutive retryable
+    failures it opens and calls fail fast for `cooldown` seconds. Then it is
+    half-open: one probe call goes through; success closes it, failure opens
+    it again, and a probe that never finished (cancelled) lets the next call
+    probe instead.
+    """
+
+    def __init__(self, threshold: int, cooldown: float):
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self.state = "closed"
+        self.failures = 0
+        self.opened_at = 0.0
+        self._probing = False
+        self._lock = threading.Lock()
+
+    def before_call(self) -> bool:
+        """Raise CircuitOpenError if the call must fail fast. True if the call is the half-open probe."""
+        if self.threshold <= 0:
+            return False
+        with self._lock:
+            if self.state == "closed":
+                return False
+            remaining = self.opened_at + self.cooldown - time.monotonic()
+            if remaining > 0:
+                raise CircuitOpenError(remaining)
+            # Cooldown over: let a single probe through
+            if self._probing:
+                raise CircuitOpenError(self.cooldown)
+            self.state = "half_open"
+            self._probing = True
+            return True
+
+    def record_success(self):
+        with self._lock:
+            self.state = "closed"
+            self.failures = 0
+            self._probing = False
+
+    def release_probe(self):
+        """The call was abandoned (cancelled): neither a success nor a failure."""
+        with self._lock:
+            self._probing = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            self._probing = False
+            if self.state == "half_open" or (self.threshold > 0 and self.failures >= self.threshold):
+                self.state = "open"
+                self.opened_at = time.monotonic()
+
+
+class LLMTransport:
+    """OpenAI clients on a shared, tuned httpx pool with retries and a circuit breaker."""
+
+    def __init__(self, api_key: str, base_url: Optional[str] = None,
+                 config: Optional[TransportConfig] = None):
+        """
+        Args:
+            api_key: OpenAI API key
+            base_url: API base URL (default OPENAI_BASE_URL or the public API)
+            config: Transport settings (default TransportConfig.from_env())
+        """
+        self.config = config or TransportConfig.from_env()
+        limits = httpx.Limits(
+            max_connections=self.config.max_connections,
+            max_keepalive_connections=self.config.max_keepalive_connections,
+            keepalive_expiry=self.config.keepalive_expiry
+        )
+        timeout = httpx.Timeout(self.config.timeout, connect=self.config.connect_timeout)
+
+        # Retries are done here (with the breaker), not by the SDK
+        self.client = OpenAI(
+            api_key=api_key, base_url=base_url, timeout=timeout, max_retries=0,
+            http_client=DefaultHttpxClient(limits=limits, timeout=timeout)
+        )
+        self.async_client = AsyncOpenAI(
+            api_key=api_key, base_url=base_url, timeout=timeout, max_retries=0,
+            http_client=DefaultAsyncHttpxClient(limits=limits, timeout=timeout)
+        )
+        self.breaker = CircuitBreaker(self.config.breaker_threshold, self.config.breaker_cooldown)
+        self.calls = 0
+        self.retries = 0
+        self.failures = 0
+        self.fast_failures = 0
+
+    def create_completion(self, **kwargs) -> Any:
+        """chat.completions.create on the sync client, with retries."""
+        attempt = 0
+        while True:
+            probe = self._before_call()
+            try:
+                response = self.client.chat.completions.create(**kwargs)
+            except Exception as e:
+                delay = self._after_failure(e, attempt, probe)
+                if delay is None:
+                    raise
+                attempt += 1
+                time.sleep(delay)
+                continue
+            except BaseException:
+                if probe:
+                    self.breaker.release_probe()
+                raise
+            self.breaker.record_success()
+            return response
+
+    async def acreate_completion(self, **kwargs) -> Any:
+        """
+        chat.completions.create on the async client, with retries.
+
+        With stream=True only opening the stream is retried; errors while
+        iterating it reach the caller.
+        """
+        attempt = 0
+        while True:
+            probe = self._before_call()
+            try:
+                response = await self.async_client.chat.completions.create(**kwargs)
+            except Exception as e:
+                delay = self._after_failure(e, attempt, probe)
+                if delay is None:
+                    raise
+                attempt += 1
+                await asyncio.sleep(delay)
+                continue
+            except BaseException:
+                # Cancelled (client gone, wait_for timeout): let another call probe
+                if probe:
+                    self.breaker.release_probe()
+                raise
+            self.breaker.record_success()
+            return response
+
+    def close(self):
+        """Close the sync connection pool."""
+        self.client.close()
+
+    async def aclose(self):
+        """Close both connection pools."""
+        self.client.close()
+        await self.async_client.close()
+
+    def stats(self) -> Dict[str, Any]:
+        """Call, retry and circuit breaker counters."""
+        return {
+            "calls": self.calls,
+            "retries": self.retries,
+            "failures": self.failures,
+            "fast_failures": self.fast_failures,
+            "breaker_state": self.breaker.state
+        }
+
+    def _before_call(self) -> bool:
+        try:
+            probe = self.breaker.before_call()
+        except CircuitOpenError:
+            self.fast_failures += 1
+            raise
+        self.calls += 1
+        return probe
+
+    def _after_failure(self, error: Exception, attempt: int, probe: bool = False) -> Optional[float]:
+        """Record a failed attempt. Returns the delay before retrying, or None to give up."""
+        if not is_retryable(error):
+            # Bad request, auth... the provider is up, so the breaker is not involved
+            self.breaker.record_success()
+            self.failures += 1
+            return None
+
+        if isinstance(error, RateLimitError):
+            # Throttled, not down: retried after Retry-After but never trips the breaker
+            if probe:
+                self.breaker.release_probe()
+        else:
+            self.breaker.record_failure()
+        if attempt >= self.config.max_retries or self.breaker.state == "open":
+            self.failures += 1
+            return None
+
+        self.retries += 1
+        return self._backoff(error, attempt)
+
+    def _backoff(self, error: Exception, attempt: int) -> float:
+        # Full jitter: uniform in [0, base * 2^attempt], capped
+        ceiling = min(self.config.retry_max_delay, self.config.retry_base_delay * 2 ** attempt)
+        delay = random.uniform(0, ceiling)
+
+        # Honour Retry-After on rate limits (within the same cap)
+        if isinstance(error, RateLimitError):
+            retry_after = error.response.headers.get("retry-after")
+            try:
+                delay = max(delay, min(float(retry_after), self.config.retry_max_delay))
+            except (TypeError, ValueError):
+                pass
+        return delay
@@ -2,31 +2,175 @@
 FastAPI application for Adaptive LLM Chat Agent.
 """
 
+import asyncio
+import os
+import json
+from contextlib import asynccontextmanager
 from pathlib import Path
-from fastapi import FastAPI, HTTPException, Form
-from fastapi.responses import HTMLResponse
+from typing import Any, Dict, List, Optional
+from fastapi import FastAPI, HTTPException, Form, Query
+from fastapi.responses import HTMLResponse, StreamingResponse
 from fastapi.staticfiles import StaticFiles
 from dotenv import load_dotenv
 
-from .database import Database
+from .conversation_analysis import EmotionalState
+from .database import Database, AsyncDatabase
+from .emotional_batch import ANALYSIS_WINDOW, EmotionalBatch
+from .llm_cache import LLMResponseCache
 from .llm_service import LLMService
 from .profile_service import ProfileService
 from .news_service import NewsService
+from .news_prefetcher import NewsPrefetcher
+from .job_queue import JobQueue
+from .context_builder import ContextBuilder
+from .profile_store import ProfileStore
+from .risk_screen import RiskAssessment, RiskScreen
 
 load_dotenv()
 
+# Services
+db = Database(os.getenv("DATABASE_PATH", "chat_agent.db"))
+adb = AsyncDatabase(db)
+profile_store = ProfileStore(adb)
+llm_service = LLMService(response_cache=LLMResponseCache(adb))
+profile_service = ProfileService(llm_service)
+news_service = NewsService(adb=adb)
+job_queue = JobQueue(adb)
+context_builder = ContextBuilder(adb, llm_service)
+emotional_batch = EmotionalBatch(adb, llm_service, save=profile_store.update_emotional_state)
+risk_screen = RiskScreen()
+news_prefetcher = NewsPrefetcher(adb, news_service, llm_service)
+
+# "batch": emotional states are refreshed by emotional_batch (plus checks
+# triggered by the risk screen); "inline": also a check every 7 messages per session
+EMOTIONAL_CHECK_MODE = os.getenv("EMOTIONAL_CHECK_MODE", "batch")
+
+# Unseen messages sent per profile extraction call
+ANALYSIS_PAGE_SIZE = 30
+
+# Appended to a streamed reply cut short by an error or a client disconnect
+INTERRUPTED_REPLY_MARKER = " […]"
+
+
+async def run_conversation_analysis(payload: Dict[str, Any]):
+    """
+    Background job: update profile and/or emotional state in one LLM call.
+
+    Profile extraction is incremental: only messages after the user's
+    last_analyzed_message_id watermark are sent, together with the compact
+    current profile, and the extracted delta is merged into the profile.
+    The watermark only advances past messages that were sent; a backlog
+    larger than one page is worked through by follow-up jobs.
+    """
+    user_id, session_id = payload["user_id"], payload["session_id"]
+    emotion = payload.get("emotion", False)
+    profile = await profile_store.get(user_id) or profile_service._get_empty_profile()
+    watermark = profile.get("last_analyzed_message_id", 0)
+
+    # Oldest unseen turns plus the last analyzed message (id >= watermark),
+    # which is usually the assistant question the new user message answers
+    unseen = []
+    if payload.get("profile", True):
+        unseen = await adb.get_user_messages_after(user_id, max(watermark - 1, 0),
+                                                   ANALYSIS_PAGE_SIZE, oldest=True)
+    extract_profile = any(m["id"] > watermark for m in unseen)
+    if not extract_profile and not emotion:
+        return
+
+    history = unseen if extract_profile else []
+    if emotion:
+        # The emotional snapshot needs the recent conversation, not just new turns
+        sent = {m["id"] for m in history}
+        recent = await adb.get_recent_messages(session_id, 15)
+        history = sorted(history + [m for m in recent if m["id"] not in sent], key=lambda m: m["id"])
+
+    print(f"🔄 Analyzing conversation for user {user_id}...")
+    recent_conv = [{"role": m["role"], "content": m["content"]} for m in history]
+    result = await profile_service.aanalyze_conversation(
+        recent_conv, profile=extract_profile, emotion=emotion, known_profile=profile, user_id=user_id
+    )
+    if result is None:
+        raise RuntimeError("Conversation analysis failed")
+
+    if result.profile is not None:
+        updated_profile = profile_service._merge_profiles(profile, result.profile)
+        updated_profile["last_analyzed_message_id"] = max(watermark, unseen[-1]["id"])
+        await profile_store.update(user_id, updated_profile)
+        print("✅ Profile updated")
+        if len(unseen) == ANALYSIS_PAGE_SIZE:
+            await job_queue.enqueue("conversation_analysis", {
+                "user_id": user_id, "session_id": session_id, "profile": True, "emotion": False
+            })
+    if result.emotional_state is not None:
+        await profile_store.update_emotional_state(user_id, result.emotional_state.to_dict())
+        print(f"✅ Emotional state: {result.emotional_state.recommended_mode}")
+
+
+async def run_profile_extraction(payload: Dict[str, Any]):
+    """Background job: update the user's profile from the latest messages."""
+    user_id, session_id = payload["user_id"], payload["session_id"]
+    history = await adb.get_recent_messages(session_id, 10)
+    profile = await profile_store.get(user_id) or profile_service._get_empty_profile()
+
+    print(f"🔄 Updating profile for user {user_id}...")
+    recent_conv = [{"role": m["role"], "content": m["content"]} for m in history]
+    updated_profile = await profile_service.aextract_profile_from_conversation(recent_conv, profile, user_id)
+    await profile_store.update(user_id, updated_profile)
+    print("✅ Profile updated")
+
+
+async def run_emotional_analysis(payload: Dict[str, Any]):
+    """Background job: refresh the user's emotional state."""
+    user_id, session_id = payload["user_id"], payload["session_id"]
+    history = await adb.get_recent_messages(session_id, 15)
+
+    print(f"🧠 Analyzing emotional state for user {user_id}...")
+    recent_conv = [{"role": m["role"], "content": m["content"]} for m in history]
+    emotional_state = await llm_service.aanalyze_emotional_state(recent_conv, user_id)
+    if emotional_state and not emotional_state.get("insufficient_data"):
+        await profile_store.update_emotional_state(user_id, emotional_state)
+        print(f"✅ Emotional state: {emotional_state.get('recommended_mode', 'normal')}")
+
+
+async def run_session_summary(payload: Dict[str, Any]):
+    """Background job: fold turns that left the prompt window into the summary."""
+    # Jobs queued before the boundary was dropped from the payload still carry up_to_id
+    if await context_builder.update_summary(payload["session_id"], payload.get("up_to_id"),
+                                            payload.get("user_id")):
+        print(f"📝 Summary updated for session {payload['session_id']}")
+
+
+job_queue.register("conversation_analysis", run_conversation_analysis)
+# Separate jobs from before conversation_analysis may still be pending in the db
+job_queue.register("profile_extraction", run_profile_extraction)
+job_queue.register("emotional_analysis", run_emotional_analysis)
+job_queue.register("session_summary", run_session_summary)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    await profile_store.start()
+    await job_queue.start()
+    if EMOTIONAL_CHECK_MODE == "batch":
+        await emotional_batch.start()
+    await news_prefetcher.start()
+    yield
+    await news_prefetcher.stop()
+    await emotional_batch.stop()
+    await job_queue.stop()
+    await profile_store.stop()
+    await llm_service.aclose()
+    await news_service.aclose()
+    adb.shutdown()
+
+
 app = FastAPI(
     title="Agente Conversacional LLM Adaptativo",
     description="API con perfil inteligente y análisis emocional",
-    version="2.0.0"
+    version="2.0.0",
+    lifespan=lifespan
 )
 
-# Services
-db = Database()
-llm_service = LLMService()
-profile_service = ProfileService(llm_service)
-news_service = NewsService()
-
 # Resolve static directory relative to this file (works in Docker and local)
 BASE_DIR = Path(__file__).resolve().parent.parent
 STATIC_DIR = BASE_DIR / "static"
@@ -36,6 +180,24 @@ app.mount("/static", StaticFiles(directory=STATIC_DIR), name="static")
 # Track messages per session for profile updates
 message_counters = {}
 
+# Messages loaded per turn (the context builder trims them to the token budget)
+HISTORY_WINDOW = int(os.getenv("HISTORY_WINDOW", "50"))
+
+# Default page size of /api/messages and /api/sessions (cursor pagination)
+PAGE_SIZE = int(os.getenv("PAGE_SIZE", "50"))
+MAX_PAGE_SIZE = 200
+
+# Extract profile at most every N user messages (informative messages only;
+# extraction reads the last 10 messages, so keep N small)
+PROFILE_UPDATE_FREQUENCY = int(os.getenv("PROFILE_UPDATE_FREQUENCY", "1"))
+
+# Per session: user message count at the last extraction and informative
+# messages seen since then
+last_profile_extraction = {}
+pending_profile_info = {}
+extraction_stats = {"queued": 0, "skipped_uninformative": 0, "deferred_cadence": 0}
+emotional_stats = {"inline_checks": 0, "crisis_checks": 0, "crisis_fallbacks": 0, "risk_queued": 0}
+
 
 @app.get("/")
 async def root():
@@ -55,20 +217,20 @@ async def root():
 
 @app.post("/api/register")
 async def register(username: str = Form(...), password: str = Form(...)):
-    result = db.create_user(username, password)
+    result = await adb.create_user(username, password)
     if not result["success"]:
         raise HTTPException(status_code=400, detail=result["error"])
     
     # Create empty profile
     user_id = result["user_id"]
-    db.create_user_profile(user_id, profile_service._get_empty_profile())
+    await profile_store.create(user_id, profile_service._get_empty_profile())
     
     return result
 
 
 @app.post("/api/login")
 async def login(username: str = Form(...), password: str = Form(...)):
-    result = db.authenticate_user(username, password)
+    result = await adb.authenticate_user(username, password)
     if not result["success"]:
         raise HTTPException(status_code=401, detail=result["error"])
     return result
@@ -77,52 +239,85 @@ async def login(username: str = Form(...), password: str = Form(...)):
 @app.get("/api/profile/{user_id}")
 async def get_profile(user_id: int):
     """Get user profile."""
-    profile = db.get_user_profile(user_id)
+    profile = await profile_store.get(user_id)
     if not profile:
         profile = profile_service._get_empty_profile()
-        db.create_user_profile(user_id, profile)
+        await profile_store.create(user_id, profile)
     return {"profile": profile}
 
 
 @app.get("/api/system-prompt/{user_id}")
 async def get_system_prompt(user_id: int):
     """Get current system prompt for UI display."""
-    profile = db.get_user_profile(user_id) or profile_service._get_empty_profile()
+    profile = await profile_store.get(user_id) or profile_service._get_empty_profile()
     emotional_state = profile.get("emotional_state")
-    system_prompt = profile_service.generate_system_prompt(profile, emotional_state)
+    system_prompt = profile_service.get_system_prompt(user_id, profile, emotional_state)
     return {"system_prompt": system_prompt, "emotional_state": emotional_state}
 
 
+@app.get("/api/cache-stats")
+async def get_cache_stats():
+    """Hit/miss counters of the caches, analysis pre-filters and LLM transport."""
+    return {
+        "prompt_cache": profile_service.prompt_cache_stats(),
+        "profile_cache": profile_store.stats(),
+        "profile_extraction": extraction_stats,
+        "emotional_analysis": {**emotional_stats, "mode": EMOTIONAL_CHECK_MODE, "batch": emotional_batch.stats()},
+        "risk_screen": risk_screen.stats(),
+        "news_cache": news_service.stats(),
+        "news_prefetch": news_prefetcher.stats(),
+        "llm_transport": llm_service.transport.stats(),
+        "llm_response_cache": llm_service.response_cache.stats(),
+        "llm_scheduler": llm_service.scheduler.stats()
+    }
+
+
 @app.get("/api/sessions/{user_id}")
-async def get_sessions(user_id: int):
-    sessions = db.get_user_sessions(user_id)
-    return {"sessions": sessions}
+async def get_sessions(user_id: int, before_id: Optional[int] = None,
+                       limit: int = Query(PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE)):
+    """Sessions, most recent first; pass next_before_id as before_id for the next page."""
+    page = await adb.get_user_sessions_page(user_id, before_id, limit)
+    if page is None:
+        raise HTTPException(status_code=400, detail="before_id is not a session of this user")
+    sessions = page["sessions"]
+
+    # Returning after a day away: greet with the precomputed news question
+    # (generated offline by news_prefetcher, never on this request)
+    proactive_greeting = None
+    if before_id is None and sessions and news_prefetcher.is_idle(sessions[0]["updated_at"]):
+        proactive_greeting = await news_prefetcher.take_greeting(user_id)
+
+    return {**page, "proactive_greeting": proactive_greeting}
 
 
 @app.post("/api/sessions")
 async def create_session(user_id: int = Form(...), session_name: str = Form(...)):
-    session_id = db.create_session(user_id, session_name)
+    session_id = await adb.create_session(user_id, session_name)
     return {"success": True, "session_id": session_id}
 
 
 @app.get("/api/messages/{session_id}")
-async def get_messages(session_id: int):
-    messages = db.get_session_messages(session_id)
-    return {"messages": messages}
+async def get_messages(session_id: int, before_id: Optional[int] = None,
+                       limit: int = Query(PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE)):
+    """Latest messages, oldest first; pass next_before_id as before_id for older ones."""
+    return await adb.get_session_messages_page(session_id, before_id, limit)
 
 
-@app.post("/api/chat")
-async def chat(session_id: int = Form(...), message: str = Form(...)):
+async def prepare_turn(session_id: int, message: str) -> Dict[str, Any]:
     """
-    Adaptive chat with profile extraction and emotional analysis.
+    Store the user message and build everything needed to answer it.
+
+    Shared by /api/chat and /api/chat/stream. The reply is generated with the
+    last known profile; profile and emotional updates run afterwards as
+    background jobs (see schedule_analysis).
     """
     # Get user_id from session
-    user_id = db.get_user_id_from_session(session_id)
+    user_id = await adb.get_user_id_from_session(session_id)
     if not user_id:
         raise HTTPException(status_code=404, detail="Session not found")
     
     # Store user message
-    db.add_message(session_id, "user", message)
+    await adb.add_message(session_id, "user", message)
     
     # Initialize or increment message counter
     if session_id not in message_counters:
@@ -130,69 +325,205 @@ async def chat(session_id: int = Form(...), message: str = Form(...)):
     message_counters[session_id] += 1
     count = message_counters[session_id]
     
-    # Get conversation history
-    history = db.get_session_messages(session_id)
+    # Get the recent conversation window (never the whole session)
+    history = await adb.get_recent_messages(session_id, HISTORY_WINDOW)
     
     # Get or create profile
-    profile = db.get_user_profile(user_id)
+    profile = await profile_store.get(user_id)
     if not profile:
         profile = profile_service._get_empty_profile()
-        db.create_user_profile(user_id, profile)
-    
-    # Update profile AFTER EVERY user message (critical for demo - immediate adaptation)
-    profile_updated = False
-    if len(history) >= 2:  # Need at least 1 exchange to extract info
-        print(f"🔄 Updating profile for user {user_id}...")
-        recent_conv = [{"role": m["role"], "content": m["content"]} for m in history[-10:]]
-        updated_profile = profile_service.extract_profile_from_conversation(recent_conv, profile)
-        db.update_user_profile(user_id, updated_profile)
-        profile = updated_profile
-        profile_updated = True
-        print("✅ Profile updated")
-    
-    # Emotional check every 7 messages
-    if count % 7 == 0 and len(history) >= 10:
-        print(f"🧠 Analyzing emotional state for user {user_id}...")
-        recent_conv = [{"role": m["role"], "content": m["content"]} for m in history[-15:]]
-        emotional_state = llm_service.analyze_emotional_state(recent_conv)
-        if emotional_state and not emotional_state.get("insufficient_data"):
-            db.update_emotional_state(user_id, emotional_state)
-            profile["emotional_state"] = emotional_state
-            print(f"✅ Emotional state: {emotional_state.get('recommended_mode', 'normal')}")
+        await profile_store.create(user_id, profile)
     
+    # High-risk language can't wait for the next batch: analyze before replying
+    risk = risk_screen.screen(message)
+    if risk.level == "high":
+        await check_crisis(user_id, history, risk)
+        profile = await profile_store.get(user_id)
+
     # Generate adaptive system prompt
     emotional_state = profile.get("emotional_state")
-    system_prompt = profile_service.generate_system_prompt(profile, emotional_state)
+    system_prompt = profile_service.get_system_prompt(user_id, profile, emotional_state)
     
-    # Format history for LLM (exclude last message as we'll add it separately)
-    formatted_history = [
-        {"role": msg["role"], "content": msg["content"]}
-        for msg in history[:-1]
-    ]
-    
-    # Add current message
-    formatted_history.append({"role": "user", "content": message})
+    # Fit system prompt + rolling summary + recent turns into the token budget
+    # (history already ends with the current user message)
+    context = await context_builder.build(session_id, system_prompt, history)
+
+    return {
+        "user_id": user_id,
+        "count": count,
+        "history_length": len(history),
+        "history": context["messages"],
+        "system_prompt": context["system_prompt"],
+        "summarize_up_to": context["summarize_up_to"],
+        "risk_level": risk.level
+    }
+
+
+async def check_crisis(user_id: int, history: List[Dict[str, Any]], risk: RiskAssessment):
+    """
+    Immediate emotional analysis for a message the risk screen rated high.
+
+    Runs with reply priority since the reply waits for it. If the analysis
+    fails, a crisis state with the screen's concerns is stored so the reply
+    still gets the crisis guardrails.
+    """
+    emotional_stats["crisis_checks"] += 1
+    recent_conv = [{"role": m["role"], "content": m["content"]} for m in history[-ANALYSIS_WINDOW:]]
+    result = await llm_service.aanalyze_emotional_state(recent_conv, user_id, priority="reply")
+    try:
+        emotional_state = EmotionalState.from_dict(result).to_dict()
+    except ValueError:
+        emotional_stats["crisis_fallbacks"] += 1
+        emotional_state = EmotionalState(
+            support_needed="urgent", recommended_mode="crisis", professional_help_suggested=True,
+            detected_concerns=risk.concerns, confidence=risk.score, notes="Detectado por el filtro local"
+        ).to_dict()
+    await profile_store.update_emotional_state(user_id, emotional_state)
+    print(f"🚨 Crisis check for user {user_id}: {emotional_state['recommended_mode']}")
+
+
+async def schedule_analysis(session_id: int, turn: Dict[str, Any]) -> bool:
+    """
+    Queue profile extraction and emotional analysis for a finished turn.
+
+    Both run as a single conversation_analysis job (one LLM call) when they
+    are due on the same turn. Returns True if a profile update was queued.
+    """
+    payload = {"user_id": turn["user_id"], "session_id": session_id}
+
+    # Update profile after informative user messages (critical for demo -
+    # immediate adaptation), skipping small talk like "ok" or "jaja"
+    profile_update_queued = False
+    if turn["history_length"] >= 2:  # Need at least 1 exchange to extract info
+        history = turn["history"]
+        previous_reply = None
+        if len(history) >= 2 and history[-2]["role"] == "assistant":
+            previous_reply = history[-2]["content"]
+        if profile_service.is_informative_message(history[-1]["content"], previous_reply):
+            pending_profile_info[session_id] = pending_profile_info.get(session_id, 0) + 1
+        else:
+            extraction_stats["skipped_uninformative"] += 1
+
+        if pending_profile_info.get(session_id):
+            if turn["count"] - last_profile_extraction.get(session_id, 0) >= PROFILE_UPDATE_FREQUENCY:
+                last_profile_extraction[session_id] = turn["count"]
+                pending_profile_info[session_id] = 0
+                extraction_stats["queued"] += 1
+                profile_update_queued = True
+            else:
+                extraction_stats["deferred_cadence"] += 1
+
+    # Inline mode: emotional check every 7 messages (batch mode leaves it to emotional_batch)
+    emotional_check = (
+        EMOTIONAL_CHECK_MODE == "inline" and turn["count"] % 7 == 0 and turn["history_length"] >= 10
+    )
+    if emotional_check:
+        emotional_stats["inline_checks"] += 1
+    elif turn["risk_level"] == "moderate":
+        # Worrying but not urgent: analyze right after the reply
+        emotional_check = True
+        emotional_stats["risk_queued"] += 1
+
+    if profile_update_queued or emotional_check:
+        await job_queue.enqueue("conversation_analysis", {
+            **payload, "profile": profile_update_queued, "emotion": emotional_check
+        })
+
+    # Older turns left the prompt window: fold them into the session summary. The
+    # payload has no boundary, so turns while a job is pending coalesce into it
+    # (the job reads the latest boundary from the context builder)
+    if turn["summarize_up_to"]:
+        await job_queue.enqueue("session_summary", payload)
+
+    return profile_update_queued
+
+
+@app.post("/api/chat")
+async def chat(session_id: int = Form(...), message: str = Form(...)):
+    """
+    Adaptive chat with profile extraction and emotional analysis.
+    """
+    turn = await prepare_turn(session_id, message)
     
     # Get response with custom system prompt
-    response = llm_service.chat_with_custom_system(formatted_history, system_prompt)
+    response = await llm_service.achat_with_custom_system(
+        turn["history"], turn["system_prompt"], user_id=turn["user_id"]
+    )
     
     if response.get("error"):
-        raise HTTPException(status_code=500, detail=response["content"])
+        # Provider down or overloaded (retries exhausted / circuit open) -> 503
+        headers = None
+        if response.get("retry_after"):
+            headers = {"Retry-After": str(max(1, round(response["retry_after"])))}
+        raise HTTPException(status_code=response.get("status_code", 500),
+                            detail=response["content"], headers=headers)
     
     # Store assistant response
-    db.add_message(session_id, "assistant", response["content"])
+    await adb.add_message(session_id, "assistant", response["content"])
+    profile_update_queued = await schedule_analysis(session_id, turn)
     
     return {
         "response": response["content"],
         "usage": response.get("usage", {}),
         "model": response.get("model", "unknown"),
-        "profile_updated": profile_updated
+        "profile_update_queued": profile_update_queued
     }
 
 
+def sse_event(data: Dict[str, Any], event: Optional[str] = None) -> str:
+    """Format a Server-Sent Events frame."""
+    frame = f"event: {event}\n" if event else ""
+    return frame + f"data: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
+@app.post("/api/chat/stream")
+async def chat_stream(session_id: int = Form(...), message: str = Form(...)):
+    """
+    Same as /api/chat but streams the reply as Server-Sent Events.
+
+    Emits one `data: {"delta": ...}` frame per token chunk, then a `done`
+    event once the assembled reply has been stored (or an `error` event).
+    """
+    turn = await prepare_turn(session_id, message)
+
+    async def event_stream():
+        parts = []
+        stored = False
+        try:
+            async for delta in llm_service.astream_chat_with_custom_system(
+                turn["history"], turn["system_prompt"], user_id=turn["user_id"]
+            ):
+                parts.append(delta)
+                yield sse_event({"delta": delta})
+
+            # Store assistant response once the stream is complete
+            await adb.add_message(session_id, "assistant", "".join(parts))
+            stored = True
+        except Exception as e:
+            yield sse_event({"detail": f"Error: {str(e)}"}, event="error")
+            return
+        finally:
+            # Error or client disconnect: keep what the user already saw so the
+            # history doesn't end with an unanswered message. Shielded because
+            # a disconnect cancels the response task
+            if not stored and parts:
+                await asyncio.shield(adb.add_message(
+                    session_id, "assistant", "".join(parts) + INTERRUPTED_REPLY_MARKER
+                ))
+
+        profile_update_queued = await schedule_analysis(session_id, turn)
+        yield sse_event({"profile_update_queued": profile_update_queued}, event="done")
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
 @app.delete("/api/sessions/{session_id}/{user_id}")
 async def delete_session(session_id: int, user_id: int):
-    success = db.delete_session(session_id, user_id)
+    success = await adb.delete_session(session_id, user_id)
     if not success:
         raise HTTPException(status_code=404, detail="Session not found")
     return {"success": True}
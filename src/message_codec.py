@@ -0,0 +1,263 @@
+"""
+Compressed storage of message bodies.
+
+With MESSAGE_COMPRESSION set ("zlib", or "zstd" when the zstandard package
+is installed), message bodies of at least MESSAGE_COMPRESSION_MIN_BYTES are
+stored compressed: messages.content holds the bytes and messages.encoding
+says how ("zlib:<dictionary id>"). Shorter bodies gain nothing and stay
+plain text (encoding NULL). Reads decompress transparently, whatever the
+current setting.
+
+A single chat message is too short to compress well on its own, so every
+body is compressed against a shared preset dictionary of Spanish chat text:
+id 0 is the built-in one below (copied into message_dictionaries when the
+database is created); better ones are trained from the stored messages and
+kept there too. A process that meets a dictionary it has not loaded yet
+(one trained from the command line while the app runs) reads it from the
+table. Existing rows are compressed (or re-compressed with the newest
+dictionary) from the command line:
+
+    python -m src.message_codec train
+    python -m src.message_codec compact [--recompress] [--vacuum]
+    python -m src.message_codec stats
+"""
+
+import argparse
+import os
+import threading
+import zlib
+from collections import Counter
+from typing import Callable, Dict, Iterable, Optional, Tuple, Union
+
+try:
+    import zstandard
+except ImportError:  # optional: zlib is always available
+    zstandard = None
+
+# Preset dictionary id 0: frequent phrases of the assistant and its users.
+# zlib matches nearby bytes more cheaply, so the most common come last.
+# Migration 8 writes it to message_dictionaries and stored rows are decoded
+# with that copy, so editing it only affects databases created afterwards.
+BUILTIN_DICTIONARY = " ".join([
+    "Te recomiendo hablar con un profesional de la salud mental.",
+    "Si estás en peligro, llama al 112 o al 024 (línea de atención a la conducta suicida).",
+    "Recuerda que no estás solo y que pedir ayuda es un signo de fortaleza.",
+    "Aquí tienes algunas ideas que pueden ayudarte:",
+    "Por ejemplo, podrías intentar",
+    "Otra opción es",
+    "Lo más importante es que",
+    "Si te apetece, podemos",
+    "¿Te gustaría que te recomiende",
+    "¿Has probado a",
+    "¿Qué es lo que más te gusta de",
+    "¿Qué tal te ha ido",
+    "¿Cómo te sientes con eso?",
+    "¿Quieres contarme un poco más sobre",
+    "¿Hay algo más en lo que te pueda ayudar?",
+    "Es completamente normal sentirse así.",
+    "Entiendo cómo te sientes.",
+    "Gracias por contármelo.",
+    "Me alegra mucho que me lo cuentes.",
+    "¡Qué bien! Me encanta que",
+    "¡Hola! ¿Qué tal estás hoy?",
+    "en el colegio en el instituto en la universidad en el trabajo con tu familia con tus amigos",
+    "un poco mucho más también porque cuando siempre ahora hoy mañana ayer semana",
+    "puedes puedo quieres quiero tienes tengo hacer algo bien mejor",
+    "que de la el en y los las por para con una un es no lo me te se",
+])
+# Bytes of a dictionary trained from stored messages (zlib uses at most 32 KiB)
+DICTIONARY_SIZE = 32 * 1024
+
+ALGORITHMS = ("zlib", "zstd")
+
+
+class MessageCodec:
+    """Encodes message bodies for storage and decodes them back."""
+
+    def __init__(self, algorithm: Optional[str] = None, min_bytes: Optional[int] = None,
+                 level: Optional[int] = None,
+                 loader: Optional[Callable[[int], Optional[Tuple[str, bytes]]]] = None):
+        """
+        Args:
+            algorithm: "zlib", "zstd" or "" to store new messages uncompressed
+                (MESSAGE_COMPRESSION, default ""). Falls back to zlib when
+                zstandard is not installed.
+            min_bytes: Smallest UTF-8 body that is compressed
+                (MESSAGE_COMPRESSION_MIN_BYTES, default 256).
+            level: Compression level (MESSAGE_COMPRESSION_LEVEL, default 6 for
+                zlib, 3 for zstd).
+            loader: Returns (algorithm, bytes) of a stored dictionary by id, or
+                None. Called when a body uses a dictionary this codec has not
+                seen yet (trained by another process after startup).
+        """
+        algorithm = algorithm if algorithm is not None else os.getenv("MESSAGE_COMPRESSION", "")
+        if algorithm == "zstd" and zstandard is None:
+            print("⚠️  zstandard is not installed; compressing messages with zlib")
+            algorithm = "zlib"
+        if algorithm and algorithm not in ALGORITHMS:
+            raise ValueError(f"Unknown MESSAGE_COMPRESSION: {algorithm}")
+        self.algorithm = algorithm
+        self.min_bytes = min_bytes if min_bytes is not None else int(
+            os.getenv("MESSAGE_COMPRESSION_MIN_BYTES", "256"))
+        default_level = "3" if algorithm == "zstd" else "6"
+        self.level = level if level is not None else int(os.getenv("MESSAGE_COMPRESSION_LEVEL", default_level))
+
+        # dictionary id -> (algorithm it was trained for, bytes); id 0 suits both
+        self.dictionaries: Dict[int, Tuple[Optional[str], bytes]] = {0: (None, BUILTIN_DICTIONARY.encode())}
+        self.dictionary_id = 0
+        self.loader = loader
+        self._load_lock = threading.Lock()
+        # zstd (de)compressors are not thread-safe: one set per thread
+        self._local = threading.local()
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.algorithm)
+
+    def add_dictionary(self, dictionary_id: int, algorithm: str, data: bytes):
+        """Register a stored dictionary; the newest one for the algorithm is used to encode."""
+        self.dictionaries[dictionary_id] = (algorithm, data)
+        if algorithm == self.algorithm and dictionary_id > self.dictionary_id:
+            self.dictionary_id = dictionary_id
+
+    def encode(self, text: str) -> Tuple[Union[str, bytes], Optional[str]]:
+        """(value to store, encoding): compressed bytes, or the text itself with encoding None."""
+        if not self.enabled:
+            return text, None
+        raw = text.encode("utf-8")
+        if len(raw) < self.min_bytes:
+            return text, None
+
+        if self.algorithm == "zstd":
+            data = self._zstd(self.dictionary_id)[0].compress(raw)
+        else:
+            compressor = zlib.compressobj(self.level, zlib.DEFLATED, -15,
+                                          zdict=self.dictionaries[self.dictionary_id][1])
+            data = compressor.compress(raw) + compressor.flush()
+        if len(data) >= len(raw):
+            return text, None
+        return data, f"{self.algorithm}:{self.dictionary_id}"
+
+    def decode(self, value: Union[str, bytes], encoding: Optional[str]) -> str:
+        """Text of a stored message body."""
+        if encoding is None:
+            return value
+        algorithm, dictionary_id = encoding.split(":")
+        dictionary_id = int(dictionary_id)
+        if algorithm == "zstd":
+            if zstandard is None:
+                raise RuntimeError("Message stored with zstd but zstandard is not installed")
+            return self._zstd(dictionary_id)[1].decompress(value).decode("utf-8")
+
+        decompressor = zlib.decompressobj(-15, zdict=self._dictionary(dictionary_id))
+        return (decompressor.decompress(value) + decompressor.flush()).decode("utf-8")
+
+    def _dictionary(self, dictionary_id: int) -> bytes:
+        """Bytes of a dictionary, loading it from storage the first time it is seen."""
+        entry = self.dictionaries.get(dictionary_id)
+        if entry is None:
+            with self._load_lock:
+                entry = self.dictionaries.get(dictionary_id)
+                if entry is None and self.loader is not None:
+                    loaded = self.loader(dictionary_id)
+                    if loaded is not None:
+                        self.add_dictionary(dictionary_id, *loaded)
+                        entry = self.dictionaries[dictionary_id]
+            if entry is None:
+                raise KeyError(f"Unknown message dictionary {dictionary_id}")
+        return entry[1]
+
+    def _zstd(self, dictionary_id: int):
+        """This thread's (compressor, decompressor) for a dictionary."""
+        cache = getattr(self._local, "zstd", None)
+        if cache is None:
+            cache = self._local.zstd = {}
+        if dictionary_id not in cache:
+            dictionary = zstandard.ZstdCompressionDict(self._dictionary(dictionary_id))
+            cache[dictionary_id] = (zstandard.ZstdCompressor(level=self.level, dict_data=dictionary),
+                                    zstandard.ZstdDecompressor(dict_data=dictionary))
+        return cache[dictionary_id]
+
+
+def train_dictionary(samples: Iterable[str], algorithm: str = "zlib",
+                     size: int = DICTIONARY_SIZE) -> bytes:
+    """
+    Build a preset dictionary from sample message bodies.
+
+    zstd uses its own trainer. For zlib, the word sequences (2 to 8 words)
+    repeated across the samples are ranked by the bytes they would save
+    (occurrences x length) and concatenated, best last, up to `size` bytes.
+    """
+    samples = [text for text in samples if text]
+    if algorithm == "zstd":
+        return zstandard.train_dictionary(size, [text.encode("utf-8") for text in samples]).as_bytes()
+
+    counts = Counter()
+    for text in samples:
+        words = text.split()
+        for n in (2, 3, 5, 8):
+            counts.update(" ".join(words[i:i + n]) for i in range(len(words) - n + 1))
+
+    picked, total = [], 0
+    ranked = sorted(((count * len(phrase), phrase) for phrase, count in counts.items() if count > 1),
+                    reverse=True)
+    for _, phrase in ranked:
+        if total >= size:
+            break
+        # Skip phrases already covered by a longer one that was picked
+        if any(phrase in longer for longer in picked[-200:]):
+            continue
+        picked.append(phrase)
+        total += len(phrase.encode("utf-8")) + 1
+    return " ".join(reversed(picked)).encode("utf-8")[-size:]
+
+
+def _main(argv: Optional[list] = None):
+    from dotenv import load_dotenv
+
+    from .database import Database
+
+    parser = argparse.ArgumentParser(description="Compressed message storage maintenance.")
+    commands = parser.add_subparsers(dest="command", required=True)
+    train = commands.add_parser("train", help="train a dictionary from stored messages")
+    train.add_argument("--samples", type=int, default=20000, help="messages sampled (default 20000)")
+    compact = commands.add_parser("compact", help="compress stored messages with the current settings")
+    compact.add_argument("--recompress", action="store_true",
+                         help="also re-encode rows compressed with an older dictionary")
+    compact.add_argument("--batch", type=int, default=1000, help="rows per transaction (default 1000)")
+    compact.add_argument("--vacuum", action="store_true", help="VACUUM afterwards to shrink the file")
+    commands.add_parser("stats", help="storage used by messages, by encoding")
+    args = parser.parse_args(argv)
+
+    load_dotenv()
+    db = Database(os.getenv("DATABASE_PATH", "chat_agent.db"))
+    try:
+        if args.command != "stats" and not db.codec.enabled:
+            parser.error("set MESSAGE_COMPRESSION=zlib (or zstd) first")
+        if args.command == "train":
+            samples = db.sample_message_contents(db.codec.min_bytes, args.samples)
+            data = train_dictionary(samples, db.codec.algorithm)
+            dictionary_id = db.save_message_dictionary(db.codec.algorithm, data)
+            print(f"Dictionary {dictionary_id}: {len(data)} bytes from {len(samples)} messages "
+                  f"(run compact --recompress to use it for existing rows)")
+        elif args.command == "compact":
+            after_id, totals = 0, Counter()
+            while True:
+                batch = db.compact_messages(after_id, args.batch, args.recompress)
+                if batch["scanned"] == 0:
+                    break
+                after_id = batch.pop("last_id")
+                totals.update(batch)
+                print(f"  up to id {after_id}: {totals['compressed']} compressed, "
+                      f"{totals['bytes_before'] / 1e6:.1f} MB -> {totals['bytes_after'] / 1e6:.1f} MB")
+            if args.vacuum:
+                db.vacuum()
+            print(dict(totals))
+        else:
+            print(db.get_message_storage_stats())
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    _main()
@@ -0,0 +1,331 @@
+"""
+Background news prefetcher and precomputed proactive greetings.
+
+Instead of fetching news and calling the LLM when a returning user opens the
+app, a periodic worker:
+- aggregates the interests of all user profiles, deduplicated and ranked by
+  how many users share them
+- refreshes the news of the top NEWS_PREFETCH_TOPICS topics, so they stay
+  fresh in the news cache
+- precomputes a proactive greeting for each user who will be idle for
+  PROACTIVE_IDLE_SECONDS within the lookahead, and stores it in the
+  proactive_greetings table (with an expiry and a consumed flag)
+
+Greetings are generated in batches (one transaction per batch) with a
+request-per-minute cap at the scheduler's "proactive" priority, and, when
+PROACTIVE_OFF_PEAK_HOURS is set, only during those hours. They can also be
+generated from the command line / cron:
+
+    python -m src.news_prefetcher run
+
+GET /api/sessions then only reads the greeting by primary key (see take_greeting).
+"""
+
+import argparse
+import asyncio
+import calendar
+import os
+import time
+from collections import Counter
+from typing import Any, Dict, List, Optional, Tuple
+
+# News searched for greetings (same as the previous on-demand lookup)
+NEWS_LANGUAGE = "es"
+NEWS_DAYS_BACK = 3
+NEWS_MAX_RESULTS = 3
+
+
+def topic_key(interest: str) -> str:
+    """Key under which equivalent interests are counted ("Fútbol " == "fútbol")."""
+    return " ".join(interest.lower().split())
+
+
+def parse_hours(hours: str) -> Optional[Tuple[int, int]]:
+    """
+    "2-6" -> (2, 6): local hours [start, end), may wrap midnight ("23-5").
+
+    Empty -> None (no window). A malformed value is reported and also
+    treated as no window, so a typo in the setting can't stop the app.
+    """
+    if not hours.strip():
+        return None
+    try:
+        start, end = (int(hour) for hour in hours.split("-"))
+    except ValueError:
+        start = end = -1
+    if not (0 <= start <= 24 and 0 <= end <= 24):
+        print(f"⚠️  Ignoring invalid PROACTIVE_OFF_PEAK_HOURS {hours!r} (expected e.g. 2-6); "
+              "greetings are generated on every run")
+        return None
+    return start % 24, end % 24
+
+
+class NewsPrefetcher:
+    """Keeps the news of popular interests fresh and greetings ready."""
+
+    def __init__(self, adb, news_service, llm_service, run_interval: Optional[float] = None,
+                 max_topics: Optional[int] = None, idle_after: Optional[float] = None,
+                 greeting_ttl: Optional[float] = None, concurrency: Optional[int] = None,
+                 max_greetings: Optional[int] = None, batch_size: Optional[int] = None,
+                 rpm: Optional[float] = None, off_peak_hours: Optional[str] = None,
+                 lookahead: Optional[float] = None):
+        """
+        Args:
+            adb: AsyncDatabase with the user profiles and greetings.
+            news_service: NewsService whose cache is kept warm.
+            llm_service: LLMService generating the greetings.
+            run_interval: Seconds between runs (NEWS_PREFETCH_INTERVAL, default 1800;
+                0 = no loop).
+            max_topics: Most popular topics refreshed per run (NEWS_PREFETCH_TOPICS, default 20).
+            idle_after: Seconds without activity before a user is greeted
+                (PROACTIVE_IDLE_SECONDS, default 86400).
+            greeting_ttl: Seconds a greeting stays valid (PROACTIVE_GREETING_TTL, default 86400).
+            concurrency: Greetings generated in parallel (PROACTIVE_GREETING_CONCURRENCY, default 4).
+            max_greetings: Greetings generated per run (PROACTIVE_GREETINGS_PER_RUN, default 500).
+            batch_size: Greetings stored per transaction (PROACTIVE_GREETING_BATCH, default 50).
+            rpm: Greeting LLM calls per minute (PROACTIVE_GREETING_RPM, default 60; 0 = unlimited).
+            off_peak_hours: Local hours when the loop generates greetings, e.g. "2-6"
+                (PROACTIVE_OFF_PEAK_HOURS, default empty = every run).
+            lookahead: Users who will be idle within this many seconds are greeted
+                ahead of time (PROACTIVE_LOOKAHEAD, default run_interval, or a
+                day with an off-peak window).
+        """
+        self.adb = adb
+        self.news_service = news_service
+        self.llm_service = llm_service
+        self.run_interval = run_interval if run_interval is not None else float(
+            os.getenv("NEWS_PREFETCH_INTERVAL", "1800"))
+        self.max_topics = max_topics or int(os.getenv("NEWS_PREFETCH_TOPICS", "20"))
+        self.idle_after = idle_after if idle_after is not None else float(
+            os.getenv("PROACTIVE_IDLE_SECONDS", "86400"))
+        self.greeting_ttl = greeting_ttl if greeting_ttl is not None else float(
+            os.getenv("PROACTIVE_GREETING_TTL", "86400"))
+        self.concurrency = concurrency or int(os.getenv("PROACTIVE_GREETING_CONCURRENCY", "4"))
+        self.max_greetings = max_greetings or int(os.getenv("PROACTIVE_GREETINGS_PER_RUN", "500"))
+        self.batch_size = batch_size or int(os.getenv("PROACTIVE_GREETING_BATCH", "50"))
+        self.rpm = rpm if rpm is not None else float(os.getenv("PROACTIVE_GREETING_RPM", "60"))
+        self.off_peak = parse_hours(off_peak_hours if off_peak_hours is not None
+                                    else os.getenv("PROACTIVE_OFF_PEAK_HOURS", ""))
+        default_lookahead = 86400 if self.off_peak else self.run_interval
+        self.lookahead = lookahead if lookahead is not None else float(
+            os.getenv("PROACTIVE_LOOKAHEAD", str(default_lookahead)))
+
+        self.topics: List[Dict[str, Any]] = []
+        self._task = None
+        self._next_call = 0.0
+        self.runs = 0
+        self.topics_refreshed = 0
+        self.refresh_errors = 0
+        self.prefetch_hits = 0
+        self.prefetch_misses = 0
+        self.generated = 0
+        self.failed = 0
+        self.served = 0
+        self.not_ready = 0
+
+    async def start(self):
+        """Run once now, then every run_interval (no-op when 0 or without NewsAPI)."""
+        if self.run_interval > 0 and self.news_service.is_available():
+            self._task = asyncio.create_task(self._run_loop())
+
+    async def stop(self):
+        """Stop the run loop; greetings not yet stored are generated again next run."""
+        if self._task:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    def rank_topics(self, profiles: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """
+        Deduplicated interests ranked by the number of users sharing them.
+
+        Each topic keeps the first spelling seen as its search query.
+        """
+        counts = Counter()
+        queries = {}
+        for row in profiles:
+            for interest in set(filter(None, map(topic_key, row["profile"].get("interests") or []))):
+                counts[interest] += 1
+            for interest in row["profile"].get("interests") or []:
+                queries.setdefault(topic_key(interest), interest.strip())
+        ranked = sorted(counts.items(), key=lambda item: (-item[1], item[0]))
+        return [{"key": key, "query": queries[key], "users": users} for key, users in ranked]
+
+    def in_off_peak(self, hour: Optional[int] = None) -> bool:
+        """Whether greetings may be generated now (always, without a window)."""
+        if self.off_peak is None:
+            return True
+        hour = time.localtime().tm_hour if hour is None else hour
+        start, end = self.off_peak
+        return start <= hour < end if start <= end else hour >= start or hour < end
+
+    async def run(self, greetings: bool = True) -> Dict[str, int]:
+        """Refresh the top topics, then (optionally) generate the missing or expired greetings."""
+        profiles = await self.adb.get_profiles_with_activity(time.time())
+        self.topics = self.rank_topics(profiles)[:self.max_topics]
+
+        # One failing topic or user must not discard the rest of the run
+        results = await asyncio.gather(*(
+            self.news_service.arefresh(topic["query"], NEWS_LANGUAGE, NEWS_DAYS_BACK,
+                                       min_fresh=self.run_interval)
+            for topic in self.topics
+        ), return_exceptions=True)
+        refreshed = []
+        for topic, result in zip(self.topics, results):
+            if isinstance(result, BaseException):
+                print(f"Error refreshing news for {topic['query']!r}: {str(result)}")
+            refreshed.append(result is True)
+        self.topics_refreshed += sum(refreshed)
+        self.refresh_errors += len(refreshed) - sum(refreshed)
+        self.runs += 1
+
+        due = self._due_for_greeting(profiles) if greetings else []
+        prefetched = {topic["key"] for topic, ok in zip(self.topics, refreshed) if ok}
+        semaphore = asyncio.Semaphore(self.concurrency)
+
+        async def generate(row: Dict[str, Any]) -> Optional[tuple]:
+            async with semaphore:
+                await self._pace()
+                return await self._generate_greeting(row, prefetched)
+
+        generated = 0
+        for start in range(0, len(due), self.batch_size):
+            chunk = due[start:start + self.batch_size]
+            batch = await asyncio.gather(*(generate(row) for row in chunk), return_exceptions=True)
+            rows = []
+            for row, result in zip(chunk, batch):
+                if isinstance(result, BaseException):
+                    print(f"Error generating greeting for user {row['user_id']}: {str(result)}")
+                elif result is not None:
+                    rows.append(result)
+            if rows:
+                await self.adb.save_proactive_greetings(rows, time.time())
+            generated += len(rows)
+        self.generated += generated
+        self.failed += len(due) - generated
+        return {"topics": len(self.topics), "refreshed": sum(refreshed),
+                "due": len(due), "generated": generated}
+
+    async def take_greeting(self, user_id: int) -> Optional[str]:
+        """Precomputed greeting for a returning user, if ready; it is then marked consumed."""
+        greeting = await self.adb.take_proactive_greeting(user_id, time.time())
+        if greeting is None:
+            self.not_ready += 1
+        else:
+            self.served += 1
+        return greeting
+
+    def is_idle(self, updated_at: str) -> bool:
+        """Whether a session last updated at updated_at (SQLite UTC timestamp) is idle."""
+        last = calendar.timegm(time.strptime(updated_at, "%Y-%m-%d %H:%M:%S"))
+        return time.time() - last > self.idle_after
+
+    def stats(self) -> Dict[str, Any]:
+        """Prefetch and greeting counters."""
+        lookups = self.prefetch_hits + self.prefetch_misses
+        requests = self.served + self.not_ready
+        return {
+            "runs": self.runs,
+            "topics": [{"query": topic["query"], "users": topic["users"]} for topic in self.topics],
+            "topics_refreshed": self.topics_refreshed,
+            "refresh_errors": self.refresh_errors,
+            "prefetch_hits": self.prefetch_hits,
+            "prefetch_misses": self.prefetch_misses,
+            "prefetch_hit_rate": self.prefetch_hits / lookups if lookups else 0.0,
+            "greetings_generated": self.generated,
+            "greetings_failed": self.failed,
+            "greetings_served": self.served,
+            "greetings_not_ready": self.not_ready,
+            "greeting_hit_rate": self.served / requests if requests else 0.0,
+            "off_peak_hours": "-".join(map(str, self.off_peak)) if self.off_peak else None
+        }
+
+    def _due_for_greeting(self, profiles: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Users idle within the lookahead, with interests and no valid greeting; soonest idle first."""
+        threshold = self.idle_after - self.lookahead
+        due = [
+            row for row in profiles
+            if row["profile"].get("interests") and not row["has_greeting"]
+            and row["idle_seconds"] is not None and row["idle_seconds"] >= threshold
+        ]
+        due.sort(key=lambda row: row["idle_seconds"])
+        return due[:self.max_greetings]
+
+    async def _pace(self):
+        """Space greeting calls to at most rpm per minute."""
+        if self.rpm <= 0:
+            return
+        now = time.monotonic()
+        slot = max(now, self._next_call)
+        self._next_call = slot + 60 / self.rpm
+        if slot > now:
+            await asyncio.sleep(slot - now)
+
+    async def _generate_greeting(self, row: Dict[str, Any], prefetched: set) -> Optional[tuple]:
+        """(user_id, greeting, topic, expires_at) for a user, or None on failure."""
+        interests = [i for i in row["profile"]["interests"] if topic_key(i)]
+        if not interests:
+            return None
+        # Prefer an interest whose news was just prefetched; otherwise the
+        # first interest is looked up on demand (still cached and coalesced)
+        topic = next((i for i in interests if topic_key(i) in prefetched), None)
+        if topic is not None:
+            self.prefetch_hits += 1
+        else:
+            self.prefetch_misses += 1
+            topic = interests[0]
+
+        news = await self.news_service.asearch_news(topic, NEWS_LANGUAGE, NEWS_DAYS_BACK, NEWS_MAX_RESULTS)
+        if not news:
+            return None
+        ordered = [topic] + [i for i in interests if i != topic]
+        greeting = await self.llm_service.agenerate_proactive_question(
+            ordered, news, row["profile"], row["user_id"]
+        )
+        if not greeting:
+            return None
+        return row["user_id"], greeting, topic, time.time() + self.greeting_ttl
+
+    async def _run_loop(self):
+        while True:
+            try:
+                stats = await self.run(greetings=self.in_off_peak())
+                print(f"📰 News prefetch: {stats['refreshed']}/{stats['topics']} topics fresh, "
+                      f"{stats['generated']}/{stats['due']} greetings generated")
+            except Exception as e:
+                print(f"Error in news prefetch: {str(e)}")
+            await asyncio.sleep(self.run_interval)
+
+
+async def _main(argv: Optional[List[str]] = None):
+    from dotenv import load_dotenv
+
+    from .database import AsyncDatabase, Database
+    from .llm_cache import LLMResponseCache
+    from .llm_service import LLMService
+    from .news_service import NewsService
+
+    parser = argparse.ArgumentParser(description="Prefetch news and precompute proactive greetings.")
+    commands = parser.add_subparsers(dest="command", required=True)
+    commands.add_parser("run", help="refresh popular topics and generate due greetings now")
+    parser.parse_args(argv)
+
+    load_dotenv()
+    adb = AsyncDatabase(Database(os.getenv("DATABASE_PATH", "chat_agent.db")))
+    llm_service = LLMService(response_cache=LLMResponseCache(adb))
+    news_service = NewsService(adb=adb)
+    prefetcher = NewsPrefetcher(adb, news_service, llm_service)
+
+    try:
+        if not news_service.is_available():
+            print("NEWS_API_KEY is not configured")
+        else:
+            print(await prefetcher.run())
+    finally:
+        await news_service.aclose()
+        await llm_service.aclose()
+        adb.shutdown()
+
+
+if __name__ == "__main__":
+    asyncio.run(_main())
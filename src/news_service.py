@@ -1,25 +1,69 @@
 """
 News Service module for fetching recent news using NewsAPI.
+
+Requests go through pooled httpx clients (keep-alive connections reused
+across calls). Results are cached in memory and, with a database, in the
+news_cache table, keyed by (query, language, days_back):
+- fresh entries (younger than NEWS_CACHE_TTL) are served directly
+- stale entries (up to NEWS_CACHE_STALE_TTL more) are served immediately
+  while a background fetch refreshes them (stale-while-revalidate)
+- concurrent misses for the same key share one upstream request, so many
+  users with the same interest cause a single NewsAPI call
 """
 
+import asyncio
 import os
-import requests
-from typing import List, Dict, Any, Optional
+import time
+from collections import OrderedDict
 from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional
+
+import httpx
 
 
 class NewsService:
     """Service for fetching news from NewsAPI."""
 
-    def __init__(self, api_key: str = None):
+    def __init__(self, api_key: str = None, adb=None, base_url: Optional[str] = None,
+                 ttl: Optional[float] = None, stale_ttl: Optional[float] = None):
         """
         Initialize NewsAPI service.
 
         Args:
             api_key: NewsAPI key. If None, will try to get from environment.
+            adb: AsyncDatabase for the persistent cache (None = no caching).
+            base_url: API root (NEWS_API_BASE_URL, default https://newsapi.org/v2).
+            ttl: Seconds a result is fresh (NEWS_CACHE_TTL, default 3600).
+            stale_ttl: Extra seconds a result may be served while it is
+                refreshed (NEWS_CACHE_STALE_TTL, default 86400).
         """
         self.api_key = api_key or os.getenv("NEWS_API_KEY")
-        self.base_url = "https://newsapi.org/v2"
+        self.base_url = base_url or os.getenv("NEWS_API_BASE_URL", "https://newsapi.org/v2")
+        self.adb = adb
+        self.db = adb.db if adb is not None else None
+        self.ttl = ttl if ttl is not None else float(os.getenv("NEWS_CACHE_TTL", "3600"))
+        self.stale_ttl = stale_ttl if stale_ttl is not None else float(os.getenv("NEWS_CACHE_STALE_TTL", "86400"))
+        # Articles fetched per query; callers get the first max_results
+        self.page_size = int(os.getenv("NEWS_PAGE_SIZE", "10"))
+        self.memory_size = int(os.getenv("NEWS_MEMORY_CACHE_SIZE", "256"))
+        self._memory: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+
+        limits = httpx.Limits(
+            max_connections=int(os.getenv("NEWS_MAX_CONNECTIONS", "20")),
+            max_keepalive_connections=int(os.getenv("NEWS_MAX_KEEPALIVE", "10"))
+        )
+        timeout = httpx.Timeout(float(os.getenv("NEWS_TIMEOUT", "10")))
+        self.client = httpx.Client(limits=limits, timeout=timeout)
+        self.async_client = httpx.AsyncClient(limits=limits, timeout=timeout)
+
+        # cache key -> upstream fetch in progress
+        self._inflight: Dict[str, asyncio.Task] = {}
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.fetches = 0
+        self.fetch_errors = 0
 
     def is_available(self) -> bool:
         """Check if news service is available (API key configured)."""
@@ -42,45 +86,198 @@ class NewsService:
         if not self.is_available():
             return None
 
-        # Calculate from_date
-        from_date = (datetime.now() - timedelta(days=days_back)).strftime("%Y-%m-%d")
+        key = self.cache_key(query, language, days_back)
+        entry = self._memory.get(key)
+        if entry is None and self.db is not None:
+            entry = self._remember(key, self.db.get_news_cache(key))
+        cached = self._cached(entry)
+        if cached is not None and cached["age"] < self.ttl:
+            self.hits += 1
+            return cached["articles"][:max_results]
 
+        self.misses += 1
         try:
-            response = requests.get(
-                f"{self.base_url}/everything",
-                params={
-                    "q": query,
-                    "language": language,
-                    "from": from_date,
-                    "sortBy": "publishedAt",
-                    "pageSize": max_results,
-                    "apiKey": self.api_key
-                },
-                timeout=10
-            )
+            response = self.client.get(f"{self.base_url}/everything",
+                                       params=self._params(query, language, days_back))
+            articles = self._parse(response)
+        except Exception as e:
+            articles = self._fetch_failed(e)
+
+        if articles is None:
+            return cached["articles"][:max_results] if cached else None
+        fetched_at = time.time()
+        self._remember(key, {"articles": articles, "fetched_at": fetched_at})
+        if self.db is not None:
+            self.db.save_news_cache(key, query, language, days_back, articles, fetched_at, self.max_age)
+        return articles[:max_results]
+
+    async def asearch_news(self, query: str, language: str = "es",
+                           days_back: int = 7, max_results: int = 3) -> Optional[List[Dict[str, Any]]]:
+        """Async variant of search_news with stale-while-revalidate and request coalescing."""
+        if not self.is_available():
+            return None
+
+        key = self.cache_key(query, language, days_back)
+        cached = await self._alookup(key)
+
+        if cached is not None:
+            if cached["age"] < self.ttl:
+                self.hits += 1
+                return cached["articles"][:max_results]
+            if cached["age"] < self.max_age:
+                self.stale_hits += 1
+                self._fetch(key, query, language, days_back)  # refresh in the background
+                return cached["articles"][:max_results]
+
+        self.misses += 1
+        articles = await asyncio.shield(self._fetch(key, query, language, days_back))
+        return articles[:max_results] if articles is not None else None
+
+    async def arefresh(self, query: str, language: str = "es", days_back: int = 7,
+                       min_fresh: float = 0.0) -> bool:
+        """
+        Fetch a query from upstream unless its cached result stays fresh for
+        at least min_fresh more seconds (used by the news prefetcher).
+
+        Returns True if a fresh result is cached afterwards.
+        """
+        if not self.is_available():
+            return False
+
+        key = self.cache_key(query, language, days_back)
+        cached = await self._alookup(key)
+        if cached is not None and cached["age"] + min_fresh < self.ttl:
+            return True
+        return await asyncio.shield(self._fetch(key, query, language, days_back)) is not None
 
-            if response.status_code == 200:
-                data = response.json()
-                articles = data.get("articles", [])
-
-                # Format results
-                return [
-                    {
-                        "title": article.get("title"),
-                        "description": article.get("description"),
-                        "url": article.get("url"),
-                        "published_at": article.get("publishedAt"),
-                        "source": article.get("source", {}).get("name")
-                    }
-                    for article in articles
-                ]
-            else:
-                print(f"NewsAPI error: {response.status_code}")
-                return None
+    @property
+    def max_age(self) -> float:
+        """Oldest cached result ever served (fresh + stale window)."""
+        return self.ttl + self.stale_ttl
 
+    def cache_key(self, query: str, language: str, days_back: int) -> str:
+        return f"{' '.join(query.lower().split())}|{language}|{days_back}"
+
+    async def aclose(self):
+        """Close the HTTP connection pools."""
+        for task in list(self._inflight.values()):
+            task.cancel()
+        self.client.close()
+        await self.async_client.aclose()
+
+    def stats(self) -> Dict[str, Any]:
+        """Cache and upstream counters."""
+        lookups = self.hits + self.stale_hits + self.misses
+        return {
+            "hits": self.hits,
+            "stale_hits": self.stale_hits,
+            "misses": self.misses,
+            "hit_rate": (self.hits + self.stale_hits) / lookups if lookups else 0.0,
+            "coalesced": self.coalesced,
+            "fetches": self.fetches,
+            "fetch_errors": self.fetch_errors,
+            "inflight": len(self._inflight)
+        }
+
+    async def _alookup(self, key: str) -> Optional[Dict[str, Any]]:
+        """Cached entry from memory or SQLite, with its age."""
+        entry = self._memory.get(key)
+        if entry is None and self.adb is not None:
+            try:
+                entry = self._remember(key, await self.adb.get_news_cache(key))
+            except Exception as e:
+                print(f"Error reading news cache: {str(e)}")
+        return self._cached(entry)
+
+    def _fetch(self, key: str, query: str, language: str, days_back: int) -> asyncio.Task:
+        """Upstream fetch for a key, shared with any fetch already in progress."""
+        task = self._inflight.get(key)
+        if task is not None:
+            self.coalesced += 1
+            return task
+
+        task = asyncio.ensure_future(self._fetch_and_store(key, query, language, days_back))
+        self._inflight[key] = task
+        task.add_done_callback(lambda _: self._inflight.pop(key, None))
+        return task
+
+    async def _fetch_and_store(self, key: str, query: str, language: str,
+                               days_back: int) -> Optional[List[Dict[str, Any]]]:
+        try:
+            response = await self.async_client.get(f"{self.base_url}/everything",
+                                                   params=self._params(query, language, days_back))
+            articles = self._parse(response)
         except Exception as e:
-            print(f"Error fetching news: {str(e)}")
+            return self._fetch_failed(e)
+
+        if articles is None:
+            return None
+        fetched_at = time.time()
+        self._remember(key, {"articles": articles, "fetched_at": fetched_at})
+        if self.adb is not None:
+            try:
+                await self.adb.save_news_cache(key, query, language, days_back, articles,
+                                               fetched_at, self.max_age)
+            except Exception as e:
+                print(f"Error writing news cache: {str(e)}")
+        return articles
+
+    def _params(self, query: str, language: str, days_back: int) -> Dict[str, Any]:
+        # Calculate from_date
+        from_date = (datetime.now() - timedelta(days=days_back)).strftime("%Y-%m-%d")
+        return {
+            "q": query,
+            "language": language,
+            "from": from_date,
+            "sortBy": "publishedAt",
+            "pageSize": self.page_size,
+            "apiKey": self.api_key
+        }
+
+    def _parse(self, response: httpx.Response) -> Optional[List[Dict[str, Any]]]:
+        self.fetches += 1
+        if response.status_code != 200:
+            print(f"NewsAPI error: {response.status_code}")
+            self.fetch_errors += 1
+            return None
+
+        articles = response.json().get("articles", [])
+
+        # Format results
+        return [
+            {
+                "title": article.get("title"),
+                "description": article.get("description"),
+                "url": article.get("url"),
+                "published_at": article.get("publishedAt"),
+                "source": (article.get("source") or {}).get("name")
+            }
+            for article in articles
+        ]
+
+    def _fetch_failed(self, error: Exception) -> None:
+        print(f"Error fetching news: {str(error)}")
+        self.fetches += 1
+        self.fetch_errors += 1
+        return None
+
+    def _remember(self, key: str, entry: Optional[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+        """Keep an entry in the in-memory LRU in front of SQLite."""
+        if entry is not None:
+            self._memory[key] = entry
+            self._memory.move_to_end(key)
+            while len(self._memory) > self.memory_size:
+                self._memory.popitem(last=False)
+        return entry
+
+    def _cached(self, entry: Optional[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+        """Cached entry with its age, or None if missing or too old to serve."""
+        if entry is None:
+            return None
+        age = time.time() - entry["fetched_at"]
+        if age >= self.max_age:
             return None
+        return {"articles": entry["articles"], "age": age}
 
     def format_news_for_prompt(self, news_articles: List[Dict[str, Any]]) -> str:
         """
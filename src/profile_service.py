@@ -3,42 +3,26 @@ Profile Service for intelligent user profile extraction and system prompt genera
 This is the core of the adaptive personality system.
 """
 
+import os
+import re
 import json
+import hashlib
+import unicodedata
+from collections import Counter, OrderedDict
 from typing import Dict, Any, List, Optional
 from datetime import datetime
 
-
-class ProfileService:
-    """Service for profile extraction and adaptive system prompt generation."""
-
-    def __init__(self, llm_service):
-        """Initialize with LLM service for AI-powered extraction."""
-        self.llm_service = llm_service
-
-    def extract_profile_from_conversation(self, conversation: List[Dict[str, str]],
-                                         existing_profile: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
-        """
-        Extract relevant user information from conversation using LLM.
-
-        Args:
-            conversation: Recent conversation messages
-            existing_profile: Existing profile to update (if any)
-
-        Returns:
-            Updated profile dict
-        """
-        if len(conversation) < 2:
-            return existing_profile or self._get_empty_profile()
-
-        # Format conversation
-        conv_text = "\n".join([
-            f"{'Usuario' if msg['role'] == 'user' else 'Asistente'}: {msg['content']}"
-            for msg in conversation[-10:]  # Last 10 messages
-        ])
-
-        extraction_prompt = f"""Actúa como un ANALISTA EXPERTO extrayendo información PERMANENTE sobre el usuario.
-
-🚨🚨🚨 PASO 1 - DETECTAR GÉNERO (HACER PRIMERO):
+try:
+    from .conversation_analysis import ANALYSIS_FUNCTION_NAME, AnalysisResult, analysis_tool
+    from .llm_service import EMOTIONAL_ANALYSIS_GUIDELINES, EMOTIONAL_EVALUATION_CRITERIA, completion_json
+    from .prompt_templates import PromptTemplates
+except ImportError:  # imported as a top-level module (src/ on sys.path, as main_new.py does)
+    from conversation_analysis import ANALYSIS_FUNCTION_NAME, AnalysisResult, analysis_tool
+    from llm_service import EMOTIONAL_ANALYSIS_GUIDELINES, EMOTIONAL_EVALUATION_CRITERIA, completion_json
+    from prompt_templates import PromptTemplates
+
+# Extraction rules shared by the profile-only and the combined analysis prompts
+PROFILE_EXTRACTION_GUIDELINES = """🚨🚨🚨 PASO 1 - DETECTAR GÉNERO (HACER PRIMERO):
 Lee TODA la conversación buscando palabras terminadas en -A o -O que describan al usuario:
 - Si ves "aburrida", "cansada", "contenta", "entretenida", "ocupada", "satisfecha", etc. → gender = "femenino"
 - Si ves "aburrido", "cansado", "contento", "entretenido", "ocupado", "satisfecho", etc. → gender = "masculino"
@@ -205,16 +189,356 @@ EJEMPLOS:
 
 - Si NINGUNA pista es clara → "ambiguo" (NO "null")
 - Si no hay información → "null"
+"""
+
+PROFILE_GENDER_CHECK = """🚨 ANTES DE RESPONDER - VERIFICA GÉNERO:
+¿Hay palabras terminadas en -A describiendo al usuario? (aburrida, cansada, entretenida, ocupada, contenta, etc.) → gender = "femenino"
+¿Hay palabras terminadas en -O describiendo al usuario? (aburrido, cansado, entretenido, ocupado, contento, etc.) → gender = "masculino"
+"""
+
+# Pre-filter for profile extraction: cheap signals that a user message may
+# carry something worth adding to the profile
+_FILLER_WORDS = {
+    "ok", "okay", "okey", "vale", "sí", "si", "no", "bueno", "bien", "genial",
+    "guay", "claro", "gracias", "muchas", "perfecto", "ah", "oh", "ahh", "ohh",
+    "hmm", "mmm", "eh", "pues", "nada", "jaja", "jajaja", "jeje", "jiji", "xd",
+    "lol", "sé", "hola", "buenas", "adiós", "adios", "chao", "venga", "vaya", "ya",
+    "de", "acuerdo", "entiendo", "exacto", "cierto", "verdad", "también", "tal",
+    "vez", "quizás", "quizá", "igual", "dale", "sale", "anda", "uff", "uf", "wow"
+}
+_WORD_PATTERN = re.compile(r"[a-záéíóúüñ]+")
+_LAUGH_PATTERN = re.compile(r"^(?:j[aeiou]){2,}j?$|^x+d+$")
+_FIRST_PERSON_PATTERN = re.compile(
+    r"\b(?:yo|me|mi|mis|conmigo|soy|estoy|tengo|tenía|vivo|trabajo|estudio|"
+    r"juego|quiero|quisiera|necesito|prefiero|odio|adoro|gusta|gustan|encanta|"
+    r"encantan|siento|creo|pienso|voy|fui|era|estaba|tuve|hago|hice|nací|"
+    r"llamo|mío|mía|nuestro|nuestra)\b",
+    re.IGNORECASE
+)
+_GENDERED_ADJECTIVE_PATTERN = re.compile(
+    r"\b\w{3,}(?:ad|id|os|iv)[oa]s?\b|\b(?:solo|sola|cansado|cansada|harto|harta|"
+    r"contento|contenta|casado|casada|soltero|soltera|viudo|viuda)\b",
+    re.IGNORECASE
+)
+_NUMBER_PATTERN = re.compile(r"\d+|\b(?:uno|dos|tres|cuatro|cinco|seis|siete|ocho|"
+                             r"nueve|diez|once|doce|veinte|treinta|cuarenta|cincuenta|"
+                             r"sesenta|setenta|ochenta|noventa)\b", re.IGNORECASE)
+# Capitalized word in mid-sentence (after a word or comma), e.g. "vivo en Madrid"
+_NAMED_ENTITY_PATTERN = re.compile(r"(?<=[\w,;:] )[A-ZÁÉÍÓÚÑ][a-záéíóúüñ]{2,}")
+_LONG_MESSAGE_CHARS = 80
+
+# Age/gender normalization, done once when an extracted profile is applied
+AGE_GROUPS = ("child", "preteen", "teen", "young_adult", "adult", "senior")
+_YOUNG_AGE_GROUPS = ("child", "preteen", "teen", "young_adult")
+_AGE_NUMBER_PATTERN = re.compile(r"(?<!\d)\d{1,3}(?!\d)")
+_AGE_GROUP_UPPER_BOUNDS = [("child", 9), ("preteen", 13), ("teen", 17), ("young_adult", 20), ("adult", 64)]
+_AGE_KEYWORD_PATTERNS = [
+    ("preteen", re.compile(r"preadolescente")),
+    ("teen", re.compile(r"adolescente")),
+    ("child", re.compile(r"niñ[oa]")),
+    ("young_adult", re.compile(r"joven")),
+    ("senior", re.compile(r"senior|mayor|jubilad[oa]|ancian[oa]")),
+    ("adult", re.compile(r"adult[oa]"))
+]
+_GENDER_ALIASES = {
+    "masculino": "masculino", "hombre": "masculino", "chico": "masculino", "male": "masculino",
+    "femenino": "femenino", "mujer": "femenino", "chica": "femenino", "female": "femenino",
+    "ambiguo": "ambiguo"
+}
+
+# Profile merge: list fields are capped, evicting the oldest entries first
+PROFILE_LIST_LIMITS = {
+    "interests": 20,
+    "important_facts": 50,
+    "sensitive_topics": 20,
+    "personality_traits": 20,
+    "needs": 15
+}
+_NON_ALNUM_PATTERN = re.compile(r"[^a-z0-9ñ]+")
+_PROFESSION_FACT_PATTERN = re.compile(r"trabaja como|trabaja de|es un|es una|su trabajo|su ocupacion")
+_EDUCATION_FACT_PATTERN = re.compile(r"estudio|graduado en|titulo en|carrera de")
+_TRIVIAL_WORK_FACTS = {"trabaja", "tiene trabajo", "trabaja como trabajador"}
+# Ignored when comparing facts, so "Tiene un perro" and "Tiene un gato" differ
+_FACT_STOPWORDS = {
+    "a", "al", "como", "con", "de", "del", "el", "en", "es", "la", "las", "le", "lo",
+    "los", "mas", "muy", "para", "por", "que", "se", "su", "sus", "un", "una", "y"
+}
+
+
+def _normalize_text(text: str) -> str:
+    """Lowercase, strip accents and punctuation, collapse whitespace."""
+    text = unicodedata.normalize("NFKD", text.lower().replace("ñ", "\x00"))
+    text = "".join(ch for ch in text if not unicodedata.combining(ch)).replace("\x00", "ñ")
+    return _NON_ALNUM_PATTERN.sub(" ", text).strip()
+
+
+def _classify_age(age_range: Optional[str]) -> tuple:
+    """
+    Parse a free-text age_range into (age_years, age_group).
+
+    Numbers win over keywords; a range like "~10-17 años" uses its midpoint.
+    age_group is one of AGE_GROUPS, or None when nothing is recognised.
+    """
+    if not age_range or age_range == "null":
+        return None, None
+
+    numbers = [int(n) for n in _AGE_NUMBER_PATTERN.findall(age_range) if 0 < int(n) <= 120]
+    if numbers:
+        age_years = (numbers[0] + numbers[1]) // 2 if len(numbers) > 1 else numbers[0]
+        for group, upper in _AGE_GROUP_UPPER_BOUNDS:
+            if age_years <= upper:
+                return age_years, group
+        return age_years, "senior"
+
+    age_lower = age_range.lower()
+    for group, pattern in _AGE_KEYWORD_PATTERNS:
+        if pattern.search(age_lower):
+            return None, group
+    return None, None
+
+
+def _normalize_gender(gender: Optional[str]) -> Optional[str]:
+    """Map the extracted gender onto masculino/femenino/ambiguo (None if unknown)."""
+    if not gender or gender == "null":
+        return None
+    return _GENDER_ALIASES.get(_normalize_text(gender), "ambiguo")
+
+
+class ProfileService:
+    """Service for profile extraction and adaptive system prompt generation."""
+
+    def __init__(self, llm_service, prompt_cache_size: Optional[int] = None,
+                 templates: Optional[PromptTemplates] = None):
+        """
+        Initialize with LLM service for AI-powered extraction.
+
+        Args:
+            llm_service: LLMService used for extraction calls
+            prompt_cache_size: Users whose system prompt is kept in the LRU
+                cache (PROMPT_CACHE_SIZE, default 1024)
+            templates: Compiled prompt templates (default src/prompts)
+        """
+        self.llm_service = llm_service
+        self.templates = templates or PromptTemplates()
+        self.prompt_cache_size = prompt_cache_size or int(os.getenv("PROMPT_CACHE_SIZE", "1024"))
+        self._prompt_cache: "OrderedDict[Any, tuple]" = OrderedDict()
+        self.prompt_cache_hits = 0
+        self.prompt_cache_misses = 0
+
+    def extract_profile_from_conversation(self, conversation: List[Dict[str, str]],
+                                         existing_profile: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """
+        Extract relevant user information from conversation using LLM.
+
+        Args:
+            conversation: Recent conversation messages
+            existing_profile: Existing profile to update (if any)
+
+        Returns:
+            Updated profile dict
+        """
+        if len(conversation) < 2:
+            return existing_profile or self._get_empty_profile()
+
+        extraction_prompt = self._build_extraction_prompt(conversation)
+
+        try:
+            extracted = self.llm_service.cached_completion(
+                completion_json,
+                messages=[{"role": "user", "content": extraction_prompt}],
+                max_tokens=600,
+                temperature=0.3
+            )
+            return self._apply_extraction(extracted, existing_profile)
+
+        except Exception as e:
+            print(f"Error extracting profile: {str(e)}")
+            return existing_profile or self._get_empty_profile()
+
+    async def aextract_profile_from_conversation(self, conversation: List[Dict[str, str]],
+                                                existing_profile: Optional[Dict[str, Any]] = None,
+                                                user_id: Optional[int] = None) -> Dict[str, Any]:
+        """Async variant of extract_profile_from_conversation backed by AsyncOpenAI."""
+        if len(conversation) < 2:
+            return existing_profile or self._get_empty_profile()
+
+        extraction_prompt = self._build_extraction_prompt(conversation)
+
+        try:
+            extracted = await self.llm_service.acached_completion(
+                completion_json,
+                priority="profile",
+                user_id=user_id,
+                messages=[{"role": "user", "content": extraction_prompt}],
+                max_tokens=600,
+                temperature=0.3
+            )
+            return self._apply_extraction(extracted, existing_profile)
+
+        except Exception as e:
+            print(f"Error extracting profile: {str(e)}")
+            return existing_profile or self._get_empty_profile()
+
+    async def aanalyze_conversation(self, conversation: List[Dict[str, str]],
+                                    profile: bool = True,
+                                    emotion: bool = True,
+                                    known_profile: Optional[Dict[str, Any]] = None,
+                                    user_id: Optional[int] = None) -> Optional[AnalysisResult]:
+        """
+        Extract profile info and/or emotional state in a single LLM call.
+
+        The model answers through function calling with ANALYSIS_FUNCTION's
+        schema, so there is no free-text JSON to parse.
+
+        Args:
+            conversation: Recent conversation messages
+            profile: Request profile extraction (needs 2+ messages)
+            emotion: Request emotional analysis (needs 3+ messages)
+            known_profile: Current profile. When given, the conversation is
+                only the turns not analyzed yet and the extracted profile is a
+                delta (new or corrected info) to merge with _merge_profiles
+            user_id: Owner of the conversation, for fair scheduling. The call
+                has "profile" priority, or "emotion" if only that is requested
+
+        Returns:
+            AnalysisResult with the requested parts (None for parts skipped
+            for lack of messages), or None if the call or validation failed
+        """
+        profile = profile and len(conversation) >= 2
+        emotion = emotion and len(conversation) >= 3
+        if not profile and not emotion:
+            return AnalysisResult()
+
+        analysis_prompt = self._build_analysis_prompt(conversation, profile, emotion, known_profile)
+
+        try:
+            return await self.llm_service.acached_completion(
+                lambda response: self._parse_analysis(response, profile, emotion),
+                priority="profile" if profile else "emotion",
+                user_id=user_id,
+                messages=[{"role": "user", "content": analysis_prompt}],
+                tools=[analysis_tool(profile, emotion)],
+                tool_choice={"type": "function", "function": {"name": ANALYSIS_FUNCTION_NAME}},
+                max_tokens=600 + (400 if profile and emotion else 0),
+                temperature=0.3
+            )
+
+        except Exception as e:
+            print(f"Error in conversation analysis: {str(e)}")
+            return None
+
+    def _parse_analysis(self, response, profile: bool, emotion: bool) -> AnalysisResult:
+        """Validate the forced tool call of an analysis completion."""
+        message = response.choices[0].message
+        arguments = message.tool_calls[0].function.arguments if message.tool_calls else message.content
+        return AnalysisResult.from_arguments(arguments, profile, emotion)
+
+    def _build_analysis_prompt(self, conversation: List[Dict[str, str]],
+                               profile: bool, emotion: bool,
+                               known_profile: Optional[Dict[str, Any]] = None) -> str:
+        """Build the combined profile/emotional analysis prompt."""
+        conv_text = "\n".join([
+            f"{'Usuario' if msg['role'] == 'user' else 'Asistente'}: {msg['content']}"
+            for msg in conversation
+        ])
+
+        roles = []
+        if profile:
+            roles.append("un ANALISTA EXPERTO extrayendo información PERMANENTE sobre el usuario")
+        if emotion:
+            roles.append("un PSICÓLOGO CLÍNICO EXPERTO analizando su estado emocional")
+
+        sections = [f"Actúa como {' y como '.join(roles)}.\n"]
+        if profile:
+            sections.append(f"📋 PERFIL:\n\n{PROFILE_EXTRACTION_GUIDELINES}")
+        if emotion:
+            sections.append(f"🧠 ESTADO EMOCIONAL:\n\n{EMOTIONAL_ANALYSIS_GUIDELINES}")
+
+        if profile and known_profile is not None:
+            sections.append(
+                "PERFIL ACTUAL (ya extraído de mensajes anteriores):\n"
+                f"{self._compact_profile(known_profile)}\n\n"
+                "En \"profile\" devuelve ÚNICAMENTE información nueva o que corrija el perfil\n"
+                "actual; deja null o [] todo lo que no cambie (no repitas lo que ya está en el perfil).\n"
+            )
+
+        sections.append(f"CONVERSACIÓN:\n━━━━━━━━━━━━━━━━━━━━━━━━━━━\n{conv_text}\n━━━━━━━━━━━━━━━━━━━━━━━━━━━\n")
+
+        if profile:
+            sections.append(PROFILE_GENDER_CHECK)
+        if emotion:
+            sections.append(f"ESTADO EMOCIONAL - {EMOTIONAL_EVALUATION_CRITERIA}")
+        sections.append(f"Responde llamando a la función {ANALYSIS_FUNCTION_NAME}.")
+
+        return "\n".join(sections)
+
+    def _compact_profile(self, profile: Dict[str, Any]) -> str:
+        """One-line JSON with only the known profile fields (no bookkeeping keys)."""
+        empty = self._get_empty_profile()
+        known = {
+            key: value for key, value in profile.items()
+            if key in empty and value and value != "null" and value != empty[key]
+            and not (isinstance(value, dict) and not any(v for v in value.values() if v and v != "null"))
+        }
+        return json.dumps(known, ensure_ascii=False, separators=(",", ":"))
+
+    def is_informative_message(self, message: str, previous_reply: Optional[str] = None) -> bool:
+        """
+        Cheap local check of whether a user message is worth a profile extraction.
 
+        Args:
+            message: The new user message
+            previous_reply: The assistant message it answers, if any
+
+        Returns:
+            False for acknowledgements, laughter and other small talk
+            ("ok", "jaja", "vale gracias"); True as soon as the message has a
+            number, a first-person statement, a gendered adjective, a named
+            entity, is long, or answers a question from the assistant.
+        """
+        text = message.strip()
+        if _NUMBER_PATTERN.search(text):
+            return True
+
+        words = _WORD_PATTERN.findall(text.lower())
+        if all(w in _FILLER_WORDS or _LAUGH_PATTERN.match(w) for w in words):
+            return False
+
+        if len(text) >= _LONG_MESSAGE_CHARS:
+            return True
+        if previous_reply and previous_reply.rstrip().endswith("?"):
+            return True
+
+        return bool(
+            _FIRST_PERSON_PATTERN.search(text)
+            or _GENDERED_ADJECTIVE_PATTERN.search(text)
+            or _NAMED_ENTITY_PATTERN.search(text)
+        )
+
+    def _apply_extraction(self, extracted: Dict[str, Any],
+                          existing_profile: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+        """Merge freshly extracted info into the existing profile if there is one."""
+        if existing_profile and existing_profile.get("age_range"):
+            return self._merge_profiles(existing_profile, extracted)
+        return self._normalize_demographics(dict(extracted))
+
+    def _build_extraction_prompt(self, conversation: List[Dict[str, str]]) -> str:
+        """Build the profile extraction prompt for a conversation window."""
+        # Format conversation
+        conv_text = "\n".join([
+            f"{'Usuario' if msg['role'] == 'user' else 'Asistente'}: {msg['content']}"
+            for msg in conversation[-10:]  # Last 10 messages
+        ])
+
+        return f"""Actúa como un ANALISTA EXPERTO extrayendo información PERMANENTE sobre el usuario.
+
+{PROFILE_EXTRACTION_GUIDELINES}
 CONVERSACIÓN:
 ━━━━━━━━━━━━━━━━━━━━━━━━━━━
 {conv_text}
 ━━━━━━━━━━━━━━━━━━━━━━━━━━━
 
-🚨 ANTES DE RESPONDER - VERIFICA GÉNERO:
-¿Hay palabras terminadas en -A describiendo al usuario? (aburrida, cansada, entretenida, ocupada, contenta, etc.) → gender = "femenino"
-¿Hay palabras terminadas en -O describiendo al usuario? (aburrido, cansado, entretenido, ocupado, contento, etc.) → gender = "masculino"
-
+{PROFILE_GENDER_CHECK}
 Responde SOLO con este JSON (sin explicaciones):
 {{
   "name": "nombre del usuario si lo mencionó, sino null",
@@ -242,28 +566,16 @@ Responde SOLO con este JSON (sin explicaciones):
   "tone_preference": "descripción del tono apropiado"
 }}"""
 
-        try:
-            response = self.llm_service.client.chat.completions.create(
-                model=self.llm_service.model,
-                messages=[{"role": "user", "content": extraction_prompt}],
-                max_tokens=600,
-                temperature=0.3
-            )
-
-            extracted = json.loads(response.choices[0].message.content)
-
-            # Merge with existing profile if available
-            if existing_profile and existing_profile.get("age_range"):
-                return self._merge_profiles(existing_profile, extracted)
-            else:
-                return extracted
-
-        except Exception as e:
-            print(f"Error extracting profile: {str(e)}")
-            return existing_profile or self._get_empty_profile()
-
     def _merge_profiles(self, existing: Dict[str, Any], new: Dict[str, Any]) -> Dict[str, Any]:
-        """Merge new extracted info with existing profile, keeping what's valuable."""
+        """
+        Merge new extracted info with existing profile, keeping what's valuable.
+
+        Linear in the size of the lists: entries are deduplicated by
+        normalized key, important_facts are checked against other fields
+        with precompiled patterns and against each other through a word
+        index, and every list is capped by PROFILE_LIST_LIMITS (oldest
+        entries evicted first).
+        """
         merged = existing.copy()
 
         # Update scalar fields if new info is more specific
@@ -271,74 +583,19 @@ Responde SOLO con este JSON (sin explicaciones):
             if new.get(key) and new[key] != "null":
                 merged[key] = new[key]
 
-        # Merge arrays (deduplicate)
-        for key in ["interests", "important_facts", "sensitive_topics", "personality_traits", "needs"]:
-            if key in new and new[key]:
-                existing_items = set(merged.get(key, []))
-                new_items = set(new[key]) if isinstance(new[key], list) else set()
-                merged[key] = list(existing_items | new_items)
+        # Merge arrays (deduplicate, newest last)
+        for key, limit in PROFILE_LIST_LIMITS.items():
+            items = list(merged.get(key) or [])
+            if isinstance(new.get(key), list):
+                items.extend(new[key])
+            merged[key] = self._dedupe_items(items, None if key == "important_facts" else limit)
 
         # CRITICAL: Clean up important_facts to avoid duplication with other fields
-        facts = merged.get("important_facts", [])
-        cleaned_facts = []
-
-        # Get all other fields for comparison
-        profession = merged.get("profession", "").lower() if merged.get("profession") else ""
-        education = merged.get("education", "").lower() if merged.get("education") else ""
-        interests = [i.lower() for i in merged.get("interests", [])]
-
-        for fact in facts:
-            fact_lower = fact.lower()
-            should_skip = False
+        merged["important_facts"] = self._clean_facts(
+            merged["important_facts"], merged, PROFILE_LIST_LIMITS["important_facts"]
+        )
 
-            # Skip if it's about profession
-            if profession and profession != "null":
-                if any(word in fact_lower for word in ["trabaja como", "trabaja de", "es un", "es una", "su trabajo", "su ocupación"]):
-                    if profession in fact_lower or "trabajador" in fact_lower:
-                        should_skip = True
-                if fact_lower in ["trabaja", "tiene trabajo", "trabaja como trabajador"]:
-                    should_skip = True
-
-            # Skip if it's about an interest/hobby (redundant with interests field)
-            for interest in interests:
-                # Check if the fact mentions this interest
-                if interest in fact_lower or fact_lower in interest:
-                    should_skip = True
-                    break
-                # Check common patterns for interests
-                if any(pattern.format(interest) in fact_lower for pattern in [
-                    "le gusta {}", "le encanta {}", "{} es su pasión", "disfruta {}",
-                    "le apasiona {}", "practica {}", "{}"
-                ]):
-                    should_skip = True
-                    break
-
-            # Skip if it's about education (redundant with education field)
-            if education and education != "null":
-                if any(word in fact_lower for word in ["estudió", "graduado en", "título en", "carrera de"]):
-                    if education in fact_lower:
-                        should_skip = True
-
-            if not should_skip:
-                cleaned_facts.append(fact)
-
-        # Additional deduplication: remove semantically similar facts
-        final_facts = []
-        for fact in cleaned_facts:
-            # Check if this fact is not already represented by a similar one
-            is_duplicate = False
-            for existing_fact in final_facts:
-                # Simple similarity check: if facts share many words, they're duplicates
-                fact_words = set(fact.lower().split())
-                existing_words = set(existing_fact.lower().split())
-                overlap = len(fact_words & existing_words)
-                if overlap >= 2 and overlap >= len(fact_words) * 0.5:
-                    is_duplicate = True
-                    break
-            if not is_duplicate:
-                final_facts.append(fact)
-
-        merged["important_facts"] = final_facts
+        self._normalize_demographics(merged)
 
         # Update nested objects
         if new.get("political_stance") and any(v for v in new["political_stance"].values() if v and v != "null"):
@@ -349,121 +606,189 @@ Responde SOLO con este JSON (sin explicaciones):
 
         return merged
 
-    def generate_system_prompt(self, profile: Dict[str, Any],
-                              emotional_state: Optional[Dict[str, Any]] = None) -> str:
-        """
-        Generate adaptive system prompt based on user profile and emotional state.
-
-        This is the core of the personality adaptation system.
-        """
-        # Check emotional state for guardrails
-        mode = "normal"
-        if emotional_state:
-            mode = emotional_state.get("recommended_mode", "normal")
-            support_needed = emotional_state.get("support_needed", "none")
+    def _normalize_demographics(self, profile: Dict[str, Any]) -> Dict[str, Any]:
+        """Store age_years/age_group parsed from age_range and a canonical gender."""
+        profile["age_years"], profile["age_group"] = _classify_age(profile.get("age_range"))
+        profile["gender"] = _normalize_gender(profile.get("gender"))
+        return profile
+
+    def _age_group(self, profile: Dict[str, Any]) -> Optional[str]:
+        """Stored age_group (parsed on the fly for profiles saved before it existed)."""
+        if "age_group" in profile:
+            return profile["age_group"]
+        return _classify_age(profile.get("age_range"))[1]
+
+    def _dedupe_items(self, items: List[str], limit: Optional[int]) -> List[str]:
+        """Drop repeated entries (by normalized key) keeping the newest, then cap."""
+        kept = []
+        seen = set()
+        for item in reversed(items):
+            if not isinstance(item, str):
+                continue
+            key = _normalize_text(item)
+            if not key or key in seen:
+                continue
+            seen.add(key)
+            kept.append(item)
+            if limit is not None and len(kept) >= limit:
+                break
 
-        # Generate identity section
-        identity = self._generate_identity_section(profile, mode)
+        kept.reverse()
+        return kept
 
-        # Generate profile summary
-        profile_summary = self._generate_profile_summary(profile)
+    def _clean_facts(self, facts: List[str], merged: Dict[str, Any], limit: int) -> List[str]:
+        """
+        Drop facts redundant with profession, education or interests, and
+        near-duplicates (2+ shared content words covering half the fact).
 
-        # Generate behavior instructions
-        behavior = self._generate_behavior_instructions(profile, mode)
+        Facts are visited newest first, so the newest wording of a fact wins
+        and the oldest facts are the ones left out by the cap.
+        """
+        profession = _normalize_text(merged.get("profession") or "")
+        education = _normalize_text(merged.get("education") or "")
+        interests = [i for i in (_normalize_text(i) for i in merged.get("interests", [])) if i]
+        interest_pattern = re.compile("|".join(re.escape(i) for i in interests)) if interests else None
+        longest_interest = max((len(i) for i in interests), default=0)
 
-        # Generate guardrails
-        guardrails = self._generate_guardrails(emotional_state)
+        kept = []
+        word_index: Dict[str, List[int]] = {}
+        for fact in reversed(facts):
+            fact_key = _normalize_text(fact)
 
-        # Generate proactive questions to fill profile
-        proactive_questions = self.generate_proactive_questions(profile)
+            # Skip if it's about profession
+            if profession and profession != "null":
+                if _PROFESSION_FACT_PATTERN.search(fact_key) and (profession in fact_key or "trabajador" in fact_key):
+                    continue
+                if fact_key in _TRIVIAL_WORK_FACTS:
+                    continue
 
-        # Check if user is young to add slang reminder
-        age = profile.get("age_range") or ""
-        is_young = any(word in age.lower() for word in ["niño", "adolescente", "preadolescente"]) or any(str(n) in age for n in range(10, 21))
+            # Skip if it's about an interest/hobby (redundant with interests field)
+            if interest_pattern and interest_pattern.search(fact_key):
+                continue
+            if len(fact_key) <= longest_interest and any(fact_key in i for i in interests):
+                continue
 
-        slang_reminder = ""
-        if is_young:
-            slang_reminder = """
-━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━
-🚨🚨🚨 ADVERTENCIA CRÍTICA - LEER ANTES DE RESPONDER 🚨🚨🚨
-━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━
+            # Skip if it's about education (redundant with education field)
+            if education and education != "null":
+                if _EDUCATION_FACT_PATTERN.search(fact_key) and education in fact_key:
+                    continue
+
+            # Skip if a kept fact already shares most of its words
+            words = {w for w in fact_key.split() if w not in _FACT_STOPWORDS}
+            shared = Counter(position for w in words for position in word_index.get(w, ()))
+            if any(n >= 2 and n >= len(words) * 0.5 for n in shared.values()):
+                continue
+
+            for w in words:
+                word_index.setdefault(w, []).append(len(kept))
+            kept.append(fact)
+            if len(kept) >= limit:
+                break
 
-❌❌❌ PALABRAS QUE TE HACEN PARECER VIEJO Y CRINGE ❌❌❌
-BAJO NINGUNA CIRCUNSTANCIA uses estas palabras:
+        kept.reverse()
+        return kept
 
-🚫 "GUAY" → TE HACE PARECER DE 40 AÑOS
-🚫 "MOLA" → TE HACE PARECER DE 40 AÑOS
-🚫 "CHACHI" → TE HACE PARECER DE 50 AÑOS
-🚫 "GENIAL" → TE HACE PARECER FORMAL/VIEJO
-🚫 "UNA PASADA" → TE HACE PARECER DE 35+ AÑOS
-🚫 "FLIPAR" (como verbo activo) → TE HACE PARECER MILLENNIAL VIEJO
+    def get_system_prompt(self, user_id: int, profile: Dict[str, Any],
+                          emotional_state: Optional[Dict[str, Any]] = None) -> str:
+        """
+        Cached generate_system_prompt.
 
-✅✅✅ USA ESTAS EN SU LUGAR ✅✅✅
-→ En lugar de "guay": "PEC", "brutal", "increíble"
-→ En lugar de "mola": "me gusta", "es PEC", "me renta"
-→ En lugar de "una pasada": "PEC", "brutal", "chetado"
-→ En lugar de "flipar": "alucinar", "es una locura"
-→ En lugar de "genial": "PEC", "brutal", "increíble"
+        Prompts are cached per user and reused while the profile version
+        (bumped on every profile or emotional state write) is unchanged, so
+        consecutive turns send a byte-identical system prompt.
+        """
+        fingerprint = self._profile_fingerprint(profile, emotional_state)
 
-⚡ USA FRECUENTEMENTE:
-✅ "Literal" → ÚSALO MUCHO: "Literal te entiendo", "Es literal lo mejor"
-✅ "En plan" → ÚSALO PARA TODO: "en plan Creativo", "en plan sí"
-✅ "Bro/Tete" → ÚSALO COMO VOCATIVO: "Bro, escucha", "Tete, mira"
-✅ "PEC" → SUSTITUTO DE "GUAY": "Eso es PEC", "Un mapa PEC"
+        cached = self._prompt_cache.get(user_id)
+        if cached and cached[0] == fingerprint:
+            self.prompt_cache_hits += 1
+            self._prompt_cache.move_to_end(user_id)
+            return cached[1]
 
-EJEMPLO CORRECTO: "Literal, el Creativo es PEC. ¿Has creado algún mapa brutal?"
-EJEMPLO INCORRECTO: "¡Literal, el Creativo es una pasada! ¿Has creado algún mapa guay?"
+        self.prompt_cache_misses += 1
+        system_prompt = self.generate_system_prompt(profile, emotional_state)
+        self._prompt_cache[user_id] = (fingerprint, system_prompt)
+        self._prompt_cache.move_to_end(user_id)
+        while len(self._prompt_cache) > self.prompt_cache_size:
+            self._prompt_cache.popitem(last=False)
 
-━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━
-"""
+        return system_prompt
 
-        # Assemble full system prompt
-        system_prompt = f"""{identity}
-{slang_reminder}
-{profile_summary}
+    def prompt_cache_stats(self) -> Dict[str, Any]:
+        """Hit/miss counters for the system prompt cache."""
+        lookups = self.prompt_cache_hits + self.prompt_cache_misses
+        return {
+            "size": len(self._prompt_cache),
+            "max_size": self.prompt_cache_size,
+            "hits": self.prompt_cache_hits,
+            "misses": self.prompt_cache_misses,
+            "hit_rate": self.prompt_cache_hits / lookups if lookups else 0.0
+        }
 
-{behavior}
+    def _profile_fingerprint(self, profile: Dict[str, Any],
+                             emotional_state: Optional[Dict[str, Any]]) -> Any:
+        """Version of the inputs to generate_system_prompt (hash if unversioned)."""
+        if profile.get("profile_version") is not None:
+            return ("version", profile["profile_version"], self.templates.generation)
 
-{guardrails}
+        content = json.dumps([profile, emotional_state], sort_keys=True, default=str)
+        return ("hash", hashlib.sha256(content.encode()).hexdigest(), self.templates.generation)
 
-{proactive_questions}
-{slang_reminder}
-RECUERDA:
-- Eres su igual, pero con expertise en sus intereses
-- Habla naturalmente como alguien de su edad y contexto
-- Sé proactivo sobre temas que le apasionan
-- SIEMPRE prioriza su bienestar sobre "actuar como él"
-- Mantén consistencia con conversaciones previas
-- Si algo no encaja con su perfil, el usuario puede haber cambiado - adapta
+    def generate_system_prompt(self, profile: Dict[str, Any],
+                              emotional_state: Optional[Dict[str, Any]] = None) -> str:
+        """
+        Generate adaptive system prompt based on user profile and emotional state.
 
-¡Ahora conversa naturalmente!"""
+        This is the core of the personality adaptation system. The prompt is
+        rendered from the system_prompt template: guardrails, rules and the
+        age-group style are static text at the start, so every user of the
+        same age group shares that prefix (provider-side prompt caching);
+        only the slots after it are filled per user.
+        """
+        mode = "normal"
+        if emotional_state:
+            mode = emotional_state.get("recommended_mode", "normal")
 
-        return system_prompt
+        age_group = self._age_group(profile)
+        is_young = age_group in _YOUNG_AGE_GROUPS
+
+        return self.templates.render(
+            "system_prompt",
+            style=self.templates.render(self._style_template(age_group)),
+            slang_reminder=self.templates.render("slang_reminder") if is_young else "",
+            identity=self._generate_identity_section(profile, mode),
+            profile_summary=self._generate_profile_summary(profile),
+            personal_instructions=self._generate_behavior_instructions(profile, mode),
+            alert=self._generate_guardrails(emotional_state),
+            proactive_questions=self.generate_proactive_questions(profile)
+        )
+
+    def _style_template(self, age_group: Optional[str]) -> str:
+        """Name of the static behavior template for an age group."""
+        # Generación Alfa (10-13) - incluye "preadolescente" para rango amplio
+        if age_group in ("child", "preteen"):
+            return "style_gen_alfa"
+        # Generación Z (14-20)
+        if age_group in ("teen", "young_adult"):
+            return "style_gen_z"
+        return "style_adult"
 
     def _generate_identity_section(self, profile: Dict[str, Any], mode: str) -> str:
         """Generate the identity/role section of system prompt."""
         age = profile.get("age_range") or "adulto"
+        age_group = self._age_group(profile)
         interests = profile.get("interests") or []
         profession = profile.get("profession")
 
         if mode in ["supportive", "empathetic", "crisis"]:
-            return f"""IDENTIDAD Y ROL:
-Eres un amigo cercano y comprensivo.
-Te preocupas genuinamente por el usuario y quieres ayudar.
-
-🚨 MODO: APOYO EMOCIONAL ACTIVADO
-- Prioriza el bienestar emocional sobre todo
-- Sé empático, paciente, y cálido
-- Ofrece ayuda práctica si es apropiado
-- No minimices sus sentimientos
-- Si detectas riesgo grave, sugiere ayuda profesional"""
+            return self.templates.render("identity_support")
 
         # Normal/friendly mode
-        if "niño" in age.lower() or any(x in age for x in ["8", "9", "10", "11", "12"]):
+        if age_group in ("child", "preteen"):
             peer = f"un amigo de tu edad"
             if interests:
                 peer += f" al que le encanta {interests[0]}"
-        elif "adolescente" in age.lower() or any(x in age for x in ["13", "14", "15", "16", "17"]):
+        elif age_group == "teen":
             peer = f"un colega adolescente"
             if interests:
                 peer += f" experto en {interests[0]}"
@@ -476,36 +801,28 @@ Te preocupas genuinamente por el usuario y quieres ayudar.
             if interests:
                 peer += f" con pasión por {interests[0]}"
 
-        return f"""IDENTIDAD Y ROL:
-Eres {peer}.
-Compartes intereses y hablas como {self._get_language_style(age)}.
-
-TU PERSONALIDAD:
-- Edad: Similar a {age}
-- Intereses compartidos: {', '.join(interests[:3]) if interests else 'varios temas'}
-- Rol: Amigo/igual que además es experto en {interests[0] if interests else 'muchos temas'}"""
-
-    def _get_language_style(self, age: str) -> str:
-        """Get appropriate language style for age."""
-        if not age:
+        return self.templates.render(
+            "identity",
+            peer=peer,
+            language_style=self._get_language_style(age_group or "adult"),
+            age=age,
+            shared_interests=", ".join(interests[:3]) if interests else "varios temas",
+            expert_topic=interests[0] if interests else "muchos temas"
+        )
+
+    def _get_language_style(self, age_group: Optional[str]) -> str:
+        """Get appropriate language style for an age group."""
+        if not age_group:
             return "un español (natural, amigable)"
 
-        age_lower = age.lower()
-        # Detectar edad numérica
-        age_number = None
-        for num in ["10", "11", "12", "13", "14", "15", "16", "17", "18", "19", "20"]:
-            if num in age:
-                age_number = int(num)
-                break
-
         # Generación Alfa (10-13) - incluye "preadolescente" para rango amplio
-        if "niño" in age_lower or "preadolescente" in age_lower or (age_number and 10 <= age_number <= 13):
+        if age_group in ("child", "preteen"):
             return "un colega de tu edad de la Generación Alfa española (usa jerga viral 2024-2025: literal, en plan, rizz, PEC, cringe, chetado, bro)"
         # Generación Z (14-20)
-        elif "adolescente" in age_lower or (age_number and 14 <= age_number <= 20):
+        elif age_group in ("teen", "young_adult"):
             return "un colega de tu edad de la Generación Z española (usa jerga natural 2024-2025: en plan, literal, me renta, PEC, cringe, crush, tete, bro)"
         # Adultos mayores
-        elif "senior" in age_lower or any(x in age for x in ["70", "75", "80"]):
+        elif age_group == "senior":
             return "un adulto mayor español (cálido, experimentado - sin emojis ni jerga)"
         # Adultos normales
         else:
@@ -579,102 +896,16 @@ TU PERSONALIDAD:
         return "\n".join(parts)
 
     def _generate_behavior_instructions(self, profile: Dict[str, Any], mode: str) -> str:
-        """Generate behavior instructions."""
-        age = profile.get("age_range") or "adulto"
+        """Generate the per-user behavior instructions (age-group style is a static template)."""
+        age_group = self._age_group(profile)
         interests = profile.get("interests") or []
         tone = profile.get("tone_preference") or "amigable y natural"
 
-        instructions = ["INSTRUCCIONES DE COMPORTAMIENTO:"]
-
-        # Detectar edad numérica para clasificar generación
-        age_number = None
-        for num in ["10", "11", "12", "13", "14", "15", "16", "17", "18", "19", "20"]:
-            if num in age:
-                age_number = int(num)
-                break
-
-        # GENERACIÓN ALFA (10-13 años) - Brain Rot / Skibidi Generation
-        # Incluye "preadolescente" para rango amplio inferido por jerga
-        if "niño" in age.lower() or "preadolescente" in age.lower() or (age_number and 10 <= age_number <= 13):
-            instructions.append("\n🎮 ESTILO GENERACIÓN ALFA (2024-2025) - ESPAÑA:")
-            instructions.append("- Usa lenguaje SIMPLE pero con jerga viral actual")
-            instructions.append("- Emojis MUY OCASIONALMENTE: 💀🔥🗿 (solo cuando encaje)")
-            instructions.append("\n📱 VOCABULARIO OBLIGATORIO (úsalo naturalmente):")
-            instructions.append("  * 'Literal' como intensificador: 'Literal me encanta' / 'Literal es lo mejor'")
-            instructions.append("  * 'En plan' para ejemplificar: 'Es en plan muy guay' / 'Juegos en plan Minecraft'")
-            instructions.append("  * 'Rizz' (carisma/ligar): 'Tienes buen rizz con eso' / 'Es un rizzler'")
-            instructions.append("  * 'PEC' (algo increíble): 'Eso es PEC' / 'Tu setup PEC'")
-            instructions.append("  * 'Cringe' (vergüenza ajena): 'Qué cringe' / 'Eso da cringe'")
-            instructions.append("  * 'Chetado' (muy bueno/poderoso): 'Está chetado' / 'Es chetadísimo'")
-            instructions.append("  * 'Bro' / 'Tete' / 'Socio' como apelativo de amistad")
-            instructions.append("  * 'Random' (aleatorio/raro): 'Eso es muy random'")
-            instructions.append("\n⚠️ USA IRONÍA GEN ALFA (OPCIONAL, solo si encaja):")
-            instructions.append("  * 'Skibidi' (absurdo/raro): 'Eso es skibidi' [SOLO si el contexto es muy informal]")
-            instructions.append("  * 'Sigma' (cara seria/misterioso): 'Modo sigma activado' [SOLO irónicamente]")
-            instructions.append("\n💬 EJEMPLOS DE FRASES CORRECTAS:")
-            instructions.append("  → 'Bro, literal ese juego es PEC, está chetadísimo'")
-            instructions.append("  → 'Tus zapatillas en plan tienen buen rizz'")
-            instructions.append("  → 'Eso da un cringe increíble, no lo hagas'")
-            instructions.append("  → '¿Te renta jugar luego?' (¿te apetece?)")
-            instructions.append("  → 'Literal, a mí también me pasan esas partidas random'")
-            instructions.append("  → 'Me gusta jugar en plan Creativo' (NO 'en modo Creativo')")
-            instructions.append("\n🚫 PALABRAS ABSOLUTAMENTE PROHIBIDAS (TE HACEN PARECER VIEJO):")
-            instructions.append("  ❌ 'Guay' - NUNCA (pareces de 40 años)")
-            instructions.append("  ❌ 'Mola' - NUNCA (pareces de 40 años)")
-            instructions.append("  ❌ 'Chachi' - NUNCA (pareces de 50 años)")
-            instructions.append("  ❌ 'Genial' - NUNCA (muy formal/viejo)")
-            instructions.append("  ❌ 'Una pasada' - NUNCA (pareces de 35+ años)")
-            instructions.append("  ❌ 'Flipar' - NUNCA (millennial viejo)")
-            instructions.append("  ❌ 'en modo X' - SIEMPRE 'en plan X'")
-            instructions.append("\n⚡ USA FRECUENTEMENTE:")
-            instructions.append("  ✅ 'Literal' al inicio de frases: 'Literal te entiendo', 'Literal es así'")
-            instructions.append("  ✅ 'En plan' en lugar de otras construcciones: 'en plan Creativo', 'en plan rápido'")
-
-        # GENERACIÓN Z (14-20 años) - Jerga Urbana Española
-        elif "adolescente" in age.lower() or (age_number and 14 <= age_number <= 20):
-            instructions.append("\n🔥 ESTILO GENERACIÓN Z (2024-2025) - ESPAÑA:")
-            instructions.append("- Tono natural, relajado, sin forzar")
-            instructions.append("- Emojis MUY OCASIONALMENTE: 💀😭🔥 (solo si realmente encaja)")
-            instructions.append("\n📱 VOCABULARIO OBLIGATORIO (intégralo de forma natural):")
-            instructions.append("  * 'En plan' (muletilla universal): 'Es que en plan no me apetece' / 'Me gusta en plan el indie'")
-            instructions.append("  * 'Literal' (totalmente de acuerdo): 'Literal te entiendo' / 'Literal es así'")
-            instructions.append("  * 'Me renta / No me renta' (me apetece / vale la pena): '¿Te renta ir?' / 'Eso no me renta'")
-            instructions.append("  * 'PEC' (algo increíble): 'Ese plan PEC' / 'La canción es PEC'")
-            instructions.append("  * 'Cringe' o 'Lache' (vergüenza): 'Qué cringe da' / 'Me da lache'")
-            instructions.append("  * 'Tipo' / 'Rollo' (comparación vaga): 'Música tipo indie' / 'No es mi rollo'")
-            instructions.append("  * 'Crush' (amor platónico): 'Es mi crush' / 'Tienes crush con alguien?'")
-            instructions.append("  * 'Simp' (sumiso romántico): 'No seas simp' / 'Está siendo muy simp'")
-            instructions.append("  * 'Red flag' / 'Green flag' (señal de alerta/positiva): 'Eso es red flag' / 'Qué green flag'")
-            instructions.append("  * 'Ghosting' (ignorar/desaparecer): 'Le hizo ghosting' / 'No me ghostees'")
-            instructions.append("  * 'Bro' / 'Tete' / 'Socio' / 'Nano' (apelativo amigo)")
-            instructions.append("\n💬 EJEMPLOS DE FRASES CORRECTAS:")
-            instructions.append("  → 'Tete, literal no me renta salir hoy, en plan tengo mucha pereza'")
-            instructions.append("  → 'Ese plan es PEC, me apunto seguro'")
-            instructions.append("  → 'Bro, eso que dijiste es súper cringe'")
-            instructions.append("  → 'Tiene todas las red flags, no salgas con él'")
-            instructions.append("  → 'Es mi crush, pero me da lache hablarle'")
-            instructions.append("  → 'Literal, a mí también me pasa' (usa 'literal' frecuentemente)")
-            instructions.append("  → 'Me gusta en plan el indie' (NO 'el género indie')")
-            instructions.append("  → 'Jugar en plan Creativo' (NO 'en modo Creativo')")
-            instructions.append("\n🚫 PALABRAS ABSOLUTAMENTE PROHIBIDAS (TE HACEN PARECER VIEJO/CRINGE):")
-            instructions.append("  ❌ 'Guay' - NUNCA (pareces de 40 años)")
-            instructions.append("  ❌ 'Mola' - NUNCA (pareces de 40 años)")
-            instructions.append("  ❌ 'Chachi' - NUNCA (pareces de 50 años)")
-            instructions.append("  ❌ 'Genial' - NUNCA (muy formal/viejo)")
-            instructions.append("  ❌ 'Una pasada' - NUNCA (pareces de 35+ años)")
-            instructions.append("  ❌ 'Flipar' como verbo - NUNCA (millennial viejo)")
-            instructions.append("  ❌ 'en modo X' - SIEMPRE 'en plan X'")
-            instructions.append("\n⚡ USA FRECUENTEMENTE:")
-            instructions.append("  ✅ 'Literal' al inicio/medio de frases: 'Literal te entiendo', 'Es literal lo mejor'")
-            instructions.append("  ✅ 'En plan' para TODO: 'en plan rápido', 'en plan sí', 'en plan no sé'")
-            instructions.append("  ✅ 'Bro' / 'Tete' como vocativo: 'Bro, escucha', 'Tete, te digo'")
-            instructions.append("  ✅ 'Me renta / No me renta' en lugar de 'me apetece / no me apetece'")
+        instructions = []
 
         # ADULTOS (21+)
-        else:
+        if age_group not in _YOUNG_AGE_GROUPS:
             instructions.append(f"- Tono: {tone}")
-            instructions.append("- NO uses emojis")
-            instructions.append("- Lenguaje estándar, profesional pero cercano")
 
         # Interests (para todas las edades)
         if interests:
@@ -688,23 +919,19 @@ TU PERSONALIDAD:
             instructions.append(f"\n📝 CONTEXTO:")
             instructions.append(f"- Recuerda: {facts[0]}")
 
-        return "\n".join(instructions)
+        if not instructions:
+            return ""
+        return "INSTRUCCIONES PARA ESTE USUARIO:\n" + "\n".join(instructions) + "\n"
 
     def _generate_guardrails(self, emotional_state: Optional[Dict[str, Any]]) -> str:
-        """Generate safety guardrails."""
-        base_guardrails = """GUARDARRAÍLES SIEMPRE ACTIVOS:
-⚠️ Si detectas angustia/depresión → cambia a modo empático
-⚠️ Si el usuario tiene comportamiento autodestructivo → NO lo copies, ofrece perspectiva
-⚠️ Si menciona autolesión → expresa preocupación, sugiere ayuda profesional
-⚠️ Siempre prioriza bienestar sobre "ser como el usuario\""""
-
+        """Generate the current alert (the base guardrails are in the static template)."""
         if emotional_state and emotional_state.get("support_needed") in ["high", "urgent"]:
             concerns = emotional_state.get("detected_concerns", [])
             if concerns:
-                base_guardrails += f"\n\n🚨 ALERTA ACTUAL: {', '.join(concerns[:2])}"
-                base_guardrails += "\n   → Mantén tono de apoyo y considera sugerir ayuda profesional"
+                return (f"\n🚨 ALERTA ACTUAL: {', '.join(concerns[:2])}"
+                        "\n   → Mantén tono de apoyo y considera sugerir ayuda profesional\n")
 
-        return base_guardrails
+        return ""
 
     def generate_proactive_questions(self, profile: Dict[str, Any]) -> str:
         """Generate proactive questions to fill missing profile information."""
@@ -714,6 +941,7 @@ TU PERSONALIDAD:
         # Check what's missing
         name = profile.get("name")
         age = profile.get("age_range")
+        age_group = self._age_group(profile)
         gender = profile.get("gender")
         profession = profile.get("profession")
         interests = profile.get("interests", [])
@@ -731,13 +959,13 @@ TU PERSONALIDAD:
             missing_info.append("gender_ambiguous")
 
         # Priority 4: Basic info based on what we know
-        if age and "niño" in age.lower():
+        if age_group in ("child", "preteen"):
             # For kids: ask about school
             if not profession and "school" not in missing_info:
                 missing_info.append("school_grade")
             if len(interests) < 2:
                 missing_info.append("kid_interests")
-        elif gender in ["femenino", "masculino"] or (age and "adulto" in age.lower()):
+        elif gender in ["femenino", "masculino"] or age_group in ("young_adult", "adult", "senior"):
             # For adults: ask about work/family
             # Only ask profession if we're not already asking to deduce gender
             if not profession and "gender_ambiguous" not in missing_info:
@@ -0,0 +1,196 @@
+"""
+Profile store: in-memory cache of decoded user profiles with write-behind.
+
+Reads are served from an LRU of decoded profiles. Writes update the cached
+copy, bump its version and mark it dirty; dirty profiles are flushed to
+SQLite in one batched transaction every few seconds and on shutdown.
+Clean entries are reloaded after a TTL, so writes made outside this process
+(e.g. the emotional batch CLI) show up without a restart.
+"""
+
+import asyncio
+import os
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+
+
+class ProfileStore:
+    """LRU-bounded profile cache in front of the user_profiles table."""
+
+    def __init__(self, adb, max_size: Optional[int] = None, flush_interval: Optional[float] = None,
+                 ttl: Optional[float] = None):
+        """
+        Args:
+            adb: AsyncDatabase used for loads and batched flushes.
+            max_size: Profiles kept in memory (PROFILE_CACHE_SIZE, default 10000).
+            flush_interval: Seconds between write-behind flushes
+                (PROFILE_FLUSH_INTERVAL, default 5).
+            ttl: Seconds before a clean profile is re-read from the database
+                (PROFILE_CACHE_TTL, default 300; 0 = never).
+        """
+        self.adb = adb
+        self.max_size = max_size or int(os.getenv("PROFILE_CACHE_SIZE", "10000"))
+        self.flush_interval = flush_interval or float(os.getenv("PROFILE_FLUSH_INTERVAL", "5"))
+        self.ttl = ttl if ttl is not None else float(os.getenv("PROFILE_CACHE_TTL", "300"))
+        self._cache: "OrderedDict[int, Dict[str, Any]]" = OrderedDict()
+        self._loaded_at: Dict[int, float] = {}
+        self._dirty_profiles = set()
+        self._dirty_emotional = set()
+        # Profiles being written by flush(), pinned in the cache like dirty ones
+        self._flushing: Dict[int, Dict[str, Any]] = {}
+        self._flush_lock = asyncio.Lock()
+        self._flush_task = None
+        self.hits = 0
+        self.misses = 0
+        self.expired = 0
+        self.flushed_writes = 0
+
+    async def start(self):
+        """Start the periodic flush task."""
+        self._flush_task = asyncio.create_task(self._flush_loop())
+
+    async def stop(self):
+        """Stop the flush task and write out everything still dirty."""
+        if self._flush_task:
+            self._flush_task.cancel()
+            await asyncio.gather(self._flush_task, return_exceptions=True)
+            self._flush_task = None
+        await self.flush()
+
+    async def get(self, user_id: int) -> Optional[Dict[str, Any]]:
+        """Get a profile (shallow copy), loading it from the database on a miss."""
+        cached = self._cache.get(user_id)
+        if cached is not None and self._expired(user_id):
+            self.expired += 1
+            cached = None
+        if cached is not None:
+            self.hits += 1
+            self._cache.move_to_end(user_id)
+            return dict(cached)
+
+        self.misses += 1
+        profile = await self.adb.get_user_profile(user_id)
+        if profile is None:
+            return None
+
+        self._put(user_id, profile)
+        return dict(profile)
+
+    async def create(self, user_id: int, profile: Dict[str, Any]) -> bool:
+        """Create a profile row right away (not deferred) and cache it."""
+        created = await self.adb.create_user_profile(user_id, profile)
+        if created:
+            self._put(user_id, {**profile, "profile_version": 0})
+        return created
+
+    async def update(self, user_id: int, profile: Dict[str, Any]):
+        """Replace a profile; persisted on the next flush."""
+        cached = self._cache.get(user_id) or await self.adb.get_user_profile(user_id) or {}
+        updated = dict(profile)
+        if "emotional_state" in cached:
+            updated["emotional_state"] = cached["emotional_state"]
+        updated["profile_version"] = cached.get("profile_version", 0) + 1
+
+        self._put(user_id, updated)
+        self._dirty_profiles.add(user_id)
+
+    async def update_emotional_state(self, user_id: int, emotional_state: Dict[str, Any]):
+        """Set the emotional state of a profile; persisted on the next flush."""
+        cached = self._cache.get(user_id) or await self.adb.get_user_profile(user_id)
+        if cached is None:
+            return
+
+        updated = dict(cached)
+        updated["emotional_state"] = emotional_state
+        updated["profile_version"] = cached.get("profile_version", 0) + 1
+
+        self._put(user_id, updated)
+        self._dirty_emotional.add(user_id)
+
+    def invalidate(self, user_id: int):
+        """Drop a clean cached profile so the next read goes to the database."""
+        if not self._pinned(user_id):
+            self._cache.pop(user_id, None)
+            self._loaded_at.pop(user_id, None)
+
+    async def flush(self) -> int:
+        """Write all dirty profiles in one transaction. Returns rows written."""
+        async with self._flush_lock:
+            if not self._dirty_profiles and not self._dirty_emotional:
+                return 0
+
+            # Dirty ids are always cached (pinned), but never index a missing one
+            profiles = [(user_id, self._cache[user_id]) for user_id in self._dirty_profiles
+                        if user_id in self._cache]
+            emotional = [(user_id, self._cache[user_id]) for user_id in self._dirty_emotional
+                         if user_id in self._cache]
+            self._dirty_profiles.intersection_update(self._cache)
+            self._dirty_emotional.intersection_update(self._cache)
+            # Ids stay dirty (and pinned) until the write commits
+            self._flushing = dict(profiles + emotional)
+
+            try:
+                written = await self.adb.save_profiles_batch(profiles, emotional)
+            except Exception as e:
+                print(f"Error flushing profiles: {str(e)}")
+                return 0
+            finally:
+                flushed, self._flushing = self._flushing, {}
+
+            # Entries replaced during the write stay dirty for the next flush
+            for user_id, profile in flushed.items():
+                if self._cache.get(user_id) is profile:
+                    self._dirty_profiles.discard(user_id)
+                    self._dirty_emotional.discard(user_id)
+            self.flushed_writes += written
+            return written
+
+    def stats(self) -> Dict[str, Any]:
+        """Hit/miss and write-behind counters."""
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._cache),
+            "max_size": self.max_size,
+            "hits": self.hits,
+            "misses": self.misses,
+            "expired": self.expired,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "dirty": len(self._dirty_profiles | self._dirty_emotional),
+            "flushed_writes": self.flushed_writes
+        }
+
+    def _expired(self, user_id: int) -> bool:
+        """Clean entry older than the TTL (dirty ones are newer than the database)."""
+        return (
+            self.ttl > 0
+            and time.monotonic() - self._loaded_at.get(user_id, 0.0) > self.ttl
+            and not self._pinned(user_id)
+        )
+
+    def _pinned(self, user_id: int) -> bool:
+        """Dirty or being flushed: the cached copy is newer than the database."""
+        return (user_id in self._dirty_profiles or user_id in self._dirty_emotional
+                or user_id in self._flushing)
+
+    def _put(self, user_id: int, profile: Dict[str, Any]):
+        self._cache[user_id] = profile
+        self._cache.move_to_end(user_id)
+        self._loaded_at[user_id] = time.monotonic()
+
+        # Evict least recently used clean entries; dirty ones wait for a flush
+        if len(self._cache) > self.max_size:
+            for candidate in list(self._cache):
+                if len(self._cache) <= self.max_size:
+                    break
+                if not self._pinned(candidate):
+                    del self._cache[candidate]
+                    del self._loaded_at[candidate]
+
+    async def _flush_loop(self):
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            try:
+                await self.flush()
+            except Exception as e:
+                print(f"Error in profile flush loop: {str(e)}")
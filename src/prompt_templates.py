@@ -0,0 +1,135 @@
+"""
+Prompt template engine for the adaptive system prompt.
+
+Templates live in src/prompts/*.txt and are parsed once into
+static text fragments and named slots:
+
+    {{name}}     slot filled at render time
+    {{> name}}   include of another template, inlined at parse time
+
+Consecutive static text (including inlined templates) is merged when the
+template is parsed, so a render only drops the slot values into a copy of
+the precomputed list of strings and joins it. Templates are data: nothing
+in them is ever executed. Set PROMPT_TEMPLATES_RELOAD=1 in development to
+re-read templates whose file changed.
+"""
+
+import os
+import re
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple, Union
+
+TEMPLATE_DIR = Path(__file__).resolve().parent / "prompts"
+
+_TAG_PATTERN = re.compile(r"\{\{\s*(>)?\s*([a-zA-Z_][a-zA-Z0-9_]*)\s*\}\}")
+
+
+class Slot(str):
+    """Name of a dynamic slot inside a parsed template."""
+
+
+class PromptTemplate:
+    """A template compiled into static fragments and slots."""
+
+    def __init__(self, name: str, parts: List[Union[str, Slot]]):
+        self.name = name
+        self.parts: Tuple[Union[str, Slot], ...] = tuple(parts)
+        self.slots = {part for part in parts if isinstance(part, Slot)}
+        self._static = "".join(parts) if not self.slots else None
+        # Static strings with an empty placeholder where each slot goes
+        self._pieces = ["" if isinstance(part, Slot) else str(part) for part in parts]
+        self._positions = [(index, str(part)) for index, part in enumerate(parts) if isinstance(part, Slot)]
+
+    def render(self, **values: str) -> str:
+        """
+        Fill the slots. Raises TypeError if a slot has no value or a value
+        has no slot.
+
+        Templates without slots return their precomputed text.
+        """
+        if self._static is not None:
+            if values:
+                raise TypeError(f"Template {self.name} has no slots: {', '.join(sorted(values))}")
+            return self._static
+        if len(values) != len(self.slots) or not self.slots.issuperset(values):
+            missing = self.slots.difference(values)
+            unknown = set(values).difference(self.slots)
+            raise TypeError(f"Template {self.name}: missing slots {sorted(missing)}, "
+                            f"unknown slots {sorted(unknown)}")
+        pieces = self._pieces.copy()
+        for index, slot in self._positions:
+            pieces[index] = values[slot]
+        return "".join(pieces)
+
+
+class PromptTemplates:
+    """Loads, compiles and caches the templates of a directory."""
+
+    def __init__(self, directory: Optional[Path] = None, reload: Optional[bool] = None):
+        """
+        Args:
+            directory: Folder with the *.txt templates (default src/prompts).
+            reload: Re-read changed files on access (PROMPT_TEMPLATES_RELOAD, default off).
+        """
+        self.directory = Path(directory or TEMPLATE_DIR)
+        self.reload = reload if reload is not None else os.getenv("PROMPT_TEMPLATES_RELOAD", "0") == "1"
+        self._templates: Dict[str, PromptTemplate] = {}
+        self._mtimes: Dict[str, float] = {}
+        self.generation = 0
+        self.load()
+
+    def load(self):
+        """(Re)compile every template in the directory."""
+        self._templates = {}
+        self._mtimes = {path.stem: path.stat().st_mtime for path in self.directory.glob("*.txt")}
+        for name in self._mtimes:
+            self._compile(name, ())
+        # Bumped on every (re)load so cached prompts built from old templates are dropped
+        self.generation += 1
+
+    def get(self, name: str) -> PromptTemplate:
+        if self.reload and self._changed():
+            self.load()
+        return self._templates[name]
+
+    def render(self, name: str, **values: str) -> str:
+        """Render a template by name."""
+        return self.get(name).render(**values)
+
+    def _changed(self) -> bool:
+        current = {path.stem: path.stat().st_mtime for path in self.directory.glob("*.txt")}
+        return current != self._mtimes
+
+    def _compile(self, name: str, including: Tuple[str, ...]) -> PromptTemplate:
+        if name in self._templates:
+            return self._templates[name]
+        if name in including:
+            raise ValueError(f"Template include cycle: {' -> '.join(including + (name,))}")
+
+        source = (self.directory / f"{name}.txt").read_text(encoding="utf-8")
+
+        parts: List[Union[str, Slot]] = []
+        position = 0
+        for match in _TAG_PATTERN.finditer(source):
+            parts.append(source[position:match.start()])
+            if match.group(1):
+                parts.extend(self._compile(match.group(2), including + (name,)).parts)
+            else:
+                parts.append(Slot(match.group(2)))
+            position = match.end()
+        parts.append(source[position:])
+
+        # Merge adjacent static text so rendering joins as few pieces as possible
+        merged: List[Union[str, Slot]] = []
+        for part in parts:
+            if isinstance(part, Slot):
+                merged.append(part)
+            elif part:
+                if merged and not isinstance(merged[-1], Slot):
+                    merged[-1] += part
+                else:
+                    merged.append(part)
+
+        template = PromptTemplate(name, merged)
+        self._templates[name] = template
+        return template
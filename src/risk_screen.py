@@ -0,0 +1,236 @@
+"""
+Local risk pre-screen for user messages.
+
+Every user message is matched against a Spanish risk lexicon before the
+reply is generated, in microseconds and without calling the LLM:
+- "high" (suicidal ideation, self-harm, abuse): the full emotional analysis
+  runs inline so this very reply already gets the crisis guardrails
+- "moderate" (hopelessness, bullying, accumulated distress): an emotional
+  analysis is queued right after the reply
+
+The lexicon is compiled into one Aho-Corasick automaton, so the cost is a
+single pass over the message whatever the number of phrases. Accented
+letters and punctuation are folded inside the automaton (á -> a, "," -> " ")
+rather than by rewriting the message, and phrases match whole words (or word
+prefixes for stems ending in "*"). Idioms and negations
+("me muero de risa", "matarme a estudiar", "no quiero morir") are listed as
+safe phrases: a risk match inside a safe one is ignored.
+"""
+
+from dataclasses import dataclass, field
+from typing import Dict, List, Tuple
+
+# category -> (weight per distinct phrase, phrases); normalized text, "*" = stem
+RISK_LEXICON: Dict[str, Tuple[float, Tuple[str, ...]]] = {
+    "suicide": (1.0, (
+        "suicid*", "matarme", "me voy a matar", "me quiero matar", "quitarme la vida",
+        "acabar con mi vida", "terminar con mi vida", "poner fin a mi vida", "acabar con todo",
+        "no quiero vivir", "no quiero seguir viviendo", "no quiero seguir aqui",
+        "no quiero estar aqui", "quiero morir*", "me quiero morir", "ganas de morir*",
+        "prefiero morir*", "prefiero estar muert*", "mejor muert*", "ojala estuviera muert*",
+        "ojala me muera", "ojala no despertar", "no quiero despertar", "no volver a despertar",
+        "desaparecer para siempre", "tirarme por la ventana", "tirarme de un puente",
+        "tirarme a las vias", "tomarme todas las pastillas", "tomar todas las pastillas",
+        "carta de despedida", "despedirme de todos", "estarian mejor sin mi",
+        "el mundo estaria mejor sin mi", "nadie me echaria de menos",
+        "no merece la pena vivir", "no vale la pena vivir", "harto de vivir", "harta de vivir",
+        "cansado de vivir", "cansada de vivir",
+    )),
+    "self_harm": (1.0, (
+        "hacerme daño", "hacerme dano", "me hago daño", "me hago dano", "autolesion*",
+        "me hago cortes", "hacerme cortes", "cortarme las venas", "cortarme los brazos",
+        "cortarme las muñecas", "cortarme las munecas", "cortarme las piernas",
+        "me corto los brazos", "me corto las muñecas", "me corto las munecas",
+        "me corto las piernas", "quemarme con", "me quemo con",
+        "me pego a mi mism*", "golpearme a mi mism*",
+    )),
+    "abuse": (1.0, (
+        "me pega", "me pegan", "me maltrata*", "me han violado", "me violo", "me violaron",
+        "abusa de mi", "abuso de mi", "abusan de mi", "abusaron de mi",
+        "me toca donde no", "me tocan donde no", "me obliga a tocar*",
+        "tengo miedo de volver a casa", "me amenaza con matar*",
+    )),
+    "hopelessness": (0.4, (
+        "no puedo mas", "no aguanto mas", "nada tiene sentido", "mi vida no tiene sentido",
+        "no tiene sentido seguir", "soy una carga", "no sirvo para nada", "odio mi vida",
+        "no tengo salida", "no hay salida", "nadie me quiere", "todos me odian",
+        "estoy solo en el mundo", "estoy sola en el mundo", "no le importo a nadie",
+        "ya nada importa", "todo me da igual",
+    )),
+    "bullying": (0.4, (
+        "me hacen bullying", "me hacen acoso", "me acosan", "me acosa", "se burlan de mi",
+        "se rien de mi", "me insultan", "me dan de lado", "nadie quiere estar conmigo",
+    )),
+    "distress": (0.2, (
+        "me siento vacio", "me siento vacia", "estoy destrozad*", "lloro todos los dias",
+        "lloro cada noche", "no puedo dormir", "ataque de ansiedad", "ataques de ansiedad",
+        "ataque de panico", "ataques de panico", "estoy deprimid*", "tengo depresion",
+        "me siento sol*", "me siento fatal", "estoy muy mal", "no tengo ganas de nada",
+    )),
+}
+
+# Idioms and negations containing a risk phrase
+SAFE_PHRASES: Tuple[str, ...] = (
+    "no quiero morir*", "no me quiero morir", "no me quiero matar", "no quiero matarme",
+    "no pienso matarme", "no quiero suicidarme", "no pienso suicidarme",
+    "no quiero hacerme daño", "nunca me haria daño",
+    "me quiero morir de risa", "me quiero morir de verguenza", "quiero morirme de risa",
+    "quiero morirme de verguenza", "matarme a estudiar", "matarme a trabajar",
+    "matarme de risa", "matarme en el gimnasio", "me voy a matar a estudiar",
+    "me voy a matar a trabajar", "me voy a matar de risa", "prevencion del suicidio",
+    "escuadron suicida", "acabar con todo el", "acabar con todo lo",
+    "se me pega", "se me pegan", "me pega un susto", "me pego un susto", "no me pega",
+    # "me pega" as "suits me" or a ball hitting by accident: only with the object named
+    "camiseta me pega", "ropa me pega", "color me pega", "vestido me pega", "falda me pega",
+    "chaqueta me pega", "me pega con la ropa", "me pega con mi ropa", "me pega con el pelo",
+    "balon me pega", "pelota me pega",
+    "no puedo mas de risa", "no puedo mas de la risa",
+)
+
+# Human-readable concerns, used for the crisis guardrails when the LLM is unavailable
+RISK_CATEGORY_LABELS = {
+    "suicide": "Posible ideación suicida",
+    "self_harm": "Posibles autolesiones",
+    "abuse": "Posible maltrato o abuso",
+    "hopelessness": "Desesperanza",
+    "bullying": "Posible acoso escolar",
+    "distress": "Malestar emocional",
+}
+
+HIGH_RISK_SCORE = 1.0
+MODERATE_RISK_SCORE = 0.4
+
+# Characters read as another one by the automaton (ñ is kept)
+CHARACTER_ALIASES = {
+    **dict(zip("áéíóúüàèìòù", "aeiouuaeiou")),
+    **{ch: " " for ch in "¿?¡!.,;:()[]{}\"'«»“”‘’…-—–_/\\*#@+=<>|~^`%&$"},
+}
+
+
+def normalize(message: str) -> str:
+    """Lowercase, collapse whitespace and pad with spaces (accents/punctuation are aliases)."""
+    return f" {' '.join(message.lower().split())} "
+
+
+@dataclass
+class RiskAssessment:
+    """Result of screening one message."""
+
+    level: str = "none"  # none, moderate, high
+    score: float = 0.0
+    categories: List[str] = field(default_factory=list)
+    phrases: List[str] = field(default_factory=list)
+
+    @property
+    def concerns(self) -> List[str]:
+        return [RISK_CATEGORY_LABELS[category] for category in self.categories]
+
+
+class _Automaton:
+    """Aho-Corasick automaton with precomputed transitions (a DFA over the lexicon's characters)."""
+
+    def __init__(self, patterns: List[str], aliases: Dict[str, str]):
+        goto: List[Dict[str, int]] = [{}]
+        out: List[List[int]] = [[]]
+        for index, pattern in enumerate(patterns):
+            state = 0
+            for ch in pattern:
+                if ch not in goto[state]:
+                    goto.append({})
+                    out.append([])
+                    goto[state][ch] = len(goto) - 1
+                state = goto[state][ch]
+            out[state].append(index)
+
+        # Breadth-first: fail links, inherited outputs, missing transitions
+        fail = [0] * len(goto)
+        order = list(goto[0].values())
+        for state in order:
+            for ch, target in goto[state].items():
+                order.append(target)
+                fallback = fail[state]
+                while fallback and ch not in goto[fallback]:
+                    fallback = fail[fallback]
+                fail[target] = goto[fallback].get(ch, 0)
+                out[target] = out[target] + out[fail[target]]
+        alphabet = {ch for transitions in goto for ch in transitions}
+        for state in order:
+            for ch in alphabet:
+                if ch not in goto[state]:
+                    goto[state][ch] = goto[fail[state]].get(ch, 0)
+        for transitions in goto:
+            for alias, ch in aliases.items():
+                if ch in transitions:
+                    transitions[alias] = transitions[ch]
+
+        self.delta = goto
+        self.out = [tuple(indices) for indices in out]
+        self.lengths = [len(pattern) for pattern in patterns]
+
+    def search(self, text: str) -> List[Tuple[int, int, int]]:
+        """(pattern index, start, end) of every match, overlapping ones included."""
+        delta, out, lengths = self.delta, self.out, self.lengths
+        found = []
+        state = 0
+        for end, ch in enumerate(text, 1):
+            state = delta[state].get(ch, 0)
+            if out[state]:
+                for index in out[state]:
+                    found.append((index, end - lengths[index], end))
+        return found
+
+
+def _compile_phrase(phrase: str) -> str:
+    """Word-boundary form: " word " for whole words, " stem" for stems ending in "*"."""
+    if phrase.endswith("*"):
+        return f" {phrase[:-1]}"
+    return f" {phrase} "
+
+
+class RiskScreen:
+    """Scores user messages against the risk lexicon."""
+
+    def __init__(self, lexicon: Dict[str, Tuple[float, Tuple[str, ...]]] = RISK_LEXICON,
+                 safe_phrases: Tuple[str, ...] = SAFE_PHRASES):
+        # (phrase, category or None for safe phrases)
+        self._phrases: List[Tuple[str, str]] = [
+            (phrase, category) for category, (_, phrases) in lexicon.items() for phrase in phrases
+        ] + [(phrase, None) for phrase in safe_phrases]
+        self._weights = {category: weight for category, (weight, _) in lexicon.items()}
+        self._automaton = _Automaton([_compile_phrase(phrase) for phrase, _ in self._phrases], CHARACTER_ALIASES)
+        self.screened = 0
+        self.flagged = {"moderate": 0, "high": 0}
+
+    def screen(self, message: str) -> RiskAssessment:
+        """Score one message; level is "high" at HIGH_RISK_SCORE, "moderate" at MODERATE_RISK_SCORE."""
+        self.screened += 1
+        matches = self._automaton.search(normalize(message))
+        if not matches:
+            return RiskAssessment()
+
+        safe = [(start, end) for index, start, end in matches if self._phrases[index][1] is None]
+        phrases = {}
+        for index, start, end in matches:
+            phrase, category = self._phrases[index]
+            if category is None or any(s <= start and end <= e for s, e in safe):
+                continue
+            phrases[phrase] = category
+        if not phrases:
+            return RiskAssessment()
+
+        score = min(1.0, sum(self._weights[category] for category in phrases.values()))
+        if score >= HIGH_RISK_SCORE:
+            level = "high"
+        elif score >= MODERATE_RISK_SCORE:
+            level = "moderate"
+        else:
+            level = "none"
+        if level != "none":
+            self.flagged[level] += 1
+
+        categories = sorted(set(phrases.values()), key=lambda c: -self._weights[c])
+        return RiskAssessment(level=level, score=score, categories=categories, phrases=list(phrases))
+
+    def stats(self):
+        """Messages screened and flagged per level."""
+        return {"screened": self.screened, **self.flagged}
@@ -59,5 +59,6 @@ print("   4. Or build Docker: docker build -t llm-chat-agent .")
 
 # Cleanup
 import os
+db.close()
 os.remove("test_chat.db")
 print("\n🧹 Test database cleaned up")
@@ -0,0 +1,77 @@
+"""/api/chat/stream keeps the partial reply when the stream is cut short."""
+
+import asyncio
+import importlib
+import sys
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+
+@pytest.fixture(scope="module")
+def main(tmp_path_factory):
+    patch = pytest.MonkeyPatch()
+    patch.setenv("DATABASE_PATH", str(tmp_path_factory.mktemp("stream") / "chat.db"))
+    patch.setenv("OPENAI_API_KEY", "sk-test")
+    patch.setenv("EMOTIONAL_CHECK_MODE", "batch")
+    module = importlib.import_module("src.main")
+    yield module
+    module.db.close()
+    patch.undo()
+
+
+@pytest.fixture
+def session(main, request):
+    user = main.db.create_user(request.node.name, "secret")
+    return main.db.get_user_sessions(user["user_id"])[0]["id"]
+
+
+def reply(main, chunks, error=None):
+    async def stream(messages, system_prompt, user_id=None):
+        for chunk in chunks:
+            yield chunk
+        if error:
+            raise error
+
+    main.llm_service.astream_chat_with_custom_system = stream
+
+
+async def read_all(response):
+    return "".join([frame async for frame in response.body_iterator])
+
+
+def roles_and_contents(main, session_id):
+    return [(m["role"], m["content"]) for m in main.db.get_session_messages(session_id)]
+
+
+def test_complete_stream_stores_the_reply(main, session):
+    reply(main, ["Hola", ", ¿qué tal?"])
+    body = asyncio.run(read_all(asyncio.run(main.chat_stream(session, "hola"))))
+
+    assert "event: done" in body
+    assert roles_and_contents(main, session)[-1] == ("assistant", "Hola, ¿qué tal?")
+
+
+def test_stream_error_stores_the_partial_reply(main, session):
+    reply(main, ["Me alegra ", "que"], error=RuntimeError("connection reset"))
+    body = asyncio.run(read_all(asyncio.run(main.chat_stream(session, "hoy aprobé"))))
+
+    assert "event: error" in body
+    assert roles_and_contents(main, session)[-2:] == [
+        ("user", "hoy aprobé"), ("assistant", "Me alegra que" + main.INTERRUPTED_REPLY_MARKER)
+    ]
+
+
+def test_client_disconnect_stores_the_partial_reply(main, session):
+    reply(main, ["Vaya, ", "lo siento ", "mucho"])
+
+    async def disconnect_after_first_chunk():
+        response = await main.chat_stream(session, "mi perro está malo")
+        frames = response.body_iterator
+        await frames.__anext__()
+        await frames.aclose()
+
+    asyncio.run(disconnect_after_first_chunk())
+    assert roles_and_contents(main, session)[-1] == ("assistant", "Vaya, " + main.INTERRUPTED_REPLY_MARKER)
@@ -0,0 +1,98 @@
+"""ContextBuilder token budget, window boundary and summary requests."""
+
+import asyncio
+
+import pytest
+
+from context_builder import ContextBuilder
+from database import AsyncDatabase, Database
+from llm_service import LLMService
+
+# 40 characters = 11 tokens with the rough estimate, 15 with the per-message overhead
+TURN = "x" * 40
+
+
+@pytest.fixture
+def adb(tmp_path):
+    db = Database(str(tmp_path / "chat.db"))
+    yield AsyncDatabase(db)
+    db.close()
+
+
+@pytest.fixture
+def llm():
+    service = LLMService(api_key="sk-test")
+    service._encoding = None
+    service.summaries = []
+
+    async def summarize(previous, conversation, user_id=None):
+        service.summaries.append(len(conversation))
+        return f"{previous or ''}+{len(conversation)}"
+
+    service.asummarize_conversation = summarize
+    return service
+
+
+def session_with_messages(adb, count):
+    db = adb.db
+    user_id = db.create_user("ana", "secret")["user_id"]
+    session_id = db.get_user_sessions(user_id)[0]["id"]
+    for i in range(count):
+        db.add_message(session_id, "user" if i % 2 == 0 else "assistant", TURN)
+    return session_id, db.get_recent_messages(session_id, count)
+
+
+def test_history_is_trimmed_to_the_token_budget(adb, llm):
+    session_id, history = session_with_messages(adb, 20)
+    # 1 system token + 100 reserved for the reply leaves 150 tokens = 10 turns
+    builder = ContextBuilder(adb, llm, token_budget=251, reply_tokens=100, min_history_tokens=10,
+                             summary_min_messages=5)
+
+    context = asyncio.run(builder.build(session_id, "", history))
+
+    assert len(context["messages"]) == 10
+    assert context["prompt_tokens"] == 1 + 10 * 15
+    assert context["summarize_up_to"] == history[9]["id"]
+
+
+def test_no_summary_until_enough_turns_leave_the_window(adb, llm):
+    session_id, history = session_with_messages(adb, 14)
+    builder = ContextBuilder(adb, llm, token_budget=251, reply_tokens=100, min_history_tokens=10,
+                             summary_min_messages=5)
+
+    context = asyncio.run(builder.build(session_id, "", history))
+
+    assert len(context["messages"]) == 10
+    assert context["summarize_up_to"] is None
+
+
+def test_min_history_budget_survives_a_huge_system_prompt(adb, llm):
+    session_id, history = session_with_messages(adb, 6)
+    builder = ContextBuilder(adb, llm, token_budget=100, reply_tokens=50, min_history_tokens=30)
+
+    context = asyncio.run(builder.build(session_id, "y" * 4000, history))
+
+    assert len(context["messages"]) == 2
+
+
+def test_summary_covers_the_latest_requested_boundary(adb, llm):
+    session_id, history = session_with_messages(adb, 30)
+    builder = ContextBuilder(adb, llm, token_budget=251, reply_tokens=100, min_history_tokens=10,
+                             summary_min_messages=5)
+
+    async def scenario():
+        first = await builder.build(session_id, "", history[:20])
+        latest = await builder.build(session_id, "", history)
+        assert latest["summarize_up_to"] > first["summarize_up_to"]
+        # One job queued on the first turn picks up the later boundary
+        assert await builder.update_summary(session_id)
+        assert not await builder.update_summary(session_id)
+        return await adb.get_session_summary(session_id)
+
+    summary = asyncio.run(scenario())
+    assert summary["summarized_up_to"] == history[19]["id"]
+    assert llm.summaries == [20]
+
+    context = asyncio.run(builder.build(session_id, "Sistema", history))
+    assert "+20" in context["system_prompt"]
+    assert context["summarize_up_to"] is None
@@ -0,0 +1,96 @@
+"""Validation of the combined analysis tool arguments."""
+
+import json
+
+import pytest
+
+from conversation_analysis import AnalysisResult, EmotionalState
+
+EMOTIONAL_STATE = {
+    "depression_probability": 0.2, "anxiety_level": "low", "loneliness_level": "none",
+    "support_needed": "low", "recommended_mode": "friendly", "detected_concerns": ["exámenes"],
+    "positive_indicators": ["buenos amigos", " "], "confidence": 0.8,
+    "professional_help_suggested": False, "notes": "Tranquila"
+}
+PROFILE = {
+    "name": "Lucía", "age_range": "null", "gender": "", "profession": None, "education": None,
+    "interests": ["fútbol"], "important_facts": [], "sensitive_topics": [], "personality_traits": [],
+    "needs": [], "political_stance": {"spectrum": None, "intensity": None, "approach": None},
+    "religion": None, "tone_preference": "cercano"
+}
+
+
+def arguments(**parts):
+    return json.dumps(parts)
+
+
+def test_valid_arguments_are_normalized():
+    result = AnalysisResult.from_arguments(arguments(profile=PROFILE, emotional_state=EMOTIONAL_STATE))
+
+    assert result.profile["name"] == "Lucía"
+    assert result.profile["age_range"] is None and result.profile["gender"] is None
+    assert result.profile["religion"] == {"faith": None, "intensity": None, "approach": None}
+    assert result.emotional_state.recommended_mode == "friendly"
+    assert result.emotional_state.positive_indicators == ["buenos amigos"]
+
+
+def test_only_requested_parts_are_validated():
+    result = AnalysisResult.from_arguments(arguments(profile=PROFILE, emotional_state="basura"), emotion=False)
+    assert result.emotional_state is None and result.profile["interests"] == ["fútbol"]
+
+
+@pytest.mark.parametrize("args, profile, emotion", [
+    (arguments(emotional_state=EMOTIONAL_STATE), True, True),
+    (arguments(profile=PROFILE), True, True),
+    (arguments(profile=PROFILE), False, True),
+    ("[]", True, False),
+    ('{"profile": ', True, False),
+])
+def test_missing_or_malformed_parts_are_rejected(args, profile, emotion):
+    with pytest.raises(ValueError):
+        AnalysisResult.from_arguments(args, profile=profile, emotion=emotion)
+
+
+@pytest.mark.parametrize("field", ["interests", "needs"])
+@pytest.mark.parametrize("value", ["fútbol", {"fútbol": True}, ["fútbol", 3]])
+def test_profile_lists_must_be_lists_of_strings(field, value):
+    with pytest.raises(ValueError, match=field):
+        AnalysisResult.from_arguments(arguments(profile={**PROFILE, field: value}), emotion=False)
+
+
+def test_profile_scalars_and_nested_fields_are_type_checked():
+    with pytest.raises(ValueError, match="name"):
+        AnalysisResult.from_arguments(arguments(profile={**PROFILE, "name": 7}), emotion=False)
+    with pytest.raises(ValueError, match="religion"):
+        AnalysisResult.from_arguments(arguments(profile={**PROFILE, "religion": "católica"}), emotion=False)
+
+
+def test_emotional_state_missing_field_is_rejected():
+    data = {k: v for k, v in EMOTIONAL_STATE.items() if k != "confidence"}
+    with pytest.raises(ValueError, match="confidence"):
+        EmotionalState.from_dict(data)
+
+
+@pytest.mark.parametrize("value, expected", [(1.7, 1.0), (-0.3, 0.0), (1, 1.0)])
+def test_out_of_range_probabilities_are_clamped(value, expected):
+    state = EmotionalState.from_dict({**EMOTIONAL_STATE, "depression_probability": value, "confidence": value})
+    assert state.depression_probability == expected and state.confidence == expected
+
+
+@pytest.mark.parametrize("field, value", [
+    ("depression_probability", "alta"),
+    ("confidence", True),
+    ("recommended_mode", "panic"),
+    ("recommended_mode", None),
+    ("anxiety_level", "extreme"),
+    ("support_needed", "severe"),
+    ("detected_concerns", "soledad"),
+])
+def test_invalid_emotional_values_are_rejected(field, value):
+    with pytest.raises(ValueError, match=field):
+        EmotionalState.from_dict({**EMOTIONAL_STATE, field: value})
+
+
+def test_emotional_state_must_be_an_object():
+    with pytest.raises(ValueError):
+        EmotionalState.from_dict(None)
@@ -0,0 +1,59 @@
+"""Database pagination."""
+
+import pytest
+
+from database import Database
+
+
+@pytest.fixture
+def db(tmp_path):
+    db = Database(str(tmp_path / "chat.db"))
+    yield db
+    db.close()
+
+
+def user_with_sessions(db, username, count):
+    user_id = db.create_user(username, "secret")["user_id"]
+    for i in range(count - 1):
+        db.create_session(user_id, f"{username} {i}")
+    return user_id
+
+
+def test_session_pages_cover_every_session_once(db):
+    user_id = user_with_sessions(db, "ana", 7)
+    seen, cursor = [], None
+    while True:
+        page = db.get_user_sessions_page(user_id, cursor, limit=3)
+        seen += [session["id"] for session in page["sessions"]]
+        cursor = page["next_before_id"]
+        if cursor is None:
+            break
+    assert seen == [session["id"] for session in db.get_user_sessions(user_id)]
+
+
+def test_session_cursor_of_another_user_is_rejected(db):
+    ana = user_with_sessions(db, "ana", 3)
+    leo = user_with_sessions(db, "leo", 3)
+    leo_session = db.get_user_sessions(leo)[0]["id"]
+
+    assert db.get_user_sessions_page(ana, leo_session) is None
+    assert db.get_user_sessions_page(ana, 999999) is None
+    assert db.get_user_sessions_page(leo, leo_session)["sessions"]
+
+
+def test_user_messages_page_forward_from_the_watermark(db):
+    user_id = user_with_sessions(db, "ana", 2)
+    first, second = [session["id"] for session in db.get_user_sessions(user_id)]
+    for i in range(10):
+        db.add_message(first if i % 2 else second, "user", f"mensaje {i}")
+    ids = [m["id"] for m in db.get_user_messages_after(user_id, 0, limit=100)]
+
+    assert [m["id"] for m in db.get_user_messages_after(user_id, ids[2], limit=3)] == ids[-3:]
+    paged, after_id = [], ids[2]
+    while True:
+        page = db.get_user_messages_after(user_id, after_id, limit=3, oldest=True)
+        if not page:
+            break
+        paged += [m["id"] for m in page]
+        after_id = page[-1]["id"]
+    assert paged == ids[3:]
@@ -0,0 +1,110 @@
+"""EmotionalBatch due users, runs and batch-file import."""
+
+import asyncio
+import json
+
+import pytest
+
+from database import AsyncDatabase, Database
+from emotional_batch import EmotionalBatch
+
+STATE = {
+    "depression_probability": 0.1, "anxiety_level": "low", "loneliness_level": "none",
+    "support_needed": "none", "recommended_mode": "friendly", "detected_concerns": [],
+    "positive_indicators": ["ánimo"], "confidence": 0.7, "professional_help_suggested": False,
+    "notes": ""
+}
+
+
+class FakeLLM:
+    model = "test-model"
+
+    def __init__(self):
+        self.calls = 0
+
+    async def aanalyze_emotional_state(self, conversation, user_id=None):
+        if len(conversation) < 3:
+            return {"insufficient_data": True}
+        self.calls += 1
+        return None if conversation[-1]["content"] == "error" else STATE
+
+
+@pytest.fixture
+def adb(tmp_path):
+    db = Database(str(tmp_path / "chat.db"))
+    yield AsyncDatabase(db)
+    db.close()
+
+
+def user_with_messages(adb, username, *messages):
+    db = adb.db
+    user_id = db.create_user(username, "secret")["user_id"]
+    db.create_user_profile(user_id, {"name": username})
+    session_id = db.get_user_sessions(user_id)[0]["id"]
+    for message in messages:
+        db.add_message(session_id, "user", message)
+    return user_id
+
+
+def test_due_users_need_enough_new_messages(adb):
+    ana = user_with_messages(adb, "ana", "hola", "qué tal", "bien")
+    user_with_messages(adb, "leo", "hola")
+    batch = EmotionalBatch(adb, FakeLLM(), check_interval=3600, min_new_messages=3)
+
+    assert asyncio.run(batch.due_users()) == [ana]
+
+
+def test_run_updates_due_users_and_leaves_failures_due(adb):
+    ana = user_with_messages(adb, "ana", "hola", "qué tal", "bien")
+    eva = user_with_messages(adb, "eva", "hola", "uf", "error")
+    llm = FakeLLM()
+    batch = EmotionalBatch(adb, llm, check_interval=3600, min_new_messages=3)
+
+    stats = asyncio.run(batch.run())
+
+    assert stats == {"due": 2, "updated": 1, "skipped": 0, "failed": 1}
+    assert adb.db.get_user_profile(ana)["emotional_state"]["recommended_mode"] == "friendly"
+    assert asyncio.run(batch.due_users()) == [eva]
+
+
+def test_insufficient_data_is_stamped_and_not_retried(adb):
+    leo = user_with_messages(adb, "leo", "hola")
+    llm = FakeLLM()
+    batch = EmotionalBatch(adb, llm, check_interval=3600, min_new_messages=1)
+
+    assert asyncio.run(batch.run()) == {"due": 1, "updated": 0, "skipped": 1, "failed": 0}
+    assert asyncio.run(batch.due_users()) == []
+    assert llm.calls == 0
+    assert adb.db.get_user_profile(leo).get("emotional_state") is None
+
+
+def batch_line(user_id, status_code=200, content=None, custom_id=None):
+    body = {
+        "id": "chatcmpl-test", "object": "chat.completion", "created": 0, "model": "test-model",
+        "choices": [{"index": 0, "finish_reason": "stop",
+                     "message": {"role": "assistant", "content": content or json.dumps(STATE)}}]
+    }
+    return json.dumps({"custom_id": custom_id or f"user-{user_id}",
+                       "response": {"status_code": status_code, "body": body}})
+
+
+def test_import_results_skips_malformed_lines_and_failed_requests(adb, tmp_path):
+    ana = user_with_messages(adb, "ana", "hola")
+    leo = user_with_messages(adb, "leo", "hola")
+    path = tmp_path / "results.jsonl"
+    path.write_text("\n".join([
+        batch_line(ana),
+        "",
+        "{not json",
+        batch_line(leo, status_code=429),
+        batch_line(leo, content="no es json"),
+        batch_line(leo, content=json.dumps({**STATE, "recommended_mode": "panic"})),
+        batch_line(leo, custom_id="user-abc"),
+        json.dumps({"custom_id": f"user-{leo}"}),
+    ]) + "\n", encoding="utf-8")
+    batch = EmotionalBatch(adb, FakeLLM())
+
+    assert asyncio.run(batch.import_results(str(path))) == {"updated": 1, "failed": 6}
+    assert adb.db.get_user_profile(ana)["emotional_state"]["positive_indicators"] == ["ánimo"]
+    assert adb.db.get_user_profile(leo).get("emotional_state") is None
+    assert batch.stats()["failed"] == 6
@@ -0,0 +1,101 @@
+"""JobQueue retries with backoff and per-user locks."""
+
+import asyncio
+import gc
+import random
+import sqlite3
+
+from job_queue import JobQueue
+
+
+class FakeAdb:
+    def __init__(self):
+        self.next_id = 0
+        self.status = {}
+
+    async def add_job(self, job_type, payload):
+        self.next_id += 1
+        self.status[self.next_id] = "pending"
+        return self.next_id
+
+    async def get_unfinished_jobs(self):
+        return []
+
+    async def update_job_status(self, job_id, status, error=None):
+        self.status[job_id] = status
+
+    async def delete_job(self, job_id):
+        self.status[job_id] = "done"
+
+
+def test_retry_delay_grows_exponentially_up_to_the_cap(monkeypatch):
+    monkeypatch.setattr(random, "uniform", lambda low, high: high)
+    queue = JobQueue(FakeAdb(), retry_base_delay=1, retry_max_delay=5)
+    assert [queue.retry_delay(attempts) for attempts in range(1, 6)] == [1, 2, 4, 5, 5]
+
+
+def test_locked_database_is_retried_after_a_backoff():
+    adb = FakeAdb()
+    queue = JobQueue(adb, workers=1, max_attempts=3, retry_base_delay=0.05, retry_max_delay=0.05)
+    attempts = []
+
+    async def flaky(payload):
+        attempts.append(asyncio.get_running_loop().time())
+        if len(attempts) < 3:
+            raise sqlite3.OperationalError("database is locked")
+
+    async def scenario():
+        queue.register("profile", flaky)
+        await queue.start()
+        job_id = await queue.enqueue("profile", {"user_id": 1})
+        await queue.join()
+        await queue.stop()
+        return job_id
+
+    job_id = asyncio.run(scenario())
+    assert len(attempts) == 3 and adb.status[job_id] == "done"
+    assert all(later >= earlier for earlier, later in zip(attempts, attempts[1:]))
+
+
+def test_job_fails_after_max_attempts():
+    adb = FakeAdb()
+    queue = JobQueue(adb, workers=1, max_attempts=2, retry_base_delay=0.01)
+
+    async def broken(payload):
+        raise RuntimeError("always")
+
+    async def scenario():
+        queue.register("profile", broken)
+        await queue.start()
+        job_id = await queue.enqueue("profile", {"user_id": 1})
+        await queue.join()
+        await queue.stop()
+        return job_id
+
+    assert adb.status[asyncio.run(scenario())] == "failed"
+
+
+def test_jobs_of_one_user_are_serialized_and_locks_are_released():
+    queue = JobQueue(FakeAdb(), workers=4)
+    running = {}
+    overlaps = []
+
+    async def handler(payload):
+        user_id = payload["user_id"]
+        running[user_id] = running.get(user_id, 0) + 1
+        overlaps.append(running[user_id])
+        await asyncio.sleep(0.01)
+        running[user_id] -= 1
+
+    async def scenario():
+        queue.register("profile", handler)
+        await queue.start()
+        for i in range(40):
+            await queue.enqueue("profile", {"user_id": i % 10})
+        await queue.join()
+        await queue.stop()
+
+    asyncio.run(scenario())
+    assert max(overlaps) == 1
+    gc.collect()
+    assert len(queue._user_locks) == 0
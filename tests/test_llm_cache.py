@@ -0,0 +1,118 @@
+"""LLM response cache: keys and hits through LLMService.acached_completion."""
+
+import asyncio
+import json
+
+import httpx
+import pytest
+from openai import AsyncOpenAI
+
+from database import AsyncDatabase, Database
+from llm_cache import LLMResponseCache
+from llm_service import LLMService, completion_json
+
+MESSAGES = [{"role": "system", "content": "Analiza"}, {"role": "user", "content": "me gusta el fútbol"}]
+
+
+@pytest.fixture
+def adb(tmp_path):
+    adb = AsyncDatabase(Database(str(tmp_path / "chat.db")))
+    yield adb
+    adb.shutdown()
+
+
+@pytest.fixture
+def service(adb):
+    """LLMService with a response cache whose provider is an httpx.MockTransport."""
+    service = LLMService(api_key="sk-test", response_cache=LLMResponseCache(adb, ttl=3600))
+    service.requests = []
+
+    def handler(request):
+        service.requests.append(json.loads(request.content))
+        completion = {
+            "id": f"chatcmpl-{len(service.requests)}", "object": "chat.completion", "created": 0,
+            "model": service.model,
+            "choices": [{"index": 0, "finish_reason": "stop",
+                         "message": {"role": "assistant", "content": json.dumps({"n": len(service.requests)})}}],
+        }
+        return httpx.Response(200, json=completion)
+
+    service.transport.async_client = AsyncOpenAI(
+        api_key="sk-test", base_url="http://llm.test/v1", max_retries=0,
+        http_client=httpx.AsyncClient(transport=httpx.MockTransport(handler))
+    )
+    return service
+
+
+def test_key_is_stable_across_parameter_order(adb):
+    cache = LLMResponseCache(adb)
+    params = {"model": "m", "messages": MESSAGES, "temperature": 0, "max_tokens": 300}
+    assert cache.key(params) == cache.key(dict(reversed(list(params.items()))))
+    assert cache.key(params) == cache.key(json.loads(json.dumps(params)))
+
+
+@pytest.mark.parametrize("change", [
+    {"model": "other-model"},
+    {"messages": MESSAGES[:1] + [{"role": "user", "content": "me gusta el baloncesto"}]},
+    {"temperature": 0.7},
+    {"max_tokens": 301},
+    {"tools": [{"type": "function", "function": {"name": "f", "parameters": {}}}]},
+])
+def test_key_changes_with_model_messages_and_params(adb, change):
+    cache = LLMResponseCache(adb)
+    params = {"model": "m", "messages": MESSAGES, "temperature": 0, "max_tokens": 300}
+    assert cache.key(params) != cache.key({**params, **change})
+
+
+def test_identical_request_is_answered_from_cache(service):
+    async def scenario():
+        first = await service.acached_completion(completion_json, messages=MESSAGES, temperature=0)
+        again = await service.acached_completion(completion_json, temperature=0, messages=list(MESSAGES))
+        return first, again
+
+    first, again = asyncio.run(scenario())
+    assert first == again == {"n": 1}
+    assert len(service.requests) == 1
+    assert service.response_cache.stats()["hits"] == 1
+
+
+def test_different_requests_miss(service):
+    async def scenario():
+        results = [await service.acached_completion(completion_json, messages=MESSAGES, temperature=0)]
+        results.append(await service.acached_completion(completion_json, messages=MESSAGES, temperature=0.5))
+        results.append(await service.acached_completion(completion_json, messages=MESSAGES[1:], temperature=0))
+        service.model = "gpt-4o-mini"
+        results.append(await service.acached_completion(completion_json, messages=MESSAGES, temperature=0))
+        return results
+
+    assert asyncio.run(scenario()) == [{"n": 1}, {"n": 2}, {"n": 3}, {"n": 4}]
+    assert service.response_cache.stats()["hits"] == 0
+
+
+def test_unparseable_response_is_not_cached(service):
+    calls = []
+
+    def parse(response):
+        calls.append(response)
+        if len(calls) == 1:
+            raise ValueError("malformed")
+        return completion_json(response)
+
+    async def scenario():
+        with pytest.raises(ValueError):
+            await service.acached_completion(parse, messages=MESSAGES, temperature=0)
+        return await service.acached_completion(parse, messages=MESSAGES, temperature=0)
+
+    assert asyncio.run(scenario()) == {"n": 2}
+    assert len(service.requests) == 2
+
+
+def test_expired_entries_miss(service):
+    service.response_cache.ttl = 0.01
+
+    async def scenario():
+        await service.acached_completion(completion_json, messages=MESSAGES, temperature=0)
+        await asyncio.sleep(0.02)
+        return await service.acached_completion(completion_json, messages=MESSAGES, temperature=0)
+
+    assert asyncio.run(scenario()) == {"n": 2}
@@ -0,0 +1,98 @@
+"""LLMScheduler: priority classes and per-user round-robin."""
+
+import asyncio
+
+from llm_scheduler import LLMScheduler
+
+
+async def dispatch_order(scheduler: LLMScheduler, calls):
+    """
+    Queue `calls` [(priority, user_id)] behind a call holding the only slot,
+    then release it and return the order in which they were served.
+    """
+    order = []
+    release = asyncio.Event()
+
+    async def blocker():
+        async with scheduler.slot("reply", "blocker"):
+            await release.wait()
+
+    async def call(priority, user_id, index):
+        async with scheduler.slot(priority, user_id):
+            order.append((priority, user_id, index))
+
+    holder = asyncio.create_task(blocker())
+    await asyncio.sleep(0)
+    tasks = [asyncio.create_task(call(priority, user_id, i)) for i, (priority, user_id) in enumerate(calls)]
+    await asyncio.sleep(0)
+    release.set()
+    await asyncio.gather(holder, *tasks)
+    return order
+
+
+def test_users_are_served_round_robin():
+    calls = [("profile", "ana")] * 3 + [("profile", "leo")] * 2 + [("profile", "eva")]
+    order = asyncio.run(dispatch_order(LLMScheduler(max_concurrency=1, rpm=0, tpm=0), calls))
+    assert [user_id for _, user_id, _ in order] == ["ana", "leo", "eva", "ana", "leo", "ana"]
+    # Each user's own calls keep their order
+    assert [i for _, user_id, i in order if user_id == "ana"] == [0, 1, 2]
+
+
+def test_higher_priority_goes_first_then_round_robin():
+    calls = [("proactive", "ana"), ("emotion", "ana"), ("emotion", "ana"), ("emotion", "leo"),
+             ("profile", "eva"), ("reply", "leo")]
+    order = asyncio.run(dispatch_order(LLMScheduler(max_concurrency=1, rpm=0, tpm=0), calls))
+    assert [(priority, user_id) for priority, user_id, _ in order] == [
+        ("reply", "leo"), ("profile", "eva"), ("emotion", "ana"), ("emotion", "leo"),
+        ("emotion", "ana"), ("proactive", "ana"),
+    ]
+
+
+def test_concurrency_limit_is_respected():
+    scheduler = LLMScheduler(max_concurrency=3, rpm=0, tpm=0)
+    peak = 0
+
+    async def call(user_id):
+        nonlocal peak
+        async with scheduler.slot("reply", user_id):
+            peak = max(peak, scheduler.stats()["in_flight"])
+            await asyncio.sleep(0.01)
+
+    async def scenario():
+        await asyncio.gather(*(call(i % 4) for i in range(20)))
+
+    asyncio.run(scenario())
+    assert peak == 3
+    assert scheduler.stats()["in_flight"] == 0
+    assert scheduler.stats()["priorities"]["reply"]["dispatched"] == 20
+
+
+def test_cancelled_waiter_leaves_the_queue():
+    scheduler = LLMScheduler(max_concurrency=1, rpm=0, tpm=0)
+
+    async def scenario():
+        release = asyncio.Event()
+
+        async def blocker():
+            async with scheduler.slot("reply", "blocker"):
+                await release.wait()
+
+        async def waiter():
+            async with scheduler.slot("profile", "ana"):
+                pass
+
+        holder = asyncio.create_task(blocker())
+        await asyncio.sleep(0)
+        queued = asyncio.create_task(waiter())
+        await asyncio.sleep(0)
+        assert scheduler.stats()["priorities"]["profile"]["queued"] == 1
+        queued.cancel()
+        await asyncio.sleep(0)
+        assert scheduler.stats()["priorities"]["profile"]["queued"] == 0
+        release.set()
+        await holder
+        async with scheduler.slot("reply", "leo"):
+            pass
+
+    asyncio.run(scenario())
+    assert scheduler.stats()["in_flight"] == 0
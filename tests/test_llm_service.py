@@ -0,0 +1,35 @@
+"""LLMService prompts built from external data."""
+
+import asyncio
+
+import httpx
+from openai import AsyncOpenAI
+
+from llm_service import LLMService
+
+ARTICLES = [
+    {"title": "Nuevo récord en la Liga", "description": None, "url": "http://news.test", "source": "Test"},
+    {"title": "Fichaje sorpresa", "description": "El club confirma el fichaje " * 20, "source": "Test"},
+]
+
+
+def test_proactive_prompt_accepts_articles_without_description():
+    service = LLMService(api_key="sk-test")
+    prompt = service._build_proactive_question_prompt(["fútbol"], ARTICLES, {})
+    assert "Nuevo récord en la Liga" in prompt
+    assert "El club confirma el fichaje" in prompt
+
+
+def test_proactive_question_with_missing_description():
+    service = LLMService(api_key="sk-test")
+    completion = {
+        "id": "chatcmpl-test", "object": "chat.completion", "created": 0, "model": service.model,
+        "choices": [{"index": 0, "finish_reason": "stop",
+                     "message": {"role": "assistant", "content": " ¿Viste el récord de la Liga? "}}],
+    }
+    service.transport.async_client = AsyncOpenAI(
+        api_key="sk-test", base_url="http://llm.test/v1", max_retries=0,
+        http_client=httpx.AsyncClient(transport=httpx.MockTransport(lambda r: httpx.Response(200, json=completion)))
+    )
+    greeting = asyncio.run(service.agenerate_proactive_question(["fútbol"], ARTICLES, {}, user_id=1))
+    assert greeting == "¿Viste el récord de la Liga?"
@@ -0,0 +1,184 @@
+"""LLMTransport retries and circuit breaker, against httpx.MockTransport."""
+
+import asyncio
+import random
+
+import httpx
+import pytest
+from openai import APIStatusError, AsyncOpenAI, RateLimitError
+
+from llm_transport import CircuitBreaker, CircuitOpenError, LLMTransport, TransportConfig
+
+COMPLETION = {
+    "id": "chatcmpl-test", "object": "chat.completion", "created": 0, "model": "test-model",
+    "choices": [{"index": 0, "finish_reason": "stop", "message": {"role": "assistant", "content": "hola"}}],
+}
+
+
+def make_transport(handler, **settings) -> LLMTransport:
+    """LLMTransport whose async client answers with `handler(request)`."""
+    transport = LLMTransport("sk-test", base_url="http://llm.test/v1", config=TransportConfig(**settings))
+    transport.async_client = AsyncOpenAI(
+        api_key="sk-test", base_url="http://llm.test/v1", max_retries=0,
+        http_client=httpx.AsyncClient(transport=httpx.MockTransport(handler))
+    )
+    return transport
+
+
+def complete(transport):
+    return transport.acreate_completion(model="test-model", messages=[{"role": "user", "content": "hola"}])
+
+
+def open_breaker(breaker: CircuitBreaker):
+    """Trip the breaker and let its cooldown run out."""
+    for _ in range(breaker.threshold):
+        breaker.record_failure()
+    breaker.opened_at -= breaker.cooldown
+
+
+class Script:
+    """MockTransport handler answering with the given status codes, then 200."""
+
+    def __init__(self, *statuses, headers=None):
+        self.statuses = list(statuses)
+        self.headers = headers or {}
+        self.requests = 0
+
+    def __call__(self, request):
+        self.requests += 1
+        if self.statuses:
+            return httpx.Response(self.statuses.pop(0), headers=self.headers, json={"error": {"message": "x"}})
+        return httpx.Response(200, json=COMPLETION)
+
+
+@pytest.fixture
+def delays(monkeypatch):
+    """Backoff delays slept by the transport (not actually waited)."""
+    slept = []
+
+    async def sleep(delay):
+        slept.append(delay)
+
+    monkeypatch.setattr(asyncio, "sleep", sleep)
+    monkeypatch.setattr(random, "uniform", lambda low, high: high)
+    return slept
+
+
+def test_retries_429_and_5xx_with_exponential_backoff(delays):
+    script = Script(429, 503, 500)
+    transport = make_transport(script, max_retries=3, retry_base_delay=0.5, retry_max_delay=8,
+                               breaker_threshold=0)
+    response = asyncio.run(complete(transport))
+    assert response.choices[0].message.content == "hola"
+    assert script.requests == 4
+    assert delays == [0.5, 1.0, 2.0]
+    assert transport.stats()["retries"] == 3
+
+
+def test_backoff_is_capped_and_honours_retry_after(delays):
+    script = Script(429, 429, 429, 429, headers={"retry-after": "3"})
+    transport = make_transport(script, max_retries=4, retry_base_delay=1, retry_max_delay=4,
+                               breaker_threshold=0)
+    asyncio.run(complete(transport))
+    assert delays == [3.0, 3.0, 4.0, 4.0]
+
+
+def test_gives_up_after_max_retries(delays):
+    script = Script(503, 503, 503)
+    transport = make_transport(script, max_retries=2, breaker_threshold=0)
+    with pytest.raises(APIStatusError):
+        asyncio.run(complete(transport))
+    assert script.requests == 3 and len(delays) == 2
+
+
+def test_client_errors_are_not_retried(delays):
+    script = Script(400)
+    transport = make_transport(script, max_retries=3, breaker_threshold=0)
+    with pytest.raises(APIStatusError) as error:
+        asyncio.run(complete(transport))
+    assert not isinstance(error.value, RateLimitError)
+    assert script.requests == 1 and delays == []
+
+
+def test_breaker_opens_then_half_opens_then_closes():
+    breaker = CircuitBreaker(threshold=3, cooldown=30)
+    for _ in range(2):
+        breaker.record_failure()
+    assert breaker.state == "closed" and breaker.before_call() is False
+
+    breaker.record_failure()
+    assert breaker.state == "open"
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call()
+
+    breaker.opened_at -= 30
+    assert breaker.before_call() is True
+    assert breaker.state == "half_open"
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call()  # only one probe at a time
+
+    breaker.record_success()
+    assert breaker.state == "closed" and breaker.failures == 0
+    assert breaker.before_call() is False
+
+
+def test_failed_probe_reopens_the_breaker():
+    breaker = CircuitBreaker(threshold=3, cooldown=30)
+    open_breaker(breaker)
+    assert breaker.before_call() is True
+    breaker.record_failure()
+    assert breaker.state == "open"
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call()
+
+
+def test_open_breaker_fails_fast_without_calling_the_provider(delays):
+    script = Script(503, 503, 503, 503)
+    transport = make_transport(script, max_retries=5, breaker_threshold=2, breaker_cooldown=30)
+    with pytest.raises(APIStatusError):
+        asyncio.run(complete(transport))
+    assert script.requests == 2 and transport.breaker.state == "open"
+
+    with pytest.raises(CircuitOpenError):
+        asyncio.run(complete(transport))
+    assert script.requests == 2 and transport.stats()["fast_failures"] == 1
+
+
+def test_rate_limits_do_not_trip_the_breaker(delays):
+    script = Script(429, 429, 429, 429, headers={"retry-after": "2"})
+    transport = make_transport(script, max_retries=4, retry_base_delay=0.5, retry_max_delay=8,
+                               breaker_threshold=2, breaker_cooldown=30)
+    response = asyncio.run(complete(transport))
+    assert response.choices[0].message.content == "hola"
+    assert script.requests == 5 and delays == [2.0, 2.0, 2.0, 4.0]
+    assert transport.breaker.state == "closed" and transport.breaker.failures == 0
+
+
+def test_rate_limited_probe_lets_the_retry_probe(delays):
+    script = Script(429)
+    transport = make_transport(script, max_retries=2, breaker_threshold=2, breaker_cooldown=30)
+    open_breaker(transport.breaker)
+    asyncio.run(complete(transport))
+    assert script.requests == 2 and transport.breaker.state == "closed"
+
+
+def test_cancelled_probe_lets_the_next_call_probe():
+    async def slow(request):
+        await asyncio.sleep(10)
+        return httpx.Response(200, json=COMPLETION)
+
+    async def scenario():
+        transport = make_transport(slow, breaker_threshold=2, breaker_cooldown=30)
+        open_breaker(transport.breaker)
+        try:
+            await asyncio.wait_for(complete(transport), 0.05)
+        except asyncio.TimeoutError:
+            pass
+        assert transport.breaker.state == "half_open"
+
+        transport.async_client = make_transport(lambda r: httpx.Response(200, json=COMPLETION)).async_client
+        response = await complete(transport)
+        assert response.choices[0].message.content == "hola"
+        assert transport.breaker.state == "closed"
+
+    asyncio.run(scenario())
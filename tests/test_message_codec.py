@@ -0,0 +1,52 @@
+"""Compressed message storage: dictionaries trained while the app is running."""
+
+import pytest
+
+from database import Database
+import message_codec
+from message_codec import train_dictionary
+
+LONG_REPLY = ("Entiendo cómo te sientes, es completamente normal sentirse así con los exámenes. "
+              "¿Quieres contarme un poco más? A veces ayuda ponerlo en palabras. ")
+
+
+@pytest.fixture
+def db_path(tmp_path, monkeypatch):
+    monkeypatch.setenv("MESSAGE_COMPRESSION", "zlib")
+    return str(tmp_path / "chat.db")
+
+
+def seed(db, count=20):
+    user_id = db.create_user("lucia", "secret")["user_id"]
+    session_id = db.get_user_sessions(user_id)[0]["id"]
+    for i in range(count):
+        db.add_message(session_id, "assistant", f"{LONG_REPLY * 3}({i})")
+    return session_id
+
+
+def test_reads_rows_recompressed_with_a_dictionary_trained_elsewhere(db_path):
+    app = Database(db_path)
+    session_id = seed(app)
+    before = app.get_session_messages(session_id)
+
+    cli = Database(db_path)
+    dictionary_id = cli.save_message_dictionary("zlib", train_dictionary([m["content"] for m in before]))
+    cli.compact_messages(0, recompress=True)
+    assert dictionary_id not in app.codec.dictionaries
+
+    assert app.get_session_messages(session_id) == before
+    assert app.get_message_storage_stats()["encodings"].keys() == {f"zlib:{dictionary_id}"}
+
+
+def test_builtin_dictionary_is_decoded_from_the_stored_copy(db_path, monkeypatch):
+    session_id = seed(Database(db_path))
+    before = Database(db_path).get_session_messages(session_id)
+
+    monkeypatch.setattr(message_codec, "BUILTIN_DICTIONARY", "edited later")
+    assert Database(db_path).get_session_messages(session_id) == before
+
+
+def test_unknown_dictionary_raises(db_path):
+    db = Database(db_path)
+    with pytest.raises(KeyError):
+        db.codec.decode(b"\x00", "zlib:42")
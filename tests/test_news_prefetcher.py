@@ -0,0 +1,79 @@
+"""NewsPrefetcher runs keep the work that succeeded when some of it fails."""
+
+import asyncio
+
+import pytest
+
+from news_prefetcher import NewsPrefetcher, parse_hours
+
+
+class FakeAdb:
+    def __init__(self, profiles):
+        self.profiles = profiles
+        self.saved = []
+
+    async def get_profiles_with_activity(self, now):
+        return self.profiles
+
+    async def save_proactive_greetings(self, rows, now):
+        self.saved.extend(rows)
+        return len(rows)
+
+
+class FakeNews:
+    def is_available(self):
+        return True
+
+    async def arefresh(self, query, language, days_back, min_fresh=0.0):
+        if query == "ajedrez":
+            raise RuntimeError("NewsAPI exploded")
+        return True
+
+    async def asearch_news(self, query, language, days_back, max_results):
+        return [{"title": f"Noticia de {query}", "description": None}]
+
+
+class FakeLLM:
+    async def agenerate_proactive_question(self, interests, news, profile, user_id):
+        if user_id == 2:
+            raise RuntimeError("unexpected response")
+        return f"¿Viste lo de {interests[0]}?"
+
+
+def profile(user_id, *interests):
+    return {"user_id": user_id, "profile": {"interests": list(interests)},
+            "idle_seconds": 2 * 86400, "has_greeting": False}
+
+
+def test_failures_do_not_discard_the_rest_of_the_run():
+    adb = FakeAdb([profile(1, "fútbol"), profile(2, "fútbol"), profile(3, "ajedrez"), profile(4, "cocina")])
+    prefetcher = NewsPrefetcher(adb, FakeNews(), FakeLLM(), rpm=0, batch_size=10)
+
+    stats = asyncio.run(prefetcher.run())
+
+    assert stats == {"topics": 3, "refreshed": 2, "due": 4, "generated": 3}
+    assert sorted(row[0] for row in adb.saved) == [1, 3, 4]
+    assert prefetcher.stats()["refresh_errors"] == 1
+    assert prefetcher.stats()["greetings_failed"] == 1
+
+
+@pytest.mark.parametrize("hours, expected", [
+    ("2-6", (2, 6)),
+    (" 23 - 5 ", (23, 5)),
+    ("22-24", (22, 0)),
+    ("", None),
+    ("2", None),
+    ("2-6-8", None),
+    ("dos-seis", None),
+    ("22-25", None),
+    ("-3-4", None),
+])
+def test_parse_hours(hours, expected):
+    assert parse_hours(hours) == expected
+
+
+def test_invalid_off_peak_hours_fall_back_to_every_run(monkeypatch, capsys):
+    monkeypatch.setenv("PROACTIVE_OFF_PEAK_HOURS", "2a6")
+    prefetcher = NewsPrefetcher(FakeAdb([]), FakeNews(), FakeLLM(), rpm=0)
+    assert prefetcher.off_peak is None
+    assert "PROACTIVE_OFF_PEAK_HOURS" in capsys.readouterr().out
@@ -0,0 +1,120 @@
+"""NewsService cache, stale-while-revalidate and coalescing, against httpx.MockTransport."""
+
+import asyncio
+import time
+
+import httpx
+
+from news_service import NewsService
+
+
+class FakeNewsAPI:
+    """MockTransport handler: answers /everything with numbered articles, or fails on demand."""
+
+    def __init__(self, delay: float = 0.0):
+        self.delay = delay
+        self.requests = 0
+        self.status = 200
+        self.error = None
+
+    async def __call__(self, request: httpx.Request) -> httpx.Response:
+        self.requests += 1
+        if self.delay:
+            await asyncio.sleep(self.delay)
+        if self.error is not None:
+            raise self.error
+        articles = [{"title": f"{request.url.params['q']} {self.requests}", "description": None,
+                     "url": "http://news.test", "publishedAt": "2025-01-01", "source": {"name": "Test"}}]
+        return httpx.Response(self.status, json={"status": "ok", "articles": articles})
+
+
+def make_service(api: FakeNewsAPI, **kwargs) -> NewsService:
+    service = NewsService(api_key="test", base_url="http://news.test/v2", **kwargs)
+    service.async_client = httpx.AsyncClient(transport=httpx.MockTransport(api))
+    return service
+
+
+def age(service: NewsService, seconds: float):
+    """Make every cached entry `seconds` old."""
+    for entry in service._memory.values():
+        entry["fetched_at"] = time.time() - seconds
+
+
+def test_fresh_result_is_served_from_cache():
+    async def scenario():
+        api = FakeNewsAPI()
+        service = make_service(api, ttl=60, stale_ttl=600)
+        first = await service.asearch_news("fútbol")
+        assert await service.asearch_news("Fútbol ") == first
+        assert api.requests == 1 and service.hits == 1
+
+    asyncio.run(scenario())
+
+
+def test_stale_result_is_served_while_refreshed_in_background():
+    async def scenario():
+        api = FakeNewsAPI(delay=0.05)
+        service = make_service(api, ttl=60, stale_ttl=600)
+        first = await service.asearch_news("fútbol")
+        age(service, 120)
+
+        start = time.perf_counter()
+        assert await service.asearch_news("fútbol") == first
+        assert time.perf_counter() - start < api.delay, "stale hit waited for upstream"
+        assert service.stale_hits == 1
+
+        await asyncio.gather(*service._inflight.values())
+        assert api.requests == 2
+        refreshed = await service.asearch_news("fútbol")
+        assert refreshed[0]["title"] == "fútbol 2"
+        assert service.hits == 1
+
+    asyncio.run(scenario())
+
+
+def test_concurrent_misses_share_one_request():
+    async def scenario():
+        api = FakeNewsAPI(delay=0.05)
+        service = make_service(api)
+        results = await asyncio.gather(*(service.asearch_news("Minecraft") for _ in range(10)))
+        assert api.requests == 1
+        assert service.coalesced == 9
+        assert all(result == results[0] for result in results)
+        assert not service._inflight
+
+    asyncio.run(scenario())
+
+
+def test_upstream_errors_fall_back_to_stale_result():
+    async def scenario():
+        api = FakeNewsAPI()
+        service = make_service(api, ttl=60, stale_ttl=600)
+        first = await service.asearch_news("cocina")
+
+        api.status = 500
+        age(service, 120)
+        assert await service.asearch_news("cocina") == first
+        await asyncio.gather(*service._inflight.values())
+        assert service.fetch_errors == 1
+        # The failed refresh left the stale entry in place
+        assert await service.asearch_news("cocina") == first
+        await asyncio.gather(*service._inflight.values())
+        assert service.fetch_errors == 2
+
+        api.error = httpx.ConnectError("down")
+        age(service, 1000)
+        assert await service.asearch_news("cocina") is None
+        assert service.fetch_errors == 3
+
+    asyncio.run(scenario())
+
+
+def test_without_api_key_nothing_is_requested():
+    async def scenario():
+        api = FakeNewsAPI()
+        service = make_service(api)
+        service.api_key = None
+        assert await service.asearch_news("series") is None
+        assert api.requests == 0
+
+    asyncio.run(scenario())
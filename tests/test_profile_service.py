@@ -0,0 +1,140 @@
+"""ProfileService normalization, merging and message screening."""
+
+import pytest
+
+from profile_service import PROFILE_LIST_LIMITS, ProfileService, _classify_age, _normalize_gender
+
+
+@pytest.fixture
+def service():
+    return ProfileService(llm_service=None)
+
+
+@pytest.mark.parametrize("age_range, expected", [
+    ("9 años", (9, "child")),
+    ("10 años", (10, "preteen")),
+    ("13", (13, "preteen")),
+    ("14 años", (14, "teen")),
+    ("17", (17, "teen")),
+    ("18 años", (18, "young_adult")),
+    ("20", (20, "young_adult")),
+    ("21", (21, "adult")),
+    ("64 años", (64, "adult")),
+    ("65 años", (65, "senior")),
+    ("120", (120, "senior")),
+    ("~10-17 años", (13, "preteen")),
+    ("15-19", (17, "teen")),
+    ("0 o 121 años", (None, None)),
+    ("adolescente", (None, "teen")),
+    ("preadolescente", (None, "preteen")),
+    ("Niña pequeña", (None, "child")),
+    ("adulto joven", (None, "young_adult")),
+    ("persona mayor", (None, "senior")),
+    ("adulta", (None, "adult")),
+    ("desconocida", (None, None)),
+    ("", (None, None)),
+    ("null", (None, None)),
+    (None, (None, None)),
+])
+def test_classify_age(age_range, expected):
+    assert _classify_age(age_range) == expected
+
+
+@pytest.mark.parametrize("gender, expected", [
+    ("masculino", "masculino"),
+    ("Hombre", "masculino"),
+    ("  chico. ", "masculino"),
+    ("male", "masculino"),
+    ("FEMENINO", "femenino"),
+    ("Mujer", "femenino"),
+    ("chica", "femenino"),
+    ("female", "femenino"),
+    ("ambiguo", "ambiguo"),
+    ("no binario", "ambiguo"),
+    ("hombre o mujer", "ambiguo"),
+    ("desconocido", "ambiguo"),
+    ("", None),
+    ("null", None),
+    (None, None),
+])
+def test_normalize_gender(gender, expected):
+    assert _normalize_gender(gender) == expected
+
+
+def test_dedupe_ignores_case_accents_and_punctuation(service):
+    items = ["Fútbol", "futbol!", "Música", "MUSICA", "  ", 3, "Cocina"]
+    assert service._dedupe_items(items, None) == ["futbol!", "MUSICA", "Cocina"]
+
+
+def test_dedupe_keeps_the_newest_entries_up_to_the_limit(service):
+    assert service._dedupe_items([f"tema {i}" for i in range(10)], 3) == ["tema 7", "tema 8", "tema 9"]
+
+
+def test_clean_facts_drops_facts_covered_by_other_fields(service):
+    merged = {"profession": "enfermera", "education": "Medicina", "interests": ["Fútbol"]}
+    facts = ["Le gusta el futbol", "Trabaja como enfermera", "Estudió medicina", "Tiene un perro"]
+    assert service._clean_facts(facts, merged, 50) == ["Tiene un perro"]
+
+
+def test_clean_facts_keeps_the_newest_wording_of_near_duplicates(service):
+    facts = ["Tiene un perro", "Vive en Madrid", "Tiene un perro llamado Toby", "Tiene un gato"]
+    assert service._clean_facts(facts, {}, 50) == ["Vive en Madrid", "Tiene un perro llamado Toby", "Tiene un gato"]
+
+
+def test_clean_facts_caps_dropping_the_oldest(service):
+    facts = ["Tiene dos hermanos", "Vive en Sevilla", "Nació en Lima", "Toca la guitarra"]
+    assert service._clean_facts(facts, {}, 2) == facts[-2:]
+
+
+def test_merge_overrides_scalar_fields_with_the_delta(service):
+    existing = {"name": "Ana", "age_range": "15 años", "gender": "femenino", "profession": "estudiante",
+                "tone_preference": "cercano"}
+    merged = service._merge_profiles(existing, {"name": "Ana María", "age_range": "16", "profession": "null",
+                                                "tone_preference": ""})
+
+    assert merged["name"] == "Ana María"
+    assert (merged["age_years"], merged["age_group"]) == (16, "teen")
+    assert merged["profession"] == "estudiante"
+    assert merged["tone_preference"] == "cercano"
+    assert merged["gender"] == "femenino"
+    assert existing["name"] == "Ana"
+
+
+def test_merge_dedupes_and_caps_lists(service):
+    limit = PROFILE_LIST_LIMITS["interests"]
+    existing = {"interests": [f"tema {i}" for i in range(limit)], "needs": ["Desahogarse"]}
+    merged = service._merge_profiles(existing, {"interests": ["Tema 0", "ajedrez"], "needs": "desahogarse"})
+
+    assert len(merged["interests"]) == limit
+    assert merged["interests"][-2:] == ["Tema 0", "ajedrez"]
+    assert "tema 1" not in merged["interests"]
+    assert merged["needs"] == ["Desahogarse"]
+
+
+@pytest.mark.parametrize("message", [
+    "ok", "Vale, gracias!!", "jajajaja", "xD", "hola", "buenas", "ah vale", "sí, claro", "  ", "🙂",
+    "bueno pues nada",
+])
+def test_small_talk_is_not_informative(service, message):
+    assert not service.is_informative_message(message)
+    assert not service.is_informative_message(message, previous_reply="¿Y tú qué tal?")
+
+
+@pytest.mark.parametrize("message", [
+    "Me llamo Lucía",
+    "tengo 15 años",
+    "estoy muy cansada últimamente",
+    "mi perro se llama Toby",
+    "ayer fuimos a Valencia",
+    "el fin de semana pasado fue el cumpleaños de la abuela y lo celebramos todos juntos en casa",
+    "Odio los lunes",
+    "dos hermanos",
+])
+def test_self_disclosures_are_informative(service, message):
+    assert service.is_informative_message(message)
+
+
+def test_short_answer_to_a_question_is_informative(service):
+    assert not service.is_informative_message("el fútbol")
+    assert service.is_informative_message("el fútbol", previous_reply="¿Qué deporte te gusta? ")
+    assert not service.is_informative_message("el fútbol", previous_reply="Qué bien.")
@@ -0,0 +1,129 @@
+"""ProfileStore keeps dirty profiles in memory until their write commits."""
+
+import asyncio
+
+from profile_store import ProfileStore
+
+
+class FakeAdb:
+    def __init__(self):
+        self.rows = {}
+        self.batches = []
+        self.fail = False
+        self.gate = None
+
+    async def get_user_profile(self, user_id):
+        row = self.rows.get(user_id)
+        return dict(row) if row is not None else None
+
+    async def save_profiles_batch(self, profiles, emotional_states):
+        if self.gate is not None:
+            await self.gate.wait()
+        if self.fail:
+            raise RuntimeError("database is locked")
+        self.batches.append(sorted(user_id for user_id, _ in profiles + emotional_states))
+        for user_id, profile in profiles + emotional_states:
+            self.rows[user_id] = dict(profile)
+        return len(profiles) + len(emotional_states)
+
+
+def test_profiles_being_flushed_are_not_evicted():
+    async def scenario():
+        adb = FakeAdb()
+        adb.rows = {1: {"name": "viejo"}, 2: {"name": "Dos"}}
+        store = ProfileStore(adb, max_size=1, flush_interval=60, ttl=0)
+        await store.update(1, {"name": "Lucía"})
+
+        adb.gate = asyncio.Event()
+        flush = asyncio.create_task(store.flush())
+        await asyncio.sleep(0)
+        assert await store.get(2) == {"name": "Dos"}
+        assert (await store.get(1))["name"] == "Lucía"
+        assert store.stats()["dirty"] == 1
+
+        adb.gate.set()
+        assert await flush == 1
+        return store
+
+    store = asyncio.run(scenario())
+    assert store.stats()["dirty"] == 0
+
+
+def test_updates_during_a_flush_stay_dirty():
+    async def scenario():
+        adb = FakeAdb()
+        store = ProfileStore(adb, max_size=10, flush_interval=60, ttl=0)
+        await store.update(1, {"name": "Lucía"})
+
+        adb.gate = asyncio.Event()
+        flush = asyncio.create_task(store.flush())
+        await asyncio.sleep(0)
+        await store.update(1, {"name": "Lucía", "age": 15})
+        adb.gate.set()
+        await flush
+
+        assert store.stats()["dirty"] == 1
+        assert await store.flush() == 1
+        return adb
+
+    adb = asyncio.run(scenario())
+    assert adb.rows[1]["age"] == 15
+
+
+def test_failed_flush_keeps_profiles_dirty_for_the_next_one():
+    async def scenario():
+        adb = FakeAdb()
+        store = ProfileStore(adb, max_size=10, flush_interval=60, ttl=0)
+        await store.update(1, {"name": "Lucía"})
+        await store.update_emotional_state(1, {"overall_mood": "feliz"})
+
+        adb.fail = True
+        assert await store.flush() == 0
+        assert store.stats()["dirty"] == 1
+
+        adb.fail = False
+        assert await store.flush() == 2
+        return store, adb
+
+    store, adb = asyncio.run(scenario())
+    assert store.stats()["dirty"] == 0
+    assert adb.batches == [[1, 1]]
+    assert adb.rows[1]["emotional_state"] == {"overall_mood": "feliz"}
+
+
+def test_flush_skips_ids_that_are_no_longer_cached():
+    async def scenario():
+        adb = FakeAdb()
+        store = ProfileStore(adb, max_size=10, flush_interval=60, ttl=0)
+        await store.update(1, {"name": "Lucía"})
+        store._dirty_profiles.add(99)
+        return await store.flush(), store
+
+    written, store = asyncio.run(scenario())
+    assert written == 1
+    assert store.stats()["dirty"] == 0
+
+
+def test_flush_loop_survives_errors():
+    async def scenario():
+        adb = FakeAdb()
+        store = ProfileStore(adb, max_size=10, flush_interval=0.01, ttl=0)
+        await store.update(1, {"name": "Lucía"})
+        flush, calls = store.flush, []
+
+        async def flaky_flush():
+            calls.append(1)
+            if len(calls) == 1:
+                raise RuntimeError("unexpected")
+            return await flush()
+
+        store.flush = flaky_flush
+        await store.start()
+        await asyncio.sleep(0.05)
+        assert not store._flush_task.done()
+        await store.stop()
+        return adb, calls
+
+    adb, calls = asyncio.run(scenario())
+    assert len(calls) > 1
+    assert adb.rows[1]["name"] == "Lucía"
@@ -0,0 +1,57 @@
+"""Prompt templates: parsing, rendering and reload."""
+
+import os
+
+import pytest
+
+from prompt_templates import PromptTemplates
+
+
+@pytest.fixture
+def directory(tmp_path):
+    (tmp_path / "header.txt").write_text("Eres un asistente.\n", encoding="utf-8")
+    (tmp_path / "prompt.txt").write_text("{{> header}}Hola {{user}}, hablemos de {{topic}}.\n{{user}}!",
+                                         encoding="utf-8")
+    return tmp_path
+
+
+def test_render_fills_slots_and_inlines_includes(directory):
+    templates = PromptTemplates(directory)
+    assert templates.render("prompt", user="Ana", topic="fútbol") == \
+        "Eres un asistente.\nHola Ana, hablemos de fútbol.\nAna!"
+    assert templates.get("prompt").slots == {"topic", "user"}
+    assert templates.render("header") == "Eres un asistente.\n"
+
+
+def test_missing_or_unknown_slot_raises(directory):
+    templates = PromptTemplates(directory)
+    with pytest.raises(TypeError):
+        templates.render("prompt", user="Ana")
+    with pytest.raises(TypeError):
+        templates.render("prompt", user="Ana", topic="x", mood="y")
+    with pytest.raises(TypeError):
+        templates.render("header", user="Ana")
+
+
+def test_template_text_is_never_executed(directory):
+    payload = "'), __import__('os').system('echo pwned'), ('\"\"\" {{user}} \\n"
+    (directory / "evil.txt").write_text(payload, encoding="utf-8")
+    templates = PromptTemplates(directory)
+    assert templates.render("evil", user="Ana") == payload.replace("{{user}}", "Ana")
+
+
+def test_changed_files_are_reloaded(directory):
+    templates = PromptTemplates(directory, reload=True)
+    generation = templates.generation
+    path = directory / "header.txt"
+    path.write_text("Eres un tutor.\n", encoding="utf-8")
+    os.utime(path, (path.stat().st_atime, path.stat().st_mtime + 5))
+    assert templates.render("prompt", user="Ana", topic="x").startswith("Eres un tutor.\n")
+    assert templates.generation == generation + 1
+
+
+def test_include_cycle_is_rejected(tmp_path):
+    (tmp_path / "a.txt").write_text("{{> b}}", encoding="utf-8")
+    (tmp_path / "b.txt").write_text("{{> a}}", encoding="utf-8")
+    with pytest.raises(ValueError):
+        PromptTemplates(tmp_path)
@@ -0,0 +1,29 @@
+"""Regression tests for the local risk pre-screen."""
+
+import pytest
+
+from risk_screen import RiskScreen
+
+
+@pytest.fixture(scope="module")
+def screen():
+    return RiskScreen()
+
+
+@pytest.mark.parametrize("message", [
+    "mi padre me pega con el cinturón",
+    "mi madre me pega mucho",
+    "quiero acabar con todo esto de una vez",
+])
+def test_disclosures_are_not_hidden_by_safe_phrases(screen, message):
+    assert screen.screen(message).level == "high"
+
+
+@pytest.mark.parametrize("message", [
+    "Esa camiseta me pega mucho",
+    "ese color me pega con la ropa",
+    "el balón me pega en la cara en cada partido",
+    "Quiero acabar con todo el trabajo antes del viernes",
+])
+def test_anchored_idioms_stay_safe(screen, message):
+    assert screen.screen(message).level == "none"